@@ -0,0 +1,227 @@
+"""
+async_fetch.py - ファイル取得エンジン（requests / httpx の非同期版を切り替え）
+FETCH_ENGINE=httpx では専用スレッドのイベントループで httpx.AsyncClient を動かし、
+同時接続数を FETCH_CONCURRENCY で制限しながら接続を使い回す。
+どちらのエンジンも requests.get と同じ形（get(url, headers=, params=)）で呼べ、
+応答の raise_for_status() は requests.exceptions.HTTPError を送出する。
+429 / 5xx は Retry-After（なければ指数バックオフ）に従って再試行する。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FETCH_ENGINE = os.environ.get("FETCH_ENGINE", "requests").lower()
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "4"))
+FETCH_MAX_RETRIES = int(os.environ.get("FETCH_MAX_RETRIES", "3"))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "60"))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# get_many の結果（url, 応答 or None, エラー or None, 秒数）
+FetchResult = namedtuple('FetchResult', ['url', 'response', 'error', 'seconds'])
+
+def _retry_delay(headers, attempt):
+    """再試行までの待機秒数（Retry-After があれば優先）"""
+    retry_after = headers.get("retry-after") if headers else None
+    try:
+        if retry_after is not None:
+            return max(0.0, float(retry_after))
+    except (TypeError, ValueError):
+        pass
+    return min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+class FetchResponse:
+    """requests.Response と同じ使い方ができる応答"""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+class _FetcherBase:
+    """共通の統計（リクエスト数・再試行数・1件ごとの所要秒数）"""
+
+    def __init__(self, concurrency, max_retries):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.latencies = []
+        self.metrics = {"requests": 0, "retries": 0, "errors": 0}
+        self._metrics_lock = threading.Lock()
+
+    def _record(self, seconds=None, **counts):
+        with self._metrics_lock:
+            if seconds is not None:
+                self.latencies.append(seconds)
+            for key, value in counts.items():
+                self.metrics[key] += value
+
+    def percentile(self, q):
+        """所要秒数のパーセンタイル（q は 0〜100）"""
+        with self._metrics_lock:
+            values = sorted(self.latencies)
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+        return values[index]
+
+    def summary(self):
+        return (f"取得エンジン {self.engine}（同時 {self.concurrency}）: {self.metrics['requests']}件 / "
+                f"再試行 {self.metrics['retries']}回 / エラー {self.metrics['errors']}件 / "
+                f"p50 {self.percentile(50) * 1000:.0f} ms / p99 {self.percentile(99) * 1000:.0f} ms")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class RequestsFetcher(_FetcherBase):
+    """requests（スレッドごとの Session）で取得"""
+
+    engine = "requests"
+
+    def __init__(self, concurrency=FETCH_CONCURRENCY, max_retries=FETCH_MAX_RETRIES, timeout=FETCH_TIMEOUT):
+        super().__init__(concurrency, max_retries)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._slots = threading.Semaphore(self.concurrency)
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def get(self, url, headers=None, params=None):
+        attempt = 0
+        with self._slots:
+            # 空き待ちの時間は所要時間に含めない
+            start = time.perf_counter()
+            while True:
+                response = self._session().get(url, headers=headers, params=params, timeout=self.timeout)
+                if response.status_code not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    break
+                attempt += 1
+                self._record(retries=1)
+                time.sleep(_retry_delay(response.headers, attempt))
+        self._record(time.perf_counter() - start, requests=1, errors=int(response.status_code >= 400))
+        return FetchResponse(url, response.status_code, response.headers, response.content)
+
+    def get_many(self, urls, headers=None):
+        """複数のURLを同時に取得して FetchResult のリストを返す（入力順）"""
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                return FetchResult(url, self.get(url, headers=headers), None, time.perf_counter() - start)
+            except Exception as e:
+                self._record(errors=1)
+                return FetchResult(url, None, str(e), time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(fetch, urls))
+
+    def close(self):
+        pass
+
+class HttpxAsyncFetcher(_FetcherBase):
+    """httpx.AsyncClient を専用スレッドのイベントループで動かして取得"""
+
+    engine = "httpx"
+
+    def __init__(self, concurrency=FETCH_CONCURRENCY, max_retries=FETCH_MAX_RETRIES, timeout=FETCH_TIMEOUT):
+        import httpx
+
+        super().__init__(concurrency, max_retries)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+        async def setup():
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            return httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True), \
+                asyncio.Semaphore(self.concurrency)
+
+        self._client, self._slots = self._run(setup())
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _get(self, url, headers=None, params=None):
+        attempt = 0
+        async with self._slots:
+            start = time.perf_counter()
+            while True:
+                response = await self._client.get(url, headers=headers, params=params)
+                if response.status_code not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    break
+                attempt += 1
+                self._record(retries=1)
+                await asyncio.sleep(_retry_delay(response.headers, attempt))
+        self._record(time.perf_counter() - start, requests=1, errors=int(response.status_code >= 400))
+        return FetchResponse(str(response.url), response.status_code, response.headers, response.content)
+
+    def get(self, url, headers=None, params=None):
+        """requests.get と同じ形で1件取得（ワーカースレッドから並行して呼んでよい）"""
+        return self._run(self._get(url, headers=headers, params=params))
+
+    def get_many(self, urls, headers=None):
+        """複数のURLを同時に取得して FetchResult のリストを返す（入力順）"""
+        async def fetch(url):
+            start = time.perf_counter()
+            try:
+                return FetchResult(url, await self._get(url, headers=headers), None, time.perf_counter() - start)
+            except Exception as e:
+                self._record(errors=1)
+                return FetchResult(url, None, str(e), time.perf_counter() - start)
+
+        async def fetch_all():
+            return await asyncio.gather(*(fetch(url) for url in urls))
+
+        return self._run(fetch_all())
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        try:
+            self._run(self._client.aclose())
+        except Exception as e:
+            logging.warning(f"httpx クライアントの終了に失敗: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+FETCH_ENGINES = {"requests": RequestsFetcher, "httpx": HttpxAsyncFetcher}
+
+def create_fetcher(engine=None, concurrency=None, **kwargs):
+    """取得エンジンを作成（engine 未指定は FETCH_ENGINE、httpx が使えなければ requests）"""
+    engine = (engine or FETCH_ENGINE).lower()
+    concurrency = concurrency or FETCH_CONCURRENCY
+    if engine not in FETCH_ENGINES:
+        raise ValueError(f"未対応の取得エンジン: {engine}（{', '.join(FETCH_ENGINES)}）")
+    if engine == "httpx":
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            logging.warning("httpx が見つからないため requests で取得します")
+            engine = "requests"
+    return FETCH_ENGINES[engine](concurrency=concurrency, **kwargs)
@@ -0,0 +1,44 @@
+"""ベンチマーク共通ヘルパー"""
+
+import logging
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# streamlit_app をスクリプト外で読み込むときの警告を抑制
+for logger_name in ("streamlit", "streamlit.runtime"):
+    logging.getLogger(logger_name).setLevel(logging.ERROR)
+
+
+def import_streamlit_app():
+    """streamlit_app を bare mode で読み込む"""
+    logging.disable(logging.WARNING)
+    try:
+        import streamlit_app
+    finally:
+        logging.disable(logging.NOTSET)
+    return streamlit_app
+
+
+def measure(func, repeat=3):
+    """func を repeat 回実行し、(中央値秒, 最後の戻り値) を返す"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def report(title, rows):
+    """(名前, 秒) のリストを表形式で表示"""
+    print(f"\n== {title} ==")
+    width = max(len(name) for name, _ in rows)
+    for name, seconds in rows:
+        print(f"  {name.ljust(width)}  {seconds * 1000:10.1f} ms")
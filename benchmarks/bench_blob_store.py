@@ -0,0 +1,62 @@
+"""ファイル保管領域（BlobStore）のベンチマーク
+
+ダウンロードしたファイル本体をセッションに (名前, bytes) で保持する従来方式と、
+BlobStore に保存して (名前, BlobRef) だけを保持する方式で、保持メモリと読み込み時間を比較する。
+読み込みは streamlit_app の process_single_file_lightweight を使う（BlobRef は mmap で開く）。
+
+    python benchmarks/bench_blob_store.py [--files 300] [--rows 400]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+
+from _common import import_streamlit_app, measure, report
+from bench_pipeline import make_csv
+from blob_store import BlobStore, open_content
+
+sa = import_streamlit_app()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=400)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench_blob_store_')
+    store = BlobStore(root)
+    try:
+        held = [(f'list_{i}.csv', make_csv(i, args.rows)) for i in range(args.files)]
+        held_bytes = sum(len(content) for _, content in held)
+        handles = [(name, store.put(content)) for name, content in held]
+        handle_bytes = sum(sys.getsizeof(ref) + sys.getsizeof(ref.digest) for _, ref in handles)
+
+        def parse_bytes():
+            return [sa.process_single_file_lightweight(name, content) for name, content in held]
+
+        def parse_blobs():
+            frames = []
+            for name, ref in handles:
+                with open_content(ref, store) as data:
+                    frames.append(sa.process_single_file_lightweight(name, data))
+            return frames
+
+        bytes_time, bytes_frames = measure(parse_bytes)
+        blob_time, blob_frames = measure(parse_blobs)
+        assert all(a.equals(b) for a, b in zip(bytes_frames, blob_frames))
+
+        report(f'{args.files}ファイルの読み込み', [
+            ('bytes をセッションに保持', bytes_time),
+            ('BlobRef + mmap', blob_time),
+        ])
+        print(f"\n  セッションの保持メモリ: bytes {held_bytes / 1024 / 1024:.1f} MB"
+              f" / BlobRef {handle_bytes / 1024:.1f} KB")
+        print(f"  {store.summary()}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
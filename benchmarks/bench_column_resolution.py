@@ -0,0 +1,88 @@
+"""列名解決ベンチマーク
+
+COLUMN_RENAMES を毎回走査する旧実装と、正規化キーの索引 + 部分一致判定表の現行実装で
+1ファイルあたりの列名解決時間（列構成キャッシュを使わない初回解決）を比較する。
+
+    python benchmarks/bench_column_resolution.py [--files 2000] [--columns 40]
+"""
+
+import argparse
+import random
+
+from _common import import_streamlit_app, measure, report
+
+sa = import_streamlit_app()
+
+
+def legacy_resolve_lightweight(columns):
+    """比較用：索引化前の軽量版列名変換（完全一致は COLUMN_RENAMES を線形走査）"""
+    rename_dict = {}
+    for col in columns:
+        col_clean = col.strip()
+        col_lower = col_clean.lower()
+        for old_name, new_name in sa.COLUMN_RENAMES.items():
+            if col_lower == old_name.lower():
+                rename_dict[col] = new_name
+                break
+        if col not in rename_dict:
+            if 'tel' in col_lower and 'url' not in col_lower:
+                rename_dict[col] = 'Tel'
+            elif 'mail' in col_lower and 'url' not in col_lower:
+                rename_dict[col] = 'メールアドレス'
+            elif any(kw in col_clean for kw in ['会社', '企業']) and 'url' not in col_lower:
+                rename_dict[col] = '会社名'
+            elif col_lower in ['url', 'website'] and len(col_clean) < 15:
+                rename_dict[col] = 'Website'
+            elif any(kw in col_clean for kw in ['展示会初日', '開始日', '初日', '開催日']) and 'url' not in col_lower:
+                rename_dict[col] = '展示会初日'
+    return rename_dict
+
+
+def current_resolve_lightweight(columns):
+    """現行の軽量版列名変換（resolve_lightweight_column_plan の変換部分）"""
+    rename_dict = {}
+    for col in columns:
+        new_name = sa.COLUMN_RENAME_INDEX.get(sa.normalize_column_key(col)) or sa.match_lightweight_partial(col)
+        if new_name:
+            rename_dict[col] = new_name
+    return rename_dict
+
+
+def make_headers(files, columns, seed=0):
+    """既知の列名と未知の列名を混ぜたヘッダーを files 個作成"""
+    rng = random.Random(seed)
+    known = list(sa.COLUMN_RENAMES)
+    unknown = [f'備考{i}' for i in range(50)] + ['Facebook URL', 'SNS URL', '会社URL', '出展カテゴリ', 'Booth No']
+    headers = []
+    for _ in range(files):
+        picked = rng.sample(known, min(columns // 2, len(known))) + rng.sample(unknown, columns - columns // 2)
+        rng.shuffle(picked)
+        headers.append([f' {col.upper()} ' if rng.random() < 0.2 else col for col in picked])
+    return headers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    headers = make_headers(args.files, args.columns)
+    legacy_time, legacy_result = measure(lambda: [legacy_resolve_lightweight(h) for h in headers], args.repeat)
+    current_time, current_result = measure(lambda: [current_resolve_lightweight(h) for h in headers], args.repeat)
+    assert legacy_result == current_result, "変換結果が一致しません"
+
+    detailed_time, _ = measure(lambda: [sa.resolve_detailed_column_plan(h) for h in headers], args.repeat)
+
+    per_file = lambda seconds: seconds / args.files
+    report(f"列名解決 1ファイルあたり ({args.files:,}ファイル × {args.columns}列, ルール {len(sa.COLUMN_RENAMES)}件)", [
+        ("旧実装 (COLUMN_RENAMES 線形走査)", per_file(legacy_time)),
+        ("現行実装 (正規化索引 + 判定表)", per_file(current_time)),
+        ("詳細版プラン作成 (現行)", per_file(detailed_time)),
+    ])
+    print(f"  速度比: {legacy_time / current_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""会社名のゆれ統合（company_resolution.resolve_companies）のスケーリングベンチマーク
+
+正解の会社IDつきで表記ゆれ（法人格の前後・(株)・全角・Co., Ltd.・1文字違い）を含む会社名を生成し、
+100k〜1M 行で所要時間・候補の組数（総当たりとの比較）・統合結果の適合率／再現率を表示する。
+適合率：同じグループにまとめた会社名の組のうち、正解でも同じ会社の割合
+再現率：正解で同じ会社の会社名の組のうち、同じグループにまとめられた割合
+
+    python benchmarks/bench_company_resolution.py [--rows 100000,300000,1000000]
+"""
+
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from _common import report
+from company_resolution import resolution_summary, resolve_companies
+
+KATAKANA = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン'
+SUFFIXES = ['工業', '商事', '製作所', '電機', 'システムズ', 'ホールディングス', 'テクノロジー', '物産']
+FULLWIDTH = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ')
+
+
+def make_companies(count, rng):
+    """正解の会社（基本名・ドメイン・電話番号の局番）"""
+    companies = []
+    for i in range(count):
+        if rng.random() < 0.3:
+            base = ''.join(rng.choice(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'), int(rng.integers(3, 7))))
+        else:
+            base = ''.join(rng.choice(list(KATAKANA), int(rng.integers(3, 7)))) + rng.choice(SUFFIXES)
+        companies.append((base, f'c{i}.co.jp', f'0{int(rng.integers(3, 99))}-{int(rng.integers(100, 9999))}'))
+    return companies
+
+
+def variant(base, rng):
+    """会社名の表記ゆれ"""
+    style = int(rng.integers(0, 7))
+    if style == 0:
+        return f'株式会社{base}'
+    if style == 1:
+        return f'{base}株式会社'
+    if style == 2:
+        return f'(株){base.translate(FULLWIDTH)}'
+    if style == 3:
+        return f'㈱ {base}'
+    if style == 4 and base.isascii():
+        return f'{base} Co., Ltd.'
+    if style == 5 and len(base) >= 6:
+        # 1文字の誤記
+        position = int(rng.integers(0, len(base)))
+        return f'株式会社{base[:position]}{rng.choice(list(KATAKANA))}{base[position + 1:]}'
+    return base
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    companies = make_companies(max(rows // 10, 1), rng)
+    truth = rng.integers(0, len(companies), rows)
+    names, emails, phones = [], [], []
+    for company_id in truth:
+        base, domain, prefix = companies[company_id]
+        names.append(variant(base, rng))
+        emails.append(f'user{int(rng.integers(0, 999))}@{domain}' if rng.random() < 0.6 else '')
+        phones.append(f'{prefix}-{int(rng.integers(0, 9999)):04d}' if rng.random() < 0.6 else '')
+    return pd.DataFrame({'会社名': names, 'メールアドレス': emails, 'Tel': phones, 'truth': truth})
+
+
+def pair_scores(names, truth, labels):
+    """会社名の組単位の適合率・再現率"""
+    frame = pd.DataFrame({'name': names, 'truth': truth, 'label': labels}).drop_duplicates('name')
+
+    def pairs(group_sizes):
+        return sum(size * (size - 1) // 2 for size in group_sizes)
+
+    both = pairs(Counter(zip(frame['truth'], frame['label'])).values())
+    predicted = pairs(Counter(frame['label']).values())
+    actual = pairs(Counter(frame['truth']).values())
+    return both / max(predicted, 1), both / max(actual, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='100000,300000,1000000')
+    args = parser.parse_args()
+
+    for rows in (int(r) for r in args.rows.split(',')):
+        df = make_frame(rows)
+        start = time.perf_counter()
+        labels, stats = resolve_companies(df['会社名'], df['メールアドレス'], df['Tel'])
+        elapsed = time.perf_counter() - start
+        exact_labels, _ = resolve_companies(df['会社名'], threshold=2.0, evidence_threshold=2.0)
+        precision, recall = pair_scores(df['会社名'], df['truth'], labels)
+        exact_precision, exact_recall = pair_scores(df['会社名'], df['truth'], exact_labels)
+        all_pairs = stats['names'] * (stats['names'] - 1) // 2
+        print(f"\n{rows}行: {resolution_summary(stats)}")
+        print(f"  候補の組 {stats['candidate_pairs']} / 総当たり {all_pairs}"
+              f"（{stats['candidate_pairs'] / max(all_pairs, 1):.5%}）")
+        print(f"  正規化キーのみ: 適合率 {exact_precision:.3f} / 再現率 {exact_recall:.3f}")
+        print(f"  あいまい一致込み: 適合率 {precision:.3f} / 再現率 {recall:.3f}")
+        report(f'{rows}行（{stats["names"]}社名）', [('resolve_companies', elapsed)])
+
+
+if __name__ == '__main__':
+    main()
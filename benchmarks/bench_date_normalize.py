@@ -0,0 +1,101 @@
+"""日付正規化（date_normalize）のベンチマーク（500k行・書式混在）
+
+  - 旧実装: pd.to_datetime(errors='coerce') を毎回の重複削除で全行に実行
+  - 新実装: 取り込み時に重複しない値ごとに解析して int64 キーを保存し、重複削除はキーで並べ替え
+を比較する。旧実装が読み取れた日付は新実装でも同じ日付になることを確認し、読み取れた件数も表示する。
+
+    python benchmarks/bench_date_normalize.py [--rows 500000] [--unique 3000]
+"""
+
+import argparse
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from _common import import_streamlit_app, measure, report
+import date_normalize
+
+sa = import_streamlit_app()
+
+
+def format_date(value, style):
+    era_year = value.year - 2018
+    return [
+        f"{value.year}/{value.month}/{value.day}",
+        f"{value.year}-{value.month:02d}-{value.day:02d} 00:00:00",
+        f"{value.year}年{value.month}月{value.day}日",
+        f"R{era_year}.{value.month}.{value.day}",
+        f"令和{era_year}年{value.month}月{value.day}日（{'月火水木金土日'[value.weekday()]}）",
+        f"{value.month}月{value.day}日({'月火水木金土日'[value.weekday()]})",
+        "",
+        "未定",
+    ][style]
+
+
+def make_frame(rows, unique, seed=0):
+    """展示会初日の書式が混在したデータ（会社名+展示会名の重複あり）"""
+    rng = np.random.default_rng(seed)
+    start = date(2024, 1, 1)
+    pool = [format_date(start + timedelta(days=int(rng.integers(0, 900))), int(rng.integers(0, 8)))
+            for _ in range(unique)]
+    return pd.DataFrame({
+        '会社名': [f'株式会社{i}' for i in rng.integers(0, rows // 4, rows)],
+        '展示会名': [f'展示会{i}' for i in rng.integers(0, 20, rows)],
+        'メールアドレス': [f'user{i}@example.co.jp' if i % 3 else '' for i in rng.integers(0, rows // 2, rows)],
+        '展示会初日': [pool[i] for i in rng.integers(0, unique, rows)],
+    })
+
+
+def legacy_parse(values):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return pd.to_datetime(values, errors='coerce')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--unique', type=int, default=3000)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.unique)
+    values = df['展示会初日']
+
+    legacy_time, legacy = measure(lambda: legacy_parse(values), repeat=1)
+
+    def fresh_keys():
+        date_normalize.parse_date_key.cache_clear()
+        return date_normalize.date_keys(values)
+
+    cold_time, keys = measure(fresh_keys, repeat=1)
+    warm_time, _ = measure(lambda: date_normalize.date_keys(values))
+
+    # 旧実装が読み取れた日付は同じ日付になること
+    legacy_keys = ((legacy.dt.year * 10000 + legacy.dt.month * 100 + legacy.dt.day) * 1000000
+                   + legacy.dt.hour * 10000).fillna(0).astype(np.int64).to_numpy()
+    both = (legacy_keys > 0) & (keys > 0)
+    assert (legacy_keys[both] == keys[both]).all()
+    assert not ((legacy_keys > 0) & (keys == 0)).any()
+
+    # 重複削除：毎回パースする場合と、取り込み時のキー列を使う場合
+    plain = df.copy()
+    keyed = date_normalize.add_date_keys(df.copy())
+    dedup_plain_time, expected = measure(lambda: sa.remove_duplicates_lightweight(plain.copy()), repeat=1)
+    dedup_keyed_time, result = measure(lambda: sa.remove_duplicates_lightweight(keyed.copy()))
+    assert date_normalize.drop_date_keys(result).equals(expected)
+
+    report(f'展示会初日 {args.rows}行（重複しない値 {args.unique}件）', [
+        (f'pd.to_datetime（読み取り {int(legacy.notna().sum())}件）', legacy_time),
+        (f'date_keys 初回（読み取り {int((keys > 0).sum())}件）', cold_time),
+        ('date_keys 2回目（キャッシュ済み）', warm_time),
+    ])
+    report('remove_duplicates_lightweight', [
+        ('キー列なし（その場で解析）', dedup_plain_time),
+        ('取り込み時のキー列を使用', dedup_keyed_time),
+    ])
+
+
+if __name__ == '__main__':
+    main()
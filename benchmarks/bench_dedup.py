@@ -0,0 +1,90 @@
+"""remove_duplicates_lightweight ベンチマーク（最大 2M 行）
+
+旧実装（日付キーで全行を並べ替え → 一時列を追加して drop_duplicates(keep='first')）と
+現行実装（キー列を factorize して int64 のグループ番号に → グループごとの最新行、残った行だけ並べ替え）を比較し、
+結果が同一（行・順序とも）であることを確認する。
+
+    python benchmarks/bench_dedup.py [--rows 100000,500000,2000000]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from _common import import_streamlit_app, measure, report
+from date_normalize import add_date_keys, stored_date_keys
+
+sa = import_streamlit_app()
+
+
+def legacy_remove_duplicates(df):
+    """比較用：ハッシュ化前の remove_duplicates_lightweight（表示処理は除く）"""
+    df = df.reset_index(drop=True)
+    date_keys = [stored_date_keys(df, col) for col in ['展示会初日', '最終更新日'] if col in df.columns]
+    if date_keys:
+        df['_max_date'] = np.maximum.reduce(date_keys)
+        df = df.sort_values(by='_max_date', ascending=False, kind='stable')
+    if 'メールアドレス' in df.columns:
+        df['_normalized_email'] = df['メールアドレス'].fillna('').str.strip()
+        df.loc[df['_normalized_email'] == '', '_normalized_email'] = pd.NA
+        duplicate_subset = ['会社名', '展示会名', '_normalized_email']
+    else:
+        duplicate_subset = ['会社名', '展示会名']
+    df = df.drop_duplicates(subset=duplicate_subset, keep='first')
+    for col in ['_max_date', '_normalized_email']:
+        if col in df.columns:
+            df = df.drop(columns=[col])
+    return df.reset_index(drop=True)
+
+
+def make_frame(rows, seed=0):
+    """会社名+展示会名+メールアドレスの重複（約3行に1件が重複）、空白・欠損メール、同じ日付を含むデータ"""
+    rng = np.random.default_rng(seed)
+    records = max(rows * 2 // 3, 1)
+    companies = np.array([f'株式会社{i}' for i in range(max(records // 3, 1))], dtype=object)
+    emails = np.array([f'user{i}@example.co.jp' for i in range(max(records // 2, 1))] + ['', ' ', None], dtype=object)
+    base = pd.DataFrame({
+        '会社名': companies[rng.integers(0, len(companies), records)],
+        '展示会名': [f'展示会{i}' for i in rng.integers(0, 30, records)],
+        'メールアドレス': emails[rng.integers(0, len(emails), records)],
+    })
+    df = base.iloc[rng.integers(0, records, rows)].reset_index(drop=True)
+    # 一部のメールアドレスは前後に空白
+    padded = rng.random(rows) < 0.1
+    df.loc[padded, 'メールアドレス'] = ' ' + df.loc[padded, 'メールアドレス'].fillna('') + ' '
+    dates = pd.Series(pd.date_range('2024-01-01', periods=400, freq='D').strftime('%Y/%m/%d'))
+    first_day = dates.iloc[rng.integers(0, len(dates), rows)].to_numpy(dtype=object)
+    first_day[rng.random(rows) < 0.05] = ''
+    df['Tel'] = [f'03-{i:04d}' for i in rng.integers(0, 9999, rows)]
+    df['展示会初日'] = first_day
+    return add_date_keys(df)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='100000,500000,2000000')
+    args = parser.parse_args()
+
+    for rows in (int(r) for r in args.rows.split(',')):
+        df = make_frame(rows)
+        repeat = 3 if rows <= 500000 else 1
+        legacy_time, expected = measure(lambda: legacy_remove_duplicates(df), repeat=repeat)
+        current_time, result = measure(lambda: sa.remove_duplicates_lightweight(df), repeat=repeat)
+        assert result.equals(expected), '結果が一致しません'
+
+        no_date = df.drop(columns=['展示会初日', '_展示会初日_key'])
+        legacy_nd_time, expected_nd = measure(lambda: legacy_remove_duplicates(no_date), repeat=repeat)
+        current_nd_time, result_nd = measure(lambda: sa.remove_duplicates_lightweight(no_date), repeat=repeat)
+        assert result_nd.equals(expected_nd), '結果が一致しません（日付なし）'
+
+        report(f'{rows}行 → {len(result)}行', [
+            ('旧: 全行ソート + drop_duplicates', legacy_time),
+            ('新: グループ番号 + グループ最大', current_time),
+            ('旧: 日付なし drop_duplicates', legacy_nd_time),
+            ('新: 日付なし グループ番号 + duplicated', current_nd_time),
+        ])
+
+
+if __name__ == '__main__':
+    main()
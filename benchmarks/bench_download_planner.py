@@ -0,0 +1,117 @@
+"""カテゴリ間の重複ダウンロード排除（DownloadPlanner / SharedFrames）のベンチマーク
+
+3カテゴリの結果に同じページが --overlap の割合で重複して現れ、さらに --same-content の割合で
+別URLから同じ内容のスプレッドシートが取得される状況を作り、従来方式（参照ごとに取得・読み込み）と
+比較する。取得は1件あたり --latency 秒の待ちで代用し、読み込みは process_single_file_lightweight を使う。
+
+    python benchmarks/bench_download_planner.py [--pages 120] [--overlap 0.3] [--same-content 0.1]
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from _common import import_streamlit_app, report
+from bench_pipeline import make_csv
+from blob_store import BlobStore, open_content
+from download_planner import DownloadPlanner, SharedFrames, download_key, frame_key
+
+sa = import_streamlit_app()
+
+CATEGORIES = ['製造', '小売', 'その他']
+
+
+def build_categories(pages, overlap, same_content, rows, seed=0):
+    """カテゴリ → [(ファイル名, file_info)] と URL → 内容 を作成"""
+    rng = random.Random(seed)
+    contents = {}
+    files = []
+    for index in range(pages):
+        url = f'https://docs.google.com/spreadsheets/d/sheet{index}/edit#gid=0'
+        # 一部は別のシートと同じ内容
+        source = rng.randrange(index) if index and rng.random() < same_content else index
+        contents[f'sheet:sheet{index}:0'] = make_csv(source, rows)
+        files.append((f'page{index}.csv', {'type': 'external', 'external': {'url': url}}))
+    categories = {category: [] for category in CATEGORIES}
+    for index, entry in enumerate(files):
+        categories[CATEGORIES[index % len(CATEGORIES)]].append(entry)
+        if rng.random() < overlap:
+            other = CATEGORIES[(index + 1) % len(CATEGORIES)]
+            # 共有URLに ?usp=sharing が付くなど、表記の揺れも含める
+            url = entry[1]['external']['url'].replace('/edit#', '/edit?usp=sharing#')
+            categories[other].append((entry[0], {'type': 'external', 'external': {'url': url}}))
+    return categories, contents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=120)
+    parser.add_argument('--rows', type=int, default=300)
+    parser.add_argument('--overlap', type=float, default=0.3)
+    parser.add_argument('--same-content', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    categories, contents = build_categories(args.pages, args.overlap, args.same_content, args.rows)
+
+    def fetch(file_info):
+        time.sleep(args.latency)
+        return contents[download_key(file_info)]
+
+    def parse(name, content):
+        return sa.process_single_file_lightweight(name, content)
+
+    start = time.perf_counter()
+    naive_fetches = naive_parses = 0
+    naive_frames = []
+    for entries in categories.values():
+        for name, file_info in entries:
+            content = fetch(file_info)
+            naive_fetches += 1
+            naive_frames.append(parse(name, content))
+            naive_parses += 1
+    naive_time = time.perf_counter() - start
+
+    root = tempfile.mkdtemp(prefix='bench_download_planner_')
+    store = BlobStore(root)
+    try:
+        start = time.perf_counter()
+        planner = DownloadPlanner()
+        categorized = {}
+        for category, entries in categories.items():
+            downloaded = []
+            for name, file_info in entries:
+                planned = planner.lookup(file_info)
+                if planned:
+                    downloaded.extend(planned)
+                    continue
+                downloaded.append(planner.record(file_info, name, store.put(fetch(file_info))))
+            categorized[category] = downloaded
+        shared = SharedFrames.for_files([entry for files in categorized.values() for entry in files])
+        planned_frames = []
+        for files in categorized.values():
+            for name, ref in files:
+                def read_file():
+                    with open_content(ref, store) as data:
+                        return parse(name, data)
+                planned_frames.append(shared.get_or_parse(frame_key(name, ref), read_file))
+        planned_time = time.perf_counter() - start
+        assert all(a.equals(b) for a, b in zip(naive_frames, planned_frames))
+
+        references = sum(len(files) for files in categorized.values())
+        report(f'{references}件の参照（{args.pages}ページ）', [
+            ('参照ごとに取得・読み込み', naive_time),
+            ('DownloadPlanner + SharedFrames', planned_time),
+        ])
+        print(f"\n  従来: 取得 {naive_fetches}回 / 読み込み {naive_parses}回")
+        print(f"  計画: {planner.summary()} / 読み込み {references - shared.parses_avoided}回"
+              f"（省略 {shared.parses_avoided}回）")
+        print(f"  {store.summary()}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
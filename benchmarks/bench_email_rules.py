@@ -0,0 +1,106 @@
+"""fix_email_address ベンチマーク・ゴールデンコーパス照合
+
+benchmarks/data/email_golden.json（ルール化前の実装で作成した入力と期待値）と
+現行実装の出力が一致することを確認し、列単位の修正速度を旧実装と比較する。
+
+    python benchmarks/bench_email_rules.py [--rows 200000] [--unique-ratio 0.3]
+"""
+
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from _common import import_streamlit_app, measure, report
+
+sa = import_streamlit_app()
+
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), 'data', 'email_golden.json')
+
+
+def legacy_fix_email_address(email):
+    """比較用：ルール化前の fix_email_address"""
+    if pd.isna(email) or str(email).strip() == '':
+        return ''
+    email = str(email).strip()
+    email = email.replace('＠', '@')
+    if '@' in email:
+        local_part, domain_part = email.split('@', 1)
+        email = f"{local_part}@{domain_part.replace(',', '.')}"
+    for wrong, correct in sa.EMAIL_TYPO_RULES:
+        email = email.replace(wrong, correct)
+    for char in ['?', ' ', '　', '\n', '\r', '\t']:
+        email = email.replace(char, '')
+    email = re.sub(r'[^a-zA-Z0-9@._\-+]', '', email)
+    if email.count('@') > 1:
+        parts = email.split('@')
+        email = parts[0] + '@' + ''.join(parts[1:])
+    if '@' not in email or email.startswith('@') or email.endswith('@'):
+        return ''
+    local, domain = email.split('@', 1)
+    if domain.isdigit():
+        return ''
+    if '.' not in domain:
+        if domain == 'gmail':
+            domain = 'gmail.com'
+        elif domain == 'yahoo':
+            domain = 'yahoo.co.jp'
+        elif domain in ['hotmail', 'outlook']:
+            domain = domain + '.com'
+    domain = domain.rstrip('.').lstrip('.')
+    email = f"{local}@{domain}"
+    if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+        return ''
+    return email.lower()
+
+
+def check_golden():
+    """ゴールデンコーパスと現行実装を照合"""
+    with open(GOLDEN_FILE, encoding='utf-8') as f:
+        corpus = json.load(f)
+    mismatches = [(value, expected, sa.fix_email_address(value))
+                  for value, expected in corpus if sa.fix_email_address(value) != expected]
+    series_result = sa.fix_email_series(pd.Series([value for value, _ in corpus], dtype=object))
+    if series_result.tolist() != [expected for _, expected in corpus]:
+        mismatches.append(('fix_email_series', 'golden', 'differs'))
+    for value, expected, actual in mismatches[:20]:
+        print(f"  NG: {value!r} → {actual!r}（期待値 {expected!r}）")
+    assert not mismatches, f"ゴールデンコーパス不一致: {len(mismatches)}件"
+    print(f"ゴールデンコーパス一致: {len(corpus)}件")
+    return [value for value, _ in corpus if value is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--unique-ratio', type=float, default=0.3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus_values = check_golden()
+    rng = np.random.default_rng(0)
+    unique_count = max(1, int(args.rows * args.unique_ratio))
+    pool = corpus_values + [f'user{i}@example{i % 97}.co.jp' for i in range(unique_count)]
+    column = pd.Series(rng.choice(np.array(pool, dtype=object), args.rows), dtype=object)
+
+    legacy_time, legacy_result = measure(lambda: column.apply(legacy_fix_email_address), 1)
+
+    def current():
+        sa._fix_email_text.cache_clear()
+        return sa.fix_email_series(column)
+
+    current_time, current_result = measure(current, args.repeat)
+    assert legacy_result.tolist() == current_result.tolist(), "出力が一致しません"
+
+    report(f"メールアドレス修正 ({args.rows:,}行, ユニーク率 {args.unique_ratio:.0%})", [
+        ("旧実装 (セルごとの apply)", legacy_time),
+        ("現行実装 (ルール集約 + ユニーク値メモ化)", current_time),
+    ])
+    print(f"  速度比: {legacy_time / current_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Excel 読み込みエンジンの比較ベンチマーク
+
+datagen の出展者リストに数値・小数・日付・空行・重複列名を加えた xlsx を
+  pd.read_excel(engine='openpyxl')（従来の読み込み）
+  pd.read_excel(engine='calamine')
+  excel_reader.read_excel（エンジンごと、一括 / 分割読み込み）
+で読み込み、結果が従来の読み込みと同じであること、所要時間と最大 RSS（子プロセスで計測）を表示する。
+
+    python benchmarks/bench_excel_reader.py [--rows 10000,100000] [--chunk-rows 20000]
+"""
+
+import argparse
+import io
+from datetime import datetime, timedelta
+
+import pandas as pd
+import xlsxwriter
+
+from _common import measure, report
+from bench_spill_merge import peak_rss
+from datagen import generate_exhibitors
+from excel_reader import engine_available, read_excel
+
+
+def make_workbook(rows, seed=0):
+    """文字列以外の型・空行・重複列名を含む xlsx"""
+    frame = generate_exhibitors(rows, seed=seed, layout=4)
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_numbers': False,
+                                            'strings_to_formulas': False, 'strings_to_urls': False})
+    date_format = workbook.add_format({'num_format': 'yyyy/mm/dd'})
+    sheet = workbook.add_worksheet()
+    sheet.write_row(0, 0, [str(column) for column in frame.columns] + ['郵便番号', '小間面積', '登録日', ''])
+    start = datetime(2024, 4, 1)
+    width = len(frame.columns)
+    row_index = 1
+    for i, values in enumerate(frame.itertuples(index=False, name=None)):
+        if i % 5000 == 4999:
+            row_index += 1  # 空行
+        sheet.write_row(row_index, 0, values)
+        sheet.write_number(row_index, width, 1000000 + i)
+        sheet.write_number(row_index, width + 1, (i % 37) / 4)
+        sheet.write_datetime(row_index, width + 2, start + timedelta(days=i % 400), date_format)
+        if i % 1000 == 0:
+            sheet.write(row_index, width + 4, '列名なし')
+        row_index += 1
+    workbook.close()
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='10000,100000')
+    parser.add_argument('--chunk-rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    readers = [('pd.read_excel openpyxl（従来）', lambda data: pd.read_excel(io.BytesIO(data), dtype=str,
+                                                                          engine='openpyxl'))]
+    if engine_available('calamine'):
+        readers.append(('pd.read_excel calamine', lambda data: pd.read_excel(io.BytesIO(data), dtype=str,
+                                                                             engine='calamine')))
+    for engine in ('openpyxl', 'calamine'):
+        if not engine_available(engine):
+            print(f"{engine} がインストールされていないため省略")
+            continue
+        readers.append((f'read_excel {engine} 一括',
+                        lambda data, engine=engine: read_excel(data, engine=engine, stream_rows=0)))
+        readers.append((f'read_excel {engine} 分割',
+                        lambda data, engine=engine: read_excel(data, engine=engine, stream_rows=1,
+                                                               chunk_rows=args.chunk_rows)))
+
+    for rows in (int(r) for r in args.rows.split(',')):
+        data = make_workbook(rows)
+        expected = readers[0][1](data)
+        timings = []
+        peaks = []
+        for name, reader in readers:
+            seconds, result = measure(lambda: reader(data), repeat=args.repeat)
+            assert list(result.columns) == list(expected.columns), f'{name}: 列が一致しません'
+            assert result.equals(expected), f'{name}: 結果が一致しません'
+            timings.append((name, seconds))
+            peaks.append((name, peak_rss(lambda: reader(data))[1]))
+        print(f"\n{rows}行（{len(data) / 1024 ** 2:.1f}MB）→ {len(expected)}行 × {len(expected.columns)}列")
+        for name, peak in peaks:
+            print(f"  最大 RSS {name}: {peak / 1024 ** 2:.0f}MB")
+        report(f'{rows}行', timings)
+
+
+if __name__ == '__main__':
+    main()
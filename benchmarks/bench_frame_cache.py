@@ -0,0 +1,65 @@
+"""処理済み DataFrame キャッシュ（FrameCache）のベンチマーク
+
+同じファイル群を2回処理し、1回目（キャッシュなし・保存あり）と2回目（保存済みの結果を読み込み）の
+時間を比較する。処理は streamlit_app の軽量処理（process_single_file_lightweight +
+process_dataframe_lightweight）を使い、実行ごとに変わる列は本番と同じくキャッシュの外で追加する。
+
+    python benchmarks/bench_frame_cache.py [--files 60] [--rows 2000]
+"""
+
+import argparse
+import hashlib
+import shutil
+import tempfile
+import time
+
+from _common import import_streamlit_app, report
+from bench_pipeline import make_csv
+from frame_cache import FrameCache, frame_cache_key
+
+sa = import_streamlit_app()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=60)
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+
+    files = [(f'list_{i}.csv', make_csv(i, args.rows)) for i in range(args.files)]
+    root = tempfile.mkdtemp(prefix='bench_frame_cache_')
+    cache = FrameCache(root)
+
+    def run():
+        frames = []
+        for name, content in files:
+            def process_file():
+                df = sa.process_single_file_lightweight(name, content)
+                return sa.process_dataframe_lightweight(df, name, run_columns=False)
+            key = frame_cache_key("lightweight", sa.FRAME_PIPELINE_VERSION,
+                                  hashlib.sha256(content).hexdigest(), name)
+            df = cache.cached(key, process_file, cacheable=lambda result: result[0] is not None)[0]
+            frames.append(sa.add_run_columns(df, name))
+        return frames
+
+    try:
+        start = time.perf_counter()
+        cold = run()
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        warm = run()
+        warm_time = time.perf_counter() - start
+        # 更新日時は実行ごとに変わるため除いて比べる
+        assert all(a.drop(columns='更新日時').equals(b.drop(columns='更新日時')) for a, b in zip(cold, warm))
+
+        report(f'{args.files}ファイル × {args.rows}行', [
+            ('1回目（処理して保存）', cold_time),
+            ('2回目（キャッシュから読み込み）', warm_time),
+        ])
+        print(f"\n  {cache.summary()}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
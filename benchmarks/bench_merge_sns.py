@@ -0,0 +1,105 @@
+"""merge_sns_columns ベンチマーク（200k行・SNS 6種類）
+
+旧実装（行ごとの apply + zip ループ）と現行実装の速度を比較し、出力が同一であることを確認する。
+
+    python benchmarks/bench_merge_sns.py [--rows 200000]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from _common import import_streamlit_app, measure, report
+
+sa = import_streamlit_app()
+
+
+def legacy_merge_sns_columns(df):
+    """比較用：ベクトル化前の merge_sns_columns（表示処理は除く）"""
+    for sns_name, patterns in sa.SNS_COLUMN_PATTERNS.items():
+        matching_cols = []
+        for col in df.columns:
+            if any(pattern.lower() in str(col).lower() for pattern in patterns):
+                matching_cols.append(col)
+        if len(matching_cols) > 1:
+            df[sns_name] = df[matching_cols].apply(
+                lambda row: next((val for val in row if pd.notna(val) and str(val).strip()), ''),
+                axis=1
+            )
+            df = df.drop(columns=matching_cols)
+        elif len(matching_cols) == 1:
+            df = df.rename(columns={matching_cols[0]: sns_name})
+
+    for target_name, patterns in sa.DUPLICATE_COLUMN_PATTERNS.items():
+        matching_cols = [col for col in df.columns if col in patterns]
+        if len(matching_cols) > 1:
+            df[target_name] = df[matching_cols].apply(
+                lambda row: next((val for val in row if pd.notna(val) and str(val).strip()), ''),
+                axis=1
+            )
+            cols_to_drop = [col for col in matching_cols if col != target_name]
+            df = df.drop(columns=cols_to_drop)
+
+    email_columns = [col for col in df.columns
+                     if any(keyword in str(col).lower() for keyword in ['mail', 'email', 'メール', 'e-mail'])]
+    fixed_count = 0
+    for col in email_columns:
+        original_emails = df[col].copy()
+        df[col] = df[col].apply(sa.fix_email_address)
+        for orig, fixed in zip(original_emails, df[col]):
+            orig_str = str(orig).strip() if pd.notna(orig) else ''
+            fixed_str = str(fixed).strip() if pd.notna(fixed) else ''
+            if orig_str != fixed_str and orig_str != '':
+                fixed_count += 1
+    return df, fixed_count
+
+
+def make_frame(rows, seed=0):
+    """SNS 6種類 × 2列 + 重複連絡先列を持つデータを生成"""
+    rng = np.random.default_rng(seed)
+
+    def sparse(values, empty_ratio):
+        column = rng.choice(values, rows).astype(object)
+        mask = rng.random(rows)
+        column[mask < empty_ratio / 2] = None
+        column[(mask >= empty_ratio / 2) & (mask < empty_ratio)] = '  '
+        return column
+
+    data = {
+        '会社名': [f'株式会社テスト{i}' for i in range(rows)],
+        '展示会名': rng.choice(['展示会A', '展示会B', '展示会C'], rows),
+    }
+    for sns in ['YouTube', 'Instagram', 'Facebook', 'Twitter', 'LinkedIn', 'TikTok']:
+        data[sns] = sparse([f'https://{sns.lower()}.com/a', f'https://{sns.lower()}.com/b'], 0.6)
+        data[f'{sns}企業URL'] = sparse([f'https://{sns.lower()}.com/c'], 0.4)
+    data['Tel'] = sparse(['03-1234-5678', '06-1111-2222'], 0.5)
+    data['電話番号'] = sparse(['0312345678'], 0.3)
+    data['メールアドレス'] = sparse(['info@example.co.jp', 'sales@example,co.jp', 'a@@b.com',
+                                   'x@gmail', 'taro@example.con', ' hello@example.com '], 0.3)
+    data['メールアドレス_dup1'] = sparse(['backup@example.co.jp'], 0.5)
+    return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    base = make_frame(args.rows)
+    legacy_time, (legacy_df, legacy_fixed) = measure(lambda: legacy_merge_sns_columns(base.copy()), 1)
+    current_time, current_df = measure(lambda: sa.merge_sns_columns(base.copy()), args.repeat)
+
+    assert list(legacy_df.columns) == list(current_df.columns), (legacy_df.columns, current_df.columns)
+    assert legacy_df.astype(object).equals(current_df.astype(object)), "出力が一致しません"
+
+    report(f"merge_sns_columns ({args.rows:,}行)", [
+        ("旧実装 (apply axis=1)", legacy_time),
+        ("現行実装 (mask + bfill)", current_time),
+    ])
+    print(f"  速度比: {legacy_time / current_time:.1f}x / 修正メール件数: {legacy_fixed}")
+
+
+if __name__ == '__main__':
+    main()
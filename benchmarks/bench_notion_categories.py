@@ -0,0 +1,66 @@
+"""Notion カテゴリ別クエリのベンチマーク
+
+カテゴリごとに逐次ページネーションする旧方式、カテゴリごとの並列ワーカー、
+統合ORクエリ1本 + ローカル振り分けの3方式で、API呼び出し回数と所要時間を比較する。
+Notion API はスタブ（1回あたり --latency 秒の遅延）で代用する。
+
+    python benchmarks/bench_notion_categories.py [--pages 1000] [--latency 0.05]
+"""
+
+import argparse
+import time
+
+from _common import import_streamlit_app
+from fake_notion import FakeNotionClient, make_pages
+from notion_access import QueryResultCache, query_all_pages
+
+sa = import_streamlit_app()
+
+
+def build_category_filters(date_from):
+    """アプリのカテゴリ別分類と同じ形のフィルターを作成"""
+    filters = {}
+    for category, values in sa.NOTION_CATEGORY_SELECTS.items():
+        conditions = [{"property": sa.NOTION_CATEGORY_PROPERTY, "select": {"equals": value}} for value in values]
+        filters[category] = {"and": [
+            conditions[0] if len(conditions) == 1 else {"or": conditions},
+            {"property": "ファイル", "files": {"is_not_empty": True}},
+            {"property": "展示会日程_初日", "date": {"on_or_after": date_from}},
+        ]}
+    return filters
+
+
+def run(label, client, func):
+    client.calls = 0
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label.ljust(34)} API {client.calls:4d}回  {elapsed:7.2f} 秒")
+    return {category: [page["id"] for page in pages] for category, pages in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=3)
+    args = parser.parse_args()
+
+    client = FakeNotionClient(make_pages(args.pages), latency=args.latency)
+    filters = build_category_filters("2025-06-01T00:00:00Z")
+    print(f"\n== カテゴリ別クエリ ({args.pages:,}ページ, 遅延 {args.latency * 1000:.0f} ms/回) ==")
+
+    sequential = run("旧方式 (カテゴリごとに逐次)", client, lambda: {
+        category: query_all_pages(client, "db", filter)[0] for category, filter in filters.items()
+    })
+    concurrent = run(f"個別クエリ並列 ({args.workers}ワーカー)", client, lambda: QueryResultCache().query_categories(
+        client, "db", filters, "bench", single_pass=False, max_workers=args.workers)[0])
+    single_pass = run("統合クエリ1本 + ローカル振り分け", client, lambda: QueryResultCache().query_categories(
+        client, "db", filters, "bench")[0])
+
+    assert sequential == concurrent == single_pass, "カテゴリ別の結果が一致しません"
+    print(f"  結果一致: {sum(len(ids) for ids in sequential.values())}件")
+
+
+if __name__ == '__main__':
+    main()
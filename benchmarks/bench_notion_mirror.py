@@ -0,0 +1,61 @@
+"""Notion ローカルミラーのベンチマーク
+
+全件をNotionから取り直す従来方式と、ミラーの差分同期（last_edited_time の on_or_after）を比較する。
+--changed の割合のページを編集済みにしてから同期し、ミラー上のローカル検索結果が
+スタブへの直接クエリと一致することも確認する。
+
+    python benchmarks/bench_notion_mirror.py [--pages 5000] [--changed 0.01] [--latency 0.05]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from bench_notion_categories import build_category_filters
+from fake_notion import FakeNotionClient, make_pages
+from notion_access import QueryResultCache, query_all_pages
+from notion_mirror import NotionMirror
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=5000)
+    parser.add_argument('--changed', type=float, default=0.01)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    client = FakeNotionClient(make_pages(args.pages), latency=args.latency)
+    filters = build_category_filters("2025-06-01T00:00:00Z")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = NotionMirror(os.path.join(tmp, "mirror.sqlite"))
+        initial_time, initial = timed(lambda: mirror.sync(client, "db"))
+        touched = client.touch(args.changed)
+
+        requery_time, (_, requery_calls) = timed(lambda: query_all_pages(client, "db"))
+        client.calls = 0
+        sync_time, stats = timed(lambda: mirror.sync(client, "db"))
+        local_time, (local, _) = timed(lambda: QueryResultCache().query_categories(mirror.as_client(), "db", filters, "bench"))
+
+        direct = {category: [page["id"] for page in client.matching(filter)] for category, filter in filters.items()}
+        assert {category: sorted(page["id"] for page in pages) for category, pages in local.items()} == \
+            {category: sorted(ids) for category, ids in direct.items()}, "ミラーの検索結果が一致しません"
+        mirror.close()
+
+    print(f"\n== Notion ミラー ({args.pages:,}ページ, 変更 {touched}件 = {args.changed:.0%}, 遅延 {args.latency * 1000:.0f} ms/回) ==")
+    print(f"  初回の全件同期              API {initial['calls']:4d}回  {initial_time:7.2f} 秒")
+    print(f"  従来方式 (全件を再クエリ)   API {requery_calls:4d}回  {requery_time:7.2f} 秒")
+    print(f"  差分同期                    API {stats['calls']:4d}回  {sync_time:7.2f} 秒（取得 {stats['fetched']}件）")
+    print(f"  ミラー上のカテゴリ別検索    API    0回  {local_time:7.2f} 秒（結果一致）")
+    print(f"  速度比 (再クエリ / 差分同期): {requery_time / sync_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Notion レート制御のベンチマーク
+
+秒間リクエスト数の上限を超えると 429 を返すスタブに対して、カテゴリ別の個別クエリを並列に実行し、
+制御なし（429 で失敗）と NotionRateLimiter 経由（トークンバケット + Retry-After + AIMD）を比較する。
+
+    python benchmarks/bench_notion_rate_limit.py [--pages 2000] [--server-limit 3] [--throttle-ratio 0.15]
+"""
+
+import argparse
+import time
+
+from bench_notion_categories import build_category_filters
+from fake_notion import FakeNotionClient, make_pages
+from notion_access import NotionRateLimiter, QueryResultCache, RateLimitedClient
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--server-limit', type=int, default=3, help="スタブ側の上限（リクエスト/秒）")
+    parser.add_argument('--throttle-ratio', type=float, default=0.15, help="ランダムに 429 を返す割合")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+    filters = build_category_filters("2025-06-01T00:00:00Z")
+    print(f"\n== Notion レート制御 ({args.pages:,}ページ, 上限 {args.server_limit}回/秒, "
+          f"ランダム429 {args.throttle_ratio:.0%}, {args.workers}ワーカー) ==")
+
+    raw = FakeNotionClient(pages, args.latency, args.server_limit, args.throttle_ratio, retry_after=0.5, seed=2)
+    start = time.perf_counter()
+    try:
+        QueryResultCache().query_categories(raw, "db", filters, "bench", single_pass=False, max_workers=args.workers)
+        outcome = "成功"
+    except Exception as e:
+        outcome = f"失敗 ({e})"
+    print(f"  制御なし:   {outcome}  リクエスト {raw.calls}回 / 429 {raw.throttled}回 / "
+          f"{time.perf_counter() - start:.2f}秒")
+
+    server = FakeNotionClient(pages, args.latency, args.server_limit, args.throttle_ratio, retry_after=0.5, seed=2)
+    limiter = NotionRateLimiter(rate=args.server_limit)
+    client = RateLimitedClient(server, limiter)
+    start = time.perf_counter()
+    result, _ = QueryResultCache().query_categories(
+        client, "db", filters, "bench", single_pass=False, max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+    expected = {category: [page["id"] for page in server.matching(filter)] for category, filter in filters.items()}
+    assert {category: [page["id"] for page in items] for category, items in result.items()} == expected
+    print(f"  レート制御: 成功  {limiter.summary()}（待機はスレッド合計） / {elapsed:.2f}秒")
+    print(f"              成功リクエスト {server.calls - server.throttled}回 / スタブ側 429 {server.throttled}回")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""ダウンロード・読み込みパイプラインのベンチマーク
+
+全ファイルをダウンロードしてから読み込む従来方式と、FilePipeline でダウンロードと読み込みを
+重ねる方式を比較する。ダウンロードは1件あたり --latency 秒の待ちで代用し、読み込みは
+streamlit_app の軽量処理（process_single_file_lightweight + process_dataframe_lightweight）を使う。
+
+    python benchmarks/bench_pipeline.py [--files 120] [--rows 400] [--latency 0.1]
+"""
+
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from _common import import_streamlit_app
+from pipeline import FilePipeline
+
+sa = import_streamlit_app()
+
+
+def make_csv(index, rows):
+    frame = pd.DataFrame({
+        '会社名': [f'株式会社テスト{index}_{i}' for i in range(rows)],
+        'メールアドレス': [f'user{i}@example{index}.co.jp' for i in range(rows)],
+        'TEL': [f'03-{index:04d}-{i:04d}' for i in range(rows)],
+        '展示会名': [f'展示会{index}'] * rows,
+        '業界': ['製造'] * rows,
+    })
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False)
+    return buffer.getvalue().encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=120)
+    parser.add_argument('--rows', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--parse-workers', type=int, default=2)
+    args = parser.parse_args()
+
+    contents = [make_csv(i, args.rows) for i in range(args.files)]
+    pages = list(range(args.files))
+
+    def download(index):
+        time.sleep(args.latency)
+        return f'list_{index}.csv', contents[index]
+
+    def parse(filename, content):
+        df = sa.process_single_file_lightweight(filename, content, debug_mode=False)
+        return sa.process_dataframe_lightweight(df, filename, debug_mode=False)[0]
+
+    start = time.perf_counter()
+    downloaded = [download(index) for index in pages]
+    held_bytes = sum(len(content) for _, content in downloaded)
+    phased = [parse(name, content) for name, content in downloaded]
+    phased_time = time.perf_counter() - start
+
+    pipeline = FilePipeline(lambda idx, page: [page], download, lambda task, name, content: parse(name, content),
+                            download_workers=args.download_workers, parse_workers=args.parse_workers)
+    start = time.perf_counter()
+    results = sorted(pipeline.run(pages), key=lambda result: result.seq)
+    pipelined_time = time.perf_counter() - start
+
+    assert all(result.error is None for result in results)
+    assert all(a.drop(columns=['更新日時']).equals(b.value.drop(columns=['更新日時'])) for a, b in zip(phased, results))
+
+    average = held_bytes / args.files
+    print(f"\n== ダウンロード・読み込み ({args.files}ファイル × {args.rows}行, 遅延 {args.latency * 1000:.0f} ms/件) ==")
+    print(f"  従来方式 (全件取得 → 読み込み)   {phased_time:7.2f} 秒  保持したファイル本体 {held_bytes / 1e6:6.1f} MB")
+    print(f"  パイプライン ({args.download_workers}取得 + {args.parse_workers}読み込み)     {pipelined_time:7.2f} 秒  "
+          f"キュー内の最大 {pipeline.stats['peak_queued_files']}件 ≒ {pipeline.stats['peak_queued_files'] * average / 1e6:.2f} MB")
+    print(f"  速度比: {phased_time / pipelined_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
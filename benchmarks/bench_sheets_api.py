@@ -0,0 +1,129 @@
+"""Google Sheets API 取得（values:batchGet + DataFrame 直接生成）のベンチマーク
+
+ローカルの偽 Sheets API（fake_sheets.FakeSheetsServer）に対して、
+  - 従来: タブごとに values/{range} を取得 → CSV に変換 → process_single_file_lightweight で再解析
+  - 新方式: spreadsheets.get（フィールドマスク）+ values:batchGet → values_to_frame
+を比較する。1件目のタブは従来の取得（values/A:ZZ → CSV → 再解析）と同じ結果になることを確認する。
+ブロブへの保存（Parquet）と読み戻しでも同じ DataFrame になることを確認する。
+
+    python benchmarks/bench_sheets_api.py [--sheets 20] [--tabs 3] [--rows 1000] [--latency 0.05]
+"""
+
+import argparse
+import csv
+import io
+import time
+
+import requests
+
+from _common import import_streamlit_app, report
+from fake_sheets import FakeSheetsServer
+import sheets_api
+
+sa = import_streamlit_app()
+
+
+def make_values(sheet, tab, rows):
+    values = [['会社名', 'メールアドレス', 'TEL', '住所', '備考']]
+    for i in range(rows):
+        row = [f'株式会社{sheet}_{tab}_{i}', f'user{i}@example{sheet}.co.jp', f'03-{sheet:04d}-{i:04d}',
+               f'東京都千代田区{i}丁目', '']
+        # Sheets API は行末の空セルを返さない
+        while row and row[-1] == '':
+            row.pop()
+        values.append(row)
+    return values
+
+
+def values_to_csv_frame(sheet_id, values):
+    """従来方式：values を CSV に変換して process_single_file_lightweight で再解析"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for row in values:
+        writer.writerow(row)
+    return sa.process_single_file_lightweight(f'{sheet_id}.csv', output.getvalue().encode('utf-8'))
+
+
+def first_tab_csv(sheet_id, api_key, session):
+    """従来方式：最初のタブを values/A:ZZ で取得して CSV 経由で読み込む"""
+    response = session.get(f"{sheets_api.SHEETS_API_BASE}/spreadsheets/{sheet_id}/values/A:ZZ",
+                           params={"key": api_key})
+    response.raise_for_status()
+    return values_to_csv_frame(sheet_id, response.json().get('values', []))
+
+
+def per_tab_csv(sheet_id, api_key, tabs, session):
+    """従来方式：タブごとに values を取得して CSV 経由で読み込む"""
+    frames = []
+    for title, _, _ in tabs:
+        range_ = f"{sheets_api.quote_sheet_title(title)}!A:ZZ"
+        response = session.get(f"{sheets_api.SHEETS_API_BASE}/spreadsheets/{sheet_id}/values/{range_}",
+                               params={"key": api_key})
+        response.raise_for_status()
+        frames.append(values_to_csv_frame(sheet_id, response.json().get('values', [])))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sheets', type=int, default=20)
+    parser.add_argument('--tabs', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    workbooks = {
+        f'sheet{s}': [(f'シート{t + 1}', t * 1000, make_values(s, t, args.rows)) for t in range(args.tabs)]
+        for s in range(args.sheets)
+    }
+    server = FakeSheetsServer(workbooks, latency=args.latency).start()
+    sheets_api.SHEETS_API_BASE = server.base_url
+    session = requests.Session()
+    try:
+        # 1タブ目：従来方式（CSV経由）と DataFrame 直接生成の比較
+        start = time.perf_counter()
+        requests_before = server.requests
+        legacy_first = [first_tab_csv(sheet_id, 'key', session) for sheet_id in workbooks]
+        legacy_first_time = time.perf_counter() - start
+        legacy_first_requests = server.requests - requests_before
+
+        start = time.perf_counter()
+        requests_before = server.requests
+        direct_first = [sheets_api.fetch_sheet_frames(sheet_id, 'key', session=session)[0][2]
+                        for sheet_id in workbooks]
+        direct_first_time = time.perf_counter() - start
+        direct_first_requests = server.requests - requests_before
+        assert all(a.equals(b) for a, b in zip(legacy_first, direct_first))
+        assert all(sheets_api.frame_from_bytes(sheets_api.frame_to_bytes(df)).equals(df) for df in direct_first)
+
+        # 全タブ：タブごとの取得 + CSV と batchGet の比較
+        start = time.perf_counter()
+        requests_before = server.requests
+        legacy_all = [per_tab_csv(sheet_id, 'key', tabs, session) for sheet_id, tabs in workbooks.items()]
+        legacy_all_time = time.perf_counter() - start
+        legacy_all_requests = server.requests - requests_before
+
+        start = time.perf_counter()
+        requests_before = server.requests
+        batch_all = [[df for _, _, df in sheets_api.fetch_sheet_frames(sheet_id, 'key', all_tabs=True,
+                                                                       session=session)]
+                     for sheet_id in workbooks]
+        batch_all_time = time.perf_counter() - start
+        batch_all_requests = server.requests - requests_before
+        assert all(a.equals(b) for frames_a, frames_b in zip(legacy_all, batch_all)
+                   for a, b in zip(frames_a, frames_b))
+    finally:
+        server.stop()
+
+    report(f'{args.sheets}スプレッドシート × 1タブ（{args.rows}行）', [
+        (f'values/A:ZZ + CSV経由（{legacy_first_requests}リクエスト）', legacy_first_time),
+        (f'batchGet + DataFrame直接（{direct_first_requests}リクエスト）', direct_first_time),
+    ])
+    report(f'{args.sheets}スプレッドシート × {args.tabs}タブ（{args.rows}行）', [
+        (f'タブごとに取得 + CSV経由（{legacy_all_requests}リクエスト）', legacy_all_time),
+        (f'spreadsheets.get + batchGet（{batch_all_requests}リクエスト）', batch_all_time),
+    ])
+
+
+if __name__ == '__main__':
+    main()
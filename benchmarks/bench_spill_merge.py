@@ -0,0 +1,145 @@
+"""メモリ内の統合とディスク退避（spill_merge.SpillMerger）の比較ベンチマーク
+
+複数ファイル分の処理済み DataFrame（列構成が一部異なる）を
+  メモリ内: concat_processed_frames → remove_duplicates_lightweight（既存データがあれば pd.concat して再度重複削除）
+  ディスク退避: SpillMerger.add → merge（区分けごとに重複削除）
+で統合し、結果が同じ列・行・順・値（型を含め文字列にそろえずに比較）であること、
+所要時間と最大 RSS（子プロセスで計測）を表示する。
+既存データあり（列構成が異なり、数値と文字列が混在する列を含む）・会社名のゆれの統合（fuzzy_companies=True）の
+組み合わせは --check-rows 行で一致を確認する。
+
+    python benchmarks/bench_spill_merge.py [--rows 200000,1000000] [--files 50] [--check-rows 50000]
+"""
+
+import argparse
+import multiprocessing
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from _common import import_streamlit_app, report
+from bench_dedup import make_frame
+from spill_merge import SpillMerger
+
+sa = import_streamlit_app()
+
+
+def make_files(rows, files, seed=0):
+    """files 個のファイル分の処理済み DataFrame を順に作る（会社名・メールはファイルをまたいで重複する）
+
+    一部のファイルには別の列（最終更新日・備考）を付ける
+    """
+    for index in range(files):
+        frame = make_frame(rows // files, seed=seed + index)
+        if index % 3 == 0:
+            rng = np.random.default_rng(seed + index)
+            frame['備考'] = [f'メモ{i}' for i in rng.integers(0, 100, len(frame))]
+        if index % 4 == 1:
+            frame['最終更新日'] = '2025/03/01'
+            frame = sa.add_date_keys(frame)
+        yield frame
+
+
+def make_existing(rows):
+    """既存の統合データ（備考の代わりに旧メモの列、数値と文字列が混在する列、会社名の表記ゆれを含む）"""
+    frame = merge_in_memory(make_files(rows, 5, seed=1000))
+    frame = frame.drop(columns=['備考'], errors='ignore')
+    frame['旧メモ'] = np.where(np.arange(len(frame)) % 2 == 0, '旧', None)
+    frame['小間番号'] = pd.Series([i if i % 3 else f'A-{i}' for i in range(len(frame))], dtype=object)
+    variants = np.arange(len(frame)) % 5 == 0
+    frame.loc[variants, '会社名'] = frame.loc[variants, '会社名'].str.replace('株式会社', '(株)')
+    return frame
+
+
+def merge_in_memory(frames, existing=None, fuzzy_companies=False):
+    """streamlit_app.merge_processed_frames のメモリ内の統合と同じ手順"""
+    merged = sa.concat_processed_frames(list(frames), False)
+    merged = sa.remove_duplicates_lightweight(merged, False, fuzzy_companies)
+    if existing is None:
+        return merged
+    combined = pd.concat([existing, merged], ignore_index=True)
+    return sa.remove_duplicates_lightweight(combined, True, fuzzy_companies)
+
+
+def merge_with_spill(frames, directory, existing=None, fuzzy_companies=False):
+    """frames はジェネレーターでもよい（追加した DataFrame は保持しない）"""
+    with SpillMerger(directory=directory, flush_bytes=16 * 1024 * 1024,
+                     fuzzy_companies=fuzzy_companies) as spill:
+        for order, frame in enumerate(frames):
+            spill.add(frame, order)
+        merged, _ = spill.merge(existing)
+        return merged, spill.summary()
+
+
+def assert_same(result, expected, label):
+    """列・行・順・値が同じこと（値は型を含めて比べ、欠損どうしは同じとみなす）"""
+    assert list(result.columns) == list(expected.columns), f'{label}: 列が一致しません'
+    assert len(result) == len(expected), f'{label}: 行数が一致しません（{len(result)} / {len(expected)}）'
+    for column in expected.columns:
+        left = result[column].to_numpy(dtype=object)
+        right = expected[column].to_numpy(dtype=object)
+        missing = pd.isna(left) & pd.isna(right)
+        # 20250301 と '20250301' のように文字列とそれ以外は別の値
+        same = np.array([isinstance(a, str) == isinstance(b, str) and a == b for a, b in zip(left, right)], dtype=bool)
+        differs = np.flatnonzero(~(missing | same))
+        assert not len(differs), (f'{label}: 列 {column} の値が一致しません'
+                                  f'（{len(differs)}行、例: {left[differs[0]]!r} / {right[differs[0]]!r}）')
+
+
+def _child(queue, func):
+    start = time.perf_counter()
+    func()
+    queue.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+
+def peak_rss(func):
+    """func を fork した子プロセスで実行し、(秒, 最大 RSS) を返す"""
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(queue, func))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='200000,1000000')
+    parser.add_argument('--files', type=int, default=50)
+    parser.add_argument('--check-rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    existing = make_existing(args.check_rows // 2)
+    for existing_frame in (None, existing):
+        for fuzzy_companies in (False, True):
+            label = f"既存データ{'あり' if existing_frame is not None else 'なし'}・fuzzy_companies={fuzzy_companies}"
+            frames = list(make_files(args.check_rows, args.files))
+            expected = merge_in_memory(frames, existing_frame, fuzzy_companies)
+            with tempfile.TemporaryDirectory() as directory:
+                result, summary = merge_with_spill(frames, directory, existing_frame, fuzzy_companies)
+            assert_same(result, expected, label)
+            print(f"{label}: {args.check_rows}行 → {len(result)}行、一致 / {summary}")
+
+    for rows in (int(r) for r in args.rows.split(',')):
+        with tempfile.TemporaryDirectory() as directory:
+            # 最大 RSS は子プロセスでファイルを作りながら計測（メモリ内は全ファイルを保持してから統合）
+            memory_seconds, memory_peak = peak_rss(lambda: merge_in_memory(list(make_files(rows, args.files))))
+            spill_seconds, spill_peak = peak_rss(lambda: merge_with_spill(make_files(rows, args.files), directory))
+
+            frames = list(make_files(rows, args.files))
+            expected = merge_in_memory(frames)
+            result, summary = merge_with_spill(frames, directory)
+            assert_same(result, expected, f'{rows}行')
+        frame_bytes = sum(int(frame.memory_usage(deep=True).sum()) for frame in frames)
+        del frames, expected
+        print(f"\n{rows}行・{args.files}ファイル（{frame_bytes / 1024 ** 2:.0f}MB）→ {len(result)}行 / {summary}")
+        print(f"  最大 RSS: メモリ内 {memory_peak / 1024 ** 2:.0f}MB / ディスク退避 {spill_peak / 1024 ** 2:.0f}MB")
+        report(f'{rows}行', [('メモリ内で統合', memory_seconds), ('ディスク退避で統合', spill_seconds)])
+
+
+if __name__ == '__main__':
+    main()
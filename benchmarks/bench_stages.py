@@ -0,0 +1,251 @@
+"""パイプラインの段階別ベンチマーク（合成データ、10k / 100k / 1M 行）
+
+datagen で作った出展者リスト（複数レイアウト・文字コード・xlsx 混在）を使い、段階ごとの所要時間を
+--repeat 回ずつ計測する:
+  parse              process_single_file_lightweight（文字コード判定・CSV / Excel 読み込み）
+  column_resolution  process_dataframe_lightweight の列名解決（recorder の span）
+  normalization      同じく正規化（電話番号・メールの検証、日付キー）
+  extraction         extract_contacts（連絡先の自由記述からのメール・電話番号の抽出）
+  email_fix          fix_email_series（誤記の修正）
+  concat             concat_processed_frames
+  dedup              remove_duplicates_lightweight
+  ng_filter          deleteng_github の NG 判定（gspread がない環境では省略）
+  export_csv         CSV（utf-8-sig）の書き出し
+  export_xlsx        dataframe_to_xlsx_bytes（--xlsx-max-rows 行まで）
+
+--save-baseline で baselines/stages.json を書き換え、それ以外は保存済みの基準値との比を表示する。
+--output を指定すると結果を JSON で書き出す（形式は基準値と同じ）。
+
+    python benchmarks/bench_stages.py [--sizes 10k,100k,1m] [--repeat 5] [--stages parse,dedup]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+
+import pandas as pd
+
+from _common import REPO_ROOT, import_streamlit_app
+from datagen import CompanyPool, generate_files, ng_definitions
+from instrumentation import RunRecorder
+
+sa = import_streamlit_app()
+
+try:
+    import deleteng_github
+except (ImportError, SystemExit):
+    # gspread がない環境では読み込み時に終了するため NG 判定の段階を省略する
+    deleteng_github = None
+
+STAGES = ['parse', 'column_resolution', 'normalization', 'extraction', 'email_fix', 'concat', 'dedup',
+          'ng_filter', 'export_csv', 'export_xlsx']
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'stages.json')
+RAW_EMAIL_COLUMNS = ['メールアドレス', 'E-Mail', 'Email', 'メール']
+# 1ファイルあたりの行数（ファイル数は 2〜50）
+ROWS_PER_FILE = 20000
+
+
+def parse_size(text):
+    """'10k' / '1m' / '250000' → 行数"""
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def result_key(stage, rows):
+    return f"{stage}@{rows}"
+
+
+def summarize(stage, rows, runs):
+    """計測結果（中央値と MAD を含む）"""
+    median = statistics.median(runs)
+    return {
+        'stage': stage,
+        'rows': rows,
+        'runs': [round(seconds, 6) for seconds in runs],
+        'median': round(median, 6),
+        'mad': round(statistics.median(abs(seconds - median) for seconds in runs), 6),
+        'rows_per_second': round(rows / median) if median > 0 else None,
+    }
+
+
+def fix_raw_emails(frames):
+    """読み込んだままのメールアドレス列の誤記を修正"""
+    fixed = 0
+    for df in frames:
+        for col in [c for c in RAW_EMAIL_COLUMNS if c in df.columns]:
+            fixed += len(sa.fix_email_series(df[col]))
+    return fixed
+
+
+def ng_filter(df, definitions):
+    """deleteng_github.process と同じ4種類の NG 判定で行を絞り込む"""
+    exact, contains, ng_emails, ng_domains = definitions
+    industry_keywords = ['金融']
+    exhibition_keywords = ['FOODEX']
+    mask = df['会社名'].apply(lambda name: deleteng_github.is_ng_company(name, exact, contains))
+    mask |= df['メールアドレス'].apply(lambda mail: deleteng_github.is_ng_email(mail, ng_emails, ng_domains))
+    mask |= df['業界'].apply(lambda value: deleteng_github.is_ng_industry(value, industry_keywords))
+    mask |= df['展示会名'].apply(lambda value: deleteng_github.is_ng_exhibition(value, exhibition_keywords))
+    return df[~mask]
+
+
+def run_size(rows, repeat, stages, xlsx_max_rows, seed=0):
+    """rows 行のデータで段階ごとに repeat 回計測し、{キー: 結果} と省略した段階の一覧を返す"""
+    files_count = min(max(rows // ROWS_PER_FILE, 2), 50)
+    pool = CompanyPool(max(rows // 4, 10), seed)
+    start = time.perf_counter()
+    files = generate_files(rows, files=files_count, seed=seed, pool=pool)
+    print(f"\n{rows}行・{files_count}ファイル（{sum(len(content) for _, content in files) / 1024 ** 2:.0f}MB）"
+          f"を {time.perf_counter() - start:.1f}秒で生成")
+
+    timings = {stage: [] for stage in STAGES}
+    skipped = {}
+    raw_frames = processed = merged = deduped = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        raw_frames = [sa.process_single_file_lightweight(name, content) for name, content in files]
+        timings['parse'].append(time.perf_counter() - start)
+
+        recorder = RunRecorder('bench')
+        processed = []
+        for (name, _), df in zip(files, raw_frames):
+            result, _, error = sa.process_dataframe_lightweight(df, name, recorder=recorder)
+            assert error is None, f"{name}: {error}"
+            processed.append(result)
+        seconds = {entry['stage']: entry['seconds'] for entry in recorder.stages()}
+        timings['column_resolution'].append(seconds.get('column_resolution', 0.0))
+        timings['normalization'].append(seconds.get('normalization', 0.0))
+
+        if 'extraction' in stages:
+            frames = [df.copy() for df in processed]
+            start = time.perf_counter()
+            stats = {"email_extracted": 0, "tel_extracted": 0}
+            for df in frames:
+                sa.extract_contacts(df, stats)
+            timings['extraction'].append(time.perf_counter() - start)
+
+        if 'email_fix' in stages:
+            start = time.perf_counter()
+            fix_raw_emails(raw_frames)
+            timings['email_fix'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        merged = sa.concat_processed_frames(processed, False)
+        timings['concat'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        deduped = sa.remove_duplicates_lightweight(merged)
+        timings['dedup'].append(time.perf_counter() - start)
+
+        if 'ng_filter' in stages:
+            if deleteng_github is None:
+                skipped['ng_filter'] = 'deleteng_github を読み込めません（gspread 未インストール）'
+            else:
+                definitions = ng_definitions(pool, seed)
+                start = time.perf_counter()
+                ng_filter(deduped, definitions)
+                timings['ng_filter'].append(time.perf_counter() - start)
+
+        if 'export_csv' in stages:
+            start = time.perf_counter()
+            deduped.to_csv(index=False).encode('utf-8-sig')
+            timings['export_csv'].append(time.perf_counter() - start)
+
+        if 'export_xlsx' in stages:
+            if len(deduped) > xlsx_max_rows:
+                skipped['export_xlsx'] = f"{len(deduped)}行 > --xlsx-max-rows {xlsx_max_rows}"
+            else:
+                start = time.perf_counter()
+                sa.dataframe_to_xlsx_bytes(deduped)
+                timings['export_xlsx'].append(time.perf_counter() - start)
+
+    print(f"  読み込み {sum(len(df) for df in raw_frames)}行 → 結合 {len(merged)}行 → 重複削除後 {len(deduped)}行")
+    results = {result_key(stage, rows): summarize(stage, rows, timings[stage])
+               for stage in STAGES if stage in stages and timings[stage]}
+    return results, skipped
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def load_results(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_results(path, results, commit=None):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = {'environment': environment(), 'results': results}
+    if commit:
+        payload['commit'] = commit
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f,
+                  ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def print_results(results, skipped, baseline):
+    """段階ごとの中央値（± MAD）と基準値との比"""
+    base_results = (baseline or {}).get('results', {})
+    for entry in results.values():
+        line = (f"  {entry['stage'].ljust(18)} {entry['median'] * 1000:10.1f} ms ± {entry['mad'] * 1000:6.1f}"
+                f"  {entry['rows_per_second'] or 0:>12,} 行/秒")
+        base = base_results.get(result_key(entry['stage'], entry['rows']))
+        if base and base['median'] > 0:
+            line += f"  基準値比 {entry['median'] / base['median']:.2f}x"
+        print(line)
+    for stage, reason in skipped.items():
+        print(f"  {stage.ljust(18)} 省略: {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10k,100k,1m')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--xlsx-max-rows', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='結果の JSON の書き出し先')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='結果を基準値として保存')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"不明な段階: {', '.join(sorted(unknown))}（{', '.join(STAGES)}）")
+
+    baseline = load_results(args.baseline)
+    results = {}
+    for rows in (parse_size(size) for size in args.sizes.split(',')):
+        size_results, skipped = run_size(rows, args.repeat, stages, args.xlsx_max_rows, args.seed)
+        print_results(size_results, skipped, baseline)
+        results.update(size_results)
+
+    if args.output:
+        save_results(args.output, results)
+    if args.save_baseline:
+        # 今回計測しなかったサイズ・段階の基準値は残す
+        merged = dict((baseline or {}).get('results', {}))
+        merged.update(results)
+        save_results(args.baseline, merged)
+        print(f"\n基準値を保存: {os.path.relpath(args.baseline, REPO_ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
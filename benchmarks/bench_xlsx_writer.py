@@ -0,0 +1,91 @@
+"""xlsx 書き出しの比較ベンチマーク
+
+datagen の出展者リスト（数値・欠損・'=' で始まる文字列を含む）を
+  df.to_excel(engine='openpyxl')（従来の書き出し）
+  xlsx_writer.write_xlsx（xlsxwriter constant_memory / openpyxl write_only）
+でファイルに書き出し、所要時間と最大 RSS（子プロセスで計測）を表示する。
+書き出したファイルは excel_reader.read_excel(all_sheets=True) で読み直して元のデータと同じであること、
+--sheet-rows 行ごとのシート分割でも結合すると同じになることを確認する。
+
+    python benchmarks/bench_xlsx_writer.py [--rows 10000,100000] [--sheet-rows 30000]
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from _common import measure, report
+from bench_spill_merge import peak_rss
+from datagen import generate_exhibitors
+from excel_reader import read_excel
+from xlsx_writer import available_xlsx_engines, write_xlsx
+
+
+def make_frame(rows, seed=0):
+    """文字列以外の型・欠損・数式に見える文字列を含む DataFrame"""
+    frame = generate_exhibitors(rows, seed=seed)
+    frame['小間数'] = np.arange(rows) % 12 + 1
+    frame['面積'] = (np.arange(rows) % 37) / 4
+    frame.loc[frame.index % 97 == 0, '面積'] = np.nan
+    frame.loc[frame.index % 1000 == 0, frame.columns[0]] = '=要確認'
+    return frame
+
+
+def expected_frame(frame):
+    """読み直したときの値（文字列で読むため数値は文字列、欠損と空文字列は空セルのため NaN）"""
+    expected = frame.copy()
+    for column in ('小間数', '面積'):
+        values = expected[column]
+        expected[column] = values.map(lambda value: None if pd.isna(value) else
+                                      str(int(value)) if float(value).is_integer() else str(value))
+    expected = expected.astype(object)
+    return expected.where(expected.notna() & (expected != ''), np.nan)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='10000,100000')
+    parser.add_argument('--sheet-rows', type=int, default=30000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    writers = [('df.to_excel openpyxl（従来）',
+                lambda frame, path: frame.to_excel(path, index=False, engine='openpyxl'))]
+    for engine in available_xlsx_engines():
+        writers.append((f'write_xlsx {engine}',
+                        lambda frame, path, engine=engine: write_xlsx(frame, path, engine=engine)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'output.xlsx')
+        for rows in (int(r) for r in args.rows.split(',')):
+            frame = make_frame(rows)
+            expected = expected_frame(frame)
+            # 最大 RSS は読み直しで親プロセスが大きくなる前に、同じ状態から fork して計測
+            peaks = [(name, peak_rss(lambda: writer(frame, path))[1]) for name, writer in writers]
+            timings = []
+            sizes = []
+            for name, writer in writers:
+                seconds, _ = measure(lambda: writer(frame, path), repeat=args.repeat)
+                timings.append((name, seconds))
+                sizes.append(os.path.getsize(path))
+                if name.startswith('write_xlsx'):
+                    result = read_excel(path, all_sheets=True)
+                    assert result.astype(object).equals(expected), f'{name}: 読み直した結果が一致しません'
+
+            for engine in available_xlsx_engines():
+                sheets = write_xlsx(frame, path, engine=engine, sheet_rows=args.sheet_rows)
+                result = read_excel(path, all_sheets=True)
+                assert result.astype(object).equals(expected), f'{engine}: シート分割の結果が一致しません'
+                print(f"シート分割 {engine}: {args.sheet_rows}行ごと → {sheets}シート、結合して一致")
+
+            print(f"\n{rows}行 × {len(frame.columns)}列")
+            for (name, peak), size in zip(peaks, sizes):
+                print(f"  最大 RSS {name}: {peak / 1024 ** 2:.0f}MB（{size / 1024 ** 2:.1f}MB）")
+            report(f'{rows}行', timings)
+
+
+if __name__ == '__main__':
+    main()
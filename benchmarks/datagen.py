@@ -0,0 +1,272 @@
+"""展示会の出展者リストの合成データ生成
+
+実際の取り込みファイルに近いデータを作る（ベンチマーク用。乱数の種が同じなら同じデータ）:
+  - 法人格の位置・表記がばらばらの日本語の会社名（株式会社○○ / ○○(株) / ㈱○○ / 全角英字 / Co., Ltd.）
+  - 電話番号・メールアドレス・担当者が混ざった「連絡先」の自由記述
+  - 全角・括弧・国番号つきの電話番号
+  - fix_email_address が直す誤記（全角＠、co.jo、.con、gmail.co、ドメインのカンマ、@@、前後の空白）
+  - 列名・列順・不要列（ブース番号など）・重複した列名が異なる複数のレイアウト
+  - UTF-8 / UTF-8（BOM付き）/ Shift_JIS（cp932）の CSV と xlsx
+  - ファイルをまたいだ同じ会社・同じ担当者の重複（再出展）
+
+    from datagen import generate_files
+    files = generate_files(100000, files=20)   # [(ファイル名, bytes), ...]
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+KATAKANA = list('アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン')
+KANJI_WORDS = ['東京', '大阪', '名古屋', '日本', '中央', '新日本', '富士', '三和', '北辰', '大和', '朝日', '光陽',
+               '平和', '東洋', '西部', '昭和', '協和', '太平', '丸栄', '共栄', '明治', '第一', '関東', '九州']
+BUSINESS_WORDS = ['精機', '電機', '工業', '商事', '化学', '製作所', 'システムズ', 'ソリューションズ',
+                  'ホールディングス', 'テクノロジー', '物産', '産業', 'エンジニアリング', '食品', '印刷', '通信']
+ASCII_WORDS = ['ABC', 'NEXT', 'SMART', 'GLOBAL', 'TECH', 'ACE', 'UNITED', 'PRIME', 'NOVA', 'ZEN', 'AXIS', 'VISTA']
+SURNAMES = ['佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤', '吉田', '山田', '松本', '井上']
+GIVEN_NAMES = ['太郎', '花子', '一郎', '美咲', '健太', '陽子', '大輔', '直美', '翔', '愛']
+ROMAJI = ['sato', 'suzuki', 'takahashi', 'tanaka', 'ito', 'watanabe', 'yamamoto', 'nakamura', 'kobayashi', 'kato',
+          'yoshida', 'yamada', 'matsumoto', 'inoue']
+LOCAL_PARTS = ['info', 'sales', 'contact', 'eigyo', 'support', 'pr', 'ir']
+FREE_MAIL = ['gmail.com', 'yahoo.co.jp', 'outlook.jp', 'hotmail.co.jp']
+INDUSTRIES = ['製造業', 'IT・通信', '食品', '物流', '建設', '医療・ヘルスケア', '小売', '金融', 'エネルギー', '自動車']
+EXHIBITIONS = ['ものづくりワールド', 'Japan IT Week', 'FOODEX JAPAN', '国際物流総合展', '建築・建材展', 'メディカルジャパン',
+               'リテールテックJAPAN', 'スマートエネルギーWeek', '人とくるまのテクノロジー展', '関西設計・製造ソリューション展']
+AREA_CODES = ['03', '06', '052', '011', '092', '045', '075', '078', '022', '082']
+
+FULLWIDTH = str.maketrans('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-()@.',
+                          '０１２３４５６７８９ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ'
+                          'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ－（）＠．')
+
+# 列のレイアウト（標準の列名 → ファイルでの列名。None の列は出力しない）
+LAYOUTS = [
+    {'会社名': '会社名', '担当者': '担当者名', 'メールアドレス': 'メールアドレス', 'Tel': '電話番号', '業界': '業種',
+     '展示会名': '展示会名', '展示会初日': '展示会初日', 'ブース': 'ブース番号', '連絡先': '連絡先', '住所': '住所'},
+    {'ブース': '小間番号', '会社名': '出展社名', '担当者': 'ご担当者', '業界': 'カテゴリー', 'Tel': 'TEL',
+     'メールアドレス': 'E-Mail', '展示会名': 'イベント名', '展示会初日': '開始日', '連絡先': 'お問い合わせ先', '備考': '備考'},
+    {'会社名': 'Company', '担当者': 'Contact Person', 'メールアドレス': 'Email', 'Tel': 'Phone', '業界': 'Industry',
+     '展示会名': 'Exhibition', '展示会初日': 'Start Date', 'ブース': 'Booth', '連絡先': 'Contact Information'},
+    # メールアドレス列がなく、連絡先の自由記述にだけメールアドレスがある
+    {'会社名': '出展企業名', '担当者': '氏名', 'Tel': 'ＴＥＬ', '業界': '分野', '展示会名': '展示会',
+     '展示会初日': '会期初日', '連絡先': '問合せ先', '住所': '所在地'},
+    # 同じ列名が2回出てくる（2つ目は英語表記の会社名）
+    {'会社名': '会社名', '会社名（英語）': '会社名', 'メールアドレス': 'メール', 'Tel': 'Tel', '担当者': '担当',
+     '業界': '業界', '展示会名': '展示会名', '展示会初日': '初日', 'ブース': 'ブース'},
+]
+ENCODINGS = ['utf-8', 'utf-8-sig', 'cp932']
+
+class CompanyPool:
+    """会社の一覧（基本名・英字の基本名・ドメイン・電話番号）。ファイルをまたいで同じ会社が出てくるよう共有する"""
+
+    def __init__(self, size, seed=0):
+        rng = np.random.default_rng(seed)
+        self.size = size
+        kinds = rng.random(size)
+        bases = []
+        for i in range(size):
+            if kinds[i] < 0.25:
+                bases.append(f"{rng.choice(ASCII_WORDS)}{rng.choice(['', ' '])}{rng.choice(ASCII_WORDS)}")
+            elif kinds[i] < 0.6:
+                bases.append(f"{rng.choice(KANJI_WORDS)}{rng.choice(BUSINESS_WORDS)}")
+            else:
+                bases.append(''.join(rng.choice(KATAKANA, int(rng.integers(2, 6)))) + rng.choice(BUSINESS_WORDS))
+        self.bases = np.array(bases, dtype=object)
+        self.domains = np.array([f"c{i:06d}.co.jp" if rng.random() < 0.8 else f"c{i:06d}.com" for i in range(size)],
+                                dtype=object)
+        self.areas = rng.choice(AREA_CODES, size)
+        self.numbers = rng.integers(1000, 9999, size)
+
+def company_name(base, style, rng):
+    """法人格の位置・表記ゆれのある会社名"""
+    if style == 0:
+        return f"株式会社{base}"
+    if style == 1:
+        return f"{base}株式会社"
+    if style == 2:
+        return f"(株){base}"
+    if style == 3:
+        return f"㈱{base}"
+    if style == 4:
+        return f"株式会社 {base.translate(FULLWIDTH)}"
+    if style == 5 and base.isascii():
+        return f"{base} Co., Ltd."
+    if style == 6:
+        return f"有限会社{base}"
+    if style == 7:
+        return f" {base}（株） "
+    return base
+
+def phone_number(area, number, line, style):
+    """表記のばらばらな電話番号"""
+    digits = f"{area}{number:04d}{line:04d}"[:10]
+    local = digits[len(area):]
+    plain = f"{area}-{local[:-4]}-{local[-4:]}"
+    if style == 0:
+        return plain
+    if style == 1:
+        return plain.translate(FULLWIDTH)
+    if style == 2:
+        return f"({area}){local[:-4]}-{local[-4:]}"
+    if style == 3:
+        return digits
+    if style == 4:
+        return f"+81-{area[1:]}-{local[:-4]}-{local[-4:]}"
+    return f" {plain} "
+
+def email_with_typo(email, style):
+    """fix_email_address が直す誤記を入れたメールアドレス"""
+    if style == 0:
+        return email.replace('@', '＠')
+    if style == 1:
+        return email.replace('.co.jp', '.co.jo')
+    if style == 2:
+        return email.replace('.com', '.con')
+    if style == 3:
+        return email.replace('gmail.com', 'gmail.co')
+    if style == 4:
+        local, domain = email.split('@', 1)
+        return f"{local}@{domain.replace('.', ',', 1)}"
+    if style == 5:
+        return email.replace('@', '@@')
+    if style == 6:
+        return f" {email.upper()}　"
+    return f"{email}?"
+
+def contact_text(person, phone, email, style):
+    """連絡先の自由記述"""
+    if style == 0:
+        return f"TEL：{phone}　E-mail：{email}"
+    if style == 1:
+        return f"{person}\n電話 {phone}\n{email.translate(FULLWIDTH)}"
+    if style == 2:
+        return f"お問い合わせ：{email}（担当：{person}）"
+    if style == 3:
+        return f"℡{phone} / FAX {phone[:-1]}9"
+    if style == 4:
+        return f"営業部 {person} {phone}"
+    return ""
+
+def date_text(ordinal, style):
+    """表記のばらばらな日付"""
+    day = pd.Timestamp.fromordinal(int(ordinal))
+    if style == 0:
+        return f"{day.year}/{day.month}/{day.day}"
+    if style == 1:
+        return day.strftime('%Y-%m-%d')
+    if style == 2:
+        return f"令和{day.year - 2018}年{day.month}月{day.day}日"
+    if style == 3:
+        return f"{day.year}年{day.month:02d}月{day.day:02d}日({'月火水木金土日'[day.weekday()]})"
+    if style == 4:
+        return day.strftime('%Y%m%d')
+    return ""
+
+def generate_exhibitors(rows, seed=0, pool=None, layout=0, typo_rate=0.15, duplicate_rate=0.3):
+    """1ファイル分の出展者リスト（列名はレイアウトどおり、値はすべて文字列）"""
+    rng = np.random.default_rng(seed)
+    pool = pool or CompanyPool(max(rows // 3, 10), seed)
+    mapping = LAYOUTS[layout % len(LAYOUTS)]
+    # 再出展・重複登録（同じ会社・担当者の行）を含める
+    unique_rows = max(int(rows * (1 - duplicate_rate)), 1)
+    companies = rng.integers(0, pool.size, unique_rows)
+    persons = rng.integers(0, len(SURNAMES) * len(GIVEN_NAMES), unique_rows)
+    exhibitions = rng.integers(0, len(EXHIBITIONS), unique_rows)
+    typo_styles = np.where(rng.random(unique_rows) < typo_rate, rng.integers(0, 8, unique_rows), -1)
+    free_mail = rng.random(unique_rows) < 0.15
+    name_styles = rng.integers(0, 9, unique_rows)
+    picks = np.concatenate([np.arange(unique_rows), rng.integers(0, unique_rows, rows - unique_rows)])
+    rng.shuffle(picks)
+    companies, persons, exhibitions = companies[picks], persons[picks], exhibitions[picks]
+    typo_styles, free_mail, name_styles = typo_styles[picks], free_mail[picks], name_styles[picks]
+    # 重複行の一部は会社名の表記が元の行と異なる
+    restyled = rng.random(rows) < 0.2
+    name_styles[restyled] = rng.integers(0, 9, int(restyled.sum()))
+
+    phone_styles = rng.integers(0, 6, rows)
+    contact_styles = rng.integers(0, 6, rows)
+    date_styles = rng.integers(0, 6, rows)
+    start = pd.Timestamp('2024-01-15').toordinal()
+    date_ordinals = start + exhibitions * 37 + rng.integers(0, 3, rows) * 365
+
+    names, people, emails, phones, contacts = [], [], [], [], []
+    for i in range(rows):
+        company = companies[i]
+        base = pool.bases[company]
+        surname_index, given_index = divmod(int(persons[i]), len(GIVEN_NAMES))
+        person = f"{SURNAMES[surname_index]} {GIVEN_NAMES[given_index]}"
+        names.append(company_name(base, name_styles[i], rng))
+        people.append(person)
+        if free_mail[i]:
+            email = f"{ROMAJI[surname_index]}{given_index}@{FREE_MAIL[company % len(FREE_MAIL)]}"
+        else:
+            email = f"{LOCAL_PARTS[given_index % len(LOCAL_PARTS)]}@{pool.domains[company]}"
+        if typo_styles[i] >= 0:
+            email = email_with_typo(email, typo_styles[i])
+        emails.append(email)
+        phone = phone_number(pool.areas[company], int(pool.numbers[company]), int(persons[i]) % 10000, phone_styles[i])
+        phones.append(phone)
+        contacts.append(contact_text(person, phone, email, contact_styles[i]))
+
+    values = {
+        '会社名': names,
+        '会社名（英語）': [f"{base} Corporation" if base.isascii() else '' for base in pool.bases[companies]],
+        '担当者': people,
+        'メールアドレス': emails,
+        'Tel': phones,
+        '業界': [INDUSTRIES[i % len(INDUSTRIES)] for i in exhibitions],
+        '展示会名': [EXHIBITIONS[i] for i in exhibitions],
+        '展示会初日': [date_text(ordinal, style) for ordinal, style in zip(date_ordinals, date_styles)],
+        'ブース': [f"{chr(65 + i % 8)}-{i % 300:03d}" for i in rng.integers(0, 2400, rows)],
+        '連絡先': contacts,
+        '住所': [f"東京都千代田区丸の内{i % 3 + 1}-{i % 9 + 1}-{i % 20 + 1}" for i in rng.integers(0, 10000, rows)],
+        '備考': np.where(rng.random(rows) < 0.1, '新製品を出展', ''),
+    }
+    columns = {header: values[key] for key, header in mapping.items() if header is not None}
+    if len(columns) < len(mapping):
+        # 同じ列名が2回出てくるレイアウトは列の配列で作る
+        keys = list(mapping)
+        frame = pd.DataFrame({i: values[key] for i, key in enumerate(keys)})
+        frame.columns = [mapping[key] for key in keys]
+        return frame
+    return pd.DataFrame(columns)
+
+def encode_frame(df, fmt):
+    """DataFrame をファイルの内容（bytes）に変換。fmt は 'utf-8' / 'utf-8-sig' / 'cp932' / 'xlsx'"""
+    if fmt == 'xlsx':
+        import xlsxwriter
+        output = io.BytesIO()
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_numbers': False,
+                                                'strings_to_formulas': False, 'strings_to_urls': False})
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, [str(column) for column in df.columns])
+        for row, values in enumerate(df.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row, 0, values)
+        workbook.close()
+        return output.getvalue()
+    return df.to_csv(index=False).encode(fmt, errors='replace')
+
+def generate_files(total_rows, files=10, seed=0, xlsx_ratio=0.1, pool=None):
+    """total_rows 行を files 個のファイルに分けて作る（レイアウト・文字コードはファイルごとに変える）"""
+    rng = np.random.default_rng(seed)
+    pool = pool or CompanyPool(max(total_rows // 4, 10), seed)
+    result = []
+    for index, rows in enumerate(np.diff(np.linspace(0, total_rows, files + 1).astype(int))):
+        df = generate_exhibitors(int(rows), seed=seed * 100003 + index, pool=pool, layout=index)
+        if rng.random() < xlsx_ratio:
+            fmt, ext = 'xlsx', '.xlsx'
+        else:
+            fmt, ext = ENCODINGS[index % len(ENCODINGS)], '.csv'
+        result.append((f"exhibitors_{index:03d}_{fmt}{ext}", encode_frame(df, fmt)))
+    return result
+
+def ng_definitions(pool, seed=0, companies=200, contains=20, emails=100, domains=30):
+    """NG 判定の定義（正規化済みの会社名・部分一致の語・メールアドレス・ドメイン）を会社の一覧から作る"""
+    from company_names import normalize_company, normalize_text
+    rng = np.random.default_rng(seed)
+    picked = rng.integers(0, pool.size, companies + emails + domains)
+    exact = {normalize_company(f"株式会社{base}") for base in pool.bases[picked[:companies]]}
+    tokens = [normalize_text(word) for word in rng.choice(KANJI_WORDS + ASCII_WORDS, contains, replace=False)]
+    ng_emails = {f"info@{domain}" for domain in pool.domains[picked[companies:companies + emails]]}
+    ng_domains = set(pool.domains[picked[companies + emails:]])
+    return exact, tokens, ng_emails, ng_domains
@@ -0,0 +1,131 @@
+"""ベンチマーク用の Notion クライアントのスタブ
+
+databases.query をメモリ上のページに対してローカル評価し、1回ごとに疑似的な遅延を入れる。
+rate_limit を指定すると直近1秒間のリクエスト数が上限を超えたときに 429 を返し、
+throttle_ratio を指定するとその割合でランダムに 429 を返す。
+"""
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import date, timedelta
+
+from _common import REPO_ROOT  # noqa: F401  (リポジトリ直下を import パスに追加)
+from notion_access import matches_filter
+
+CATEGORY_VALUES = ["あり", "TELとURL", "Tel、住所、URL", "社名・住所・URL", "社名とURL（直で企業HPリンク）",
+                   "社名とURLのみ", "出展社名のみ", "社名・住所", "未確認"]
+
+
+def make_pages(count, seed=0, start=date(2025, 1, 1), days=730):
+    """展示会データベース風のページを count 件作成"""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(count):
+        first_day = start + timedelta(days=rng.randrange(days))
+        files = []
+        if rng.random() < 0.9:
+            files.append({"name": f"list_{i}.csv", "type": "file",
+                          "file": {"url": f"https://files.example/{i}.csv", "expiry_time": "2099-01-01T00:00:00.000Z"}})
+        pages.append({
+            "id": f"page-{i:06d}",
+            "last_edited_time": f"{(start - timedelta(days=rng.randrange(365))).isoformat()}T00:00:00.000Z",
+            "properties": {
+                "名前": {"type": "title", "title": [{"plain_text": f"展示会{i}"}]},
+                "メールアドレス（有無）": {"type": "select", "select": {"name": rng.choice(CATEGORY_VALUES)}},
+                "ファイル": {"type": "files", "files": files},
+                "展示会日程_初日": {"type": "date", "date": {"start": first_day.isoformat()}},
+            },
+        })
+    return pages
+
+
+class FakeAPIError(Exception):
+    """notion_client.APIResponseError と同じ属性（status / code / headers）を持つ例外"""
+
+    def __init__(self, status, code, retry_after=None):
+        super().__init__(f"Fake Notion API error: {status} {code}")
+        self.status = status
+        self.code = code
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+class _Databases:
+    def __init__(self, client):
+        self._client = client
+
+    def query(self, database_id, filter=None, start_cursor=None, page_size=100, **kwargs):
+        client = self._client
+        client.admit()
+        time.sleep(client.latency)
+        matched = client.matching(filter)
+        offset = int(start_cursor or 0)
+        results = matched[offset:offset + page_size]
+        has_more = offset + page_size < len(matched)
+        return {"object": "list", "results": results, "has_more": has_more,
+                "next_cursor": str(offset + page_size) if has_more else None}
+
+
+class _Pages:
+    def __init__(self, client):
+        self._client = client
+
+    def retrieve(self, page_id, **kwargs):
+        client = self._client
+        client.admit()
+        time.sleep(client.latency)
+        return next(page for page in client.records if page["id"] == page_id)
+
+
+class FakeNotionClient:
+    """notion_client.Client の databases.query / pages.retrieve だけを持つスタブ"""
+
+    def __init__(self, pages, latency=0.05, rate_limit=None, throttle_ratio=0.0, retry_after=1, seed=0):
+        self.records = pages
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.throttle_ratio = throttle_ratio
+        self.retry_after = retry_after
+        self.calls = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self._recent = deque()
+        self._rng = random.Random(seed)
+        self.databases = _Databases(self)
+        self.pages = _Pages(self)
+        self._matched = {}
+
+    def touch(self, ratio, seed=1):
+        """ratio の割合のページを編集済みにする（カテゴリを変え、last_edited_time を現在時刻に）"""
+        rng = random.Random(seed)
+        edited = time.strftime("%Y-%m-%dT%H:%M:00.000Z", time.gmtime())
+        touched = rng.sample(self.records, max(1, int(len(self.records) * ratio)))
+        for page in touched:
+            page["properties"]["メールアドレス（有無）"]["select"] = {"name": rng.choice(CATEGORY_VALUES)}
+            page["last_edited_time"] = edited
+        with self.lock:
+            self._matched.clear()
+        return len(touched)
+
+    def admit(self):
+        """リクエストを受け付けるか判定（超過時は 429 の FakeAPIError）"""
+        with self.lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            over_limit = self.rate_limit is not None and len(self._recent) >= self.rate_limit
+            if over_limit or self._rng.random() < self.throttle_ratio:
+                self.throttled += 1
+                raise FakeAPIError(429, "rate_limited", self.retry_after)
+            self._recent.append(now)
+
+    def matching(self, filter):
+        """フィルターに一致するページ（スタブ側の評価コストを計測に含めないようメモ化）"""
+        key = json.dumps(filter, ensure_ascii=False, sort_keys=True)
+        with self.lock:
+            if key not in self._matched:
+                self._matched[key] = [page for page in self.records if matches_filter(page, filter)]
+            return self._matched[key]
@@ -0,0 +1,98 @@
+"""ベンチマーク用のローカル Google Sheets API（http.server）
+
+spreadsheets.get（fields は無視してタブ情報のみ返す）、values/{range}、values:batchGet に応答する。
+1リクエストごとに latency 秒待ち、リクエスト数を数える。
+
+    server = FakeSheetsServer({'sheet1': [('Sheet1', 0, values), ...]}, latency=0.05)
+    server.start(); ... server.base_url ...; server.stop()
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+def _range_title(range_):
+    """'タブ名'!A:ZZ からタブ名を取り出す（タブ名なしは None）"""
+    if "!" not in range_:
+        return None
+    title = range_.rsplit("!", 1)[0]
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title
+
+
+class FakeSheetsServer:
+    def __init__(self, workbooks, latency=0.0):
+        # workbooks: {spreadsheet_id: [(タイトル, gid, values), ...]}（表示順）
+        self.workbooks = workbooks
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v4"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _values(self, sheet_id, range_):
+        tabs = self.workbooks[sheet_id]
+        title = _range_title(range_)
+        for tab_title, _, values in tabs:
+            if title is None or tab_title == title:
+                return {"range": range_, "majorDimension": "ROWS", "values": values}
+        raise KeyError(range_)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                segments = [unquote(segment) for segment in parts.path.split("/") if segment]
+                # /v4/spreadsheets/{id}[/values/{range} | /values:batchGet]
+                try:
+                    sheet_id = segments[2]
+                    if len(segments) == 3:
+                        sheets = [{"properties": {"sheetId": gid, "title": title, "index": index}}
+                                  for index, (title, gid, _) in enumerate(fake.workbooks[sheet_id])]
+                        return self._send(200, {"sheets": sheets})
+                    if segments[3] == "values:batchGet":
+                        ranges = query.get("ranges", [])
+                        return self._send(200, {"spreadsheetId": sheet_id,
+                                                "valueRanges": [fake._values(sheet_id, r) for r in ranges]})
+                    if segments[3] == "values":
+                        return self._send(200, fake._values(sheet_id, "/".join(segments[4:])))
+                except (KeyError, IndexError):
+                    pass
+                self._send(404, {"error": {"code": 404, "message": "Requested entity was not found."}})
+
+        return Handler
@@ -0,0 +1,108 @@
+"""取得エンジン（requests / httpx）の負荷試験
+
+ローカルの代替サーバー（standin_server.StandinServer）を起動し、
+  1. Notion のデータベースクエリ（RateLimitedClient 経由・429 は Retry-After に従って再試行）で対象ページを集め、
+  2. ファイルURL（スプレッドシートは CSV エクスポートURLに変換）をエンジン × 同時接続数ごとに get_many で取得して、
+files/sec と p50 / p99 の所要時間、再試行・エラー件数を表示する。
+
+    python benchmarks/load_test.py [--pages 200] [--engines requests,httpx] [--concurrency 1,4,16]
+                                   [--latency 0.05] [--error-rate 0.02] [--file-rate-limit 0]
+"""
+
+import argparse
+import time
+
+import requests
+
+from _common import import_streamlit_app
+from async_fetch import create_fetcher
+from fake_notion import FakeAPIError
+from notion_access import NotionRateLimiter, RateLimitedClient, query_all_pages
+from standin_server import StandinServer
+
+sa = import_streamlit_app()
+
+
+class _StandinDatabases:
+    """代替サーバーの databases.query（notion_client と同じ引数・例外の属性）"""
+
+    def __init__(self, base_url):
+        self._base_url = base_url
+        self._session = requests.Session()
+
+    def query(self, database_id, **body):
+        response = self._session.post(f"{self._base_url}/v1/databases/{database_id}/query", json=body)
+        if response.status_code >= 400:
+            payload = response.json()
+            raise FakeAPIError(response.status_code, payload.get("code"), response.headers.get("Retry-After"))
+        return response.json()
+
+
+class StandinNotion:
+    """代替サーバー用の最小限の Notion クライアント"""
+
+    def __init__(self, base_url):
+        self.databases = _StandinDatabases(base_url)
+
+
+def collect_file_urls(pages):
+    """ページのファイルURLを集め、スプレッドシートは CSV エクスポートURLに変換"""
+    urls = []
+    for page in pages:
+        for file_info in page["properties"]["ファイル"]["files"]:
+            if file_info["type"] == "file":
+                urls.append(file_info["file"]["url"])
+            elif sa.is_google_sheet_url(file_info["external"]["url"]):
+                urls.append(sa.google_sheet_to_csv_url(file_info["external"]["url"]))
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--engines', default='requests,httpx')
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--api-rate-limit', type=int, default=3)
+    parser.add_argument('--file-rate-limit', type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandinServer(pages=args.pages, rows=args.rows, api_latency=args.latency, file_latency=args.latency,
+                           jitter=args.jitter, error_rate=args.error_rate, api_rate_limit=args.api_rate_limit,
+                           file_rate_limit=args.file_rate_limit or None).start()
+    sa.SHEETS_EXPORT_BASE = server.base_url
+    try:
+        # 1. Notion クエリ（Notion 側のエラーは再試行で吸収する）
+        notion = RateLimitedClient(StandinNotion(server.base_url), NotionRateLimiter())
+        start = time.perf_counter()
+        pages, calls = query_all_pages(notion, "standin", page_size=100)
+        query_time = time.perf_counter() - start
+        urls = collect_file_urls(pages)
+        print(f"Notion クエリ: {len(pages)}ページ / {calls}回 / {query_time:.2f}秒  {notion.limiter.summary()}")
+        print(f"取得対象: {len(urls)}ファイル（行数 {args.rows}、遅延 {args.latency * 1000:.0f} ms"
+              f" + 最大 {args.jitter * 1000:.0f} ms、エラー率 {args.error_rate:.0%}）")
+
+        # 2. エンジン × 同時接続数
+        print(f"\n{'エンジン':<10}{'同時':>6}{'files/sec':>12}{'p50 ms':>10}{'p99 ms':>10}{'再試行':>8}{'失敗':>6}")
+        for engine in args.engines.split(','):
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                with create_fetcher(engine, concurrency) as fetcher:
+                    start = time.perf_counter()
+                    results = fetcher.get_many(urls)
+                    elapsed = time.perf_counter() - start
+                    failed = sum(1 for r in results if r.response is None or r.response.status_code >= 400)
+                    assert all(r.response.content.startswith('会社名'.encode('utf-8'))
+                               for r in results if r.response is not None and r.response.status_code == 200)
+                    print(f"{fetcher.engine:<12}{concurrency:>6}{len(urls) / elapsed:>12.1f}"
+                          f"{fetcher.percentile(50) * 1000:>10.0f}{fetcher.percentile(99) * 1000:>10.0f}"
+                          f"{fetcher.metrics['retries']:>8}{failed:>6}")
+    finally:
+        server.stop()
+    print(f"\nサーバー側: {server.counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""段階別ベンチマークの性能劣化チェック
+
+bench_stages の計測を実行して結果をコミットごとに results/<コミット>.json に保存し、
+baselines/stages.json の基準値と段階ごとに比べる。次の両方を満たす段階を「劣化」とし、差分の表を表示して
+終了コード 1 で終わる（外部サービスは使わない）:
+  - 中央値が基準値より --tolerance（段階ごとに --stage-tolerance で変更可）を超えて遅い
+  - 差が両者の MAD から見積もったばらつき（σ ≒ 1.4826 × MAD）の --noise 倍と --min-delta-ms を超える
+
+月次更新・夜間の NG 除外に入る前に、手元で次のように実行する:
+
+    python benchmarks/regression_gate.py [--sizes 10k,100k] [--repeat 7] [--tolerance 0.15]
+    python benchmarks/regression_gate.py --results benchmarks/results/abc1234.json   # 保存済みの結果と比較
+"""
+
+import argparse
+import math
+import os
+import subprocess
+import sys
+
+from _common import REPO_ROOT
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+# MAD から標準偏差への換算係数（正規分布）
+MAD_TO_SIGMA = 1.4826
+
+STATUS_LABELS = {'regression': '劣化', 'improvement': '改善', 'ok': 'OK', 'noise': 'ばらつきの範囲内',
+                 'new': '基準値なし', 'missing': '未計測'}
+
+
+def current_commit():
+    """HEAD の短いコミット ID（未コミットの変更があれば -dirty を付ける。git がなければ 'local'）"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'local'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def parse_stage_tolerances(values):
+    """['dedup=0.1', 'export_xlsx=0.3'] → {'dedup': 0.1, 'export_xlsx': 0.3}"""
+    tolerances = {}
+    for value in values or []:
+        stage, _, tolerance = value.partition('=')
+        try:
+            tolerances[stage.strip()] = float(tolerance)
+        except ValueError:
+            raise SystemExit(f"--stage-tolerance の形式が不正です: {value}（例: dedup=0.1）")
+    return tolerances
+
+
+def compare(baseline, current, tolerance=0.15, noise=3.0, stage_tolerances=None, min_delta=0.01):
+    """基準値と今回の結果を段階ごとに比べた行の一覧（status は STATUS_LABELS のキー）"""
+    stage_tolerances = stage_tolerances or {}
+    base_results = baseline.get('results', {})
+    rows = []
+    for key, entry in current.get('results', {}).items():
+        base = base_results.get(key)
+        row = {'key': key, 'stage': entry['stage'], 'rows': entry['rows'], 'median': entry['median'],
+               'mad': entry['mad'], 'base_median': None, 'change': None, 'threshold': None}
+        if not base or base['median'] <= 0:
+            rows.append(dict(row, status='new'))
+            continue
+        allowed = stage_tolerances.get(entry['stage'], tolerance)
+        delta = entry['median'] - base['median']
+        # 数ミリ秒の段階は MAD が小さくても揺れるため、差の下限（min_delta 秒）もばらつきとみなす
+        spread = max(noise * MAD_TO_SIGMA * math.hypot(entry['mad'], base['mad']), min_delta)
+        row.update(base_median=base['median'], change=delta / base['median'], threshold=allowed)
+        if abs(delta) <= spread:
+            status = 'noise' if abs(delta) > allowed * base['median'] else 'ok'
+        elif delta > allowed * base['median']:
+            status = 'regression'
+        elif -delta > allowed * base['median']:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append(dict(row, status=status))
+    for key in sorted(set(base_results) - set(current.get('results', {}))):
+        base = base_results[key]
+        rows.append({'key': key, 'stage': base['stage'], 'rows': base['rows'], 'median': None, 'mad': None,
+                     'base_median': base['median'], 'change': None, 'threshold': None, 'status': 'missing'})
+    return rows
+
+
+def warn_environment(base, current):
+    """基準値と計測環境（CPU 数・Python・pandas）が異なる場合は比較の信頼性が低いことを表示"""
+    differences = [f"{key}: {base.get(key)} → {current.get(key)}"
+                   for key in ('machine', 'processor', 'cpus', 'python', 'pandas') if base.get(key) != current.get(key)]
+    if differences:
+        print(f"⚠️ 基準値と計測環境が異なります（{', '.join(differences)}）。"
+              "この環境の基準値は bench_stages.py --save-baseline で作り直してください")
+
+
+def print_diff(rows, show_missing=False):
+    """段階ごとの差分の表"""
+    print(f"\n{'段階':<24}{'基準値':>12}{'今回':>12}{'変化':>9}{'許容':>7}{'今回の行/秒':>14}  判定")
+    for row in sorted(rows, key=lambda row: (row['rows'], row['key'])):
+        if row['status'] == 'missing' and not show_missing:
+            continue
+        base = f"{row['base_median'] * 1000:.1f}ms" if row['base_median'] is not None else '-'
+        now = f"{row['median'] * 1000:.1f}ms" if row['median'] is not None else '-'
+        change = f"{row['change'] * 100:+.1f}%" if row['change'] is not None else '-'
+        allowed = f"{row['threshold'] * 100:.0f}%" if row['threshold'] is not None else '-'
+        throughput = f"{row['rows'] / row['median']:,.0f}" if row['median'] else '-'
+        mark = '✗ ' if row['status'] == 'regression' else ''
+        print(f"{row['key']:<24}{base:>12}{now:>12}{change:>9}{allowed:>7}{throughput:>14}  "
+              f"{mark}{STATUS_LABELS[row['status']]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10k,100k')
+    parser.add_argument('--repeat', type=int, default=7, help='段階ごとの計測回数（中央値・MAD を取る）')
+    parser.add_argument('--stages', help='計測する段階（既定はすべて）')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='許容する遅延の割合')
+    parser.add_argument('--stage-tolerance', action='append', metavar='STAGE=RATIO',
+                        help='段階ごとの許容割合（複数指定可）')
+    parser.add_argument('--noise', type=float, default=3.0, help='ばらつき（σ）の何倍までを誤差とみなすか')
+    parser.add_argument('--min-delta-ms', type=float, default=10.0, help='これ以下の差は誤差とみなす（ミリ秒）')
+    parser.add_argument('--results', help='計測せずに保存済みの結果 JSON と比較する')
+    parser.add_argument('--baseline', help='基準値の JSON（既定は baselines/stages.json）')
+    parser.add_argument('--xlsx-max-rows', type=int, default=200000)
+    parser.add_argument('--show-missing', action='store_true', help='今回計測しなかった基準値も表示')
+    args = parser.parse_args()
+
+    # 計測する場合だけ streamlit_app などを読み込む
+    import bench_stages
+
+    baseline_path = args.baseline or bench_stages.BASELINE_PATH
+    baseline = bench_stages.load_results(baseline_path)
+    if baseline is None:
+        raise SystemExit(f"基準値がありません: {baseline_path}（bench_stages.py --save-baseline で作成）")
+
+    if args.results:
+        current = bench_stages.load_results(args.results)
+        if current is None:
+            raise SystemExit(f"結果を読み込めません: {args.results}")
+    else:
+        stages = args.stages.split(',') if args.stages else bench_stages.STAGES
+        results = {}
+        for rows in (bench_stages.parse_size(size) for size in args.sizes.split(',')):
+            size_results, skipped = bench_stages.run_size(rows, args.repeat, stages, args.xlsx_max_rows)
+            for stage, reason in skipped.items():
+                print(f"  {stage}: 省略（{reason}）")
+            results.update(size_results)
+        commit = current_commit()
+        path = os.path.join(RESULTS_DIR, f"{commit}.json")
+        bench_stages.save_results(path, results, commit=commit)
+        current = bench_stages.load_results(path)
+        print(f"\n結果を保存: {os.path.relpath(path, REPO_ROOT)}")
+
+    warn_environment(baseline.get('environment', {}), current.get('environment', {}))
+    rows = compare(baseline, current, args.tolerance, args.noise, parse_stage_tolerances(args.stage_tolerance),
+                   args.min_delta_ms / 1000)
+    print_diff(rows, args.show_missing)
+    regressions = [row for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n✗ {len(regressions)}段階でスループットが低下: "
+              + ', '.join(f"{row['key']} {row['change'] * 100:+.1f}%" for row in regressions))
+        sys.exit(1)
+    print("\n✓ 性能の劣化はありません")
+
+
+if __name__ == '__main__':
+    main()
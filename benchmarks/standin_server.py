@@ -0,0 +1,266 @@
+"""Notion / ファイルURL / スプレッドシートCSVエクスポートのローカル代替サーバー（負荷試験用）
+
+  POST /v1/databases/{id}/query      Notion のデータベースクエリ（フィルターはローカル評価、ページ分割あり）
+  GET  /v1/pages/{id}                Notion のページ取得
+  GET  /files/{page_id}/{name}       Notion にアップロードされたファイル（署名付きURL風のクエリ付き）
+  GET  /spreadsheets/d/{id}/export   スプレッドシートのCSVエクスポート（format=csv&gid=N）
+
+遅延（latency + 0〜jitter 秒）、エラー率（500 を返す割合）、レート制限（1秒あたりの上限を超えたら
+429 + Retry-After）を Notion API とファイル取得で別々に指定できる。
+
+単体で起動して update.py / streamlit_app.py から使う場合:
+
+    python benchmarks/standin_server.py --port 8765 --pages 300
+    NOTION_BASE_URL=http://127.0.0.1:8765 SHEETS_EXPORT_BASE=http://127.0.0.1:8765 \\
+        NOTION_API_KEY=dummy DATABASE_ID=standin USE_NOTION_MIRROR=false python update.py
+"""
+
+import argparse
+import csv
+import io
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from _common import REPO_ROOT  # noqa: F401  (リポジトリ直下を import パスに追加)
+from fake_notion import make_pages
+from notion_access import UnsupportedFilter, matches_filter
+
+
+def make_csv(seed, rows):
+    """展示会の出展社リスト風のCSV（UTF-8）"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['会社名', 'メールアドレス', 'TEL', '住所', '展示会名'])
+    for i in range(rows):
+        writer.writerow([f'株式会社テスト{seed}_{i}', f'user{i}@example{seed}.co.jp', f'03-{seed % 10000:04d}-{i:04d}',
+                         f'東京都千代田区{i}丁目', f'展示会{seed}'])
+    return output.getvalue().encode('utf-8')
+
+
+class _Limiter:
+    """直近1秒間のリクエスト数で判定する簡易レート制限（rate が None なら無制限）"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            while self._times and now - self._times[0] >= 1.0:
+                self._times.popleft()
+            if len(self._times) >= self.rate:
+                return False
+            self._times.append(now)
+            return True
+
+
+class StandinServer:
+    """Notion・ファイル・スプレッドシートのエンドポイントをまとめて提供する HTTP サーバー"""
+
+    def __init__(self, pages=200, rows=200, sheet_ratio=0.3, host="127.0.0.1", port=0,
+                 api_latency=0.05, file_latency=0.05, jitter=0.02, error_rate=0.0,
+                 api_rate_limit=3, file_rate_limit=None, retry_after=1, seed=0):
+        self.rows = rows
+        self.api_latency = api_latency
+        self.file_latency = file_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._api_limiter = _Limiter(api_rate_limit)
+        self._file_limiter = _Limiter(file_rate_limit)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.counts = {"api": 0, "files": 0, "sheets": 0, "throttled": 0, "errors": 0}
+        self._counts_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+        self.records = self._build_pages(pages, sheet_ratio, seed)
+        self._by_id = {page["id"]: page for page in self.records}
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _build_pages(self, count, sheet_ratio, seed):
+        """fake_notion.make_pages のページのファイルURLをこのサーバーに向け、一部をスプレッドシートのリンクにする"""
+        rng = random.Random(seed + 1)
+        expiry = (datetime.now(timezone.utc) + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        # 取得対象の期間（今月）に入るよう、作成日・初日を今月にそろえる
+        today = date.today()
+        pages = make_pages(count, seed=seed, start=today.replace(day=1), days=max(today.day, 1))
+        for index, page in enumerate(pages):
+            page["created_time"] = f"{today.replace(day=1).isoformat()}T00:00:00.000Z"
+            page["archived"] = False
+            files = page["properties"]["ファイル"]["files"]
+            if rng.random() < sheet_ratio:
+                files[:] = [{"name": f"sheet_{index}", "type": "external",
+                             "external": {"url": f"https://docs.google.com/spreadsheets/d/standin{index}/edit#gid=0"}}]
+                continue
+            for file_info in files:
+                name = quote(file_info["name"])
+                file_info["file"] = {
+                    "url": f"{{base}}/files/{page['id']}/{name}?X-Amz-Signature={rng.getrandbits(64):x}",
+                    "expiry_time": expiry,
+                }
+        return pages
+
+    def _page(self, page):
+        """ファイルURLの {base} をサーバーのURLに置き換えたページ"""
+        return json.loads(json.dumps(page).replace("{base}", self.base_url))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key):
+        with self._counts_lock:
+            self.counts[key] += 1
+
+    def _delay(self, base):
+        with self._rng_lock:
+            extra = self._rng.random() * self.jitter if self.jitter else 0.0
+            failed = self._rng.random() < self.error_rate
+        time.sleep(base + extra)
+        return failed
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _notion_error(self, status, code, message, headers=None):
+                self._send(status, {"object": "error", "status": status, "code": code, "message": message},
+                           headers=headers)
+
+            def _guard(self, limiter, latency, notion):
+                """レート制限・遅延・エラーを適用（応答済みなら False）"""
+                if not limiter.admit():
+                    server._count("throttled")
+                    headers = {"Retry-After": str(server.retry_after)}
+                    if notion:
+                        self._notion_error(429, "rate_limited", "Rate limited", headers)
+                    else:
+                        self._send(429, b"Too Many Requests", "text/plain", headers)
+                    return False
+                if server._delay(latency):
+                    server._count("errors")
+                    if notion:
+                        self._notion_error(500, "internal_server_error", "Stand-in error")
+                    else:
+                        self._send(500, b"Internal Server Error", "text/plain")
+                    return False
+                return True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                segments = [unquote(s) for s in urlsplit(self.path).path.split("/") if s]
+                if len(segments) == 4 and segments[:2] == ["v1", "databases"] and segments[3] == "query":
+                    server._count("api")
+                    if not self._guard(server._api_limiter, server.api_latency, True):
+                        return
+                    try:
+                        matched = [page for page in server.records if matches_filter(page, body.get("filter"))]
+                    except UnsupportedFilter:
+                        matched = list(server.records)
+                    offset = int(body.get("start_cursor") or 0)
+                    page_size = min(int(body.get("page_size") or 100), 100)
+                    has_more = offset + page_size < len(matched)
+                    return self._send(200, {
+                        "object": "list",
+                        "results": [server._page(page) for page in matched[offset:offset + page_size]],
+                        "has_more": has_more,
+                        "next_cursor": str(offset + page_size) if has_more else None,
+                    })
+                self._notion_error(404, "object_not_found", "Not found")
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                segments = [unquote(s) for s in parts.path.split("/") if s]
+                if len(segments) == 3 and segments[:2] == ["v1", "pages"]:
+                    server._count("api")
+                    if not self._guard(server._api_limiter, server.api_latency, True):
+                        return
+                    page = server._by_id.get(segments[2])
+                    if page is None:
+                        return self._notion_error(404, "object_not_found", "Not found")
+                    return self._send(200, server._page(page))
+                if len(segments) == 3 and segments[0] == "files":
+                    server._count("files")
+                    if not self._guard(server._file_limiter, server.file_latency, False):
+                        return
+                    index = int(segments[1].rsplit("-", 1)[-1])
+                    return self._send(200, make_csv(index, server.rows), "text/csv")
+                if len(segments) == 4 and segments[0] == "spreadsheets" and segments[3] == "export":
+                    server._count("sheets")
+                    if not self._guard(server._file_limiter, server.file_latency, False):
+                        return
+                    gid = parse_qs(parts.query).get("gid", ["0"])[0]
+                    index = int(segments[2].replace("standin", "") or 0)
+                    return self._send(200, make_csv(index * 10 + int(gid), server.rows), "text/csv")
+                self._send(404, b"Not Found", "text/plain")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--sheet-ratio', type=float, default=0.3)
+    parser.add_argument('--api-latency', type=float, default=0.05)
+    parser.add_argument('--file-latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--api-rate-limit', type=int, default=3)
+    parser.add_argument('--file-rate-limit', type=int, default=None)
+    args = parser.parse_args()
+
+    server = StandinServer(pages=args.pages, rows=args.rows, sheet_ratio=args.sheet_ratio, host=args.host,
+                           port=args.port, api_latency=args.api_latency, file_latency=args.file_latency,
+                           jitter=args.jitter, error_rate=args.error_rate, api_rate_limit=args.api_rate_limit,
+                           file_rate_limit=args.file_rate_limit)
+    print(f"stand-in server: {server.base_url}（{len(server.records)}ページ）  Ctrl+C で終了")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
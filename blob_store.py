@@ -0,0 +1,185 @@
+"""
+blob_store.py - ダウンロード・アップロードしたファイル本体のディスク保管（内容アドレス方式）
+SHA-256 をキーにファイルとして保存し、セッションには軽量なハンドル（BlobRef）だけを持たせる。
+読み込みは mmap で行い、合計サイズが上限を超えたら最後に使われた時刻が古い順に削除する。
+"""
+
+import contextlib
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+BLOB_STORE_DIR = os.environ.get("BLOB_STORE_DIR", os.path.join(tempfile.gettempdir(), "exhibition_blob_store"))
+BLOB_STORE_BUDGET_MB = float(os.environ.get("BLOB_STORE_BUDGET_MB", "2048"))
+
+# セッションに保持するハンドル（内容のSHA-256とサイズ）
+BlobRef = namedtuple('BlobRef', ['digest', 'size'])
+
+class BlobNotFound(KeyError):
+    """上限超過で削除済み、または存在しないブロブ"""
+
+class MappedBlob(mmap.mmap):
+    """ファイルオブジェクトとして渡せる読み取り専用 mmap（zipfile 等が seekable を確認するため）"""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+class BlobStore:
+    """SHA-256 をキーにしたファイル保管庫（LRU でサイズ上限を維持）"""
+
+    def __init__(self, root=BLOB_STORE_DIR, budget_bytes=int(BLOB_STORE_BUDGET_MB * 1024 * 1024)):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._index = {}  # digest -> [size, last_access]
+        self.evicted = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _scan(self):
+        """既存のブロブを読み込み（最終アクセスはファイルの更新時刻）"""
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(dirpath, filename))
+                self._index[filename] = [stat.st_size, stat.st_mtime]
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for size, _ in self._index.values())
+
+    def __len__(self):
+        return len(self._index)
+
+    def put(self, content):
+        """バイト列を保存してハンドルを返す（同じ内容は1つだけ保存）"""
+        digest = hashlib.sha256(content).hexdigest()
+        return self._commit(digest, len(content), lambda f: f.write(content))
+
+    def put_stream(self, stream, chunk_size=1024 * 1024):
+        """ファイルオブジェクトを少しずつ読みながら保存してハンドルを返す"""
+        hasher = hashlib.sha256()
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            return self._commit(digest, size, None, tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _commit(self, digest, size, write, tmp_path=None):
+        path = self._path(digest)
+        with self._lock:
+            if digest in self._index and os.path.exists(path):
+                self._touch(digest)
+                return BlobRef(digest, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if tmp_path is None:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._index[digest] = [size, time.time()]
+            self._evict(keep=digest)
+        return BlobRef(digest, size)
+
+    def _touch(self, digest):
+        now = time.time()
+        self._index[digest][1] = now
+        try:
+            os.utime(self._path(digest), (now, now))
+        except OSError:
+            pass
+
+    def _evict(self, keep=None):
+        """合計サイズが上限を超えていれば、最後に使われた時刻が古い順に削除（ロック取得済みで呼ぶ）"""
+        total = sum(size for size, _ in self._index.values())
+        if total <= self.budget_bytes:
+            return
+        for digest, (size, _) in sorted(self._index.items(), key=lambda entry: entry[1][1]):
+            if total <= self.budget_bytes:
+                break
+            if digest == keep:
+                continue
+            try:
+                os.unlink(self._path(digest))
+            except OSError as e:
+                logging.warning(f"ブロブの削除に失敗: {digest} - {e}")
+                continue
+            del self._index[digest]
+            total -= size
+            self.evicted += 1
+
+    def contains(self, ref):
+        with self._lock:
+            return ref.digest in self._index
+
+    @contextlib.contextmanager
+    def open(self, ref):
+        """ブロブを読み取り専用の mmap で開く（空ファイルは b''）"""
+        with self._lock:
+            if ref.digest not in self._index:
+                raise BlobNotFound(ref.digest)
+            self._touch(ref.digest)
+        if ref.size == 0:
+            yield b""
+            return
+        with open(self._path(ref.digest), "rb") as f:
+            view = MappedBlob(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield view
+            finally:
+                view.close()
+
+    def read(self, ref):
+        """ブロブの内容をバイト列で取得"""
+        with self.open(ref) as view:
+            return bytes(view)
+
+    def summary(self):
+        """表示用の使用状況"""
+        return (f"ファイル保管領域: {len(self)}件 / {self.total_bytes / 1024 / 1024:.1f} MB"
+                f"（上限 {self.budget_bytes / 1024 / 1024:.0f} MB、削除 {self.evicted}件）")
+
+@contextlib.contextmanager
+def open_content(content, store=None):
+    """バイト列または BlobRef を読み込み可能な形（bytes / mmap）で開く"""
+    if isinstance(content, BlobRef):
+        with (store or get_blob_store()).open(content) as view:
+            yield view
+    else:
+        yield content
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_blob_store(root=BLOB_STORE_DIR):
+    """ディレクトリごとに1つの BlobStore を返す"""
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = BlobStore(root)
+        return _stores[root]
@@ -0,0 +1,87 @@
+"""
+column_rules.py - 列名ルールの照合エンジン
+COLUMN_RENAMES を正規化キーの辞書に変換して O(1) で引けるようにし、
+部分一致ルールは判定表（上から順に評価し、最初に条件が合った行で決定）として1回だけ組み立てる
+"""
+
+import unicodedata
+from collections import namedtuple
+
+# 照合キーの作り方を変えたら上げる（列構成キャッシュの無効化に使用）
+RULES_ENGINE_VERSION = 1
+
+# 判定条件（指定した項目はすべて満たす必要がある）
+#   contains:       正規化キーにいずれかを含む
+#   contains_cased: 大文字小文字を区別した列名（NFKC済み）にいずれかを含む
+#   excludes:       正規化キーにどれも含まない
+#   equals:         正規化キーがいずれかと一致
+#   max_len:        列名の長さがこれ未満
+Cond = namedtuple('Cond', ['contains', 'contains_cased', 'excludes', 'equals', 'max_len'],
+                  defaults=((), (), (), (), None))
+
+def normalize_column_name(name):
+    """大文字小文字を保った列名（NFKC + 前後空白除去）"""
+    return unicodedata.normalize('NFKC', str(name)).strip()
+
+def normalize_column_key(name):
+    """列名の照合キー（NFKC + casefold + 前後空白除去）"""
+    return normalize_column_name(name).casefold().strip()
+
+def build_rename_index(column_renames):
+    """COLUMN_RENAMES から 正規化キー → 変換先 の辞書を作成（同じキーは先に定義したものを優先）"""
+    index = {}
+    for old_name, new_name in column_renames.items():
+        index.setdefault(normalize_column_key(old_name), new_name)
+    return index
+
+def _compile_cond(cond):
+    """Cond を (照合キー, 列名) → bool の関数に変換"""
+    contains = tuple(normalize_column_key(k) for k in cond.contains)
+    contains_cased = tuple(normalize_column_name(k) for k in cond.contains_cased)
+    excludes = tuple(normalize_column_key(k) for k in cond.excludes)
+    equals = frozenset(normalize_column_key(k) for k in cond.equals)
+    max_len = cond.max_len
+
+    def check(key, name):
+        if contains and not any(k in key for k in contains):
+            return False
+        if contains_cased and not any(k in name for k in contains_cased):
+            return False
+        if excludes and any(k in key for k in excludes):
+            return False
+        if equals and key not in equals:
+            return False
+        if max_len is not None and len(name) >= max_len:
+            return False
+        return True
+
+    return check
+
+def compile_decision_table(rules):
+    """部分一致ルールの判定表を1つの関数にまとめる
+
+    rules は (入口条件, 結果) のリスト。結果は変換先の列名か、
+    (追加条件 or None, 変換先) のリスト。入口条件に合った最初の行で判定を打ち切り、
+    その行の追加条件がどれも合わなければ変換しない（None）。
+    """
+    compiled = []
+    for guard, outcome in rules:
+        if isinstance(outcome, str):
+            outcome = [(None, outcome)]
+        outcomes = [(_compile_cond(cond) if cond is not None else None, target)
+                    for cond, target in outcome]
+        compiled.append((_compile_cond(guard), outcomes))
+
+    def decide(column):
+        name = normalize_column_name(column)
+        key = name.casefold()
+        for guard, outcomes in compiled:
+            if not guard(key, name):
+                continue
+            for cond, target in outcomes:
+                if cond is None or cond(key, name):
+                    return target
+            return None
+        return None
+
+    return decide
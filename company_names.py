@@ -0,0 +1,73 @@
+"""
+company_names.py - 会社名・メールドメインの正規化（NG判定と重複削除で共用）
+NFKC・小文字化のうえ法人格（株式会社・(株)・Co., Ltd. など）と記号・空白を除き、
+「株式会社ABC」「(株)ＡＢＣ」「ABC Co., Ltd.」を同じキー（abc）にそろえる。
+deleteng_github.py からも読み込むため、標準ライブラリだけで動くようにしている。
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+
+LEGAL_TOKENS = [
+    "株式会社",
+    "（株）",
+    "(株)",
+    "株)",
+    "㈱",
+    "有限会社",
+    "（有）",
+    "(有)",
+    "㈲",
+    "合名会社",
+    "合資会社",
+    "合同会社",
+    "一般社団法人",
+    "一般財団法人",
+    "公益社団法人",
+    "公益財団法人",
+    "学校法人",
+    "医療法人",
+    "特定非営利活動法人",
+    "npo法人",
+    "npo",
+    "inc.",
+    "inc",
+    "co., ltd.",
+    "co.,ltd.",
+    "co ltd",
+    "co., limited",
+    "llc",
+    "g.k.",
+    "gk",
+    "有限責任事業組合",
+]
+LEGAL_RE = re.compile(
+    "|".join(map(re.escape, sorted(LEGAL_TOKENS, key=len, reverse=True))),
+    re.IGNORECASE,
+)
+
+
+def normalize_text(value: object) -> str:
+    if not isinstance(value, str):
+        return ""
+    text = unicodedata.normalize("NFKC", value)
+    text = re.sub(r'^[\s"＂\']+|[\s"＂\']+$', "", text)
+    return text.strip().lower()
+
+
+def normalize_company(value: object) -> str:
+    base = normalize_text(value)
+    base = LEGAL_RE.sub("", base)
+    base = re.sub(r"[\s\u3000・･_\-‐-‒–—―()\[\]{}【】『』「」|｜\\/.,，、。]", "", base)
+    return base
+
+
+def clean_domain(value: str) -> str:
+    text = unicodedata.normalize("NFKC", value or "").strip().lower()
+    text = re.sub(r"^(mailto:)?(https?://)?", "", text)
+    text = text.lstrip("@")
+    text = text.split("/", 1)[0]
+    text = text.split("?", 1)[0]
+    text = text.split(":", 1)[0]
+    return text
@@ -0,0 +1,216 @@
+"""
+company_resolution.py - 会社名のゆれの統合（あいまい一致による名寄せ）
+「株式会社ABC」「(株)ＡＢＣ」「ABC Co., Ltd.」のような表記ゆれを同じ会社として扱うためのグループ番号を作る。
+
+  1. 会社名を company_names.normalize_company で正規化し、同じキーはそのまま同じ会社とする
+  2. 候補の組は総当たりではなく、正規化キーの文字2-gramの MinHash を LSH（バンド分割）で
+     バケットに分けたもの、同じメールドメイン（フリーメール以外）・同じ電話番号の局番までを持つもの
+     （ブロッキング）からだけ作る
+  3. 候補の組は 2-gram の Jaccard 係数で確認し、ドメインか電話番号が共通なら緩い閾値、
+     そうでなければ厳しい閾値を超えたものだけを統合する（Union-Find）
+"""
+
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from company_names import normalize_company
+
+# 重複削除で会社名のゆれを統合する（streamlit ではサイドバーの初期値）
+FUZZY_COMPANY_DEDUP = os.environ.get("FUZZY_COMPANY_DEDUP", "false").lower() == "true"
+# 名前だけで統合する Jaccard 係数の閾値
+FUZZY_THRESHOLD = float(os.environ.get("FUZZY_THRESHOLD", "0.8"))
+# メールドメインか電話番号が共通のときの閾値
+FUZZY_EVIDENCE_THRESHOLD = float(os.environ.get("FUZZY_EVIDENCE_THRESHOLD", "0.5"))
+# MinHash のハッシュ数とバンド数（1バンド = ハッシュ数 / バンド数 行。8×4 で Jaccard 約0.6 以上を拾う）
+FUZZY_NUM_PERM = int(os.environ.get("FUZZY_NUM_PERM", "32"))
+FUZZY_BANDS = int(os.environ.get("FUZZY_BANDS", "8"))
+# これより大きいバケット・ブロックは候補にしない（「info」「03-」のような共通部分で組が爆発するのを防ぐ）
+FUZZY_MAX_BLOCK = int(os.environ.get("FUZZY_MAX_BLOCK", "50"))
+SHINGLE_SIZE = 2
+
+# ドメインが同じでも同じ会社とは限らないメールサービス
+FREE_MAIL_DOMAINS = frozenset([
+    "gmail.com", "googlemail.com", "yahoo.co.jp", "ymail.ne.jp", "hotmail.com", "hotmail.co.jp",
+    "outlook.com", "outlook.jp", "live.jp", "icloud.com", "me.com", "mac.com", "aol.com",
+    "docomo.ne.jp", "ezweb.ne.jp", "au.com", "softbank.ne.jp", "i.softbank.jp",
+    "nifty.com", "biglobe.ne.jp", "ocn.ne.jp", "so-net.ne.jp", "plala.or.jp",
+])
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_UINT32_MASK = np.uint64(0xFFFFFFFF)
+
+def shingles(key):
+    """正規化キーの文字 n-gram の集合（短いキーはキー全体）"""
+    if len(key) <= SHINGLE_SIZE:
+        return frozenset([key])
+    return frozenset(key[i:i + SHINGLE_SIZE] for i in range(len(key) - SHINGLE_SIZE + 1))
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+def minhash_signatures(shingle_sets, num_perm=FUZZY_NUM_PERM, seed=0):
+    """各集合の MinHash 署名（件数 × num_perm の uint64 配列）"""
+    lengths = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=len(shingle_sets))
+    flat = np.array([token for s in shingle_sets for token in s], dtype=object)
+    values = pd.util.hash_array(flat) & _UINT32_MASK
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    for k in range(num_perm):
+        permuted = (a[k] * values + b[k]) % _MERSENNE_PRIME
+        signatures[:, k] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+def _bucket_members(keys, max_size):
+    """同じキーを持つ要素のグループ（2件以上 max_size 件以下）を順に返す"""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(keys)]))
+    sizes = ends - starts
+    selected = (sizes >= 2) & (sizes <= max_size)
+    for start, end in zip(starts[selected], ends[selected]):
+        yield order[start:end]
+
+def lsh_candidate_pairs(signatures, ids=None, bands=FUZZY_BANDS, max_bucket=FUZZY_MAX_BLOCK):
+    """どれかのバンドが一致する (i, j) の組（i < j。ids を指定すると署名の行番号の代わりに ids[行番号]）"""
+    pairs = set()
+    if len(signatures) < 2:
+        return pairs
+    ids = np.arange(len(signatures)) if ids is None else np.asarray(ids)
+    rows = signatures.shape[1] // bands
+    for band in range(bands):
+        band_key = np.zeros(len(signatures), dtype=np.uint64)
+        for column in range(band * rows, (band + 1) * rows):
+            band_key = band_key * np.uint64(1000003) ^ signatures[:, column]
+        for members in _bucket_members(band_key, max_bucket):
+            members = sorted(ids[members].tolist())
+            pairs.update((members[x], members[y])
+                         for x in range(len(members)) for y in range(x + 1, len(members)))
+    return pairs
+
+def block_candidate_pairs(entity_ids, block_values, max_block=FUZZY_MAX_BLOCK):
+    """同じブロック値（メールドメイン・電話番号の局番まで）を持つ正規化キーの組"""
+    frame = pd.DataFrame({'entity': entity_ids, 'block': block_values}).dropna().drop_duplicates()
+    frame = frame[frame['entity'] >= 0]
+    pairs = set()
+    if frame.empty:
+        return pairs
+    block_codes = pd.factorize(frame['block'])[0].astype(np.int64)
+    entities = frame['entity'].to_numpy()
+    for members in _bucket_members(block_codes, max_block):
+        members = sorted(entities[members].tolist())
+        pairs.update((members[x], members[y])
+                     for x in range(len(members)) for y in range(x + 1, len(members)))
+    return pairs
+
+def email_domains(emails):
+    """メールアドレスのドメイン（フリーメール・空は欠損）"""
+    text = pd.Series(emails, copy=False).fillna('').astype(str)
+    domains = text.str.strip().str.lower().str.extract(r'@([^@\s>]+)$', expand=False)
+    return domains.where(~domains.isin(FREE_MAIL_DOMAINS))
+
+def phone_prefixes(phones):
+    """電話番号の加入者番号（末尾4桁）を除いた部分（9桁未満は欠損）"""
+    digits = pd.Series(phones, copy=False).fillna('').astype(str).str.replace(r'\D', '', regex=True)
+    return digits.str[:-4].where(digits.str.len() >= 9)
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x, y):
+        root_x, root_y = self.find(x), self.find(y)
+        if root_x == root_y:
+            return False
+        # 小さい番号（先に出てきたキー）を代表にする
+        if root_y < root_x:
+            root_x, root_y = root_y, root_x
+        self.parent[root_y] = root_x
+        return True
+
+def resolve_companies(names, emails=None, phones=None, threshold=None, evidence_threshold=None):
+    """会社名ごとのグループ番号（行ごとの int64、会社名が欠損の行は -1）と統計を返す
+
+    同じグループ番号の行は同じ会社とみなせる。正規化すると空になる会社名（「株式会社」だけなど）は統合しない。
+    """
+    started = time.perf_counter()
+    threshold = FUZZY_THRESHOLD if threshold is None else threshold
+    evidence_threshold = FUZZY_EVIDENCE_THRESHOLD if evidence_threshold is None else evidence_threshold
+    names = pd.Series(names, copy=False).reset_index(drop=True)
+
+    # 1. 会社名 → 正規化キー（重複しない会社名ごとに1回）
+    name_codes, raw_names = pd.factorize(names)
+    normalized = [normalize_company(name) for name in raw_names]
+    key_codes, keys = pd.factorize(pd.Series(normalized, dtype=object))
+    keys = list(keys)
+    row_keys = np.where(name_codes >= 0, key_codes[np.maximum(name_codes, 0)], -1)
+    usable = np.array([bool(key) for key in keys], dtype=bool)
+    row_keys = np.where((row_keys >= 0) & usable[np.maximum(row_keys, 0)], row_keys, -1)
+
+    # 2. 候補の組：MinHash/LSH + メールドメイン・電話番号のブロック
+    shingle_sets = [shingles(key) for key in keys]
+    usable_ids = np.flatnonzero(usable)
+    lsh_pairs = set()
+    if len(usable_ids) >= 2:
+        signatures = minhash_signatures([shingle_sets[i] for i in usable_ids])
+        lsh_pairs = lsh_candidate_pairs(signatures, usable_ids)
+    evidence_pairs = set()
+    if emails is not None:
+        evidence_pairs |= block_candidate_pairs(row_keys, email_domains(emails).to_numpy())
+    if phones is not None:
+        evidence_pairs |= block_candidate_pairs(row_keys, phone_prefixes(phones).to_numpy())
+
+    # 3. Jaccard 係数で確認して統合
+    union_find = _UnionFind(len(keys))
+    accepted = 0
+    for i, j in lsh_pairs | evidence_pairs:
+        if union_find.find(i) == union_find.find(j):
+            continue
+        limit = evidence_threshold if (i, j) in evidence_pairs else threshold
+        if jaccard(shingle_sets[i], shingle_sets[j]) >= limit:
+            union_find.union(i, j)
+            accepted += 1
+
+    # 会社名ごとのグループ番号（正規化キーが空の会社名はそれぞれ別グループ）
+    name_labels = np.array([union_find.find(key_codes[i]) if usable[key_codes[i]] else len(keys) + i
+                            for i in range(len(raw_names))], dtype=np.int64)
+    labels = np.where(name_codes >= 0, name_labels[np.maximum(name_codes, 0)], -1)
+
+    members = Counter(name_labels.tolist())
+    merged = [label for label, count in members.items() if count > 1]
+    examples = []
+    for label in sorted(merged, key=lambda label: -members[label])[:5]:
+        examples.append([str(raw_names[i]) for i in np.flatnonzero(name_labels == label)[:5]])
+    stats = {
+        'names': len(raw_names),
+        'clusters': len(members),
+        'merged_clusters': len(merged),
+        'names_merged': len(raw_names) - len(members),
+        'normalized_merges': int(usable[key_codes].sum()) - len(usable_ids),
+        'candidate_pairs': len(lsh_pairs | evidence_pairs),
+        'fuzzy_merges': accepted,
+        'examples': examples,
+        'seconds': time.perf_counter() - started,
+    }
+    return labels, stats
+
+def resolution_summary(stats):
+    """統計の表示用文字列"""
+    return (f"会社名のゆれを統合: {stats['names']}社名 → {stats['clusters']}社"
+            f"（{stats['merged_clusters']}グループで{stats['names_merged']}社名を統合、"
+            f"あいまい一致 {stats['fuzzy_merges']}組 / 候補 {stats['candidate_pairs']}組、{stats['seconds']:.1f}秒）")
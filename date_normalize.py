@@ -0,0 +1,158 @@
+"""
+date_normalize.py - 展示会初日・最終更新日の日付正規化
+主催者ごとに書式が異なる日付（2025/3/4、2025年3月4日、R7.3.4、令和7年3月4日、3月4日(火) など）を
+正規表現で読み取り、同じ文字列は1回だけ解析する（列の重複しない値ごとにキャッシュ）。
+結果は YYYYMMDDhhmmss の int64 キー（読み取れない値は 0）で保持し、重複削除の並べ替えに使う。
+"""
+
+import functools
+import re
+import unicodedata
+import warnings
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# 解析ルールを変えたら上げる（取り込み時に保存したキーの作り直しに使用）
+DATE_RULES_VERSION = 1
+# 文字列 → キー のキャッシュ件数
+DATE_CACHE_SIZE = 200000
+# 取り込み時にキーを保存する日付列
+DATE_KEY_SOURCES = ('展示会初日', '最終更新日')
+MISSING_DATE_KEY = 0
+
+# 元号の元年の前年（西暦 = 基準年 + 元号の年）
+ERA_BASE_YEARS = {'令和': 2018, 'R': 2018, '平成': 1988, 'H': 1988, '昭和': 1925, 'S': 1925}
+EXCEL_EPOCH = date(1899, 12, 30)
+
+_SEP = r'\s*[年./-]\s*'
+_TIME = r'(?:[\sT]*(\d{1,2}):(\d{2})(?::(\d{2}))?)?'
+_ERA_DATE = re.compile(r'(令和|平成|昭和|[RHS])\s*(元|\d{1,2})' + _SEP + r'(\d{1,2})\s*[月./-]\s*(\d{1,2})\s*日?'
+                       + _TIME, re.IGNORECASE)
+_WESTERN_DATE = re.compile(r'(\d{4})' + _SEP + r'(\d{1,2})\s*[月./-]\s*(\d{1,2})\s*日?' + _TIME)
+_COMPACT_DATE = re.compile(r'(\d{4})(\d{2})(\d{2})(?!\d)')
+# 12/25/2025 のような月/日/年は対象外
+_YEARLESS_DATE = re.compile(r'(\d{1,2})\s*[月/]\s*(\d{1,2})(?!\d|\s*[/.-]\s*\d)\s*日?' + _TIME)
+_EXCEL_SERIAL = re.compile(r'(\d{5})(?:\.0+)?$')
+# 曜日の括弧書き（NFKC 後）
+_WEEKDAY = re.compile(r'\s*\([月火水木金土日祝・,、]+\)')
+
+def date_key_column(column):
+    """日付列のキーを保存する列名"""
+    return f"_{column}_key"
+
+DATE_KEY_COLUMNS = tuple(date_key_column(column) for column in DATE_KEY_SOURCES)
+
+def _key(year, month, day, hour=0, minute=0, second=0):
+    """日時を YYYYMMDDhhmmss のキーに変換（存在しない日付は 0）"""
+    try:
+        datetime(year, month, day, hour, minute, second)
+    except ValueError:
+        return MISSING_DATE_KEY
+    return ((year * 100 + month) * 100 + day) * 1000000 + hour * 10000 + minute * 100 + second
+
+def _time_parts(match, first_group):
+    return tuple(int(match.group(i) or 0) for i in range(first_group, first_group + 3))
+
+def _nearest_year(month, day, reference):
+    """年のない日付は基準日に最も近い年とする"""
+    candidates = []
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            continue
+    if not candidates:
+        return None
+    return min(candidates, key=lambda candidate: abs((candidate - reference).days)).year
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date_key(text, reference_ordinal=None):
+    """日付文字列を YYYYMMDDhhmmss の int キーに変換（読み取れなければ 0）
+
+    reference_ordinal は年のない日付の年を決める基準日（date.toordinal()、省略時は今日）
+    """
+    text = _WEEKDAY.sub('', unicodedata.normalize('NFKC', text)).strip()
+    if not text:
+        return MISSING_DATE_KEY
+
+    match = _WESTERN_DATE.match(text)
+    if match:
+        return _key(*map(int, match.group(1, 2, 3)), *_time_parts(match, 4))
+
+    match = _ERA_DATE.match(text)
+    if match:
+        era = match.group(1)
+        base = ERA_BASE_YEARS.get(era, ERA_BASE_YEARS.get(era.upper()))
+        era_year = 1 if match.group(2) == '元' else int(match.group(2))
+        return _key(base + era_year, *map(int, match.group(3, 4)), *_time_parts(match, 5))
+
+    match = _COMPACT_DATE.match(text)
+    if match:
+        return _key(*map(int, match.group(1, 2, 3)))
+
+    match = _EXCEL_SERIAL.match(text)
+    if match:
+        serial = int(match.group(1))
+        if 20000 <= serial <= 80000:
+            value = EXCEL_EPOCH + timedelta(days=serial)
+            return _key(value.year, value.month, value.day)
+        return MISSING_DATE_KEY
+
+    match = _YEARLESS_DATE.match(text)
+    if match:
+        month, day = map(int, match.group(1, 2))
+        reference = date.fromordinal(reference_ordinal) if reference_ordinal else date.today()
+        year = _nearest_year(month, day, reference)
+        return _key(year, month, day, *_time_parts(match, 3)) if year else MISSING_DATE_KEY
+
+    # その他の書式（March 4, 2025 など）は pandas に任せる
+    if not re.search(r'\d', text):
+        return MISSING_DATE_KEY
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        value = pd.to_datetime(text, errors='coerce')
+    if pd.isna(value):
+        return MISSING_DATE_KEY
+    return _key(value.year, value.month, value.day, value.hour, value.minute, value.second)
+
+def _value_key(value, reference_ordinal):
+    """1つの値（文字列・日時・数値）のキー"""
+    if isinstance(value, str):
+        return parse_date_key(value, reference_ordinal)
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return _key(value.year, value.month, value.day, value.hour, value.minute, value.second)
+    if isinstance(value, date):
+        return _key(value.year, value.month, value.day)
+    return parse_date_key(str(value), reference_ordinal)
+
+def date_keys(values, reference=None):
+    """列の値を int64 のキー配列に変換（重複しない値ごとに1回だけ解析、欠損は 0）"""
+    reference_ordinal = (reference or date.today()).toordinal()
+    codes, uniques = pd.factorize(pd.Series(values, copy=False))
+    parsed = np.fromiter((_value_key(value, reference_ordinal) for value in uniques),
+                         dtype=np.int64, count=len(uniques))
+    keys = np.full(len(codes), MISSING_DATE_KEY, dtype=np.int64)
+    valid = codes >= 0
+    keys[valid] = parsed[codes[valid]]
+    return keys
+
+def add_date_keys(df, reference=None):
+    """DATE_KEY_SOURCES のうち存在する列のキー列を追加（取り込み時に1回だけ実行）"""
+    for column in DATE_KEY_SOURCES:
+        if column in df.columns:
+            df[date_key_column(column)] = date_keys(df[column], reference)
+    return df
+
+def stored_date_keys(df, column):
+    """保存済みのキー列（なければ・数値でなければ日付列から作成）"""
+    key_column = date_key_column(column)
+    if key_column in df.columns and pd.api.types.is_integer_dtype(df[key_column]):
+        return df[key_column].to_numpy()
+    return date_keys(df[column])
+
+def drop_date_keys(df):
+    """表示・書き出し用にキー列を除いた DataFrame"""
+    present = [column for column in DATE_KEY_COLUMNS if column in df.columns]
+    return df.drop(columns=present) if present else df
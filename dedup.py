@@ -0,0 +1,84 @@
+"""
+dedup.py - 重複削除の計算部分
+キー列を列ごとに factorize（ハッシュ表で1回走査）して1本の int64 グループ番号にまとめ、
+グループごとに日付が最も新しい行（同じ日付なら先に出てきた行）の位置を求める。
+全行の並べ替えや一時列の追加は行わず、並べ替えるのは残った行だけ。
+"""
+
+import numpy as np
+import pandas as pd
+
+from company_resolution import resolve_companies
+from date_normalize import DATE_KEY_SOURCES, stored_date_keys
+
+_INT64_MAX = np.iinfo(np.int64).max
+
+def group_keys(columns):
+    """キー列（Series のリスト）を行ごとのグループ番号（0 始まり・出現順、int64）に変換
+
+    drop_duplicates と同じく欠損同士は同じ値、空文字と欠損は別の値として扱う
+    """
+    keys = None
+    size = 1
+    for column in columns:
+        codes, uniques = pd.factorize(column, use_na_sentinel=True)
+        # 欠損（-1）を 0 にずらして組み合わせる
+        codes = codes.astype(np.int64) + 1
+        width = len(uniques) + 1
+        if keys is None:
+            keys, size = codes, width
+            continue
+        if size > _INT64_MAX // width:
+            # 桁あふれしないよう、ここまでの組み合わせを詰め直す
+            keys, uniques_so_far = pd.factorize(keys)
+            size = len(uniques_so_far)
+        keys = keys * width + codes
+        size *= width
+    if keys is None:
+        return np.zeros(0, dtype=np.int64)
+    return pd.factorize(keys)[0].astype(np.int64, copy=False)
+
+def latest_positions(groups, dates=None):
+    """グループごとに残す行の位置（日付の新しい順、同じ日付は元の順）
+
+    sort_values(日付, ascending=False, kind='stable') → drop_duplicates(keep='first') と同じ行を同じ順で返す。
+    dates を省略した場合は各グループの最初の行を元の順で返す。
+    """
+    if dates is None:
+        return np.flatnonzero(~pd.Series(groups).duplicated().to_numpy())
+    if len(groups) == 0:
+        return np.zeros(0, dtype=np.int64)
+    latest = np.full(groups.max() + 1, np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(latest, groups, dates)
+    # 最新の日付を持つ行のうち、各グループで最初の行を残す
+    candidates = np.flatnonzero(dates == latest[groups])
+    positions = candidates[~pd.Series(groups[candidates]).duplicated().to_numpy()]
+    # 残った行だけを（日付の新しい順, 元の位置）で並べる
+    return positions[np.lexsort((positions, -dates[positions]))]
+
+def row_dates(df):
+    """行ごとの日付キー（DATE_KEY_SOURCES のうち最も新しい値。日付列がなければ None）"""
+    keys = []
+    for column in DATE_KEY_SOURCES:
+        if column in df.columns:
+            try:
+                keys.append(stored_date_keys(df, column))
+            except Exception:
+                pass
+    return np.maximum.reduce(keys) if keys else None
+
+def dedup_groups(df, fuzzy_companies=False):
+    """重複判定（会社名+展示会名+メールアドレス）のグループ番号と会社名統合の統計（統合しない場合は None）
+
+    fuzzy_companies=True の場合は会社名の表記ゆれを company_resolution で同じ会社にまとめる
+    """
+    key_columns = [df['会社名'], df['展示会名']]
+    resolution = None
+    if fuzzy_companies:
+        company_groups, resolution = resolve_companies(df['会社名'], df.get('メールアドレス'), df.get('Tel'))
+        key_columns[0] = pd.Series(company_groups)
+    # メールアドレス列が存在する場合は、それも重複判定に含める（空文字と欠損は同じ扱い）
+    if 'メールアドレス' in df.columns:
+        normalized_email = df['メールアドレス'].fillna('').str.strip()
+        key_columns.append(normalized_email.mask(normalized_email == ''))
+    return group_keys(key_columns), resolution
@@ -48,6 +48,10 @@ except ImportError as exc:  # pragma: no cover - surfaced at runtime
 
 from google.oauth2 import service_account
 
+from company_names import clean_domain, normalize_company, normalize_text
+from instrumentation import NULL_RECORDER, RunRecorder
+from xlsx_writer import write_xlsx
+
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 DEFAULT_CONFIG_SHEET = "指示書"
 DEFAULT_TRIM_COLUMNS = [
@@ -87,44 +91,6 @@ DEFAULT_EXHIBITION_CANDIDATES = [
     "exhibition",
     "expo",
 ]
-LEGAL_TOKENS = [
-    "株式会社",
-    "（株）",
-    "(株)",
-    "株)",
-    "㈱",
-    "有限会社",
-    "（有）",
-    "(有)",
-    "㈲",
-    "合名会社",
-    "合資会社",
-    "合同会社",
-    "一般社団法人",
-    "一般財団法人",
-    "公益社団法人",
-    "公益財団法人",
-    "学校法人",
-    "医療法人",
-    "特定非営利活動法人",
-    "npo法人",
-    "npo",
-    "inc.",
-    "inc",
-    "co., ltd.",
-    "co.,ltd.",
-    "co ltd",
-    "co., limited",
-    "llc",
-    "g.k.",
-    "gk",
-    "有限責任事業組合",
-]
-LEGAL_RE = re.compile(
-    "|".join(map(re.escape, sorted(LEGAL_TOKENS, key=len, reverse=True))),
-    re.IGNORECASE,
-)
-
 INSTRUCTION_KEY_ALIASES = {
     "入力スプレッドシートid": "input_spreadsheet_id",
     "inputspreadsheetsid": "input_spreadsheet_id",
@@ -289,31 +255,6 @@ def load_config(client: gspread.Client, spreadsheet_id: str, worksheet: str) ->
     return Config(config, spreadsheet_id, worksheet)
 
 
-def normalize_text(value: object) -> str:
-    if not isinstance(value, str):
-        return ""
-    text = unicodedata.normalize("NFKC", value)
-    text = re.sub(r'^[\s"＂\']+|[\s"＂\']+$', "", text)
-    return text.strip().lower()
-
-
-def normalize_company(value: object) -> str:
-    base = normalize_text(value)
-    base = LEGAL_RE.sub("", base)
-    base = re.sub(r"[\s\u3000・･_\-‐-‒–—―()\[\]{}【】『』「」|｜\\/.,，、。]", "", base)
-    return base
-
-
-def clean_domain(value: str) -> str:
-    text = unicodedata.normalize("NFKC", value or "").strip().lower()
-    text = re.sub(r"^(mailto:)?(https?://)?", "", text)
-    text = text.lstrip("@")
-    text = text.split("/", 1)[0]
-    text = text.split("?", 1)[0]
-    text = text.split(":", 1)[0]
-    return text
-
-
 def domain_equals_or_sub(candidate: str, ng: str) -> bool:
     return candidate == ng or candidate.endswith("." + ng)
 
@@ -613,7 +554,7 @@ def find_column(df: pd.DataFrame, candidates: Sequence[str]) -> Optional[str]:
     return None
 
 
-def process(client: gspread.Client, cfg: Config) -> None:
+def process(client: gspread.Client, cfg: Config, recorder: RunRecorder = NULL_RECORDER) -> None:
     print("Loading instructions and Google Sheets data...")
     input_spreadsheet = cfg.optional("input_spreadsheet_id", cfg.config_spreadsheet_id)
     input_worksheet = cfg.require("input_worksheet")
@@ -650,19 +591,24 @@ def process(client: gspread.Client, cfg: Config) -> None:
     if not ng_tab_names:
         raise ConfigError("Instruction sheet NGタブ欄に少なくとも1つ指定してください。")
 
-    input_ws = client.open_by_key(input_spreadsheet).worksheet(input_worksheet)
-    df = worksheet_to_dataframe(input_ws)
+    with recorder.span("download") as span:
+        input_ws = client.open_by_key(input_spreadsheet).worksheet(input_worksheet)
+        df = worksheet_to_dataframe(input_ws)
+        span.rows_out = len(df)
     if df.empty:
         print("Input worksheet is empty. Nothing to do.")
-        write_dataframe(client, output_spreadsheet, output_worksheet, df)
+        with recorder.span("export"):
+            write_dataframe(client, output_spreadsheet, output_worksheet, df)
         return
 
-    trim_columns(df, trim_targets)
+    with recorder.span("normalization", rows_in=len(df)):
+        trim_columns(df, trim_targets)
 
-    email_col = find_column(df, email_candidates)
-    company_col = find_column(df, company_candidates)
-    industry_col = find_column(df, industry_candidates)
-    exhibition_col = find_column(df, exhibition_candidates)
+    with recorder.span("column_resolution", rows_in=len(df)):
+        email_col = find_column(df, email_candidates)
+        company_col = find_column(df, company_candidates)
+        industry_col = find_column(df, industry_candidates)
+        exhibition_col = find_column(df, exhibition_candidates)
 
     if not email_col:
         raise ConfigError(
@@ -673,9 +619,10 @@ def process(client: gspread.Client, cfg: Config) -> None:
             "Company column could not be detected. Adjust '会社列候補' in the instruction sheet."
         )
 
-    exact_companies, contains_companies, ng_emails, ng_domains = load_ng_definitions(
-        client, ng_spreadsheet, ng_tab_names
-    )
+    with recorder.span("ng_definitions"):
+        exact_companies, contains_companies, ng_emails, ng_domains = load_ng_definitions(
+            client, ng_spreadsheet, ng_tab_names
+        )
 
     unsubscribe_base = cfg.optional("unsubscribe_base_url", "") or ""
 
@@ -686,24 +633,26 @@ def process(client: gspread.Client, cfg: Config) -> None:
         f" emails={len(ng_emails)}, domains={len(ng_domains)}"
     )
 
-    mask_company = df[company_col].apply(
-        lambda name: is_ng_company(name, exact_companies, contains_companies)
-    )
-    mask_email = df[email_col].apply(lambda mail: is_ng_email(mail, ng_emails, ng_domains))
-    if industry_col:
-        mask_industry = df[industry_col].apply(
-            lambda value: is_ng_industry(value, industry_keywords)
+    with recorder.span("ng_filter", rows_in=len(df)) as span:
+        mask_company = df[company_col].apply(
+            lambda name: is_ng_company(name, exact_companies, contains_companies)
         )
-    else:
-        mask_industry = pd.Series(False, index=df.index)
-    if exhibition_col:
-        mask_exhibition = df[exhibition_col].apply(
-            lambda value: is_ng_exhibition(value, exhibition_keywords)
-        )
-    else:
-        mask_exhibition = pd.Series(False, index=df.index)
+        mask_email = df[email_col].apply(lambda mail: is_ng_email(mail, ng_emails, ng_domains))
+        if industry_col:
+            mask_industry = df[industry_col].apply(
+                lambda value: is_ng_industry(value, industry_keywords)
+            )
+        else:
+            mask_industry = pd.Series(False, index=df.index)
+        if exhibition_col:
+            mask_exhibition = df[exhibition_col].apply(
+                lambda value: is_ng_exhibition(value, exhibition_keywords)
+            )
+        else:
+            mask_exhibition = pd.Series(False, index=df.index)
 
-    filtered = df[~mask_company & ~mask_email & ~mask_industry & ~mask_exhibition].copy()
+        filtered = df[~mask_company & ~mask_email & ~mask_industry & ~mask_exhibition].copy()
+        span.rows_out = len(filtered)
     print(
         f"Input rows={len(df)} | ng_company={mask_company.sum()} | ng_email={mask_email.sum()}"
         f" | ng_industry={mask_industry.sum()} | ng_exhibition={mask_exhibition.sum()} | output={len(filtered)}"
@@ -730,12 +679,15 @@ def process(client: gspread.Client, cfg: Config) -> None:
         lambda mail: build_unsubscribe(unsubscribe_base, mail)
     )
 
-    write_dataframe(client, output_spreadsheet, output_worksheet, filtered)
+    with recorder.span("export", rows_in=len(filtered)):
+        write_dataframe(client, output_spreadsheet, output_worksheet, filtered)
     print(f"Done. Wrote {len(filtered)} rows to {output_worksheet}.")
 
     output_filename = cfg.optional("output_filename")
     if output_filename:
-        filtered.to_excel(output_filename, index=False)
+        with recorder.span("export", rows_in=len(filtered)):
+            # Stream rows to disk; keep the COUNTIF duplicate-check formulas as formulas.
+            write_xlsx(filtered, output_filename, formulas=True)
         print(f"Saved local Excel file: {output_filename}")
 
 
@@ -745,9 +697,17 @@ def main() -> None:
         raise SystemExit("CONFIG_SPREADSHEET_ID environment variable is required")
     config_worksheet = os.environ.get("CONFIG_WORKSHEET", DEFAULT_CONFIG_SHEET)
 
-    client = authorize_from_env()
-    cfg = load_config(client, config_spreadsheet, config_worksheet)
-    process(client, cfg)
+    recorder = RunRecorder("deleteng")
+    try:
+        client = authorize_from_env()
+        with recorder.span("load_config"):
+            cfg = load_config(client, config_spreadsheet, config_worksheet)
+        process(client, cfg, recorder)
+    finally:
+        print(recorder.summary())
+        report_path = recorder.write()
+        if report_path:
+            print(f"Saved timing report: {report_path}")
 
 
 if __name__ == "__main__":
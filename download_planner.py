@@ -0,0 +1,138 @@
+"""
+download_planner.py - Notionファイルの重複ダウンロード・重複読み込みの排除
+取得前は正規化したURL（GoogleスプレッドシートはシートID + gid）で、取得後は内容のハッシュで重複を判定する。
+同じファイルへの参照は1つのブロブと1つの読み込み結果（DataFrame）を共有する。
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, urlunsplit
+
+from blob_store import BlobRef
+
+SHEET_ID_PATTERNS = [
+    r"/spreadsheets/d/([a-zA-Z0-9-_]+)",
+    r"/file/d/([a-zA-Z0-9-_]+)",
+    r"[?&]id=([a-zA-Z0-9-_]+)",
+]
+
+def normalize_file_url(url):
+    """重複判定用にURLを正規化（GoogleスプレッドシートはシートIDとgid、それ以外は署名などのクエリを除去）"""
+    url = url.strip()
+    if "docs.google.com" in url or "drive.google.com" in url:
+        for pattern in SHEET_ID_PATTERNS:
+            match = re.search(pattern, url)
+            if match:
+                gid_match = re.search(r"[#&?]gid=([0-9]+)", url)
+                return f"sheet:{match.group(1)}:{gid_match.group(1) if gid_match else '0'}"
+    parts = urlsplit(url)
+    # Notionのファイルは署名付きURLで、クエリが取得のたびに変わる
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, "", ""))
+
+def download_key(file_info):
+    """Notionのファイル情報から重複判定キーを作成（判定できない場合は None）"""
+    file_type = file_info.get("type")
+    if file_type == "file":
+        url = file_info.get("file", {}).get("url")
+    elif file_type == "external":
+        url = file_info.get("external", {}).get("url")
+    else:
+        return None
+    return normalize_file_url(url) if url else None
+
+def frame_key(name, content):
+    """読み込み結果の共有キー（内容のハッシュ + 拡張子）"""
+    digest = content.digest if isinstance(content, BlobRef) else hashlib.sha256(content).hexdigest()
+    return digest, os.path.splitext(name)[1].lower()
+
+class DownloadPlanner:
+    """取得済みファイルを記録し、同じURL・同じ内容のファイルの再取得と重複保存を避ける"""
+
+    def __init__(self):
+        self._planned = {}  # download_key -> [(ファイル名, 内容)]（スプレッドシートは全タブ取得で複数）
+        self._digests = set()
+        self.fetched = 0
+        self.fetches_avoided = 0
+        self.content_duplicates = 0
+
+    def lookup(self, file_info):
+        """取得済みなら [(ファイル名, 内容)] を返す"""
+        key = download_key(file_info)
+        planned = self._planned.get(key) if key else None
+        if planned:
+            self.fetches_avoided += 1
+        return planned
+
+    def claim(self, file_info):
+        """初めてのファイルなら True（パイプライン用：以降の同じファイルは取得しない）"""
+        key = download_key(file_info)
+        if key is None:
+            return True
+        if key in self._planned:
+            self.fetches_avoided += 1
+            return False
+        self._planned[key] = []
+        return True
+
+    def record(self, file_info, name, content):
+        """取得したファイルを記録して (ファイル名, 内容) を返す"""
+        self.fetched += 1
+        digest = frame_key(name, content)[0]
+        if digest in self._digests:
+            self.content_duplicates += 1
+        self._digests.add(digest)
+        key = download_key(file_info)
+        if key:
+            self._planned.setdefault(key, []).append((name, content))
+        return name, content
+
+    def summary(self):
+        return (f"取得 {self.fetched}件 / 同じURLの再取得を省略 {self.fetches_avoided}件 / "
+                f"同一内容 {self.content_duplicates}件")
+
+class SharedFrames:
+    """複数回参照されるファイルの読み込み結果を、最後の参照が処理されるまで共有する"""
+
+    def __init__(self, references):
+        # references: frame_key のリスト（参照ごとに1つ）
+        self._remaining = {key: count for key, count in Counter(references).items() if count > 1}
+        self._frames = {}
+        self._lock = threading.Lock()
+        self.parses_avoided = 0
+
+    @classmethod
+    def for_files(cls, file_data):
+        """(ファイル名, 内容) のリストから作成"""
+        return cls([frame_key(name, content) for name, content in file_data])
+
+    def get_or_parse(self, key, parse):
+        """共有中の読み込み結果を返し、なければ parse() で読み込む"""
+        with self._lock:
+            shared = key in self._remaining
+            if key in self._frames:
+                frame = self._frames[key]
+                self.parses_avoided += 1
+                self._release(key)
+                return frame
+        frame = parse()
+        with self._lock:
+            if shared and frame is not None:
+                self._frames[key] = frame
+            if shared:
+                self._release(key)
+        return frame
+
+    def release(self, key):
+        """読み込まずに済んだ参照（処理済みキャッシュのヒットなど）を消化する"""
+        with self._lock:
+            if key in self._remaining:
+                self._release(key)
+
+    def _release(self, key):
+        self._remaining[key] -= 1
+        if self._remaining[key] <= 0:
+            del self._remaining[key]
+            self._frames.pop(key, None)
@@ -0,0 +1,220 @@
+"""
+excel_reader.py - Excel ファイルの読み込み（形式ごとに速いエンジンを選択）
+xlsx / xls は先頭のバイト列（拡張子が違っていても）で判定し、利用可能なエンジンを速い順に使う:
+  xlsx: calamine（python-calamine）→ openpyxl
+  xls:  calamine → xlrd
+読み込みに失敗したら次のエンジンで読み直す。行数が EXCEL_STREAM_ROWS を超えるシートは
+行を EXCEL_STREAM_CHUNK_ROWS 行ずつ DataFrame に変換しながら読み、全行のセル値のリストを一度に持たない。
+結果はどのエンジン・読み方でも pd.read_excel(..., dtype=str) と同じ（先頭シート、1行目が列名）。
+all_sheets=True では全シートを順に結合する（xlsx_writer が行数の上限で分割したファイル用）。
+"""
+
+import io
+import logging
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+# auto / calamine / openpyxl / xlrd（auto 以外で形式に対応しないエンジンは無視して auto）
+EXCEL_READER_ENGINE = os.environ.get("EXCEL_READER_ENGINE", "auto").lower()
+# この行数を超えるシートは分割して読み込む（0 なら分割しない）
+EXCEL_STREAM_ROWS = int(os.environ.get("EXCEL_STREAM_ROWS", "200000"))
+EXCEL_STREAM_CHUNK_ROWS = int(os.environ.get("EXCEL_STREAM_CHUNK_ROWS", "50000"))
+
+FORMAT_XLSX = "xlsx"
+FORMAT_XLS = "xls"
+ENGINE_ORDER = {FORMAT_XLSX: ["calamine", "openpyxl"], FORMAT_XLS: ["calamine", "xlrd"]}
+_ENGINE_MODULES = {"calamine": "python_calamine", "openpyxl": "openpyxl", "xlrd": "xlrd"}
+_XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_available = {}
+
+def engine_available(engine):
+    """エンジンのライブラリがインストールされているか"""
+    if engine not in _available:
+        try:
+            __import__(_ENGINE_MODULES[engine])
+            _available[engine] = True
+        except ImportError:
+            _available[engine] = False
+    return _available[engine]
+
+def _head(source, size=8):
+    """先頭のバイト列（パス・bytes・ファイルオブジェクト・mmap）"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(size)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:size])
+    position = source.tell()
+    head = source.read(size)
+    source.seek(position)
+    return head
+
+def excel_format(source, filename=""):
+    """xlsx / xls の判定（先頭のバイト列、分からなければ拡張子）"""
+    try:
+        head = _head(source)
+    except (OSError, ValueError, AttributeError):
+        head = b""
+    if head.startswith(_XLS_MAGIC):
+        return FORMAT_XLS
+    if head.startswith(b"PK"):
+        return FORMAT_XLSX
+    name = filename or (str(source) if isinstance(source, (str, os.PathLike)) else "")
+    return FORMAT_XLS if name.lower().endswith(".xls") else FORMAT_XLSX
+
+def engine_candidates(fmt, engine=None):
+    """形式に使えるエンジン（指定があれば先頭、以降は速い順）"""
+    order = [name for name in ENGINE_ORDER[fmt] if engine_available(name)]
+    engine = (engine or EXCEL_READER_ENGINE).lower()
+    if engine in order:
+        order.remove(engine)
+        order.insert(0, engine)
+    return order
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+# openpyxl（values_only）はエラーのセルを文字列で返す（pandas の openpyxl 読み込みでは NaN）
+_ERROR_VALUES = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#GETTING_DATA"}
+
+def _convert_cell(value):
+    """セル値を pandas の Excel 読み込みと同じ値に（空セルは ''、整数の float は int、日付は datetime）"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:
+            return np.nan
+        as_int = int(value)
+        return as_int if as_int == value else value
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+def sheet_count(source, engine):
+    """シートの数"""
+    if engine == "calamine":
+        from python_calamine import CalamineWorkbook
+        if isinstance(source, (str, os.PathLike)):
+            workbook = CalamineWorkbook.from_path(os.fspath(source))
+        else:
+            workbook = CalamineWorkbook.from_filelike(_rewind(source))
+        count = len(workbook.sheet_names)
+        getattr(workbook, "close", lambda: None)()
+        return count
+    from openpyxl import load_workbook
+    workbook = load_workbook(_rewind(source), read_only=True, data_only=True, keep_links=False)
+    count = len(workbook.worksheets)
+    workbook.close()
+    return count
+
+def _open_rows(source, engine, sheet=0):
+    """シートの (行数, 行のイテレーター, 後始末) を返す（行数が分からなければ None）"""
+    if engine == "calamine":
+        from python_calamine import CalamineWorkbook
+        if isinstance(source, (str, os.PathLike)):
+            workbook = CalamineWorkbook.from_path(os.fspath(source))
+        else:
+            workbook = CalamineWorkbook.from_filelike(_rewind(source))
+        sheet = workbook.get_sheet_by_index(sheet)
+        return sheet.height, ([_convert_cell(value) for value in row] for row in sheet.iter_rows()), \
+            getattr(workbook, "close", lambda: None)
+    from openpyxl import load_workbook
+    workbook = load_workbook(_rewind(source), read_only=True, data_only=True, keep_links=False)
+    sheet = workbook.worksheets[sheet]
+    # 行数はシートに記録された範囲（記録がない・信用できない場合に備えて範囲はリセットして全行読む）
+    rows = sheet.max_row
+    sheet.reset_dimensions()
+    converted = ([np.nan if isinstance(value, str) and value in _ERROR_VALUES else _convert_cell(value)
+                  for value in row] for row in sheet.iter_rows(values_only=True))
+    return rows, converted, workbook.close
+
+def _chunks(rows, chunk_rows):
+    """行を chunk_rows 行ずつ (列名, 行のリスト) で返す（末尾の空セル・空行は pandas と同じく除く）"""
+    header = None
+    chunk = []
+    blank_run = []
+    emitted = False
+    for values in rows:
+        while values and values[-1] == "":
+            values.pop()
+        if header is None:
+            header = values
+            continue
+        if not values:
+            # 空行は後に値のある行が続く場合だけ残す
+            blank_run.append(values)
+            continue
+        if blank_run:
+            chunk.extend(blank_run)
+            blank_run = []
+        chunk.append(values)
+        if chunk_rows and len(chunk) >= chunk_rows:
+            yield header, chunk
+            emitted = True
+            chunk = []
+    if header is not None and (chunk or not emitted):
+        yield header, chunk
+
+def _chunk_frame(header, chunk):
+    """列名と行のリストを DataFrame に（列数は一番長い行に合わせ、列名のない列は Unnamed: n）"""
+    width = max([len(header)] + [len(values) for values in chunk])
+    data = [header + [""] * (width - len(header))] + [values + [""] * (width - len(values)) for values in chunk]
+    return TextParser(data, header=0, dtype=str).read()
+
+def _read_rows(source, engine, stream_rows, chunk_rows, sheet=0):
+    """シートを読み込む。行数が stream_rows を超える（または分からない）場合は chunk_rows 行ずつ変換する"""
+    rows, iterator, close = _open_rows(source, engine, sheet)
+    streaming = stream_rows > 0 and (rows is None or rows > stream_rows)
+    frames = []
+    try:
+        for header, chunk in _chunks(iterator, chunk_rows if streaming else 0):
+            frames.append(_chunk_frame(header, chunk))
+            chunk.clear()
+    finally:
+        close()
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    # 分割ごとの列は一番長い行までの列名の先頭部分になるため、最も列の多い分割に合わせる
+    widest = max(frames, key=lambda frame: len(frame.columns))
+    result = pd.concat([frame.reindex(columns=widest.columns) for frame in frames], ignore_index=True)
+    return result.astype(widest.dtypes.to_dict())
+
+def read_excel(source, filename="", engine=None, stream_rows=None, chunk_rows=None, all_sheets=False):
+    """Excel ファイルの先頭シート（all_sheets=True なら全シートを結合）を列名つき・文字列の DataFrame で読み込む
+
+    source はパス・bytes・ファイルオブジェクト・mmap。engine を省略すると EXCEL_READER_ENGINE（auto は速い順）
+    """
+    stream_rows = EXCEL_STREAM_ROWS if stream_rows is None else stream_rows
+    chunk_rows = chunk_rows or EXCEL_STREAM_CHUNK_ROWS
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    fmt = excel_format(source, filename)
+    candidates = engine_candidates(fmt, engine)
+    if not candidates:
+        raise ImportError(f"{fmt} を読み込めるライブラリがありません（{' / '.join(ENGINE_ORDER[fmt])}）")
+
+    error = None
+    for candidate in candidates:
+        try:
+            if fmt == FORMAT_XLS:
+                # xls は最大 65,536 行のため分割しない
+                frame = pd.read_excel(_rewind(source), dtype=str, engine=candidate,
+                                      sheet_name=None if all_sheets else 0)
+                return pd.concat(list(frame.values()), ignore_index=True) if all_sheets else frame
+            if not all_sheets:
+                return _read_rows(source, candidate, stream_rows, chunk_rows)
+            frames = [_read_rows(source, candidate, stream_rows, chunk_rows, sheet)
+                      for sheet in range(sheet_count(source, candidate))]
+            return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        except Exception as e:
+            logging.warning(f"Excel の読み込みに失敗（{candidate}）: {filename or source}: {e}")
+            error = e
+    raise error
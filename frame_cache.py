@@ -0,0 +1,190 @@
+"""
+frame_cache.py - 読み込み・正規化済み DataFrame の永続キャッシュ
+（内容のハッシュ, 処理バージョン, ファイル名）をキーに、処理結果を Parquet で保存する。
+処理結果は (DataFrame, JSON に変換できる値...) のタプルで、DataFrame 以外は Parquet のメタデータに JSON で持つ
+（読み込み時にコードを実行しうる pickle は使わない）。pyarrow がなければキャッシュしない。
+同じファイルを再処理するとき（強制全更新・再クリック・前月に取得済みのファイル）は保存済みの結果を返す。
+合計サイズが上限を超えたら最後に使われた時刻が古い順に削除する。
+実行ごとに変わる列（処理日時・処理月など）は保存せず、呼び出し側でヒット・ミスに関わらず追加する。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    FRAME_CACHE_AVAILABLE = True
+except ImportError:
+    FRAME_CACHE_AVAILABLE = False
+
+FRAME_CACHE_DIR = os.environ.get("FRAME_CACHE_DIR", os.path.join("data", "frame_cache"))
+FRAME_CACHE_BUDGET_MB = float(os.environ.get("FRAME_CACHE_BUDGET_MB", "1024"))
+# キャッシュファイルの形式を変えたら上げる
+FRAME_CACHE_FORMAT = 2
+_EXTENSION = ".parquet"
+# 以前の形式（pickle）のファイル。読み込まずに削除する
+_LEGACY_EXTENSION = ".pkl"
+_METADATA_KEY = b"frame_cache"
+
+def frame_cache_key(namespace, version, digest, filename):
+    """キャッシュキー（ファイル名から展示会名を推測するため、拡張子を除いたファイル名も含める）"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    raw = f"{namespace}\0{version}\0{digest}\0{stem}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+class FrameCache:
+    """処理済み DataFrame をディスクに保存し、LRU でサイズ上限を維持する"""
+
+    def __init__(self, root=FRAME_CACHE_DIR, budget_bytes=int(FRAME_CACHE_BUDGET_MB * 1024 * 1024)):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.evicted = 0
+        self._index = {}  # key -> [size, last_access]
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        for filename in os.listdir(root):
+            path = os.path.join(root, filename)
+            if filename.endswith(_EXTENSION):
+                stat = os.stat(path)
+                self._index[filename[:-len(_EXTENSION)]] = [stat.st_size, stat.st_mtime]
+            elif filename.endswith(_LEGACY_EXTENSION):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}{_EXTENSION}")
+
+    def get(self, key):
+        """保存済みの処理結果を返す（なければ None）"""
+        with self._lock:
+            known = key in self._index
+        if not known or not FRAME_CACHE_AVAILABLE:
+            with self._lock:
+                self.misses += 1
+            return None
+        start = time.perf_counter()
+        try:
+            table = pq.read_table(self._path(key))
+            entry = json.loads((table.schema.metadata or {}).get(_METADATA_KEY, b"{}"))
+            if entry.get("format") != FRAME_CACHE_FORMAT:
+                raise ValueError("format mismatch")
+            value = (table.to_pandas(),) + tuple(entry["extra"])
+        except Exception as e:
+            logging.warning(f"処理済みキャッシュの読み込みに失敗: {e}")
+            self._discard(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        now = time.time()
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += max(entry["seconds"] - (time.perf_counter() - start), 0.0)
+            if key in self._index:
+                self._index[key][1] = now
+        try:
+            os.utime(self._path(key), (now, now))
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value, seconds):
+        """処理結果 (DataFrame, JSON に変換できる値...) と処理にかかった秒数を保存"""
+        if not FRAME_CACHE_AVAILABLE:
+            return
+        frame, *extra = value
+        entry = {"format": FRAME_CACHE_FORMAT, "seconds": seconds, "extra": extra}
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[_METADATA_KEY] = json.dumps(entry, ensure_ascii=False, default=_json_default).encode("utf-8")
+            pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.warning(f"処理済みキャッシュの保存に失敗: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        with self._lock:
+            self._index[key] = [os.path.getsize(path), time.time()]
+            self._evict(keep=key)
+
+    def cached(self, key, compute, cacheable=lambda value: True):
+        """保存済みなら返し、なければ compute() を実行して保存する"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        start = time.perf_counter()
+        value = compute()
+        if value is not None and cacheable(value):
+            self.put(key, value, time.perf_counter() - start)
+        return value
+
+    def _discard(self, key):
+        with self._lock:
+            self._index.pop(key, None)
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self, keep=None):
+        """合計サイズが上限を超えていれば、最後に使われた時刻が古い順に削除（ロック取得済みで呼ぶ）"""
+        total = sum(size for size, _ in self._index.values())
+        if total <= self.budget_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda entry: entry[1][1]):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                continue
+            del self._index[key]
+            total -= size
+            self.evicted += 1
+
+    def counters(self):
+        """現在の (ヒット数, ミス数, 節約秒数)"""
+        return self.hits, self.misses, self.saved_seconds
+
+    def summary(self, since=(0, 0, 0.0)):
+        """ヒット率と節約時間の表示用文字列（since 以降の分のみ集計）"""
+        hits = self.hits - since[0]
+        misses = self.misses - since[1]
+        total = hits + misses
+        rate = hits / total if total else 0.0
+        size_mb = sum(size for size, _ in self._index.values()) / 1024 / 1024
+        return (f"処理済みキャッシュ: ヒット {hits}件 / ミス {misses}件（ヒット率 {rate:.1%}、"
+                f"約{self.saved_seconds - since[2]:.1f}秒を節約、{len(self._index)}件 / {size_mb:.1f} MB）")
+
+def _json_default(value):
+    """numpy の数値（処理件数の集計など）を Python の数値に"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"JSON に変換できない値: {type(value).__name__}")
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_frame_cache(root=FRAME_CACHE_DIR):
+    """ディレクトリごとに1つの FrameCache を返す"""
+    with _caches_lock:
+        if root not in _caches:
+            _caches[root] = FrameCache(root)
+        return _caches[root]
@@ -0,0 +1,179 @@
+"""
+instrumentation.py - 処理段階ごとの所要時間・行数・バイト数の計測
+with recorder.span("parse", bytes=len(content)) as span: ... span.rows_out = len(df)
+のように段階を囲むと、段階ごとに回数・合計秒数（perf_counter）・最大秒数・入出力行数・バイト数を集計する。
+ワーカースレッドから同時に記録してよい（並行実行した段階の合計秒数は実時間より長くなる）。
+実行ごとに JSON レポートを書き出し、PROMETHEUS_TEXTFILE を指定すると
+node_exporter の textfile collector 形式でも書き出す。
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+INSTRUMENTATION_DIR = os.environ.get("INSTRUMENTATION_DIR", os.path.join("data", "instrumentation"))
+# node_exporter の textfile collector 用ファイル（空なら書き出さない）
+PROMETHEUS_TEXTFILE = os.environ.get("PROMETHEUS_TEXTFILE", "")
+METRIC_PREFIX = "exhibition_pipeline"
+# 保存する JSON レポートの件数
+INSTRUMENTATION_KEEP_REPORTS = int(os.environ.get("INSTRUMENTATION_KEEP_REPORTS", "50"))
+
+class Span:
+    """計測中の段階（rows_in / rows_out / bytes は with の中で設定してよい）"""
+
+    __slots__ = ("stage", "rows_in", "rows_out", "bytes")
+
+    def __init__(self, stage, rows_in=None, bytes=None):
+        self.stage = stage
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes = bytes
+
+class RunRecorder:
+    """1回の実行（update.py の月次更新、Streamlit の取り込みなど）の段階別の計測"""
+
+    def __init__(self, run, clock=time.perf_counter):
+        self.run = run
+        self.run_id = f"{run}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._clock = clock
+        self._started = clock()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, rows_in=None, bytes=None):
+        """段階を計測（例外が起きても時間は記録し、errors を数える）"""
+        current = Span(stage, rows_in, bytes)
+        start = self._clock()
+        failed = False
+        try:
+            yield current
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.record(stage, self._clock() - start, rows_in=current.rows_in,
+                        rows_out=current.rows_out, bytes=current.bytes, errors=int(failed))
+
+    def record(self, stage, seconds, calls=1, rows_in=None, rows_out=None, bytes=None, errors=0, max_seconds=None):
+        """計測済みの値を段階に加算（取得エンジンの統計などをまとめて記録する場合）
+
+        calls が2以上のときは max_seconds に1回あたりの最大秒数を渡す（省略すると平均で代用）
+        """
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {"stage": stage, "calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                               "rows_in": 0, "rows_out": 0, "bytes": 0, "errors": 0}
+            entry["calls"] += calls
+            entry["seconds"] += seconds
+            if max_seconds is None:
+                max_seconds = seconds / max(calls, 1)
+            entry["max_seconds"] = max(entry["max_seconds"], max_seconds)
+            entry["rows_in"] += rows_in or 0
+            entry["rows_out"] += rows_out or 0
+            entry["bytes"] += bytes or 0
+            entry["errors"] += errors
+
+    def stages(self):
+        """段階ごとの集計（最初に記録した順）"""
+        with self._lock:
+            return [dict(entry) for entry in self._stages.values()]
+
+    def elapsed(self):
+        return self._clock() - self._started
+
+    def report(self):
+        return {"run": self.run, "run_id": self.run_id, "started_at": self.started_at,
+                "elapsed_seconds": round(self.elapsed(), 6), "stages": self.stages()}
+
+    def summary(self):
+        """ログ用の1行表示（合計秒数の多い順）"""
+        parts = [f"{entry['stage']} {entry['seconds']:.2f}秒" for entry in
+                 sorted(self.stages(), key=lambda entry: -entry["seconds"])]
+        return f"段階別の所要時間（全体 {self.elapsed():.1f}秒）: " + " / ".join(parts)
+
+    def prometheus_text(self):
+        """Prometheus のテキスト形式（実行ごとの集計値のため gauge。_total はカウンター用のため付けない）"""
+        run = _label_value(self.run)
+        lines = []
+        metrics = [("seconds", "seconds", "段階の合計秒数"), ("max_seconds", "max_seconds", "段階の1回の最大秒数"),
+                   ("calls", "calls", "段階の実行回数"), ("rows_in", "rows_in", "段階への入力行数"),
+                   ("rows_out", "rows_out", "段階の出力行数"), ("bytes", "bytes", "段階で扱ったバイト数"),
+                   ("errors", "errors", "段階の失敗回数")]
+        stages = self.stages()
+        for suffix, key, help_text in metrics:
+            name = f"{METRIC_PREFIX}_stage_{suffix}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for entry in stages:
+                lines.append(f'{name}{{run="{run}",stage="{_label_value(entry["stage"])}"}} {entry[key]}')
+        lines.append(f"# HELP {METRIC_PREFIX}_run_seconds 実行全体の秒数")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_seconds gauge")
+        lines.append(f'{METRIC_PREFIX}_run_seconds{{run="{run}"}} {self.elapsed():.6f}')
+        lines.append(f"# HELP {METRIC_PREFIX}_run_timestamp_seconds 最後に計測を書き出した時刻")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_timestamp_seconds gauge")
+        lines.append(f'{METRIC_PREFIX}_run_timestamp_seconds{{run="{run}"}} {time.time():.0f}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory=None, prometheus_path=None):
+        """JSON レポート（と指定があれば Prometheus テキスト）を書き出し、JSON のパスを返す
+
+        同じ実行で何度呼んでもよい（同じファイルを上書きする）。書き出しに失敗しても処理は止めない。
+        """
+        directory = INSTRUMENTATION_DIR if directory is None else directory
+        prometheus_path = PROMETHEUS_TEXTFILE if prometheus_path is None else prometheus_path
+        path = os.path.join(directory, f"{self.run_id}.json")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            _atomic_write(path, json.dumps(self.report(), ensure_ascii=False, indent=2))
+            _prune_reports(directory, INSTRUMENTATION_KEEP_REPORTS)
+            if prometheus_path:
+                _atomic_write(prometheus_path, self.prometheus_text())
+        except OSError as e:
+            logging.warning(f"計測レポートの書き出しに失敗: {e}")
+            return None
+        return path
+
+class _NullRecorder(RunRecorder):
+    """計測しない場合の recorder（span は時間を測らずに Span を返す）"""
+
+    def __init__(self):
+        super().__init__("null")
+
+    @contextmanager
+    def span(self, stage, rows_in=None, bytes=None):
+        yield Span(stage, rows_in, bytes)
+
+    def record(self, *args, **kwargs):
+        pass
+
+    def write(self, directory=None, prometheus_path=None):
+        return None
+
+NULL_RECORDER = _NullRecorder()
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _atomic_write(path, text):
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _prune_reports(directory, keep):
+    """古い JSON レポートを削除"""
+    reports = sorted((name for name in os.listdir(directory) if re.search(r"-\d{8}-\d{6}-\d+\.json$", name)),
+                     key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+    for name in reports[:max(0, len(reports) - keep)]:
+        os.remove(os.path.join(directory, name))
@@ -0,0 +1,169 @@
+"""
+memory_governor.py - メモリ予算の監視とディスク退避への切り替え
+プロセスの RSS と、保持している処理済み DataFrame の memory_usage(deep=True) の合計をメモリ予算と比べる。
+メモリ内の統合（pd.concat → 重複削除）は保持中のデータをもう1つ複製するため、
+「RSS + 保持中のデータ」が予算を超えそうになった時点で spill_merge のディスク退避に切り替える。
+"""
+
+import gc
+import logging
+import os
+
+from spill_merge import SpillMerger
+
+# メモリ予算（MB）。0 なら物理メモリの MEMORY_BUDGET_RATIO
+MEMORY_BUDGET_MB = int(os.environ.get("MEMORY_BUDGET_MB", "0"))
+MEMORY_BUDGET_RATIO = float(os.environ.get("MEMORY_BUDGET_RATIO", "0.5"))
+# 物理メモリが分からない場合の予算（MB）
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+MODE_MEMORY = "memory"
+MODE_SPILL = "spill"
+MODE_LABELS = {MODE_MEMORY: "メモリ内で統合", MODE_SPILL: "ディスク退避で統合"}
+
+def physical_memory_bytes():
+    """物理メモリ（コンテナの上限があればその値。分からなければ None）"""
+    limits = []
+    try:
+        limits.append(os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE"))
+    except (AttributeError, ValueError, OSError):
+        pass
+    # cgroup v2 / v1 のメモリ上限
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            limits.append(int(value))
+    limits = [limit for limit in limits if 0 < limit < 1 << 60]
+    return min(limits) if limits else None
+
+def default_budget_bytes():
+    if MEMORY_BUDGET_MB > 0:
+        return MEMORY_BUDGET_MB * 1024 * 1024
+    physical = physical_memory_bytes()
+    if physical is None:
+        return DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024
+    return int(physical * MEMORY_BUDGET_RATIO)
+
+def rss_bytes():
+    """プロセスの現在の RSS（psutil があれば使う。取得できなければ None）"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # 取得できるのは最大 RSS（Linux は KB、macOS はバイト）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except (ImportError, OSError, AttributeError):
+        return None
+
+def frame_bytes(df):
+    """DataFrame のメモリ使用量（文字列の中身を含む）"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def format_bytes(value):
+    if value is None:
+        return "不明"
+    if value >= 1024 ** 3:
+        return f"{value / 1024 ** 3:.2f}GB"
+    return f"{value / 1024 ** 2:.0f}MB"
+
+class MemoryGovernor:
+    """RSS と保持中の DataFrame をメモリ予算と比べ、統合方法（メモリ内 / ディスク退避）を決める"""
+
+    def __init__(self, budget_bytes=None, rss=rss_bytes):
+        self.budget_bytes = default_budget_bytes() if budget_bytes is None else budget_bytes
+        self._rss = rss
+        self.frame_bytes = 0
+        self.peak_rss = 0
+        self.mode = MODE_MEMORY
+
+    def rss(self):
+        value = self._rss()
+        if value is not None:
+            self.peak_rss = max(self.peak_rss, value)
+        return value
+
+    def track(self, df):
+        """保持する DataFrame を登録し、そのバイト数を返す"""
+        nbytes = frame_bytes(df)
+        self.frame_bytes += nbytes
+        return nbytes
+
+    def projected_bytes(self):
+        """メモリ内で統合した場合に必要な量の見積もり（現在の RSS + 保持中のデータの複製）"""
+        rss = self.rss()
+        return (rss if rss is not None else self.frame_bytes) + self.frame_bytes
+
+    def over_budget(self):
+        return self.projected_bytes() > self.budget_bytes
+
+    def status(self):
+        return {"rss": self.rss(), "peak_rss": self.peak_rss, "frame_bytes": self.frame_bytes,
+                "budget": self.budget_bytes, "mode": self.mode}
+
+    def summary(self):
+        return (f"メモリ: 使用 {format_bytes(self.rss())}（最大 {format_bytes(self.peak_rss)}）/ "
+                f"予算 {format_bytes(self.budget_bytes)}・保持中のデータ {format_bytes(self.frame_bytes)}・"
+                f"{MODE_LABELS[self.mode]}")
+
+class FrameCollector:
+    """処理済み DataFrame を集める。予算を超えたらそれまでの分も含めてディスク退避に切り替える"""
+
+    def __init__(self, governor=None, fuzzy_companies=False, spill_directory=None):
+        self.governor = governor or MemoryGovernor()
+        self.fuzzy_companies = fuzzy_companies
+        self.spill_directory = spill_directory
+        self.spill = None
+        self._frames = []
+
+    @property
+    def spilled(self):
+        return self.spill is not None
+
+    def add(self, df, order):
+        """DataFrame を追加（order は統合時の順）。この追加でディスク退避に切り替えた場合は True"""
+        if self.spill is not None:
+            self.spill.add(df, order)
+            return False
+        self._frames.append((order, df))
+        self.governor.track(df)
+        if not self.governor.over_budget():
+            return False
+        self.start_spill()
+        return True
+
+    def start_spill(self):
+        """保持中の DataFrame をディスクに書き出し、以降の追加は直接ディスクに退避する"""
+        logging.info(f"メモリ予算を超えたためディスク退避に切り替え: {self.governor.summary()}")
+        self.spill = SpillMerger(self.fuzzy_companies, directory=self.spill_directory)
+        frames, self._frames = self._frames, []
+        for order, df in sorted(frames, key=lambda entry: entry[0]):
+            self.spill.add(df, order)
+        self.spill.flush()
+        del frames, df
+        self.governor.frame_bytes = 0
+        self.governor.mode = MODE_SPILL
+        gc.collect()
+
+    def frames(self):
+        """メモリ内で統合する DataFrame（order の順）"""
+        return [df for _, df in sorted(self._frames, key=lambda entry: entry[0])]
+
+    def __len__(self):
+        return self.spill.sources if self.spill is not None else len(self._frames)
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
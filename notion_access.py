@@ -0,0 +1,421 @@
+"""
+notion_access.py - Notion データベースクエリの共通処理
+レート制御付きのクライアント、ページネーションを含むクエリ実行、
+同一条件のクエリ結果を一定時間再利用するキャッシュ、
+カテゴリ別フィルターを1回のORクエリにまとめてローカルで振り分ける処理
+"""
+
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# クエリ結果の再利用期限（秒）。ファイルの署名付きURLは約1時間で失効するため、それより短くする
+NOTION_QUERY_CACHE_TTL = int(os.environ.get("NOTION_QUERY_CACHE_TTL", "600"))
+# 統合できないフィルターを並列に取得するときのワーカー数（Notion APIの上限は平均3リクエスト/秒）
+NOTION_QUERY_WORKERS = int(os.environ.get("NOTION_QUERY_WORKERS", "3"))
+# リクエスト数の上限（リクエスト/秒）と同時実行数の上限
+NOTION_RATE_LIMIT = float(os.environ.get("NOTION_RATE_LIMIT", "3"))
+# 連続して送れるリクエスト数（大きくすると短いバーストで 429 を受けやすくなる）
+NOTION_RATE_BURST = float(os.environ.get("NOTION_RATE_BURST", "1"))
+NOTION_MAX_CONCURRENCY = int(os.environ.get("NOTION_MAX_CONCURRENCY", "6"))
+# 429 / 5xx 応答時の再試行回数
+NOTION_MAX_RETRIES = int(os.environ.get("NOTION_MAX_RETRIES", "6"))
+# 再試行するHTTPステータス（429以外は一時的なサーバーエラー）
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """トークンバケット方式のレート制限（rate 個/秒で補充、最大 capacity 個まで貯める）"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Retry-After などで指定された時間、全スレッドの取得を止める"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self.tokens = 0.0
+
+    def acquire(self):
+        """トークンを1つ取得（足りなければ待機）。戻り値: 待機した秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+class NotionRateLimiter:
+    """Notion API 呼び出しのレート制御
+
+    トークンバケットで秒間リクエスト数を抑え、同時実行数は AIMD（成功が続けば1ずつ増やし、
+    429を受けたら半減）で上限近くまで自動調整する。429 / 5xx は Retry-After に従って再試行する。
+    """
+
+    def __init__(self, rate=NOTION_RATE_LIMIT, max_concurrency=NOTION_MAX_CONCURRENCY,
+                 max_retries=NOTION_MAX_RETRIES, burst=NOTION_RATE_BURST, sleep=time.sleep):
+        self.bucket = TokenBucket(rate, capacity=burst, sleep=sleep)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = min(2, self.max_concurrency)
+        self.max_retries = max_retries
+        self._sleep = sleep
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+        self.metrics = {"requests": 0, "throttled": 0, "retries": 0, "errors": 0,
+                        "wait_seconds": 0.0, "peak_concurrency": 0}
+
+    def _enter(self):
+        with self._cond:
+            while self._in_flight >= self.concurrency:
+                self._cond.wait()
+            self._in_flight += 1
+            self.metrics["peak_concurrency"] = max(self.metrics["peak_concurrency"], self._in_flight)
+
+    def _leave(self, throttled):
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.concurrency = max(1, self.concurrency // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def _record(self, key, value=1):
+        with self._cond:
+            self.metrics[key] += value
+
+    def call(self, func, *args, **kwargs):
+        """レート制御・再試行付きで func を呼び出す"""
+        attempt = 0
+        while True:
+            self._enter()
+            throttled = False
+            try:
+                self._record("wait_seconds", self.bucket.acquire())
+                self._record("requests")
+                return func(*args, **kwargs)
+            except Exception as e:
+                status = getattr(e, "status", None)
+                if getattr(e, "code", None) == "rate_limited":
+                    status = 429
+                if status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    self._record("errors")
+                    raise
+                throttled = status == 429
+                delay = retry_delay(e, attempt)
+                if throttled:
+                    self._record("throttled")
+                    self.bucket.pause(delay)
+            finally:
+                self._leave(throttled)
+            attempt += 1
+            self._record("retries")
+            self._record("wait_seconds", delay)
+            logging.warning(f"Notion API 再試行 ({status}): {delay:.1f}秒待機 [{attempt}/{self.max_retries}]")
+            self._sleep(delay)
+
+    def summary(self):
+        """計測値の表示用文字列"""
+        m = self.metrics
+        return (f"Notion API: {m['requests']}リクエスト / 429応答 {m['throttled']}回 / 再試行 {m['retries']}回 / "
+                f"待機 {m['wait_seconds']:.1f}秒 / 最大同時実行 {m['peak_concurrency']}")
+
+def retry_delay(error, attempt):
+    """再試行までの待機秒数（Retry-After ヘッダーがあれば優先、なければ指数バックオフ + ジッター）"""
+    headers = getattr(error, "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        if retry_after is not None:
+            return max(0.0, float(retry_after))
+    except (TypeError, ValueError):
+        pass
+    return min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+class _RateLimitedEndpoint:
+    """エンドポイント（databases / pages など）のメソッド呼び出しをレート制御に通す"""
+
+    def __init__(self, endpoint, limiter):
+        self._endpoint = endpoint
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._endpoint, name)
+        if callable(attr):
+            return functools.partial(self._limiter.call, attr)
+        return attr
+
+class RateLimitedClient:
+    """notion_client.Client をラップし、API呼び出しをすべて NotionRateLimiter 経由にする"""
+
+    def __init__(self, client, limiter=None):
+        self.client = client
+        self.limiter = limiter or NotionRateLimiter()
+
+    def __getattr__(self, name):
+        return _RateLimitedEndpoint(getattr(self.client, name), self.limiter)
+
+def query_all_pages(notion, database_id, filter=None, page_size=100):
+    """フィルターに一致する全ページを取得。戻り値: (ページのリスト, API呼び出し回数)"""
+    pages = []
+    calls = 0
+    start_cursor = None
+    while True:
+        kwargs = {"database_id": database_id, "page_size": page_size}
+        if filter:
+            kwargs["filter"] = filter
+        if start_cursor:
+            kwargs["start_cursor"] = start_cursor
+        response = notion.databases.query(**kwargs)
+        calls += 1
+        pages.extend(response.get("results", []))
+        if not response.get("has_more"):
+            break
+        start_cursor = response.get("next_cursor")
+    return pages, calls
+
+class UnsupportedFilter(Exception):
+    """ローカルで評価できないフィルター条件（呼び出し側は Notion API の検索に切り替える）"""
+
+def _property_value(page, property_name):
+    """ページのプロパティ値（型ごとの中身）を取得"""
+    prop = page.get("properties", {}).get(property_name)
+    if not prop:
+        return None
+    return prop.get(prop.get("type"))
+
+def _date_start(value):
+    """日付プロパティの開始日時を比較用の文字列で取得"""
+    if not value:
+        return None
+    return (value.get("start") or "")[:19] or None
+
+# 日付条件の比較演算
+_DATE_OPERATORS = {
+    "on_or_after": lambda a, b: a >= b,
+    "on_or_before": lambda a, b: a <= b,
+    "after": lambda a, b: a > b,
+    "before": lambda a, b: a < b,
+    "equals": lambda a, b: a[:10] == b[:10],
+}
+
+def _match_date(start, cond):
+    """日付条件を評価（複数の演算子はすべて満たす必要がある）"""
+    if cond.get("is_empty"):
+        return start is None
+    if cond.get("is_not_empty"):
+        return start is not None
+    operators = [op for op in _DATE_OPERATORS if op in cond]
+    if not operators:
+        return None
+    if start is None:
+        return False
+    for op in operators:
+        bound = str(cond[op])[:19]
+        # どちらかが日付のみなら日付同士で比較（タイムゾーンは考慮しない）
+        if len(bound) == 10 or len(start) == 10:
+            matched = _DATE_OPERATORS[op](start[:10], bound[:10])
+        else:
+            matched = _DATE_OPERATORS[op](start, bound)
+        if not matched:
+            return False
+    return True
+
+def _match_condition(page, clause):
+    """単一のプロパティ条件（または created_time / last_edited_time の条件）を評価"""
+    result = None
+    if "timestamp" in clause:
+        timestamp = clause["timestamp"]
+        result = _match_date((page.get(timestamp) or "")[:19] or None, clause.get(timestamp, {}))
+    elif "select" in clause:
+        cond = clause["select"]
+        value = _property_value(page, clause["property"])
+        name = value.get("name") if value else None
+        if "equals" in cond:
+            result = name == cond["equals"]
+        elif "does_not_equal" in cond:
+            result = name != cond["does_not_equal"]
+        elif cond.get("is_empty"):
+            result = name is None
+        elif cond.get("is_not_empty"):
+            result = name is not None
+    elif "files" in clause:
+        cond = clause["files"]
+        value = _property_value(page, clause["property"])
+        if cond.get("is_not_empty"):
+            result = bool(value)
+        elif cond.get("is_empty"):
+            result = not value
+    elif "date" in clause:
+        result = _match_date(_date_start(_property_value(page, clause["property"])), clause["date"])
+    if result is None:
+        raise UnsupportedFilter(f"ローカル評価に未対応の条件: {json.dumps(clause, ensure_ascii=False)}")
+    return result
+
+def matches_filter(page, filter):
+    """Notion のフィルター（and / or / select / files / date / timestamp）をページに対してローカルで評価
+
+    未対応の条件が含まれる場合は UnsupportedFilter
+    """
+    if not filter:
+        return True
+    if "and" in filter:
+        return all(matches_filter(page, clause) for clause in filter["and"])
+    if "or" in filter:
+        return any(matches_filter(page, clause) for clause in filter["or"])
+    return _match_condition(page, filter)
+
+def filter_supported(filter):
+    """matches_filter でローカル評価できるフィルターか（ページを取得する前にすべての条件を確かめる）"""
+    if not filter:
+        return True
+    if "and" in filter:
+        return all(filter_supported(clause) for clause in filter["and"])
+    if "or" in filter:
+        return all(filter_supported(clause) for clause in filter["or"])
+    try:
+        _match_condition({}, filter)
+    except UnsupportedFilter:
+        return False
+    return True
+
+def _leaf_conditions(clause):
+    """単一条件、または単一条件のORなら条件のリストを返す（それ以外は None）"""
+    if "property" in clause:
+        return [clause]
+    if "or" in clause and all("property" in leaf for leaf in clause["or"]):
+        return list(clause["or"])
+    return None
+
+def merge_category_filters(filters):
+    """カテゴリ別フィルターを1回のORクエリにまとめる
+
+    各フィルターが {"and": [カテゴリ固有の条件, 共通条件...]} の形で共通条件が同一の場合のみ統合する。
+    戻り値: 統合フィルター（統合できない場合は None）
+    """
+    if len(filters) < 2:
+        return None
+    common_json = None
+    leaves = []
+    for filter in filters.values():
+        clauses = filter.get("and") if isinstance(filter, dict) else None
+        if not clauses:
+            return None
+        own = _leaf_conditions(clauses[0])
+        rest = json.dumps(clauses[1:], ensure_ascii=False, sort_keys=True)
+        if own is None or (common_json is not None and rest != common_json):
+            return None
+        common_json = rest
+        leaves.extend(leaf for leaf in own if leaf not in leaves)
+    return {"and": [{"or": leaves}] + json.loads(common_json)}
+
+def partition_pages(pages, filters):
+    """統合クエリの結果を各カテゴリのフィルター（固有条件のみ）で振り分け"""
+    partitions = {}
+    for category, filter in filters.items():
+        own = filter["and"][0]
+        partitions[category] = [page for page in pages if matches_filter(page, own)]
+    return partitions
+
+def query_cache_key(database_id, filter, mode):
+    """(データベースID, フィルターJSON, モード) からキャッシュキーを作成"""
+    filter_json = json.dumps(filter, ensure_ascii=False, sort_keys=True, default=str)
+    return f"{database_id}|{mode}|{filter_json}"
+
+class QueryResultCache:
+    """クエリ結果をTTL付きで保持（Streamlit のセッション内で件数確認とダウンロードの間で共有）"""
+
+    def __init__(self, ttl=NOTION_QUERY_CACHE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.saved_seconds = 0.0
+        self.saved_calls = 0
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """期限内のエントリを返す（なければ None）"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["fetched_at"] > self.ttl:
+                del self.entries[key]
+                return None
+            return entry
+
+    def put(self, key, pages, calls, elapsed):
+        """取得結果を登録"""
+        entry = {"pages": pages, "calls": calls, "elapsed": elapsed, "fetched_at": time.time()}
+        with self._lock:
+            self.entries[key] = entry
+        return entry
+
+    def query(self, notion, database_id, filter, mode, page_size=100):
+        """キャッシュを優先してクエリを実行。戻り値: (ページのリスト, キャッシュを使ったか)"""
+        key = query_cache_key(database_id, filter, mode)
+        entry = self.get(key)
+        if entry is not None:
+            with self._lock:
+                self.saved_seconds += entry["elapsed"]
+                self.saved_calls += entry["calls"]
+            return entry["pages"], True
+
+        start = time.perf_counter()
+        pages, calls = query_all_pages(notion, database_id, filter, page_size)
+        with self._lock:
+            self.api_calls += calls
+        self.put(key, pages, calls, time.perf_counter() - start)
+        return pages, False
+
+    def query_categories(self, notion, database_id, filters, mode, single_pass=True,
+                         max_workers=NOTION_QUERY_WORKERS):
+        """カテゴリ別フィルターの結果を取得。戻り値: ({カテゴリ: ページのリスト}, 統合クエリを使ったか)
+
+        統合できるフィルターは1回のORクエリで取得してローカルで振り分け、
+        統合できない・ローカルで振り分けられない条件を含む場合は各フィルターを並列のワーカーでページネーションする。
+        """
+        merged = merge_category_filters(filters) if single_pass else None
+        if merged is not None and all(filter_supported(filter) for filter in filters.values()):
+            pages, _ = self.query(notion, database_id, merged, mode)
+            return partition_pages(pages, filters), True
+
+        if max_workers <= 1 or len(filters) <= 1:
+            return {category: self.query(notion, database_id, filter, mode)[0]
+                    for category, filter in filters.items()}, False
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(filters))) as executor:
+            futures = {category: executor.submit(self.query, notion, database_id, filter, mode)
+                       for category, filter in filters.items()}
+            return {category: future.result()[0] for category, future in futures.items()}, False
+
+    def clear(self):
+        """全エントリと節約量の集計を破棄"""
+        with self._lock:
+            self.entries.clear()
+            self.saved_seconds = 0.0
+            self.saved_calls = 0
+            self.api_calls = 0
@@ -0,0 +1,199 @@
+"""
+notion_mirror.py - 展示会データベースのローカルミラー（SQLite）
+ページのプロパティとファイル参照を保存し、last_edited_time の on_or_after フィルターで差分同期する。
+フィルターはローカルで評価し、ダウンロード前に期限切れのファイルURLだけを再取得する。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from notion_access import matches_filter, query_all_pages
+
+NOTION_MIRROR_FILE = os.environ.get("NOTION_MIRROR_FILE", os.path.join("data", "notion_mirror.sqlite"))
+# 差分同期では削除されたページを検出できないため、この日数ごとに全件再構築する
+NOTION_MIRROR_FULL_SYNC_DAYS = float(os.environ.get("NOTION_MIRROR_FULL_SYNC_DAYS", "7"))
+# 期限までこの秒数未満のファイルURLは再取得する
+FILE_URL_EXPIRY_MARGIN = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    database_id TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    last_edited_time TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (database_id, page_id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    database_id TEXT PRIMARY KEY,
+    cursor TEXT,
+    synced_at REAL,
+    full_synced_at REAL
+);
+"""
+
+def _utc_now():
+    return datetime.now(timezone.utc)
+
+def _parse_time(value):
+    """Notion の ISO 8601 時刻を datetime に変換"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def _is_removed(page):
+    """アーカイブ・ゴミ箱のページか"""
+    return bool(page.get("archived") or page.get("in_trash"))
+
+class NotionMirror:
+    """Notion データベースのページを SQLite に保持し、差分同期とローカル検索を行う"""
+
+    def __init__(self, path=NOTION_MIRROR_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def sync_state(self, database_id):
+        """同期状態 (cursor, synced_at, full_synced_at) を取得（未同期なら None）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cursor, synced_at, full_synced_at FROM sync_state WHERE database_id = ?", (database_id,)
+            ).fetchone()
+        return row
+
+    def count(self, database_id):
+        """保持しているページ数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages WHERE database_id = ?", (database_id,)).fetchone()[0]
+
+    def sync(self, notion, database_id, full=False):
+        """Notion と同期。前回以降に編集されたページだけを取得し、full=True または期限切れなら全件再構築"""
+        start = time.perf_counter()
+        state = self.sync_state(database_id)
+        if state is None or state[0] is None:
+            full = True
+        elif not full and state[2] is not None and NOTION_MIRROR_FULL_SYNC_DAYS > 0:
+            full = time.time() - state[2] > NOTION_MIRROR_FULL_SYNC_DAYS * 86400
+
+        filter = None
+        if not full:
+            # last_edited_time は分単位に丸められるため、前回の最大値と同じ分から取り直す
+            filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": state[0]}}
+        pages, calls = query_all_pages(notion, database_id, filter)
+
+        cursor = state[0] if state and not full else None
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute("DELETE FROM pages WHERE database_id = ?", (database_id,))
+            for page in pages:
+                edited = page.get("last_edited_time")
+                if edited and (cursor is None or edited > cursor):
+                    cursor = edited
+                if _is_removed(page):
+                    self._conn.execute("DELETE FROM pages WHERE database_id = ? AND page_id = ?",
+                                       (database_id, page["id"]))
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (database_id, page_id, last_edited_time, data) VALUES (?, ?, ?, ?)",
+                    (database_id, page["id"], edited, json.dumps(page, ensure_ascii=False))
+                )
+            now = time.time()
+            self._conn.execute(
+                "INSERT INTO sync_state (database_id, cursor, synced_at, full_synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(database_id) DO UPDATE SET cursor = excluded.cursor, synced_at = excluded.synced_at, "
+                "full_synced_at = COALESCE(excluded.full_synced_at, sync_state.full_synced_at)",
+                (database_id, cursor, now, now if full else None)
+            )
+
+        stats = {"mode": "full" if full else "incremental", "fetched": len(pages), "calls": calls,
+                 "seconds": time.perf_counter() - start, "total": self.count(database_id)}
+        logging.info(f"Notionミラー同期（{'全件' if full else '差分'}）: 取得 {stats['fetched']}件 / "
+                     f"API {calls}回 / 保持 {stats['total']}件 / {stats['seconds']:.1f}秒")
+        return stats
+
+    def pages(self, database_id):
+        """保持している全ページ（同期で取得した順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM pages WHERE database_id = ? ORDER BY rowid", (database_id,)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def query(self, database_id, filter=None):
+        """フィルターをローカルで評価して一致するページを返す"""
+        return [page for page in self.pages(database_id) if matches_filter(page, filter)]
+
+    def refresh_file_urls(self, notion, database_id, pages):
+        """Notionにアップロードされたファイルの署名付きURLが期限切れ（間近）のページを取得し直す"""
+        deadline = _utc_now() + timedelta(seconds=FILE_URL_EXPIRY_MARGIN)
+        refreshed = []
+        count = 0
+        for page in pages:
+            if not _has_expired_file(page, deadline):
+                refreshed.append(page)
+                continue
+            fresh = notion.pages.retrieve(page_id=page["id"])
+            count += 1
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE pages SET data = ? WHERE database_id = ? AND page_id = ?",
+                    (json.dumps(fresh, ensure_ascii=False), database_id, fresh["id"])
+                )
+            refreshed.append(fresh)
+        if count:
+            logging.info(f"期限切れのファイルURLを再取得: {count}ページ")
+        return refreshed
+
+    def as_client(self):
+        """databases.query だけを持つクライアント互換オブジェクト（既存のクエリ処理をローカルで実行）"""
+        return _MirrorClient(self)
+
+def _has_expired_file(page, deadline):
+    """ページ内に期限切れ（deadline 以前に失効）の Notion ファイルURLがあるか"""
+    for prop in page.get("properties", {}).values():
+        if prop.get("type") != "files":
+            continue
+        for file_info in prop.get("files", []):
+            if file_info.get("type") != "file":
+                continue
+            expiry = file_info.get("file", {}).get("expiry_time")
+            if not expiry:
+                continue
+            try:
+                if _parse_time(expiry) <= deadline:
+                    return True
+            except ValueError:
+                return True
+    return False
+
+class _MirrorDatabases:
+    def __init__(self, mirror):
+        self._mirror = mirror
+
+    def query(self, database_id, filter=None, start_cursor=None, page_size=100, **kwargs):
+        # ローカル検索なのでページ分割せず一度に返す
+        return {"object": "list", "results": self._mirror.query(database_id, filter),
+                "has_more": False, "next_cursor": None}
+
+class _MirrorClient:
+    def __init__(self, mirror):
+        self.databases = _MirrorDatabases(mirror)
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+def get_notion_mirror(path=NOTION_MIRROR_FILE):
+    """パスごとに1つの NotionMirror を返す"""
+    with _mirrors_lock:
+        if path not in _mirrors:
+            _mirrors[path] = NotionMirror(path)
+        return _mirrors[path]
@@ -0,0 +1,145 @@
+"""
+pipeline.py - Notionページ → ダウンロード → 読み込み・正規化 を重ねて実行するパイプライン
+各段はサイズ上限付きのキューでつながり、ネットワーク待ちとCPU処理を並行させる。
+メモリに載るファイル本体はキューの深さ + 作業中のワーカー数に比例する分だけになる。
+結果は呼び出し元のスレッドに順次返すため、統合処理や画面更新は呼び出し元で行う（ワーカーは Streamlit を呼ばない）。
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections import namedtuple
+
+PIPELINE_DOWNLOAD_WORKERS = int(os.environ.get("PIPELINE_DOWNLOAD_WORKERS", "4"))
+PIPELINE_PARSE_WORKERS = int(os.environ.get("PIPELINE_PARSE_WORKERS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "8"))
+
+# seq: 投入順の通し番号 / task: expand が返したタスク / name: ファイル名
+# value: parse の戻り値 / error: 失敗時のメッセージ / stage: 結果を返した段（"download" / "parse"）
+PipelineResult = namedtuple('PipelineResult', ['seq', 'task', 'name', 'value', 'error', 'stage'])
+
+_DONE = object()
+
+class FilePipeline:
+    """ページ → ダウンロード → 読み込み の3段パイプライン
+
+    expand(page_idx, page): ページからダウンロードタスクのリストを作成
+    fetch(task): (ファイル名, 内容) を返す。対象外なら None
+    parse(task, name, content): 読み込み・正規化した結果を返す
+    """
+
+    def __init__(self, expand, fetch, parse, download_workers=PIPELINE_DOWNLOAD_WORKERS,
+                 parse_workers=PIPELINE_PARSE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE):
+        self.expand = expand
+        self.fetch = fetch
+        self.parse = parse
+        self.download_workers = max(1, download_workers)
+        self.parse_workers = max(1, parse_workers)
+        self.queue_size = max(1, queue_size)
+        self.stats = {"tasks": 0, "downloaded": 0, "skipped": 0, "parsed": 0, "errors": 0,
+                      "peak_queued_files": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def run(self, pages):
+        """パイプラインを実行し、読み込み結果（PipelineResult）を完了順に返すジェネレーター"""
+        task_q = queue.Queue(self.queue_size)
+        content_q = queue.Queue(self.queue_size)
+        result_q = queue.Queue(self.queue_size)
+        stop = threading.Event()
+
+        def put(q, value):
+            # 呼び出し元が途中で止めた場合に備え、待機中も停止フラグを確認する
+            while not stop.is_set():
+                try:
+                    q.put(value, timeout=0.2)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def produce():
+            seq = 0
+            try:
+                for page_idx, page in enumerate(pages):
+                    for task in self.expand(page_idx, page):
+                        self._count("tasks")
+                        if not put(task_q, (seq, task)):
+                            return
+                        seq += 1
+            except Exception as e:
+                logging.error(f"パイプライン: ページの展開に失敗: {e}")
+                put(result_q, PipelineResult(seq, None, None, None, str(e), "expand"))
+            finally:
+                for _ in range(self.download_workers):
+                    put(task_q, _DONE)
+
+        def download():
+            while True:
+                item = get(task_q)
+                if item is _DONE:
+                    break
+                seq, task = item
+                try:
+                    fetched = self.fetch(task)
+                except Exception as e:
+                    self._count("errors")
+                    put(result_q, PipelineResult(seq, task, None, None, str(e), "download"))
+                    continue
+                if fetched is None:
+                    self._count("skipped")
+                    continue
+                self._count("downloaded")
+                with self._stats_lock:
+                    self.stats["peak_queued_files"] = max(self.stats["peak_queued_files"], content_q.qsize() + 1)
+                put(content_q, (seq, task, fetched[0], fetched[1]))
+
+        def parse():
+            while True:
+                item = get(content_q)
+                if item is _DONE:
+                    break
+                seq, task, name, content = item
+                try:
+                    value = self.parse(task, name, content)
+                    self._count("parsed")
+                    put(result_q, PipelineResult(seq, task, name, value, None, "parse"))
+                except Exception as e:
+                    self._count("errors")
+                    put(result_q, PipelineResult(seq, task, name, None, str(e), "parse"))
+
+        def close_after(workers, q, count):
+            for worker in workers:
+                worker.join()
+            for _ in range(count):
+                put(q, _DONE)
+
+        downloaders = [threading.Thread(target=download, daemon=True) for _ in range(self.download_workers)]
+        parsers = [threading.Thread(target=parse, daemon=True) for _ in range(self.parse_workers)]
+        threads = [threading.Thread(target=produce, daemon=True)] + downloaders + parsers + [
+            threading.Thread(target=close_after, args=(downloaders, content_q, self.parse_workers), daemon=True),
+            threading.Thread(target=close_after, args=(parsers, result_q, 1), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                result = result_q.get()
+                if result is _DONE:
+                    break
+                yield result
+        finally:
+            stop.set()
@@ -0,0 +1,197 @@
+"""
+processed_ledger.py - 処理済みファイルの台帳（SQLite、WAL モード）
+ファイルキー（ページID_正規化したファイルURL、ledger_key）ごとにファイル名・内容のハッシュ・処理日時・行数を保存する。
+Notionに直接アップロードされたファイルのURLは取得のたびに署名（クエリ）が変わるため、キーには含めない。
+ファイルの処理が終わるたびに1件ずつコミットし（status = pending）、統合データを保存した時点で
+その実行で統合したファイルだけを merged にする。途中で止まった実行の pending のファイルは、次の実行で処理済みキャッシュから読み直す。
+以前の processed_files.json は最初に開いたときに1回だけ取り込む。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from download_planner import normalize_file_url
+
+PROCESSED_LEDGER_FILE = os.environ.get("PROCESSED_LEDGER_FILE", os.path.join("data", "processed_files.sqlite"))
+
+STATUS_PENDING = "pending"
+STATUS_MERGED = "merged"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_files (
+    file_key TEXT PRIMARY KEY,
+    filename TEXT,
+    hash TEXT,
+    processed_date TEXT,
+    rows INTEGER,
+    status TEXT NOT NULL DEFAULT 'merged'
+);
+CREATE INDEX IF NOT EXISTS processed_files_hash ON processed_files (hash);
+CREATE INDEX IF NOT EXISTS processed_files_status ON processed_files (status);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    imported_at TEXT,
+    entries INTEGER
+);
+"""
+
+_COLUMNS = ("file_key", "filename", "hash", "processed_date", "rows", "status")
+# 1: ファイルキーのURLを正規化（署名付きURLのクエリを除く）
+KEY_FORMAT_VERSION = 1
+
+def ledger_key(page_id, url):
+    """台帳のファイルキー（ページID_正規化したURL）"""
+    return f"{page_id}_{normalize_file_url(url or '')}"
+
+def normalize_ledger_key(file_key):
+    """以前の形式（ページID_署名付きURL）のキーを ledger_key の形式にする（ページIDに '_' は含まれない）"""
+    page_id, separator, url = file_key.partition("_")
+    return ledger_key(page_id, url) if separator else file_key
+
+def _entry(row):
+    return dict(zip(_COLUMNS, row)) if row else None
+
+class ProcessedLedger:
+    """処理済みファイルの台帳。`file_key in ledger` は統合済み（merged）のファイルのみ True"""
+
+    def __init__(self, path=PROCESSED_LEDGER_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: 1件ずつのコミットを軽くし、書き込み中も読み取りを止めない
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < KEY_FORMAT_VERSION:
+            self._normalize_keys()
+
+    def _normalize_keys(self):
+        """以前の形式のファイルキーを1回だけ書き換える（同じキーになる記録は統合済み・新しいものを残す）"""
+        with self._conn:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM processed_files "
+                f"ORDER BY status = '{STATUS_MERGED}' DESC, processed_date DESC"
+            ).fetchall()
+            renamed = [(key,) + row[1:] for key, row in ((normalize_ledger_key(row[0]), row) for row in rows)
+                       if key != row[0]]
+            self._conn.executemany("DELETE FROM processed_files WHERE file_key = ?",
+                                   [(row[0],) for row in rows if normalize_ledger_key(row[0]) != row[0]])
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO processed_files (file_key, filename, hash, processed_date, rows, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)", renamed
+            )
+            self._conn.execute(f"PRAGMA user_version = {KEY_FORMAT_VERSION}")
+        if renamed:
+            logging.info(f"処理済みファイル台帳のキーを正規化: {len(renamed)}件")
+
+    def close(self):
+        self._conn.close()
+
+    def __contains__(self, file_key):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM processed_files WHERE file_key = ? AND status = ?",
+                                     (file_key, STATUS_MERGED)).fetchone()
+        return row is not None
+
+    def get(self, file_key, default=None):
+        """ファイルキーの記録（統合済みのみ。なければ default）"""
+        entry = self.entry(file_key)
+        return entry if entry is not None and entry["status"] == STATUS_MERGED else default
+
+    def entry(self, file_key):
+        """ファイルキーの記録（status に関わらず。なければ None）"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM processed_files WHERE file_key = ?",
+                                     (file_key,)).fetchone()
+        return _entry(row)
+
+    def find_by_hash(self, file_hash):
+        """同じ内容のファイルの記録"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM processed_files WHERE hash = ?",
+                                      (file_hash,)).fetchall()
+        return [_entry(row) for row in rows]
+
+    def pending(self):
+        """処理済みで、統合データの保存が済んでいないファイルの記録"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM processed_files WHERE status = ?",
+                                      (STATUS_PENDING,)).fetchall()
+        return [_entry(row) for row in rows]
+
+    def record(self, file_key, filename, file_hash, rows, status=STATUS_PENDING):
+        """1ファイルの処理結果をコミット"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed_files (file_key, filename, hash, processed_date, rows, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (file_key, filename, file_hash, datetime.now().isoformat(), rows, status)
+            )
+
+    def mark_merged(self, file_keys):
+        """統合データに含めて保存した pending のファイルを統合済みにする。更新した件数を返す
+
+        他の実行で処理して今回統合していないファイルは pending のまま残す
+        """
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("UPDATE processed_files SET status = ? WHERE file_key = ? AND status = ?",
+                                   [(STATUS_MERGED, file_key, STATUS_PENDING) for file_key in file_keys])
+            return self._conn.total_changes - before
+
+    def count(self, status=None):
+        with self._lock:
+            if status is None:
+                return self._conn.execute("SELECT COUNT(*) FROM processed_files").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM processed_files WHERE status = ?",
+                                      (status,)).fetchone()[0]
+
+    def import_json(self, json_path):
+        """processed_files.json を取り込む（同じファイルは1回だけ。台帳にあるキーは上書きしない）。取り込んだ件数を返す"""
+        source = os.path.abspath(json_path)
+        with self._lock:
+            done = self._conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone()
+        if done or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                processed_files = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"処理済みファイルログを読み込めません（取り込みをスキップ）: {json_path}: {e}")
+            return 0
+        # キーは ledger_key の形式に正規化（同じキーになる記録は後のものを無視）
+        rows = [(normalize_ledger_key(file_key), entry.get("filename"), entry.get("hash"), entry.get("processed_date"),
+                 entry.get("rows"), STATUS_MERGED)
+                for file_key, entry in processed_files.items() if isinstance(entry, dict)]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO processed_files (file_key, filename, hash, processed_date, rows, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            imported = self._conn.total_changes - before
+            self._conn.execute("INSERT INTO imports (source, imported_at, entries) VALUES (?, ?, ?)",
+                               (source, datetime.now().isoformat(), imported))
+        logging.info(f"処理済みファイルログを台帳に取り込み: {json_path}（{imported}件）")
+        return imported
+
+    def summary(self):
+        return (f"処理済みファイル台帳: 統合済み {self.count(STATUS_MERGED)}件 / "
+                f"未統合 {self.count(STATUS_PENDING)}件")
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+def get_processed_ledger(path=PROCESSED_LEDGER_FILE):
+    """パスごとに1つの ProcessedLedger を返す"""
+    with _ledgers_lock:
+        if path not in _ledgers:
+            _ledgers[path] = ProcessedLedger(path)
+        return _ledgers[path]
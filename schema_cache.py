@@ -0,0 +1,124 @@
+"""
+schema_cache.py - 列構成ごとの列名解決プランのキャッシュ
+同じ主催者の月次ファイルはヘッダーが同一のことが多いため、
+ヘッダーのハッシュ → 解決済みの変換・削除プラン を保存して次回以降の列名解決を省略する。
+プランは元の列を位置で参照する（read_excel の数値・日時の列名は JSON に保存すると文字列になるため）
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+SCHEMA_CACHE_FILE = os.environ.get("SCHEMA_CACHE_FILE", os.path.join("data", "schema_cache.json"))
+# キャッシュファイルの形式を変えたら上げる（2: プランは列の位置で参照）
+SCHEMA_CACHE_FORMAT = 2
+
+def header_fingerprint(columns):
+    """生のヘッダー列（順序・型込み。1 と '1' は別のヘッダー）のハッシュ"""
+    raw = json.dumps([[type(col).__name__, str(col)] for col in columns], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def rename_by_position(columns, names):
+    """位置ごとの変換後の列名（None は変換しない）を元の列に当てはめた列名のリスト"""
+    return [col if name is None else name for col, name in zip(columns, names)]
+
+def rules_fingerprint(*rules):
+    """列名ルール定義のハッシュ（ルールを変更すると古いプランは使われなくなる）"""
+    raw = json.dumps(rules, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+class SchemaCache:
+    """ヘッダーごとの列名解決プランを保持し、実行をまたいでJSONに保存する"""
+
+    def __init__(self, path=SCHEMA_CACHE_FILE):
+        self.path = path
+        self.plans = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        # 古いルールのプランを削除済みの (resolver, rules_version)
+        self._pruned = set()
+        self.load()
+
+    def load(self):
+        """保存済みのプランを読み込み"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("format") == SCHEMA_CACHE_FORMAT:
+                self.plans = data.get("plans", {})
+        except Exception as e:
+            logging.warning(f"列構成キャッシュの読み込みに失敗: {e}")
+            self.plans = {}
+
+    def save(self):
+        """プランをJSONに保存（変更がない場合は何もしない）"""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {"format": SCHEMA_CACHE_FORMAT, "plans": self.plans}
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def resolve(self, resolver, rules_version, columns, build_plan):
+        """ヘッダーに対応するプランを返す。未登録なら build_plan(columns) で作成して登録
+
+        プランは JSON に保存するため、元の列は名前ではなく位置で参照すること（rename_by_position）
+        """
+        key = f"{resolver}:{rules_version}:{header_fingerprint(columns)}"
+        with self._lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.hits += 1
+                return plan
+
+        plan = build_plan(list(columns))
+        with self._lock:
+            self.misses += 1
+            if (resolver, rules_version) not in self._pruned:
+                self._prune(resolver, rules_version)
+            self.plans[key] = plan
+            self._dirty = True
+        return plan
+
+    def _prune(self, resolver, rules_version):
+        """同じ resolver の古い rules_version のプランを削除（ルールを変えるたびにファイルが大きくならないように）"""
+        prefix = f"{resolver}:"
+        current = f"{resolver}:{rules_version}:"
+        stale = [key for key in self.plans if key.startswith(prefix) and not key.startswith(current)]
+        for key in stale:
+            del self.plans[key]
+        self._pruned.add((resolver, rules_version))
+
+    def counters(self):
+        """現在の (ヒット数, ミス数)"""
+        return self.hits, self.misses
+
+    def summary(self, since=(0, 0)):
+        """ヒット率の表示用文字列（since 以降の分のみ集計）"""
+        hits = self.hits - since[0]
+        misses = self.misses - since[1]
+        total = hits + misses
+        rate = hits / total if total else 0.0
+        return f"列構成キャッシュ: ヒット {hits}件 / ミス {misses}件（ヒット率 {rate:.1%}、登録 {len(self.plans)}構成）"
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_schema_cache(path=SCHEMA_CACHE_FILE):
+    """パスごとに1つの SchemaCache を返す"""
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = SchemaCache(path)
+        return _caches[path]
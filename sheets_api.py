@@ -0,0 +1,125 @@
+"""
+sheets_api.py - Google Sheets API からの一括取得
+spreadsheets.get（フィールドマスク付き）でタブ（gid・タイトル）を調べ、values:batchGet で
+複数タブを1回のリクエストで取得する。値のJSONからそのまま DataFrame を作るため、CSVへの変換と再解析を行わない。
+取得したタブはブロブに Parquet で保存し、SheetFrameRef（型で判別、ファイル名には依存しない）で受け渡す。
+"""
+
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import requests
+
+from blob_store import BlobRef
+
+SHEETS_API_BASE = os.environ.get("SHEETS_API_BASE", "https://sheets.googleapis.com/v4")
+# 公開スプレッドシートのCSVエクスポート（負荷試験ではローカルの代替サーバーを指定する）
+SHEETS_EXPORT_BASE = os.environ.get("SHEETS_EXPORT_BASE", "https://docs.google.com")
+# タブ一覧の取得に必要な項目だけを返させる
+SHEETS_METADATA_FIELDS = "sheets.properties(sheetId,title,index)"
+SHEETS_VALUE_RANGE = "A:ZZ"
+# APIで取得したタブのファイル名の拡張子（表示用。読み込み方法は SheetFrameRef の型で判別する）
+SHEET_FRAME_EXT = ".parquet"
+# read_csv(dtype=str) が返す文字列型（pandas 3 以降は StringDtype、それ以前は object）
+TEXT_DTYPE = pd.Series([], dtype=str).dtype
+
+def quote_sheet_title(title):
+    """A1表記用にタブ名を引用符で囲む"""
+    return "'" + str(title).replace("'", "''") + "'"
+
+def _dedup_columns(names):
+    """重複列名に .1, .2 ... を付ける（pandas.read_csv と同じ命名）"""
+    names = list(names)
+    counts = {}
+    for i, col in enumerate(names):
+        cur_count = counts.get(col, 0)
+        while cur_count > 0:
+            counts[col] = cur_count + 1
+            col = f"{col}.{cur_count}"
+            cur_count = counts.get(col, 0)
+        names[i] = col
+        counts[col] = cur_count + 1
+    return names
+
+def values_to_frame(values):
+    """values（行のリスト）から DataFrame を作成（1行目がヘッダー、空セルは NaN、すべて文字列）
+
+    read_csv(dtype=str) と同じ形にそろえる：空行は読み飛ばし、空のヘッダーは「Unnamed: 列番号」
+    """
+    rows = [row for row in values if row]
+    if not rows:
+        return pd.DataFrame()
+    width = max(len(row) for row in rows)
+    header = [str(cell) if cell != "" else f"Unnamed: {i}" for i, cell in enumerate(rows[0])]
+    header += [f"Unnamed: {i}" for i in range(len(header), width)]
+    data = [
+        [str(cell) if cell != "" else np.nan for cell in row] + [np.nan] * (width - len(row))
+        for row in rows[1:]
+    ]
+    df = pd.DataFrame(data, columns=_dedup_columns(header), dtype=object)
+    return df if TEXT_DTYPE == object else df.astype(TEXT_DTYPE)
+
+def fetch_sheet_tabs(sheet_id, api_key, session=requests):
+    """スプレッドシートのタブ一覧 [(gid, タイトル)] を表示順で取得"""
+    response = session.get(f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}",
+                            params={"key": api_key, "fields": SHEETS_METADATA_FIELDS})
+    response.raise_for_status()
+    properties = [sheet["properties"] for sheet in response.json().get("sheets", [])]
+    properties.sort(key=lambda prop: prop.get("index", 0))
+    return [(prop["sheetId"], prop["title"]) for prop in properties]
+
+def batch_get_values(sheet_id, api_key, ranges, session=requests):
+    """values:batchGet で複数の範囲を1回で取得し、範囲ごとの values を返す"""
+    response = session.get(f"{SHEETS_API_BASE}/spreadsheets/{sheet_id}/values:batchGet",
+                           params={"key": api_key, "ranges": list(ranges), "majorDimension": "ROWS"})
+    response.raise_for_status()
+    return [value_range.get("values", []) for value_range in response.json().get("valueRanges", [])]
+
+def fetch_sheet_frames(sheet_id, api_key, gid=None, all_tabs=False, session=requests):
+    """スプレッドシートを DataFrame で取得して [(gid, タイトル, DataFrame)] を返す（先頭が対象のタブ）
+
+    gid も all_tabs も指定しない場合はタブ一覧を取得せず、最初のタブを1回のリクエストで取得する
+    """
+    if gid is None and not all_tabs:
+        values = batch_get_values(sheet_id, api_key, [SHEETS_VALUE_RANGE], session)
+        return [(None, None, values_to_frame(values[0] if values else []))]
+
+    tabs = fetch_sheet_tabs(sheet_id, api_key, session)
+    if not tabs:
+        return []
+    # URLの gid のタブ（見つからなければ最初のタブ）を先頭にする
+    target = next((tab for tab in tabs if tab[0] == gid), tabs[0])
+    selected = [target] + ([tab for tab in tabs if tab != target] if all_tabs else [])
+    ranges = [f"{quote_sheet_title(title)}!{SHEETS_VALUE_RANGE}" for _, title in selected]
+    values_list = batch_get_values(sheet_id, api_key, ranges, session)
+    return [(tab_gid, title, values_to_frame(values))
+            for (tab_gid, title), values in zip(selected, values_list)]
+
+class SheetFrameRef(BlobRef):
+    """APIで取得したタブ（Parquet で保存したブロブ）のハンドル。Notion の添付ファイルは BlobRef / bytes のまま"""
+
+    __slots__ = ()
+
+def frame_to_bytes(df):
+    """DataFrame を保存用のバイト列（Parquet）に変換"""
+    output = io.BytesIO()
+    df.to_parquet(output, index=False)
+    return output.getvalue()
+
+def frame_from_bytes(data):
+    """frame_to_bytes のバイト列（bytes / mmap）から DataFrame を復元"""
+    return pd.read_parquet(io.BytesIO(data))
+
+def store_sheet_frame(store, df):
+    """タブの DataFrame をブロブに保存して SheetFrameRef を返す"""
+    return SheetFrameRef(*store.put(frame_to_bytes(df)))
+
+def frame_digest(df):
+    """DataFrame の内容のハッシュ（処理済みキャッシュのキー用）"""
+    hasher = hashlib.sha256()
+    hasher.update("\0".join(map(str, df.columns)).encode('utf-8'))
+    hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return hasher.hexdigest()
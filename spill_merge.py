@@ -0,0 +1,242 @@
+"""
+spill_merge.py - ディスク退避による統合・重複削除
+メモリ予算を超えた取り込みで、処理済み DataFrame を重複判定のキーのハッシュで区分け（パーティション）して
+一時ディレクトリに Parquet（pyarrow がない・数値と文字列が混在する列などで書けない場合は pickle）で書き出し、
+区分けごとに読み戻して重複削除する。値は変換せずにそのまま読み戻す。
+同じキーの行は必ず同じ区分けに入るため、同時にメモリに載るのは1区分けと残った行だけになる。
+
+結果はメモリ内の統合（列名順に列をそろえ、ない列は空文字で結合 → remove_duplicates_lightweight、
+既存データがあれば pd.concat([既存, 新規]) → remove_duplicates_lightweight）と同じ行を同じ順で返す
+（会社名のゆれの統合は区分け＝展示会名ごとに行うため、統合の候補は同じ展示会名の中に限られる）。
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from date_normalize import DATE_KEY_COLUMNS, MISSING_DATE_KEY
+from dedup import dedup_groups, latest_positions, row_dates
+
+SPILL_DIR = os.environ.get("SPILL_DIR", os.path.join("data", "spill"))
+# 区分けの数（1区分けのデータがメモリに載る）
+SPILL_PARTITIONS = int(os.environ.get("SPILL_PARTITIONS", "32"))
+# この大きさまでたまったらまとめて書き出す（小さいファイルが大量にできるのを防ぐ）
+SPILL_FLUSH_MB = int(os.environ.get("SPILL_FLUSH_MB", "64"))
+
+# 行の並び（ファイルの順 << 32 | ファイル内の行番号）と日付キー
+SEQ_COLUMN = "_spill_seq"
+DATE_COLUMN = "_spill_date"
+_ROW_BITS = 32
+
+try:
+    import pyarrow  # noqa: F401
+    SPILL_FORMAT = "parquet"
+except ImportError:
+    SPILL_FORMAT = "pickle"
+
+def unique_column_names(columns):
+    """重複する列名に _dup1, _dup2 … を付けた列名（merge_processed_frames の前処理と同じ）"""
+    seen = {}
+    names = []
+    for column in columns:
+        name = str(column)
+        if name in seen:
+            seen[name] += 1
+            names.append(f"{name}_dup{seen[name]}")
+        else:
+            seen[name] = 0
+            names.append(name)
+    return names
+
+def partition_ids(df, columns, partitions):
+    """キー列のハッシュによる区分け番号（どの DataFrame でも同じ値は同じ区分け）"""
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for column in columns:
+        if column in df.columns:
+            values = df[column].fillna('').astype(str).to_numpy(dtype=object)
+        else:
+            values = np.full(len(df), '', dtype=object)
+        hashes = hashes * np.uint64(1000003) ^ pd.util.hash_array(values)
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+def _fill_value(column):
+    # 列がなかった DataFrame の値（メモリ内の統合と同じく空文字、日付キーは MISSING_DATE_KEY）
+    return MISSING_DATE_KEY if column in DATE_KEY_COLUMNS else ""
+
+def _align(frames, columns):
+    """列をそろえて結合（ない列は _fill_value）"""
+    aligned = []
+    for frame in frames:
+        missing = [column for column in columns if column not in frame.columns]
+        if missing:
+            frame = frame.assign(**{column: _fill_value(column) for column in missing})
+        aligned.append(frame[columns])
+    return pd.concat(aligned, ignore_index=True)
+
+class SpillMerger:
+    """処理済み DataFrame をディスクに退避し、区分けごとに重複削除して統合する"""
+
+    def __init__(self, fuzzy_companies=False, directory=None, partitions=SPILL_PARTITIONS,
+                 flush_bytes=SPILL_FLUSH_MB * 1024 * 1024):
+        self.fuzzy_companies = fuzzy_companies
+        # 会社名のゆれを統合する場合は会社名が一致しなくても同じ区分けに入るよう展示会名だけで分ける
+        self.partition_columns = ['展示会名'] if fuzzy_companies else ['展示会名', '会社名']
+        self.partitions = partitions
+        self.flush_bytes = flush_bytes
+        base = SPILL_DIR if directory is None else directory
+        os.makedirs(base, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="merge-", dir=base)
+        self.columns = []
+        self.sources = 0
+        self.rows = 0
+        self.bytes_written = 0
+        self.files_written = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._flushes = 0
+
+    def add(self, df, order, nbytes=None):
+        """DataFrame を追加（order の小さい順・同じ order 内は行の順に先に出てきた行として扱う）"""
+        df = df.reset_index(drop=True)
+        df.columns = unique_column_names(df.columns)
+        _add_order_columns(df, order)
+        for column in df.columns:
+            if column not in (DATE_COLUMN, SEQ_COLUMN) and column not in self.columns:
+                self.columns.append(column)
+        self.sources += 1
+        self._pending.append(df)
+        self._pending_bytes += nbytes if nbytes is not None else int(df.memory_usage(deep=True).sum())
+        self.rows += len(df)
+        if self._pending_bytes >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        """たまった DataFrame を区分けごとのファイルに書き出す"""
+        if not self._pending:
+            return
+        columns = list(dict.fromkeys(column for frame in self._pending for column in frame.columns))
+        batch = _align(self._pending, columns)
+        self._pending = []
+        self._pending_bytes = 0
+        ids = partition_ids(batch, self.partition_columns, self.partitions)
+        # 区分け順に1回だけ並べ替え、連続する範囲を書き出す
+        order = np.argsort(ids, kind='stable')
+        batch = batch.take(order)
+        sorted_ids = ids[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_ids)) + 1))
+        ends = np.concatenate((starts[1:], [len(sorted_ids)]))
+        for start, end in zip(starts, ends):
+            if end > start:
+                self._write(batch.iloc[start:end], int(sorted_ids[start]))
+        self._flushes += 1
+
+    def _write(self, part, partition):
+        path = os.path.join(self.directory, f"p{partition:04d}-{self._flushes:06d}")
+        written = None
+        if SPILL_FORMAT == "parquet":
+            try:
+                part.to_parquet(f"{path}.parquet", index=False)
+                written = f"{path}.parquet"
+            except Exception:
+                # 数値と文字列が混在する列などは値を変えずに pickle で書く（この退避で書いた一時ファイルだけを読む）
+                if os.path.exists(f"{path}.parquet"):
+                    os.unlink(f"{path}.parquet")
+        if written is None:
+            written = f"{path}.pickle"
+            part.to_pickle(written)
+        self.bytes_written += os.path.getsize(written)
+        self.files_written += 1
+
+    def _read_partition(self, partition):
+        prefix = f"p{partition:04d}-"
+        paths = sorted(name for name in os.listdir(self.directory) if name.startswith(prefix))
+        if not paths:
+            return None
+        columns = self.columns + [DATE_COLUMN, SEQ_COLUMN]
+        return _align([_read_file(os.path.join(self.directory, name)) for name in paths], columns)
+
+    def merge(self, existing=None):
+        """区分けごとに重複削除した結果（メモリ内の統合と同じ列・行・順）と会社名統合の統計を返す
+
+        existing（既存の統合データ）は追加した DataFrame より前の行として扱い、メモリ内の統合と同じく
+        pd.concat([既存, 新規]) の列順・欠損値で結合する（既存データはメモリにあるため退避しない）
+        """
+        self.flush()
+        new_columns = sorted(self.columns) if self.sources > 1 else self.columns
+        existing_parts = {}
+        if existing is not None and len(existing.columns):
+            columns = list(existing.columns) + [column for column in new_columns if column not in existing.columns]
+            existing = _add_order_columns(existing.reset_index(drop=True), -1)
+            existing_parts = _partition_positions(existing, self.partition_columns, self.partitions)
+        else:
+            existing = None
+            columns = new_columns
+        survivors = []
+        resolutions = []
+        for partition in range(self.partitions):
+            part = self._read_partition(partition)
+            if partition in existing_parts:
+                old = existing.take(existing_parts[partition])
+                part = old if part is None else pd.concat([old, part], ignore_index=True)
+            if part is None:
+                continue
+            groups, resolution = dedup_groups(part, self.fuzzy_companies)
+            if resolution:
+                resolutions.append(resolution)
+            positions = latest_positions(groups, part[DATE_COLUMN].to_numpy(dtype=np.int64))
+            survivors.append(part.take(positions))
+            del part
+        if not survivors:
+            return pd.DataFrame(columns=columns), combine_resolutions(resolutions)
+        merged = pd.concat(survivors, ignore_index=True)
+        del survivors
+        # 全体を（日付の新しい順, 元の順）で並べる
+        positions = np.lexsort((merged[SEQ_COLUMN].to_numpy(), -merged[DATE_COLUMN].to_numpy(dtype=np.int64)))
+        merged = merged.take(positions).drop(columns=[DATE_COLUMN, SEQ_COLUMN])
+        # メモリ内の統合と同じ列順（複数の DataFrame は列名順、既存データがあればその列が先）
+        return merged[columns].reset_index(drop=True), combine_resolutions(resolutions)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def summary(self):
+        return (f"ディスク退避: {self.rows}行 / {self.files_written}ファイル・{self.bytes_written / 1024 / 1024:.1f}MB"
+                f"（{self.partitions}区分け、{SPILL_FORMAT}）")
+
+def _add_order_columns(df, order):
+    """日付キーと行の並び（order << 32 | 行番号）の列を追加"""
+    dates = row_dates(df)
+    df[DATE_COLUMN] = dates if dates is not None else MISSING_DATE_KEY
+    df[SEQ_COLUMN] = (np.int64(order) << _ROW_BITS) + np.arange(len(df), dtype=np.int64)
+    return df
+
+def _partition_positions(df, columns, partitions):
+    """区分け番号ごとの行の位置（元の順）"""
+    ids = partition_ids(df, columns, partitions)
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_ids)) + 1))
+    ends = np.concatenate((starts[1:], [len(sorted_ids)]))
+    return {int(sorted_ids[start]): order[start:end] for start, end in zip(starts, ends) if end > start}
+
+def _read_file(path):
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+
+def combine_resolutions(resolutions):
+    """区分けごとの会社名統合の統計をまとめる（統合しなかった場合は None）"""
+    if not resolutions:
+        return None
+    combined = {key: sum(resolution[key] for resolution in resolutions)
+                for key in ('names', 'clusters', 'merged_clusters', 'names_merged', 'normalized_merges',
+                            'candidate_pairs', 'fuzzy_merges', 'seconds')}
+    combined['examples'] = [names for resolution in resolutions for names in resolution['examples']][:5]
+    return combined
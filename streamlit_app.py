@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 import requests
 from datetime import datetime
@@ -9,9 +10,34 @@ import zipfile
 import io
 import logging
 import csv
+import functools
+import hashlib
+import time
 from charset_normalizer import detect
 from notion_client import Client
 import json
+from schema_cache import get_schema_cache, rename_by_position, rules_fingerprint
+from notion_access import NotionRateLimiter, QueryResultCache, RateLimitedClient
+from notion_mirror import get_notion_mirror
+from pipeline import PIPELINE_DOWNLOAD_WORKERS, FilePipeline
+from blob_store import BlobNotFound, get_blob_store, open_content
+from download_planner import DownloadPlanner, SharedFrames, download_key, frame_key
+from frame_cache import frame_cache_key, get_frame_cache
+from sheets_api import (
+    SHEET_FRAME_EXT, SHEETS_EXPORT_BASE, SheetFrameRef, fetch_sheet_frames, frame_digest, frame_from_bytes,
+    store_sheet_frame
+)
+from async_fetch import create_fetcher
+from date_normalize import DATE_KEY_COLUMNS, DATE_RULES_VERSION, MISSING_DATE_KEY, add_date_keys, drop_date_keys
+from dedup import dedup_groups, latest_positions, row_dates
+from company_resolution import FUZZY_COMPANY_DEDUP, resolution_summary
+from instrumentation import NULL_RECORDER, RunRecorder
+from memory_governor import FrameCollector, MemoryGovernor
+from excel_reader import read_excel
+from xlsx_writer import available_xlsx_engines, dataframe_to_xlsx_bytes
+from column_rules import (
+    Cond, RULES_ENGINE_VERSION, build_rename_index, compile_decision_table, normalize_column_key
+)
 
 # ページ設定
 st.set_page_config(
@@ -24,6 +50,8 @@ st.set_page_config(
 DEFAULT_NOTION_API_KEY = ""
 DEFAULT_DATABASE_ID = ""
 DEFAULT_GOOGLE_SHEETS_API_KEY = ""
+# Notion API の接続先（負荷試験ではローカルの代替サーバーを指定する）
+NOTION_BASE_URL = os.environ.get("NOTION_BASE_URL")
 
 
 # セッション状態の初期化
@@ -33,6 +61,10 @@ if 'processed_files' not in st.session_state:
     st.session_state.processed_files = []
 if 'processing_stats' not in st.session_state:
     st.session_state.processing_stats = {}
+if 'merged_data_version' not in st.session_state:
+    st.session_state.merged_data_version = 0
+if 'notion_query_cache' not in st.session_state:
+    st.session_state.notion_query_cache = QueryResultCache()
 
 # メモリ使用量警告設定
 if 'memory_warning_shown' not in st.session_state:
@@ -121,6 +153,73 @@ COLUMN_RENAMES = {
 REQUIRED_COLUMNS = ["メールアドレス", "展示会名", "担当者", "業界", "Tel", "会社名"]
 KEY_COLS = ["展示会名", "業界", "会社名"]
 
+# Notionのカテゴリ別分類: カテゴリ → 「メールアドレス（有無）」の選択肢
+NOTION_CATEGORY_PROPERTY = "メールアドレス（有無）"
+NOTION_CATEGORY_SELECTS = {
+    "📧メールあり": ["あり"],
+    "📞TELあり": ["TELとURL", "Tel、住所、URL"],
+    "🌐URLあり": ["社名・住所・URL", "社名とURL（直で企業HPリンク）", "社名とURLのみ"],
+    "🏢出展社名のみ": ["出展社名のみ", "社名・住所"],
+}
+
+# 削除する列（ブース番号、小間番号、ロゴURL）のキーワード
+UNNEEDED_COLUMN_KEYWORDS = ['ブース番号', '小間番号', 'ロゴurl', 'ロゴ url', 'logo', 'booth', '小間', 'ブース']
+# SNS URL や その他のURLとして列名変換から除外するパターン
+EXCLUDED_COLUMN_PATTERNS = [
+    'facebook', 'twitter', 'instagram', 'linkedin', 'tiktok', 'youtube',
+    'sns', 'social', '抽出元', 'ロゴ', 'logo'
+]
+
+# 完全一致用の索引（正規化キー → 変換先）
+COLUMN_RENAME_INDEX = build_rename_index(COLUMN_RENAMES)
+
+# 部分一致の判定表（軽量版）
+LIGHTWEIGHT_PARTIAL_RULES = [
+    (Cond(contains=['tel'], excludes=['url']), 'Tel'),
+    (Cond(contains=['mail'], excludes=['url']), 'メールアドレス'),
+    (Cond(contains=['会社', '企業'], excludes=['url']), '会社名'),
+    (Cond(equals=['url', 'website'], max_len=15), 'Website'),
+    (Cond(contains=['展示会初日', '開始日', '初日', '開催日'], excludes=['url']), '展示会初日'),
+]
+
+# 部分一致の判定表（詳細版）: 入口条件に合った行で判定を打ち切る
+DETAILED_PARTIAL_RULES = [
+    # 電話番号系
+    (Cond(contains=['tel'], excludes=['url']), 'Tel'),
+    # メールアドレス系
+    (Cond(contains=['mail', 'メール'], excludes=['url']),
+     [(Cond(contains=['address', 'アドレス']), 'メールアドレス')]),
+    # 会社名系（URLを除外）
+    (Cond(excludes=['url', 'link']),
+     [(Cond(contains=['会社', '企業', '社名']), '会社名'),
+      (Cond(contains=['company'], max_len=20), '会社名')]),
+    # ウェブサイト系（企業の公式サイトのみ）
+    (Cond(contains_cased=['ウェブサイト', 'ホームページ', 'HP']), 'Website'),
+    (Cond(equals=['url', 'website', 'homepage'], max_len=15), 'Website'),
+    # 担当者系
+    (Cond(contains=['担当', '氏名', '名前'], excludes=['url']),
+     [(Cond(excludes=['会社', '企業']), '担当者')]),
+    # 住所系
+    (Cond(contains=['住所', '所在地'], excludes=['url']), 'Address'),
+    # 業界系
+    (Cond(contains=['業界', '業種', '分野'], excludes=['url']), '業界'),
+    # 展示会初日系
+    (Cond(contains=['展示会初日', '開始日', '初日', '開催日'], excludes=['url']), '展示会初日'),
+]
+
+match_lightweight_partial = compile_decision_table(LIGHTWEIGHT_PARTIAL_RULES)
+match_detailed_partial = compile_decision_table(DETAILED_PARTIAL_RULES)
+
+# 列名ルールのバージョン（ルール変更時に列構成キャッシュを無効化）
+COLUMN_RULES_VERSION = rules_fingerprint(
+    RULES_ENGINE_VERSION, COLUMN_RENAMES, UNNEEDED_COLUMN_KEYWORDS, EXCLUDED_COLUMN_PATTERNS,
+    LIGHTWEIGHT_PARTIAL_RULES, DETAILED_PARTIAL_RULES
+)
+
+# 読み込み・正規化処理のバージョン（処理内容を変えたら上げる。処理済みキャッシュを無効化）
+PROCESSING_VERSION = 2
+FRAME_PIPELINE_VERSION = rules_fingerprint(PROCESSING_VERSION, COLUMN_RULES_VERSION, DATE_RULES_VERSION)
+
 # データ抽出・正規化関数
 def extract_email_from_text(text):
     """テキストからメールアドレスを抽出"""
@@ -169,6 +268,45 @@ def extract_phone_from_text(text):
     
     return ""
 
+CONTACT_KEYWORDS = ['問い合わせ先', '連絡先', 'お問い合わせ先', 'contact', '問合せ先', '連絡']
+
+def contact_columns(df):
+    """連絡先系の列（自由記述にメールアドレス・電話番号が含まれる列）"""
+    return [c for c in df.columns if any(keyword in str(c).lower() for keyword in CONTACT_KEYWORDS)]
+
+def extract_contacts(df, stats, contact_cols=None):
+    """連絡先系の列からメールアドレスとTELを抽出して空欄を埋め、列ごとの (列名, メール件数, TEL件数) を返す"""
+    if contact_cols is None:
+        contact_cols = contact_columns(df)
+    extracted = []
+    if not contact_cols:
+        return extracted
+    
+    # 必要カラムを事前に確保
+    if 'メールアドレス' not in df.columns:
+        df['メールアドレス'] = ''
+    if 'Tel' not in df.columns:
+        df['Tel'] = ''
+    
+    for col in contact_cols:
+        # メールアドレス抽出
+        temp_emails = df[col].apply(extract_email_from_text)
+        email_mask = (df['メールアドレス'] == '') & (temp_emails != '')
+        emails = int(email_mask.sum())
+        if emails:
+            df.loc[email_mask, 'メールアドレス'] = temp_emails[email_mask]
+            stats["email_extracted"] += emails
+        
+        # 電話番号抽出
+        temp_phones = df[col].apply(extract_phone_from_text)
+        phone_mask = (df['Tel'] == '') & (temp_phones != '')
+        phones = int(phone_mask.sum())
+        if phones:
+            df.loc[phone_mask, 'Tel'] = temp_phones[phone_mask]
+            stats["tel_extracted"] += phones
+        extracted.append((col, emails, phones))
+    return extracted
+
 def normalize_phone(phone_str):
     """電話番号を統一フォーマットに整理"""
     if pd.isna(phone_str) or phone_str == "":
@@ -227,13 +365,43 @@ def extract_sheet_id(url):
     
     return None
 
+# よくある誤字の修正ルール（上から順に適用。新しいルールは末尾に追加）
+EMAIL_TYPO_RULES = [
+    ('@@', '@'),
+    ('..', '.'),
+    ('.comm', '.com'),
+    ('co.jo', 'co.jp'),
+    ('co..jp', 'co.jp'),
+    ('co.jｐ', 'co.jp'),
+    ('cojp', 'co.jp'),
+    ('.con', '.com'),
+    ('.cm', '.com'),
+    ('.cpm', '.com'),
+    ('gmail.co', 'gmail.com'),
+    ('yahoo.co,jp', 'yahoo.co.jp'),
+]
+
+# メールアドレスに含まれるべきでない文字（?・空白・改行・タブもここで削除される）
+EMAIL_INVALID_CHARS = re.compile(r'[^a-zA-Z0-9@._\-+]')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+def compile_email_typo_rules(rules):
+    """誤字ルールを検出用の1本の正規表現にまとめる"""
+    trigger = re.compile('|'.join(re.escape(wrong) for wrong, _ in rules))
+    return trigger, tuple(rules)
+
+EMAIL_TYPO_TRIGGER, COMPILED_EMAIL_TYPO_RULES = compile_email_typo_rules(EMAIL_TYPO_RULES)
+
 def fix_email_address(email):
     """メールアドレスを修正する関数"""
     if pd.isna(email) or str(email).strip() == '':
         return ''
     
-    email = str(email).strip()
-    
+    return _fix_email_text(str(email).strip())
+
+@functools.lru_cache(maxsize=65536)
+def _fix_email_text(email):
+    """前後空白除去済みのメールアドレスを修正（同じ値は再計算しない）"""
     # 全角＠を半角@に変換
     email = email.replace('＠', '@')
     
@@ -243,35 +411,14 @@ def fix_email_address(email):
         domain_part = domain_part.replace(',', '.')
         email = f"{local_part}@{domain_part}"
     
-    # よくある誤字の修正
-    replacements = [
-        ('@@', '@'),
-        ('..', '.'),
-        ('.comm', '.com'),
-        ('co.jo', 'co.jp'),
-        ('co..jp', 'co.jp'),
-        ('co.jｐ', 'co.jp'),
-        ('cojp', 'co.jp'),
-        ('.con', '.com'),
-        ('.cm', '.com'),
-        ('.cpm', '.com'),
-        ('gmail.co', 'gmail.com'),
-        ('yahoo.co,jp', 'yahoo.co.jp'),
-    ]
-    
-    for wrong, correct in replacements:
-        email = email.replace(wrong, correct)
-    
-    # 不要な文字を削除
-    email = email.replace('?', '')
-    email = email.replace(' ', '')
-    email = email.replace('　', '')
-    email = email.replace('\n', '')
-    email = email.replace('\r', '')
-    email = email.replace('\t', '')
+    # よくある誤字の修正（どのルールにも当たらない大半のアドレスは1回の走査で終わる）
+    if EMAIL_TYPO_TRIGGER.search(email):
+        for wrong, correct in COMPILED_EMAIL_TYPO_RULES:
+            if wrong in email:
+                email = email.replace(wrong, correct)
     
-    # メールアドレスに含まれるべきでない文字を削除
-    email = re.sub(r'[^a-zA-Z0-9@._\-+]', '', email)
+    # 不要な文字・メールアドレスに含まれるべきでない文字を削除
+    email = EMAIL_INVALID_CHARS.sub('', email)
     
     # @が複数ある場合は最初の@以外を削除
     at_count = email.count('@')
@@ -309,90 +456,120 @@ def fix_email_address(email):
         email = f"{local}@{domain}"
     
     # 最終的な妥当性チェック
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_pattern, email):
+    if not EMAIL_PATTERN.match(email):
         return ''
     
     return email.lower()
 
+def fix_email_series(series):
+    """列単位でメールアドレスを修正（ユニーク値ごとに1回だけ計算）"""
+    mapping = {value: fix_email_address(value) for value in series.dropna().unique()}
+    return series.map(mapping).fillna('').astype(object)
+
+# SNSごとの列パターン
+SNS_COLUMN_PATTERNS = {
+    'YouTube': ['YouTube', 'Youtube', 'YouTube企業URL', 'Youtube企業URL', 'youtube'],
+    'Instagram': ['Instagram', 'instagram', 'Instagram企業URL', 'インスタグラム'],
+    'Facebook': ['Facebook', 'facebook', 'Facebook企業URL', 'フェイスブック'],
+    'Twitter': ['Twitter', 'twitter', 'Twitter企業URL', 'X', 'X_twitter', 'x'],
+    'LinkedIn': ['LinkedIn', 'linkedin', 'linkedin企業URL', 'リンクトイン'],
+    'TikTok': ['TikTok', 'tiktok', 'TikTok企業URL', 'ティックトック']
+}
+
+# 重複する住所、電話番号、メールアドレス列などのパターン
+DUPLICATE_COLUMN_PATTERNS = {
+    'Address': ['Address', 'Address_dup1', '住所', '住所.1', '住所すべて'],
+    'Tel': ['Tel', 'Tel_dup1', 'Tel_dup2', 'Tel_dup3', '電話番号', '電話'],
+    'メールアドレス': ['メールアドレス', 'メールアドレス_dup1', 'メールアドレス２'],
+    'Website': ['Website', 'Website_dup1', 'WEB_Site', 'ホームページURL', 'URL', 'URL2', 'URL_コピー'],
+    '会社名': ['会社名', '会社名_dup1', '会社名_dup2', '会社名_dup3', '会社名_dup4'],
+    '業界': ['業界', '業界_dup1']
+}
+
+EMAIL_COLUMN_KEYWORDS = ['mail', 'email', 'メール', 'e-mail']
+
+def plan_sns_merge(columns):
+    """列構成ごとの統合プランを作成（列名の照合は列構成ごとに1回だけ行う）"""
+    return _plan_sns_merge(tuple(columns))
+
+@functools.lru_cache(maxsize=1024)
+def _plan_sns_merge(columns):
+    """plan_sns_merge の本体（長時間動かすサーバーでも列構成の数だけ増えないよう件数を制限してキャッシュ）"""
+    current = list(columns)
+    steps = []
+    
+    # 各SNSについて列を統合
+    for sns_name, patterns in SNS_COLUMN_PATTERNS.items():
+        lowered = [pattern.lower() for pattern in patterns]
+        matching_cols = [col for col in current if any(pattern in str(col).lower() for pattern in lowered)]
+        
+        if len(matching_cols) > 1:
+            # 統合列を設定した後、元の列をすべて削除
+            steps.append(('coalesce', sns_name, matching_cols, matching_cols))
+            if sns_name not in current:
+                current.append(sns_name)
+            current = [col for col in current if col not in matching_cols]
+        elif len(matching_cols) == 1:
+            # 1列のみの場合は列名を統一
+            steps.append(('rename', sns_name, matching_cols, []))
+            current = [sns_name if col == matching_cols[0] else col for col in current]
+    
+    for target_name, patterns in DUPLICATE_COLUMN_PATTERNS.items():
+        matching_cols = [col for col in current if col in patterns]
+        
+        if len(matching_cols) > 1:
+            # 元の列を削除（ターゲット名は保持）
+            cols_to_drop = [col for col in matching_cols if col != target_name]
+            steps.append(('coalesce', target_name, matching_cols, cols_to_drop))
+            if target_name not in current:
+                current.append(target_name)
+            current = [col for col in current if col not in cols_to_drop]
+    
+    email_columns = [col for col in current
+                     if any(keyword in str(col).lower() for keyword in EMAIL_COLUMN_KEYWORDS)]
+    
+    return steps, email_columns
+
+def coalesce_columns(df, columns):
+    """左から順に最初の非空値を取り出す（空白のみの値は空扱い、すべて空なら''）"""
+    block = df[columns]
+    result = pd.Series('', index=df.index, dtype=object)
+    # 右の列から順に非空の値で上書き（列方向の bfill を列単位のマスク演算で行う）
+    for position in range(block.shape[1] - 1, -1, -1):
+        values = block.iloc[:, position]
+        non_empty = values.notna() & (values.astype(str).str.strip() != '')
+        result = values.astype(object).where(non_empty, result)
+    return result
+
+def _stripped_text(series):
+    """比較用に欠損を''にして前後空白を除いた文字列に変換"""
+    return series.where(series.notna(), '').astype(str).str.strip()
+
 def merge_sns_columns(df):
     """SNS関連の重複列を統合する関数"""
     try:
-        # SNSごとの列パターンを定義
-        sns_patterns = {
-            'YouTube': ['YouTube', 'Youtube', 'YouTube企業URL', 'Youtube企業URL', 'youtube'],
-            'Instagram': ['Instagram', 'instagram', 'Instagram企業URL', 'インスタグラム'],
-            'Facebook': ['Facebook', 'facebook', 'Facebook企業URL', 'フェイスブック'],
-            'Twitter': ['Twitter', 'twitter', 'Twitter企業URL', 'X', 'X_twitter', 'x'],
-            'LinkedIn': ['LinkedIn', 'linkedin', 'linkedin企業URL', 'リンクトイン'],
-            'TikTok': ['TikTok', 'tiktok', 'TikTok企業URL', 'ティックトック']
-        }
-        
-        # 各SNSについて列を統合
-        for sns_name, patterns in sns_patterns.items():
-            # 該当する列を探す
-            matching_cols = []
-            for col in df.columns:
-                if any(pattern.lower() in str(col).lower() for pattern in patterns):
-                    matching_cols.append(col)
-            
-            # 複数の列がある場合は統合
-            if len(matching_cols) > 1:
-                # 最初の非空値を取得
-                df[sns_name] = df[matching_cols].apply(
-                    lambda row: next((val for val in row if pd.notna(val) and str(val).strip()), ''), 
-                    axis=1
-                )
-                # 元の列を削除
-                df = df.drop(columns=matching_cols)
-                st.info(f"🔄 {sns_name}列を統合しました（{len(matching_cols)}列 → 1列）")
-            elif len(matching_cols) == 1:
-                # 1列のみの場合は列名を統一
-                df = df.rename(columns={matching_cols[0]: sns_name})
-        
-        # 重複する住所、電話番号、メールアドレス列も統合
-        duplicate_patterns = {
-            'Address': ['Address', 'Address_dup1', '住所', '住所.1', '住所すべて'],
-            'Tel': ['Tel', 'Tel_dup1', 'Tel_dup2', 'Tel_dup3', '電話番号', '電話'],
-            'メールアドレス': ['メールアドレス', 'メールアドレス_dup1', 'メールアドレス２'],
-            'Website': ['Website', 'Website_dup1', 'WEB_Site', 'ホームページURL', 'URL', 'URL2', 'URL_コピー'],
-            '会社名': ['会社名', '会社名_dup1', '会社名_dup2', '会社名_dup3', '会社名_dup4'],
-            '業界': ['業界', '業界_dup1']
-        }
+        steps, email_columns = plan_sns_merge(df.columns)
         
-        for target_name, patterns in duplicate_patterns.items():
-            matching_cols = [col for col in df.columns if col in patterns]
+        for action, target_name, matching_cols, cols_to_drop in steps:
+            if action == 'rename':
+                df = df.rename(columns={matching_cols[0]: target_name})
+                continue
             
-            if len(matching_cols) > 1:
-                # 最初の非空値を取得
-                df[target_name] = df[matching_cols].apply(
-                    lambda row: next((val for val in row if pd.notna(val) and str(val).strip()), ''), 
-                    axis=1
-                )
-                # 元の列を削除（ターゲット名は保持）
-                cols_to_drop = [col for col in matching_cols if col != target_name]
-                df = df.drop(columns=cols_to_drop)
-                st.info(f"🔄 {target_name}列を統合しました（{len(matching_cols)}列 → 1列）")
+            # 最初の非空値を取得
+            df[target_name] = coalesce_columns(df, matching_cols)
+            df = df.drop(columns=cols_to_drop)
+            st.info(f"🔄 {target_name}列を統合しました（{len(matching_cols)}列 → 1列）")
         
         # メールアドレス列の修正を実行
-        email_columns = []
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if any(keyword in col_lower for keyword in ['mail', 'email', 'メール', 'e-mail']):
-                email_columns.append(col)
-        
         if email_columns:
             fixed_count = 0
             for col in email_columns:
-                original_emails = df[col].copy()
-                df[col] = df[col].apply(fix_email_address)
+                original_emails = _stripped_text(df[col])
+                df[col] = fix_email_series(df[col])
                 
                 # 修正された件数をカウント
-                for orig, fixed in zip(original_emails, df[col]):
-                    orig_str = str(orig).strip() if pd.notna(orig) else ''
-                    fixed_str = str(fixed).strip() if pd.notna(fixed) else ''
-                    if orig_str != fixed_str and orig_str != '':
-                        fixed_count += 1
+                fixed_emails = _stripped_text(df[col])
+                fixed_count += int(((original_emails != fixed_emails) & (original_emails != '')).sum())
             
             if fixed_count > 0:
                 st.info(f"📧 メールアドレスを修正しました（{fixed_count}件）")
@@ -403,8 +580,11 @@ def merge_sns_columns(df):
         st.warning(f"SNS列統合中にエラーが発生しました: {e}")
         return df
 
-def google_sheet_to_csv_with_api(sheet_url, google_api_key=None):
-    """Google Sheets APIを使用してCSVデータを取得"""
+def google_sheet_frames_with_api(sheet_url, google_api_key=None, all_tabs=False, show_errors=True, session=requests):
+    """Google Sheets APIでタブをまとめて取得し、[(ファイル名の接尾辞, DataFrame)] を返す（CSVを経由しない）
+
+    先頭はURLのタブ（gid指定がなければ最初のタブ）で接尾辞なし、他のタブは「_タブ名」を付ける
+    """
     if not google_api_key:
         return None
     
@@ -412,30 +592,22 @@ def google_sheet_to_csv_with_api(sheet_url, google_api_key=None):
     if not sheet_id:
         return None
     
-    # Google Sheets API URL
-    api_url = f"https://sheets.googleapis.com/v4/spreadsheets/{sheet_id}/values/A:ZZ?key={google_api_key}"
+    gid_match = re.search(r"[#&]gid=([0-9]+)", sheet_url)
+    gid = int(gid_match.group(1)) if gid_match else None
     
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        
-        data = response.json()
-        values = data.get('values', [])
-        
-        if not values:
+        tabs = fetch_sheet_frames(sheet_id, google_api_key, gid=gid, all_tabs=all_tabs, session=session)
+        if not tabs or len(tabs[0][2].columns) == 0:
             return None
-        
-        # CSVフォーマットに変換
-        import csv
-        output = io.StringIO()
-        writer = csv.writer(output)
-        for row in values:
-            writer.writerow(row)
-        
-        return output.getvalue().encode('utf-8')
+        frames = [("", tabs[0][2])]
+        frames += [(f"_{title}", df) for _, title, df in tabs[1:] if len(df.columns) > 0]
+        return frames
         
     except Exception as e:
-        st.warning(f"Google Sheets API エラー: {e}")
+        if show_errors:
+            st.warning(f"Google Sheets API エラー: {e}")
+        else:
+            logging.warning(f"Google Sheets API エラー: {e}")
         return None
 
 def google_sheet_to_csv_url(sheet_url):
@@ -446,7 +618,7 @@ def google_sheet_to_csv_url(sheet_url):
     
     gid_match = re.search(r"[#&]gid=([0-9]+)", sheet_url)
     gid = gid_match.group(1) if gid_match else "0"
-    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
+    return f"{SHEETS_EXPORT_BASE}/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
 
 def safe_concat_dataframes(chunk, debug_mode=False):
     """安全にDataFrameを結合する関数"""
@@ -531,6 +703,50 @@ def safe_concat_dataframes(chunk, debug_mode=False):
             # 方法3: 最後の手段として最初のDataFrameのみ返す
             return safe_chunk[0].copy().reset_index(drop=True) if safe_chunk else pd.DataFrame()
 
+def resolve_detailed_column_plan(columns):
+    """ヘッダーから列名解決プラン（厳密なマッピング・除外・変換後の重複回避）を作成
+
+    元の列は位置で参照する: rename / columns は位置ごとの変換後の列名（変換しない列は None）、
+    excluded は除外した列の位置、collisions は (位置, 重複を避けた列名)
+    """
+    # 列名正規化（完全一致を索引で引き、なければ部分一致の判定表）
+    rename_dict = {}
+    for col in columns:
+        new_name = COLUMN_RENAME_INDEX.get(normalize_column_key(col)) or match_detailed_partial(col)
+        if new_name:
+            rename_dict[col] = new_name
+    
+    # 除外パターンに該当する列は変換しない
+    for col, new_name in list(rename_dict.items()):
+        col_lower = col.lower()
+        if any(pattern in col_lower for pattern in EXCLUDED_COLUMN_PATTERNS):
+            if 'url' in col_lower or 'link' in col_lower:
+                del rename_dict[col]  # SNS URLは変換しない
+    
+    excluded = [position for position, col in enumerate(columns) if col not in rename_dict and
+                any(pattern in col.lower() for pattern in EXCLUDED_COLUMN_PATTERNS + ['url', 'link'])]
+    
+    # 変換後の列名が重複しないようにする
+    new_column_names = []
+    collisions = []
+    used_names = set()
+    for position, col in enumerate(columns):
+        name = rename_dict.get(col, col)
+        if name in used_names:
+            # 重複する場合は番号を追加
+            counter = 2
+            unique_name = f"{name}_{counter}"
+            while unique_name in used_names:
+                counter += 1
+                unique_name = f"{name}_{counter}"
+            collisions.append([position, unique_name])
+            name = unique_name
+        new_column_names.append(None if name is col else name)
+        used_names.add(name)
+    
+    return {'rename': [rename_dict.get(col) for col in columns], 'excluded': excluded,
+            'columns': new_column_names, 'collisions': collisions}
+
 def process_dataframe(df, filename):
     """データフレームの高度な処理（安全版）"""
     try:
@@ -547,7 +763,7 @@ def process_dataframe(df, filename):
         for col in df.columns:
             col_lower = str(col).lower().strip()
             # ブース番号、小間番号、ロゴURLを削除
-            if any(keyword in col_lower for keyword in ['ブース番号', '小間番号', 'ロゴurl', 'ロゴ url', 'logo', 'booth', '小間', 'ブース']):
+            if any(keyword in col_lower for keyword in UNNEEDED_COLUMN_KEYWORDS):
                 columns_to_drop.append(col)
                 st.info(f"🗑️ 不要列削除: {col}")
         
@@ -615,72 +831,12 @@ def process_dataframe(df, filename):
         # Step 3: インデックスをリセット（重複対策）
         df = df.reset_index(drop=True)
         
-        # 列名正規化（厳密なマッピングのみ使用）
-        rename_dict = {}
-        for col in df.columns:
-            col_clean = str(col).strip()
-            col_lower = col_clean.lower()
-            
-            # 1. 完全一致による変換（最優先）
-            for old_name, new_name in COLUMN_RENAMES.items():
-                if col_lower == old_name.lower():
-                    rename_dict[col] = new_name
-                    break
-            
-            # 2. 厳密な部分マッチング（必要最小限のみ）
-            if col not in rename_dict:
-                # 電話番号系（TEL、電話を含む）
-                if any(keyword in col_lower for keyword in ['tel', 'ＴＥＬ']) and 'url' not in col_lower:
-                    if '電話' in col_clean or 'tel' in col_lower.replace('ＴＥＬ', 'tel'):
-                        rename_dict[col] = 'Tel'
-                
-                # メールアドレス系
-                elif any(keyword in col_lower for keyword in ['mail', 'メール']) and 'url' not in col_lower:
-                    if 'address' in col_lower or 'アドレス' in col_clean:
-                        rename_dict[col] = 'メールアドレス'
-                
-                # 会社名系（URLを除外）
-                elif 'url' not in col_lower and 'link' not in col_lower:
-                    if any(keyword in col_clean for keyword in ['会社', '企業', '社名']):
-                        rename_dict[col] = '会社名'
-                    elif any(keyword in col_lower for keyword in ['company']) and len(col_clean) < 20:
-                        rename_dict[col] = '会社名'
-                
-                # ウェブサイト系（企業の公式サイトのみ）
-                elif any(keyword in col_clean for keyword in ['ウェブサイト', 'ホームページ', 'HP']):
-                    rename_dict[col] = 'Website'
-                elif col_lower in ['url', 'website', 'homepage'] and len(col_clean) < 15:
-                    rename_dict[col] = 'Website'
-                
-                # 担当者系
-                elif 'url' not in col_lower and any(keyword in col_clean for keyword in ['担当', '氏名', '名前']):
-                    if '会社' not in col_clean and '企業' not in col_clean:
-                        rename_dict[col] = '担当者'
-                
-                # 住所系
-                elif 'url' not in col_lower and any(keyword in col_clean for keyword in ['住所', '所在地']):
-                    rename_dict[col] = 'Address'
-                
-                # 業界系
-                elif 'url' not in col_lower and any(keyword in col_clean for keyword in ['業界', '業種', '分野']):
-                    rename_dict[col] = '業界'
-                
-                # 展示会初日系
-                elif 'url' not in col_lower and any(keyword in col_clean for keyword in ['展示会初日', '開始日', '初日', '開催日']):
-                    rename_dict[col] = '展示会初日'
-        
-        # SNS URLs や その他のURLを明示的に除外
-        excluded_patterns = [
-            'facebook', 'twitter', 'instagram', 'linkedin', 'tiktok', 'youtube',
-            'sns', 'social', '抽出元', 'ロゴ', 'logo'
-        ]
-        
-        # 除外パターンに該当する列は変換しない
-        for col, new_name in list(rename_dict.items()):
-            col_lower = col.lower()
-            if any(pattern in col_lower for pattern in excluded_patterns):
-                if 'url' in col_lower or 'link' in col_lower:
-                    del rename_dict[col]  # SNS URLは変換しない
+        # 列名解決（同じヘッダーは保存済みのプランを使用）
+        original_columns = list(df.columns)
+        plan = get_schema_cache().resolve(
+            "detailed", COLUMN_RULES_VERSION, original_columns, resolve_detailed_column_plan
+        )
+        rename_dict = {col: new for col, new in zip(original_columns, plan['rename']) if new is not None}
         
         # デバッグ: 列名変換を表示
         if rename_dict:
@@ -691,54 +847,24 @@ def process_dataframe(df, filename):
             st.write("ℹ️ **列名変換なし** (既に適切な列名)")
         
         # 除外された列も表示
-        excluded_cols = [col for col in df.columns if col not in rename_dict and 
-                        any(pattern in col.lower() for pattern in excluded_patterns + ['url', 'link'])]
-        if excluded_cols:
+        if plan['excluded']:
             st.write(f"🚫 **除外された列（変換しない）:**")
-            for col in excluded_cols:
-                st.write(f"- '{col}' (SNS/その他のURL)")
+            for position in plan['excluded']:
+                st.write(f"- '{original_columns[position]}' (SNS/その他のURL)")
         
         # Step 4: 列名変換実行（再度重複チェック）
         st.write("🔄 **列名変換実行中...**")
         
         # 変換後の列名が重複しないかチェック
-        new_column_names = []
-        used_names = set()
-        
-        for col in df.columns:
-            if col in rename_dict:
-                new_name = rename_dict[col]
-                if new_name in used_names:
-                    # 重複する場合は番号を追加
-                    counter = 2
-                    unique_name = f"{new_name}_{counter}"
-                    while unique_name in used_names:
-                        counter += 1
-                        unique_name = f"{new_name}_{counter}"
-                    new_column_names.append(unique_name)
-                    used_names.add(unique_name)
-                    st.warning(f"⚠️ 変換後重複回避: '{col}' → '{unique_name}'")
-                else:
-                    new_column_names.append(new_name)
-                    used_names.add(new_name)
+        for position, unique_name in plan['collisions']:
+            col = original_columns[position]
+            if plan['rename'][position] is not None:
+                st.warning(f"⚠️ 変換後重複回避: '{col}' → '{unique_name}'")
             else:
-                # 変換しない列もユニーク性をチェック
-                original_name = col
-                if original_name in used_names:
-                    counter = 2
-                    unique_name = f"{original_name}_{counter}"
-                    while unique_name in used_names:
-                        counter += 1
-                        unique_name = f"{original_name}_{counter}"
-                    new_column_names.append(unique_name)
-                    used_names.add(unique_name)
-                    st.warning(f"⚠️ 元列名重複回避: '{original_name}' → '{unique_name}'")
-                else:
-                    new_column_names.append(original_name)
-                    used_names.add(original_name)
+                st.warning(f"⚠️ 元列名重複回避: '{col}' → '{unique_name}'")
         
         # 列名を一括更新
-        df.columns = new_column_names
+        df.columns = rename_by_position(original_columns, plan['columns'])
         
         # 列名を文字列に統一
         df.columns = [str(col) for col in df.columns]
@@ -750,36 +876,17 @@ def process_dataframe(df, filename):
         st.write(list(df.columns))
 
         # 連絡先系列からメールアドレスとTEL抽出
-        contact_cols = [c for c in df.columns if any(keyword in str(c).lower() for keyword in 
-                       ['問い合わせ先', '連絡先', 'お問い合わせ先', 'contact', '問合せ先', '連絡'])]
+        contact_cols = contact_columns(df)
         
         # デバッグ: 連絡先関連の列を表示
         if contact_cols:
             st.write(f"📞 **連絡先関連の列:** {contact_cols}")
         
-        if contact_cols:
-            # 必要カラムを事前に確保
-            if 'メールアドレス' not in df.columns:
-                df['メールアドレス'] = ''
-            if 'Tel' not in df.columns:
-                df['Tel'] = ''
-
-            for col in contact_cols:
-                # メールアドレス抽出
-                temp_emails = df[col].apply(extract_email_from_text)
-                email_mask = (df['メールアドレス'] == '') & (temp_emails != '')
-                if email_mask.any():
-                    df.loc[email_mask, 'メールアドレス'] = temp_emails[email_mask]
-                    stats["email_extracted"] += email_mask.sum()
-                    st.info(f"📧 {col}から{email_mask.sum()}件のメールアドレスを抽出")
-                
-                # 電話番号抽出
-                temp_phones = df[col].apply(extract_phone_from_text)
-                phone_mask = (df['Tel'] == '') & (temp_phones != '')
-                if phone_mask.any():
-                    df.loc[phone_mask, 'Tel'] = temp_phones[phone_mask]
-                    stats["tel_extracted"] += phone_mask.sum()
-                    st.info(f"📞 {col}から{phone_mask.sum()}件の電話番号を抽出")
+        for col, emails, phones in extract_contacts(df, stats, contact_cols):
+            if emails:
+                st.info(f"📧 {col}から{emails}件のメールアドレスを抽出")
+            if phones:
+                st.info(f"📞 {col}から{phones}件の電話番号を抽出")
 
         # 必須列がなければ追加
         for col in REQUIRED_COLUMNS:
@@ -882,6 +989,248 @@ def process_dataframe(df, filename):
         
         return None, {}, str(e)
 
+def create_notion_client(notion_api_key):
+    """レート制御・429再試行付きの Notion クライアントを作成（制御状態はセッション内で共有）"""
+    if 'notion_rate_limiter' not in st.session_state:
+        st.session_state.notion_rate_limiter = NotionRateLimiter()
+    client_options = {"base_url": NOTION_BASE_URL} if NOTION_BASE_URL else {}
+    client = Client(auth=notion_api_key, notion_version="2022-06-28", **client_options)
+    return RateLimitedClient(client, st.session_state.notion_rate_limiter)
+
+def notion_page_title(properties):
+    """ページタイトルを取得"""
+    page_title = "untitled"
+    if "名前" in properties and properties["名前"]["title"]:
+        page_title = properties["名前"]["title"][0]["plain_text"] if properties["名前"]["title"] else "untitled"
+    elif "Name" in properties and properties["Name"]["title"]:
+        page_title = properties["Name"]["title"][0]["plain_text"] if properties["Name"]["title"] else "untitled"
+    return page_title
+
+def fetch_notion_file(item_idx, file_idx, page_title, file_info, google_api_key, sheet_all_tabs=False, fetcher=requests):
+    """Notionのファイル1件を取得して (ファイル名, 内容) を返す（対象外は None、取得失敗は例外）
+
+    Google Sheets APIで取得した場合の内容は [(ファイル名の接尾辞, DataFrame)]。
+    パイプラインのワーカースレッドから呼ぶため Streamlit は呼ばない
+    """
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    
+    # Notionに直接アップロードされたファイル
+    if file_info["type"] == "file":
+        file_name = file_info["name"]
+        ext = os.path.splitext(file_name)[1].lower()
+        if ext not in [".csv", ".xlsx", ".xls"]:
+            return None
+        response = fetcher.get(file_info["file"]["url"], headers=headers)
+        response.raise_for_status()
+        return f"{os.path.splitext(file_name)[0]}_{item_idx+1}_{file_idx+1}{ext}", response.content
+    
+    # Googleスプレッドシート等の外部URL
+    if file_info["type"] == "external":
+        url = file_info["external"]["url"]
+        if not is_google_sheet_url(url):
+            return None
+        file_stem = f"{page_title}_{extract_sheet_id(url)}_{item_idx+1}_{file_idx+1}"
+        file_name = f"{file_stem}.csv"
+        
+        # 方法1: Google Sheets APIを試行（DataFrameのまま受け取る）
+        if google_api_key:
+            sheet_frames = google_sheet_frames_with_api(url, google_api_key, sheet_all_tabs, show_errors=False,
+                                                        session=fetcher)
+            if sheet_frames:
+                return f"{file_stem}{SHEET_FRAME_EXT}", sheet_frames
+        
+        # 方法2: 公開URLを試行
+        csv_url = google_sheet_to_csv_url(url)
+        if csv_url:
+            response = fetcher.get(csv_url, headers=headers)
+            response.raise_for_status()
+            return file_name, response.content
+        raise Exception(f"スプレッドシートにアクセスできません: {url}")
+    
+    return None
+
+def prefetch_notion_files(items, fetcher, blob_store, headers, public_sheets=False):
+    """ページのファイルを fetcher の同時接続数で先に取得してブロブに保存し、{URL: ブロブ or 例外} を返す
+
+    対象はNotionに直接アップロードされたファイルと、public_sheets=True ならスプレッドシートの公開CSV
+    （Google Sheets APIは取得に失敗したときだけ公開URLを使うため、APIキーがある場合は対象外）。
+    メモリに保持する応答を抑えるため、同時接続数の数倍ずつ取得してはブロブに移す
+    """
+    urls = []
+    seen = set()
+    for item in items:
+        file_property = item["properties"].get("ファイル")
+        if not file_property or file_property["type"] != "files":
+            continue
+        for file_info in file_property["files"]:
+            url = None
+            if file_info["type"] == "file":
+                if os.path.splitext(file_info["name"])[1].lower() in [".csv", ".xlsx", ".xls"]:
+                    url = file_info["file"]["url"]
+            elif file_info["type"] == "external" and public_sheets and is_google_sheet_url(file_info["external"]["url"]):
+                url = google_sheet_to_csv_url(file_info["external"]["url"])
+            # 同じファイル（正規化したURLが同じ）は1回だけ
+            key = download_key(file_info)
+            if url and key not in seen:
+                seen.add(key)
+                urls.append(url)
+    
+    prefetched = {}
+    batch = fetcher.concurrency * 4
+    for start in range(0, len(urls), batch):
+        for result in fetcher.get_many(urls[start:start + batch], headers=headers):
+            if result.error is not None:
+                prefetched[result.url] = Exception(result.error)
+                continue
+            try:
+                result.response.raise_for_status()
+                prefetched[result.url] = blob_store.put(result.response.content)
+            except requests.exceptions.HTTPError as e:
+                prefetched[result.url] = e
+    return prefetched
+
+def fetch_blob(fetcher, blob_store, prefetched, url, headers):
+    """先に取得したファイルのブロブを返す（なければここで取得して保存。取得に失敗していれば例外）"""
+    if url in prefetched:
+        blob = prefetched.pop(url)
+        if isinstance(blob, Exception):
+            raise blob
+        return blob
+    response = fetcher.get(url, headers=headers)
+    response.raise_for_status()
+    return blob_store.put(response.content)
+
+def run_notion_pipeline(items, google_api_key, fallback_option, source_type, sheet_all_tabs=False, fetcher=requests):
+    """Notionのページからダウンロード・読み込み・統合までをパイプラインで実行（ファイル本体はセッションに残さない）"""
+    planner = DownloadPlanner()
+    recorder = RunRecorder("streamlit")
+    
+    def expand(item_idx, item):
+        file_property = item["properties"].get("ファイル")
+        if not file_property or file_property["type"] != "files":
+            return []
+        page_title = notion_page_title(item["properties"])
+        # 複数カテゴリに出てくるページ・同じスプレッドシートは1回だけ取得する
+        return [(item_idx, file_idx, page_title, file_info)
+                for file_idx, file_info in enumerate(file_property["files"]) if planner.claim(file_info)]
+    
+    def fetch(task):
+        item_idx, file_idx, page_title, file_info = task
+        with recorder.span("download") as span:
+            fetched = fetch_notion_file(item_idx, file_idx, page_title, file_info, google_api_key, sheet_all_tabs, fetcher)
+            if fetched and isinstance(fetched[1], bytes):
+                span.bytes = len(fetched[1])
+        return fetched
+    
+    def process_content(filename, digest, read):
+        def process_file():
+            df = read()
+            if df is None:
+                return None, {}, "ファイル読み込み失敗"
+            return process_dataframe_lightweight(df, filename, debug_mode=False, recorder=recorder, run_columns=False)
+        processed_df, stats, error = frame_cache.cached(
+            frame_cache_key("lightweight", FRAME_PIPELINE_VERSION, digest, filename),
+            process_file, cacheable=lambda result: result[0] is not None
+        )
+        if processed_df is not None:
+            with recorder.span("run_columns", rows_in=len(processed_df)):
+                add_run_columns(processed_df, filename)
+        return processed_df, stats, error
+    
+    def parse(task, filename, content):
+        if not isinstance(content, list):
+            return process_content(filename, frame_key(filename, content)[0],
+                                   lambda: process_single_file_lightweight(filename, content, debug_mode=False,
+                                                                           recorder=recorder))
+        
+        # Google Sheets APIで取得したタブはタブごとに処理して結合
+        stem, ext = os.path.splitext(filename)
+        processed = []
+        tab_stats = {"email_extracted": 0, "tel_extracted": 0}
+        errors = []
+        for suffix, sheet_df in content:
+            processed_df, stats, error = process_content(f"{stem}{suffix}{ext}", frame_digest(sheet_df),
+                                                         lambda sheet_df=sheet_df: sheet_df)
+            if processed_df is None:
+                errors.append(error)
+                continue
+            processed.append(processed_df)
+            tab_stats["email_extracted"] += stats["email_extracted"]
+            tab_stats["tel_extracted"] += stats["tel_extracted"]
+        if not processed:
+            return None, {}, errors[0] if errors else "ファイル読み込み失敗"
+        return pd.concat(processed, ignore_index=True), tab_stats, None
+    
+    # 同時取得数は取得エンジンに合わせる
+    pipeline = FilePipeline(expand, fetch, parse,
+                            download_workers=max(PIPELINE_DOWNLOAD_WORKERS, getattr(fetcher, "concurrency", 1)))
+    schema_cache = get_schema_cache()
+    schema_counters = schema_cache.counters()
+    frame_cache = get_frame_cache()
+    frame_counters = frame_cache.counters()
+    total_stats = {"email_extracted": 0, "tel_extracted": 0, "files_processed": 0}
+    collector = new_frame_collector()
+    error_files = []
+    progress_text = st.empty()
+    status_container = st.empty()
+    memory_container = st.empty()
+    start = time.perf_counter()
+    
+    for result in pipeline.run(items):
+        if result.error is None and result.value[0] is not None:
+            processed_df, stats, _ = result.value
+            # 完了順ではなくNotionのページ順で統合する
+            if collector.add(processed_df, result.seq):
+                notify_memory_spill(collector.governor)
+            total_stats["email_extracted"] += stats["email_extracted"]
+            total_stats["tel_extracted"] += stats["tel_extracted"]
+            total_stats["files_processed"] += 1
+        else:
+            error = result.error if result.error is not None else result.value[2]
+            if result.name:
+                error_name = result.name
+            else:
+                error_name = f"ページ{result.task[0] + 1}" if result.task else "-"
+            error_files.append((error_name, error))
+            if result.stage == "download" and fallback_option == "エラーで停止":
+                st.error(f"❌ ファイル取得エラーのため停止しました: {error}")
+                break
+        progress_text.text(f"⚡ 取得 {pipeline.stats['downloaded']}件 / 処理済み {total_stats['files_processed']}件 / "
+                           f"エラー {len(error_files)}件（{time.perf_counter() - start:.1f}秒）")
+        memory_container.caption(f"🧠 {collector.governor.summary()}")
+    
+    progress_text.empty()
+    memory_container.empty()
+    if len(collector):
+        try:
+            merge_processed_frames(collector, total_stats, error_files, pipeline.stats["tasks"], source_type,
+                                   True, False, status_container, recorder)
+        finally:
+            collector.close()
+    else:
+        st.warning("⚠️ 処理できるファイルがありませんでした")
+    status_container.empty()
+    
+    try:
+        schema_cache.save()
+    except Exception as e:
+        st.warning(f"⚠️ 列構成キャッシュの保存に失敗: {e}")
+    st.caption(f"⚡ パイプライン: 取得 {pipeline.stats['downloaded']}件 / 対象外 {pipeline.stats['skipped']}件 / "
+               f"キュー内の最大ファイル数 {pipeline.stats['peak_queued_files']} / {time.perf_counter() - start:.1f}秒")
+    if planner.fetches_avoided:
+        st.caption(f"🔁 同じURLの再取得を省略: {planner.fetches_avoided}件")
+    st.caption(f"🗂️ {schema_cache.summary(schema_counters)}")
+    st.caption(f"⏱️ {frame_cache.summary(frame_counters)}")
+    logging.info(frame_cache.summary(frame_counters))
+    st.caption(f"🧠 {collector.governor.summary()}")
+    finish_run_recorder(recorder)
+    if error_files:
+        with st.expander(f"❌ エラーファイル一覧 ({len(error_files)}件)"):
+            for filename, error in error_files:
+                st.write(f"- **{filename}**: {error}")
+
 def notion_download():
     """Notion APIからファイルダウンロード"""
     st.subheader("🔗 Notion APIからダウンロード")
@@ -933,6 +1282,12 @@ def notion_download():
             help="非公開スプレッドシートにアクセスできない場合の動作"
         )
     
+    sheet_all_tabs = st.checkbox(
+        "📑 スプレッドシートの全タブを取得（Google Sheets API使用時）",
+        value=False,
+        help="チェック時：リンク先のタブに加えて、同じスプレッドシートの他のタブもまとめて取得します"
+    )
+    
     # 処理方法の説明
     if google_api_key:
         st.info("🔑 **処理方法:** Google Sheets API → 公開URL → スキップ/エラー")
@@ -1001,6 +1356,14 @@ def notion_download():
             "🌐URLあり": download_url,
             "🏢出展社名のみ": download_exhibitor
         }
+        
+        single_pass_query = st.checkbox(
+            "1回のクエリでまとめて取得（カテゴリはローカルで振り分け）",
+            value=True,
+            help="オフにするとカテゴリごとに個別のクエリを並列で実行します"
+        )
+    else:
+        single_pass_query = True
     
     # 更新モード選択
     st.markdown("### 📅 更新モード")
@@ -1037,6 +1400,22 @@ def notion_download():
                 help="取得する期間の終了日"
             )
     
+    # ローカルミラー設定
+    col1, col2 = st.columns(2)
+    with col1:
+        use_mirror = st.checkbox(
+            "🗄️ ローカルミラーを使用",
+            value=False,
+            help="データベースをローカル（SQLite）に保持し、前回以降に編集されたページだけを同期して検索します"
+        )
+    with col2:
+        rebuild_mirror = st.checkbox(
+            "ミラーを全件再構築",
+            value=False,
+            disabled=not use_mirror,
+            help="削除されたページを反映するには全件再構築が必要です"
+        )
+    
     if st.button("対象件数を確認", disabled=not (notion_api_key and database_id)):
         # カテゴリ別の場合、選択されていないカテゴリがあるか確認
         if filter_option == "カテゴリ別分類":
@@ -1052,10 +1431,7 @@ def notion_download():
                 st.info(f"ℹ️ 以下のカテゴリはダウンロードされません: {', '.join(not_selected)}")
         
         try:
-            notion = Client(
-                auth=notion_api_key,
-                notion_version="2022-06-28"
-            )
+            notion = create_notion_client(notion_api_key)
             
             # フィルター条件を作成
             def create_filter_conditions(filter_option, update_mode, start_date=None, end_date=None):
@@ -1136,76 +1512,26 @@ def notion_download():
                 else:  # カテゴリ別分類
                     filters = {}
                     selected_categories = st.session_state.get('selected_categories', {
-                        "📧メールあり": True,
-                        "📞TELあり": True,
-                        "🌐URLあり": True,
-                        "🏢出展社名のみ": True
+                        category: True for category in NOTION_CATEGORY_SELECTS
                     })
                     
-                    # 1. メールありフォルダ
-                    if selected_categories.get("📧メールあり", True):
-                        email_filter = {
-                            "and": [
-                                {"property": "メールアドレス（有無）", "select": {"equals": "あり"}},
-                                {"property": "ファイル", "files": {"is_not_empty": True}}
-                            ]
-                        }
-                        if date_filter:
-                            email_filter["and"].append(date_filter)
-                        filters["📧メールあり"] = email_filter
-                    
-                    # 2. TELありフォルダ
-                    if selected_categories.get("📞TELあり", True):
-                        tel_filter = {
+                    for category, select_values in NOTION_CATEGORY_SELECTS.items():
+                        if not selected_categories.get(category, True):
+                            continue
+                        select_conditions = [
+                            {"property": NOTION_CATEGORY_PROPERTY, "select": {"equals": value}}
+                            for value in select_values
+                        ]
+                        category_filter = {
                             "and": [
-                                {
-                                    "or": [
-                                        {"property": "メールアドレス（有無）", "select": {"equals": "TELとURL"}},
-                                        {"property": "メールアドレス（有無）", "select": {"equals": "Tel、住所、URL"}}
-                                    ]
-                                },
+                                select_conditions[0] if len(select_conditions) == 1 else {"or": select_conditions},
                                 {"property": "ファイル", "files": {"is_not_empty": True}}
                             ]
                         }
                         if date_filter:
-                            tel_filter["and"].append(date_filter)
-                        filters["📞TELあり"] = tel_filter
+                            category_filter["and"].append(date_filter)
+                        filters[category] = category_filter
                     
-                    # 3. URLありフォルダ
-                    if selected_categories.get("🌐URLあり", True):
-                        url_filter = {
-                            "and": [
-                                {
-                                    "or": [
-                                        {"property": "メールアドレス（有無）", "select": {"equals": "社名・住所・URL"}},
-                                        {"property": "メールアドレス（有無）", "select": {"equals": "社名とURL（直で企業HPリンク）"}},
-                                        {"property": "メールアドレス（有無）", "select": {"equals": "社名とURLのみ"}}
-                                    ]
-                                },
-                                {"property": "ファイル", "files": {"is_not_empty": True}}
-                            ]
-                        }
-                        if date_filter:
-                            url_filter["and"].append(date_filter)
-                        filters["🌐URLあり"] = url_filter
-
-                    # 4. 出展社名のみ
-                    if selected_categories.get("🏢出展社名のみ", True):
-                        exhibitor_filter = {
-                            "and": [
-                                {
-                                    "or": [
-                                        {"property": "メールアドレス（有無）", "select": {"equals": "出展社名のみ"}},
-                                        {"property": "メールアドレス（有無）", "select": {"equals": "社名・住所"}}
-                                    ]
-                                },
-                                {"property": "ファイル", "files": {"is_not_empty": True}}
-                            ]
-                        }
-                        if date_filter:
-                            exhibitor_filter["and"].append(date_filter)
-                        filters["🏢出展社名のみ"] = exhibitor_filter
-
                     return filters
             
             # フィルター条件を取得
@@ -1222,27 +1548,37 @@ def notion_download():
             
             with st.spinner("対象件数を確認中..."):
                 total_counts = {}
+                query_cache = st.session_state.notion_query_cache
+                query_start = time.perf_counter()
                 
-                for category, filter_condition in filter_conditions.items():
-                    # 件数を取得
-                    count = 0
-                    start_cursor = None
-                    
-                    while True:
-                        response = notion.databases.query(
-                            database_id=database_id,
-                            filter=filter_condition,
-                            start_cursor=start_cursor,
-                            page_size=100
-                        )
-                        items = response.get("results", [])
-                        count += len(items)
-                        
-                        if not response.get("has_more"):
-                            break
-                        start_cursor = response.get("next_cursor")
-                    
-                    total_counts[category] = count
+                # ミラー使用時は差分同期してからローカルで検索
+                if use_mirror:
+                    sync_stats = get_notion_mirror().sync(notion, database_id, full=rebuild_mirror)
+                    sync_label = "全件再構築" if sync_stats["mode"] == "full" else "差分同期"
+                    st.caption(f"🗄️ ミラー{sync_label}: 取得 {sync_stats['fetched']}件 / Notion API {sync_stats['calls']}回 / "
+                               f"保持 {sync_stats['total']}件 / {sync_stats['seconds']:.1f}秒")
+                query_client = get_notion_mirror().as_client() if use_mirror else notion
+                query_mode = f"{update_mode}（ミラー）" if use_mirror else update_mode
+                calls_before = query_cache.api_calls
+                
+                # 件数を取得（取得したページはダウンロード実行で再利用）
+                if filter_option == "カテゴリ別分類":
+                    category_pages, merged = query_cache.query_categories(
+                        query_client, database_id, filter_conditions, query_mode, single_pass=single_pass_query
+                    )
+                else:
+                    category_pages = {
+                        category: query_cache.query(query_client, database_id, filter_condition, query_mode)[0]
+                        for category, filter_condition in filter_conditions.items()
+                    }
+                    merged = False
+                total_counts = {category: len(pages) for category, pages in category_pages.items()}
+                
+                query_method = "統合クエリ1本 + ローカル振り分け" if merged else f"個別クエリ{len(filter_conditions)}本"
+                query_target = "ミラー検索" if use_mirror else "Notion API"
+                st.caption(f"🔎 {query_target} {query_cache.api_calls - calls_before}回"
+                           f"（{query_method}）・{time.perf_counter() - query_start:.1f}秒")
+                st.caption(f"🚦 {notion.limiter.summary()}")
                 
                 # 結果表示
                 if filter_option == "すべて統合":
@@ -1274,8 +1610,12 @@ def notion_download():
                 st.session_state.target_filters = filter_conditions
                 st.session_state.target_mode = update_mode
                 st.session_state.target_filter_option = filter_option
+                st.session_state.target_single_pass = single_pass_query
+                st.session_state.target_use_mirror = use_mirror
+                st.session_state.target_query_mode = query_mode
                 st.session_state.google_api_key = google_api_key
                 st.session_state.fallback_option = fallback_option
+                st.session_state.sheet_all_tabs = sheet_all_tabs
                 
                 if total > 0:
                     st.warning("⚠️ 対象件数を確認後、下の「ダウンロード実行」ボタンでファイルをダウンロードしてください")
@@ -1294,47 +1634,90 @@ def notion_download():
         with col1:
             st.info(f"🎯 **対象: {sum(st.session_state.target_counts.values())}件**")
             st.info(f"📅 **モード: {st.session_state.target_mode}**")
+            use_pipeline = st.checkbox(
+                "⚡ ダウンロードしながら処理・統合（パイプライン）",
+                value=False,
+                help="取得・読み込み・統合を並行して実行し、ダウンロードしたファイルをセッションに保持しません"
+            )
         
         with col2:
             if st.button("📥 ダウンロード実行", type="primary"):
                 try:
-                    notion = Client(
-                        auth=notion_api_key,
-                        notion_version="2022-06-28"
-                    )
+                    notion = create_notion_client(notion_api_key)
                     
                     # セッションから設定を取得
                     google_api_key = st.session_state.get('google_api_key', '')
                     fallback_option = st.session_state.get('fallback_option', 'スキップして続行')
+                    sheet_all_tabs = st.session_state.get('sheet_all_tabs', False)
+                    
+                    # ダウンロードしたファイル本体はディスクに保存し、セッションにはハンドルだけを持たせる
+                    blob_store = get_blob_store()
+                    # カテゴリ間・ページ間で同じファイルを何度も取得しない
+                    planner = DownloadPlanner()
+                    # ファイル取得エンジン（FETCH_ENGINE=httpx で非同期取得）
+                    fetcher = create_fetcher()
+                    query_cache = st.session_state.notion_query_cache
+                    saved_before = (query_cache.saved_seconds, query_cache.saved_calls)
+                    target_use_mirror = st.session_state.get('target_use_mirror', False)
+                    query_client = get_notion_mirror().as_client() if target_use_mirror else notion
+                    query_mode = st.session_state.get('target_query_mode', st.session_state.target_mode)
+                    
+                    def refresh_file_urls(items):
+                        # ミラーのファイルURLは失効しているため、ダウンロード前に取り直す
+                        if not target_use_mirror:
+                            return items
+                        return get_notion_mirror().refresh_file_urls(notion, database_id, items)
+                    
+                    def refresh_category_pages(category_pages):
+                        # 複数のカテゴリに含まれるページも1回だけ取り直し、カテゴリごとに振り分け直す
+                        if not target_use_mirror:
+                            return category_pages
+                        pages = list({item["id"]: item for items in category_pages.values() for item in items}.values())
+                        refreshed = {item["id"]: item for item in refresh_file_urls(pages)}
+                        return {category: [refreshed[item["id"]] for item in items]
+                                for category, items in category_pages.items()}
                     
                     with st.spinner("Notionからファイルをダウンロード中..."):
+                        # パイプライン処理（ダウンロードと同時に統合まで実行）
+                        if use_pipeline:
+                            if st.session_state.target_filter_option == "カテゴリ別分類":
+                                category_pages, _ = query_cache.query_categories(
+                                    query_client, database_id, st.session_state.target_filters, query_mode,
+                                    single_pass=st.session_state.get('target_single_pass', True)
+                                )
+                                category_pages = refresh_category_pages(category_pages)
+                                pipeline_items = [item for items in category_pages.values() for item in items]
+                            else:
+                                pipeline_items, _ = query_cache.query(
+                                    query_client, database_id, st.session_state.target_filters["すべて"], query_mode
+                                )
+                                pipeline_items = refresh_file_urls(pipeline_items)
+                            st.info(f"🎯 {len(pipeline_items)}件のアイテムを取得しました")
+                            run_notion_pipeline(pipeline_items, google_api_key, fallback_option, "Notion",
+                                                sheet_all_tabs, fetcher)
+                        
                         # カテゴリ別処理
-                        if st.session_state.target_filter_option == "カテゴリ別分類":
+                        elif st.session_state.target_filter_option == "カテゴリ別分類":
                             categorized_files = {}
+                            category_pages, _ = query_cache.query_categories(
+                                query_client, database_id, st.session_state.target_filters, query_mode,
+                                single_pass=st.session_state.get('target_single_pass', True)
+                            )
+                            category_pages = refresh_category_pages(category_pages)
+                            headers = {
+                                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                            }
+                            # 全カテゴリのファイルを同時接続数で先に取得（複数のカテゴリに含まれるファイルは1回）
+                            prefetched = prefetch_notion_files(
+                                [item for items in category_pages.values() for item in items],
+                                fetcher, blob_store, headers, public_sheets=not google_api_key
+                            )
                             
-                            for category, filter_condition in st.session_state.target_filters.items():
-                                all_items = []
-                                start_cursor = None
-                                
-                                while True:
-                                    response = notion.databases.query(
-                                        database_id=database_id,
-                                        filter=filter_condition,
-                                        start_cursor=start_cursor
-                                    )
-                                    items = response.get("results", [])
-                                    all_items.extend(items)
-                                    if not response.get("has_more"):
-                                        break
-                                    start_cursor = response.get("next_cursor")
-                                
+                            for category, all_items in category_pages.items():
                                 st.info(f"{category}: {len(all_items)}件のアイテムを取得")
                                 
                                 # ファイルダウンロード処理
                                 downloaded_files = []
-                                headers = {
-                                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                                }
                                 
                                 for item_idx, item in enumerate(all_items):
                                     properties = item["properties"]
@@ -1349,6 +1732,11 @@ def notion_download():
                                     file_property = properties.get("ファイル")
                                     if file_property and file_property["type"] == "files":
                                         for file_idx, file_info in enumerate(file_property["files"]):
+                                            # 他のカテゴリ・ページで取得済みのファイルは同じブロブを参照する
+                                            planned = planner.lookup(file_info)
+                                            if planned:
+                                                downloaded_files.extend(planned)
+                                                continue
                                             try:
                                                 # Notionに直接アップロードされたファイル
                                                 if file_info["type"] == "file":
@@ -1357,10 +1745,9 @@ def notion_download():
                                                     ext = os.path.splitext(file_name)[1].lower()
                                                     
                                                     if ext in [".csv", ".xlsx", ".xls"]:
-                                                        response = requests.get(file_url, headers=headers)
-                                                        response.raise_for_status()
+                                                        content = fetch_blob(fetcher, blob_store, prefetched, file_url, headers)
                                                         final_name = f"{os.path.splitext(file_name)[0]}_{item_idx+1}_{file_idx+1}{ext}"
-                                                        downloaded_files.append((final_name, response.content))
+                                                        downloaded_files.append(planner.record(file_info, final_name, content))
                                                 
                                                 # Googleスプレッドシート等の外部URL
                                                 elif file_info["type"] == "external":
@@ -1371,11 +1758,13 @@ def notion_download():
                                                         # 方法1: Google Sheets APIを試行
                                                         if google_api_key:
                                                             st.info(f"🔑 Google Sheets APIでアクセス中: {url}")
-                                                            csv_data = google_sheet_to_csv_with_api(url, google_api_key)
-                                                            if csv_data:
+                                                            sheet_frames = google_sheet_frames_with_api(url, google_api_key, sheet_all_tabs,
+                                                                                                        session=fetcher)
+                                                            if sheet_frames:
                                                                 sheet_id = extract_sheet_id(url)
-                                                                file_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}.csv"
-                                                                downloaded_files.append((file_name, csv_data))
+                                                                for suffix, sheet_df in sheet_frames:
+                                                                    file_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}{suffix}{SHEET_FRAME_EXT}"
+                                                                    downloaded_files.append(planner.record(file_info, file_name, store_sheet_frame(blob_store, sheet_df)))
                                                                 success = True
                                                                 st.success(f"✅ APIで取得成功: {file_name}")
                                                         
@@ -1385,11 +1774,10 @@ def notion_download():
                                                             csv_url = google_sheet_to_csv_url(url)
                                                             if csv_url:
                                                                 try:
-                                                                    response = requests.get(csv_url, headers=headers)
-                                                                    response.raise_for_status()
+                                                                    content = fetch_blob(fetcher, blob_store, prefetched, csv_url, headers)
                                                                     sheet_id = extract_sheet_id(url)
                                                                     file_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}.csv"
-                                                                    downloaded_files.append((file_name, response.content))
+                                                                    downloaded_files.append(planner.record(file_info, file_name, content))
                                                                     success = True
                                                                     st.success(f"✅ 公開URLで取得成功: {file_name}")
                                                                 except requests.exceptions.HTTPError as e:
@@ -1421,20 +1809,10 @@ def notion_download():
                         
                         else:  # すべて統合
                             # 保存されたフィルター条件を使用
-                            all_items = []
-                            start_cursor = None
-                            
-                            while True:
-                                response = notion.databases.query(
-                                    database_id=database_id,
-                                    filter=st.session_state.target_filters["すべて"],
-                                    start_cursor=start_cursor
-                                )
-                                items = response.get("results", [])
-                                all_items.extend(items)
-                                if not response.get("has_more"):
-                                    break
-                                start_cursor = response.get("next_cursor")
+                            all_items, _ = query_cache.query(
+                                query_client, database_id, st.session_state.target_filters["すべて"], query_mode
+                            )
+                            all_items = refresh_file_urls(all_items)
                             
                             st.success(f"🎯 {len(all_items)}件のアイテムを取得しました")
                             
@@ -1446,6 +1824,9 @@ def notion_download():
                             headers = {
                                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
                             }
+                            # ファイルを同時接続数で先に取得
+                            prefetched = prefetch_notion_files(all_items, fetcher, blob_store, headers,
+                                                               public_sheets=not google_api_key)
                             
                             for item_idx, item in enumerate(all_items):
                                 properties = item["properties"]
@@ -1460,6 +1841,11 @@ def notion_download():
                                 file_property = properties.get("ファイル")
                                 if file_property and file_property["type"] == "files":
                                     for file_idx, file_info in enumerate(file_property["files"]):
+                                        # 他のカテゴリ・ページで取得済みのファイルは同じブロブを参照する
+                                        planned = planner.lookup(file_info)
+                                        if planned:
+                                            downloaded_files.extend(planned)
+                                            continue
                                         try:
                                             # Notionに直接アップロードされたファイル
                                             if file_info["type"] == "file":
@@ -1468,10 +1854,9 @@ def notion_download():
                                                 ext = os.path.splitext(file_name)[1].lower()
                                                 
                                                 if ext in [".csv", ".xlsx", ".xls"]:
-                                                    response = requests.get(file_url, headers=headers)
-                                                    response.raise_for_status()
+                                                    content = fetch_blob(fetcher, blob_store, prefetched, file_url, headers)
                                                     final_name = f"{os.path.splitext(file_name)[0]}_{item_idx+1}_{file_idx+1}{ext}"
-                                                    downloaded_files.append((final_name, response.content))
+                                                    downloaded_files.append(planner.record(file_info, final_name, content))
                                             
                                             # Googleスプレッドシート等の外部URL
                                             elif file_info["type"] == "external":
@@ -1481,11 +1866,13 @@ def notion_download():
                                                     
                                                     # 方法1: Google Sheets APIを試行
                                                     if google_api_key:
-                                                        csv_data = google_sheet_to_csv_with_api(url, google_api_key)
-                                                        if csv_data:
+                                                        sheet_frames = google_sheet_frames_with_api(url, google_api_key, sheet_all_tabs,
+                                                                                                    session=fetcher)
+                                                        if sheet_frames:
                                                             sheet_id = extract_sheet_id(url)
-                                                            file_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}.csv"
-                                                            downloaded_files.append((file_name, csv_data))
+                                                            for suffix, sheet_df in sheet_frames:
+                                                                file_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}{suffix}{SHEET_FRAME_EXT}"
+                                                                downloaded_files.append(planner.record(file_info, file_name, store_sheet_frame(blob_store, sheet_df)))
                                                             success = True
                                                     
                                                     # 方法2: 公開URLを試行
@@ -1493,11 +1880,10 @@ def notion_download():
                                                         csv_url = google_sheet_to_csv_url(url)
                                                         if csv_url:
                                                             try:
-                                                                response = requests.get(csv_url, headers=headers)
-                                                                response.raise_for_status()
+                                                                content = fetch_blob(fetcher, blob_store, prefetched, csv_url, headers)
                                                                 sheet_id = extract_sheet_id(url)
                                                                 file_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}.csv"
-                                                                downloaded_files.append((file_name, response.content))
+                                                                downloaded_files.append(planner.record(file_info, file_name, content))
                                                                 success = True
                                                             except requests.exceptions.HTTPError:
                                                                 if fallback_option == "エラーで停止":
@@ -1530,9 +1916,30 @@ def notion_download():
                                     for error in failed_files:
                                         st.write(f"- {error}")
                         
+                        if planner.fetched or planner.fetches_avoided:
+                            st.caption(f"🔁 重複ファイル: {planner.summary()}")
+                        
+                        # 件数確認時のクエリ結果を再利用した分を表示
+                        saved_seconds = query_cache.saved_seconds - saved_before[0]
+                        saved_calls = query_cache.saved_calls - saved_before[1]
+                        if saved_calls:
+                            st.caption(f"♻️ 件数確認時のクエリ結果を再利用: Notion API {saved_calls}回・約{saved_seconds:.1f}秒を節約")
+                        st.caption(f"🚦 {notion.limiter.summary()}")
+                        st.caption(f"📡 {fetcher.summary()}")
+                        if not use_pipeline:
+                            # 取得時間は「ファイルを処理」の計測にまとめて記録する
+                            st.session_state.pending_download_timing = {
+                                "seconds": sum(fetcher.latencies), "calls": len(fetcher.latencies),
+                                "max_seconds": max(fetcher.latencies, default=0.0),
+                                "errors": fetcher.metrics["errors"],
+                            }
+                        fetcher.close()
+                        
                         # セッション状態をクリア
                         keys_to_delete = ['target_counts', 'target_filters', 'target_mode', 
-                                        'target_filter_option', 'google_api_key', 'fallback_option']
+                                        'target_filter_option', 'target_single_pass', 'target_use_mirror',
+                                        'target_query_mode', 'google_api_key', 'fallback_option',
+                                        'sheet_all_tabs']
                         for key in keys_to_delete:
                             if key in st.session_state:
                                 del st.session_state[key]
@@ -1611,18 +2018,237 @@ def file_upload_processing():
         st.write(f"📂 アップロードされたファイル数: {len(uploaded_files)}")
         
         if st.button("🔄 アップロードファイルを処理"):
-            # ファイルオブジェクトを変換
+            # ファイル本体はディスクに保存し、ハンドルだけを渡す
+            blob_store = get_blob_store()
             file_data = []
             for uploaded_file in uploaded_files:
-                content = uploaded_file.read()
+                file_data.append((uploaded_file.name, blob_store.put_stream(uploaded_file)))
                 uploaded_file.seek(0)  # ポインタをリセット
-                file_data.append((uploaded_file.name, content))
             
             process_files(file_data, "アップロード")
 
+def concat_processed_frames(processed_dfs, debug_mode):
+    """処理済みDataFrameの列名を整えて結合（失敗時は None）"""
+    # Step 1: 各DataFrameの前処理（安全化）
+    safe_dfs = []
+    for i, df in enumerate(processed_dfs):
+        try:
+            # インデックスを明示的にリセット
+            df = df.reset_index(drop=True)
+        
+            # 列名の重複チェック・修正
+            columns = df.columns.tolist()
+            seen_columns = {}
+            new_columns = []
+        
+            for col in columns:
+                col_str = str(col)
+                if col_str in seen_columns:
+                    seen_columns[col_str] += 1
+                    new_col_name = f"{col_str}_dup{seen_columns[col_str]}"
+                    new_columns.append(new_col_name)
+                    if debug_mode:
+                        st.warning(f"⚠️ DataFrame{i}: 重複列名修正 '{col_str}' → '{new_col_name}'")
+                else:
+                    seen_columns[col_str] = 0
+                    new_columns.append(col_str)
+        
+            df.columns = new_columns
+        
+            # 列名を文字列に統一
+            df.columns = [str(col) for col in df.columns]
+        
+            safe_dfs.append(df)
+        
+        except Exception as e:
+            if debug_mode:
+                st.error(f"❌ DataFrame{i}の前処理でエラー: {e}")
+            continue
+
+    if not safe_dfs:
+        st.error("❌ 有効なDataFrameがありません")
+        return None
+
+    # Step 2: 安全な結合処理
+    try:
+        # メモリ効率的な統合
+        if len(safe_dfs) > 100:
+            # 大量データの場合、段階的に統合
+            st.info("📊 大量データを段階的に統合中...")
+            # ファイル数に応じたチャンクサイズ調整
+            if len(safe_dfs) > 700:
+                chunk_size = 15  # 大量ファイル時は小さいチャンク
+            elif len(safe_dfs) > 300:
+                chunk_size = 25
+            else:
+                chunk_size = 50
+        
+            merged_chunks = []
+        
+            for i in range(0, len(safe_dfs), chunk_size):
+                chunk = safe_dfs[i:i+chunk_size]
+            
+                # safe_concat_dataframes関数を使用
+                merged_chunk = safe_concat_dataframes(chunk, debug_mode)
+            
+                merged_chunks.append(merged_chunk)
+            
+                if i % (chunk_size * 5) == 0:  # 5チャンクごとに進捗表示
+                    progress_pct = min((i+chunk_size) / len(safe_dfs) * 100, 100)
+                    st.info(f"統合進捗: {min(i+chunk_size, len(safe_dfs))}/{len(safe_dfs)} チャンク ({progress_pct:.1f}%)")
+                
+                    # メモリクリア（700件以上の場合）
+                    if len(safe_dfs) > 700 and i % (chunk_size * 10) == 0:
+                        import gc
+                        gc.collect()
+        
+            # 最終統合も同様に修正
+            if len(merged_chunks) == 1:
+                merged_df = merged_chunks[0]
+            else:
+                aligned_chunks = align_dataframe_columns(merged_chunks, debug_mode)
+                merged_df = safe_concat_dataframes(aligned_chunks, debug_mode)
+        else:
+            # 通常データの場合
+            if len(safe_dfs) == 1:
+                merged_df = safe_dfs[0].copy()
+            else:
+                # 列名を統一してから結合
+                aligned_dfs = align_dataframe_columns(safe_dfs, debug_mode)
+                merged_df = safe_concat_dataframes(aligned_dfs, debug_mode)
+    
+        # 最終インデックスリセット
+        merged_df = merged_df.reset_index(drop=True)
+    
+    except Exception as e:
+        st.error(f"❌ データ統合エラー: {e}")
+        st.info("🔄 代替方法で統合を試行中...")
+    
+        # 代替統合方法
+        try:
+            merged_df = concatenate_dataframes_safely(safe_dfs, debug_mode)
+        except Exception as e2:
+            st.error(f"❌ 代替統合も失敗: {e2}")
+            return None
+    
+    return merged_df
+
+def merge_processed_frames(collector, total_stats, error_files, total_files, source_type,
+                           is_large_batch, debug_mode, status_container, recorder=NULL_RECORDER):
+    """処理済みDataFrame（FrameCollector）を統合・重複削除し、既存データと統合して結果を表示
+
+    メモリ予算を超えてディスク退避に切り替わっている場合は区分けごとに重複削除する
+    """
+    status_container.info("🔗 データ統合中...")
+    
+    merge_existing = not st.session_state.merged_data.empty and st.session_state.get('merge_with_existing', True)
+    fuzzy_companies = st.session_state.get('fuzzy_company_dedup', FUZZY_COMPANY_DEDUP)
+    
+    if collector.spilled:
+        # ディスク退避：既存データも区分けごとに新規の行の前に加えて、区分けごとに1回で重複削除
+        spill = collector.spill
+        existing = None
+        if merge_existing:
+            status_container.info("🔄 既存データと統合中...")
+            existing = st.session_state.merged_data
+        rows_in = spill.rows + (len(existing) if existing is not None else 0)
+        if is_large_batch:
+            st.info("🔄 重複削除中（ディスク退避）...")
+        with recorder.span("dedup", rows_in=rows_in) as span:
+            merged_df, resolution = spill.merge(existing)
+            span.rows_out = len(merged_df)
+        if resolution:
+            show_company_resolution(resolution)
+        if is_large_batch and rows_in > len(merged_df):
+            st.info(f"🗑️ {rows_in - len(merged_df)}件の重複行を削除（メールアドレスが異なる場合は別データとして保持）")
+        st.caption(f"💽 {spill.summary()}")
+        set_merged_data(merged_df)
+        finish_merge(total_stats, error_files, total_files, source_type)
+        return
+    
+    processed_dfs = collector.frames()
+    with recorder.span("concat", rows_in=sum(len(df) for df in processed_dfs)) as span:
+        merged_df = concat_processed_frames(processed_dfs, debug_mode)
+        span.rows_out = len(merged_df) if merged_df is not None else 0
+    if merged_df is None:
+        return
+    
+    # 軽量化された重複削除
+    with recorder.span("dedup", rows_in=len(merged_df)) as span:
+        merged_df = remove_duplicates_lightweight(merged_df, is_large_batch, fuzzy_companies)
+        span.rows_out = len(merged_df)
+    
+    # 既存データとの統合
+    if merge_existing:
+        status_container.info("🔄 既存データと統合中...")
+        with recorder.span("concat", rows_in=len(st.session_state.merged_data) + len(merged_df)) as span:
+            combined_df = pd.concat([st.session_state.merged_data, merged_df], ignore_index=True)
+            span.rows_out = len(combined_df)
+        with recorder.span("dedup", rows_in=len(combined_df)) as span:
+            combined_df = remove_duplicates_lightweight(combined_df, True, fuzzy_companies)
+            span.rows_out = len(combined_df)
+        set_merged_data(combined_df)
+    else:
+        set_merged_data(merged_df)
+    
+    finish_merge(total_stats, error_files, total_files, source_type)
+
+def finish_merge(total_stats, error_files, total_files, source_type):
+    """統計情報を保存して結果を表示"""
+    st.session_state.processing_stats = total_stats
+    
+    # 簡潔な結果表示
+    st.success(f"""
+    ✅ **{source_type}ファイル処理完了**
+    - 処理ファイル数: {total_stats['files_processed']}/{total_files}個
+    - 最終データ数: {len(st.session_state.merged_data)}件
+    - エラーファイル数: {len(error_files)}個
+    """)
+
+def new_frame_collector():
+    """処理済みDataFrameの集約（メモリ予算を超えたらディスク退避に切り替える）"""
+    fuzzy_companies = st.session_state.get('fuzzy_company_dedup', FUZZY_COMPANY_DEDUP)
+    return FrameCollector(MemoryGovernor(), fuzzy_companies)
+
+def notify_memory_spill(governor):
+    """ディスク退避に切り替えたことを通知（警告はセッションで1回だけ）"""
+    if not st.session_state.memory_warning_shown:
+        st.warning(f"⚠️ メモリ予算を超えたため、ディスクに退避して統合します（{governor.summary()}）")
+        st.session_state.memory_warning_shown = True
+
+def finish_run_recorder(recorder):
+    """計測レポートを保存し、段階別の所要時間を折りたたみ表示（エクスポートは同じ計測に追記する）"""
+    report_path = recorder.write()
+    logging.info(recorder.summary())
+    st.session_state.last_run_recorder = recorder
+    show_timing_panel(recorder, report_path)
+
+def show_timing_panel(recorder, report_path=None):
+    """段階別の所要時間・行数・バイト数の表"""
+    stages = recorder.stages()
+    if not stages:
+        return
+    with st.expander(f"⏱️ 処理時間の内訳（全体 {recorder.elapsed():.1f}秒）"):
+        table = pd.DataFrame(stages)[['stage', 'calls', 'seconds', 'max_seconds', 'rows_in', 'rows_out', 'bytes', 'errors']]
+        table.columns = ['段階', '回数', '合計秒数', '最大秒数', '入力行数', '出力行数', 'バイト数', '失敗']
+        st.dataframe(table.round({'合計秒数': 3, '最大秒数': 3}), use_container_width=True, hide_index=True)
+        st.caption("ダウンロード・読み込みは並行して実行するため、合計秒数は実時間より長くなることがあります")
+        if report_path:
+            st.caption(f"📄 計測レポート: {report_path}")
+
 def process_files(file_data, source_type):
-    """ファイルデータを処理（軽量化版）"""
-    processed_dfs = []
+    """ファイルデータを処理（軽量化版）。同じ内容のファイルは1回だけ読み込む
+
+    読み込み結果の共有はこの呼び出しの中だけ（DataFrame をセッションに残さない）。
+    再実行をまたいだ再利用は処理済みキャッシュ（frame_cache）に任せる。
+    """
+    shared_frames = SharedFrames.for_files(file_data)
+    recorder = RunRecorder("streamlit")
+    download_timing = st.session_state.pop('pending_download_timing', None)
+    if download_timing:
+        recorder.record("download", download_timing["seconds"], calls=download_timing["calls"],
+                        errors=download_timing["errors"], max_seconds=download_timing["max_seconds"])
+    collector = new_frame_collector()
     error_files = []
     total_stats = {"email_extracted": 0, "tel_extracted": 0, "files_processed": 0}
     
@@ -1644,6 +2270,11 @@ def process_files(file_data, source_type):
     # プログレスバーとステータス
     progress_bar = st.progress(0)
     status_container = st.empty()
+    memory_container = st.empty()
+    schema_cache = get_schema_cache()
+    schema_counters = schema_cache.counters()
+    frame_cache = get_frame_cache()
+    frame_counters = frame_cache.counters()
     
     if is_large_batch:
         st.info(f"🔄 大量処理モード：{total_files}件のファイルを処理中...")
@@ -1670,29 +2301,58 @@ def process_files(file_data, source_type):
                 status_container.text(f"処理中: {filename} ({global_idx+1}/{total_files})")
             
             try:
-                # 軽量化されたファイル読み込み
-                df = process_single_file_lightweight(filename, content, debug_mode)
+                content_key = frame_key(filename, content)
+                computed = []
                 
-                if df is not None:
+                def process_file():
+                    computed.append(True)
+                    # 軽量化されたファイル読み込み（保存済みファイルは mmap で読む）
+                    def read_file():
+                        with open_content(content) as data:
+                            if isinstance(content, SheetFrameRef):
+                                # Google Sheets APIで取得済みのタブ（ファイル名ではなくハンドルの型で判別）
+                                with recorder.span("parse", bytes=len(data)) as span:
+                                    df = frame_from_bytes(data)
+                                    span.rows_out = len(df)
+                                return df
+                            return process_single_file_lightweight(filename, data, debug_mode, recorder)
+                    df = shared_frames.get_or_parse(content_key, read_file)
+                    if df is None:
+                        return None, {}, "ファイル読み込み失敗"
                     # 軽量化されたデータ処理
-                    processed_df, stats, error = process_dataframe_lightweight(df, filename, debug_mode)
+                    return process_dataframe_lightweight(df, filename, debug_mode, recorder, run_columns=False)
+                
+                # 同じ内容のファイルを以前に処理していれば保存済みの結果を使う
+                processed_df, stats, error = frame_cache.cached(
+                    frame_cache_key("lightweight", FRAME_PIPELINE_VERSION, content_key[0], filename),
+                    process_file, cacheable=lambda result: result[0] is not None
+                )
+                if not computed:
+                    shared_frames.release(content_key)
+                if processed_df is not None:
+                    with recorder.span("run_columns", rows_in=len(processed_df)):
+                        add_run_columns(processed_df, filename)
+                
+                if processed_df is not None:
+                    batch_processed.append(filename)
+                    if collector.add(processed_df, global_idx):
+                        notify_memory_spill(collector.governor)
+                    total_stats["email_extracted"] += stats["email_extracted"]
+                    total_stats["tel_extracted"] += stats["tel_extracted"]
+                    total_stats["files_processed"] += 1
                     
-                    if processed_df is not None:
-                        batch_processed.append(processed_df)
-                        total_stats["email_extracted"] += stats["email_extracted"]
-                        total_stats["tel_extracted"] += stats["tel_extracted"]
-                        total_stats["files_processed"] += 1
-                        
-                        # 成功ログ（簡潔）
-                        if not is_large_batch or debug_mode:
-                            st.success(f"✅ {filename}: {len(processed_df)}行処理完了")
-                    else:
-                        batch_errors.append((filename, error))
-                        if not is_large_batch or debug_mode:
-                            st.error(f"❌ {filename}: {error}")
+                    # 成功ログ（簡潔）
+                    if not is_large_batch or debug_mode:
+                        st.success(f"✅ {filename}: {len(processed_df)}行処理完了")
                 else:
-                    batch_errors.append((filename, "ファイル読み込み失敗"))
+                    batch_errors.append((filename, error))
+                    if not is_large_batch or debug_mode:
+                        st.error(f"❌ {filename}: {error}")
                     
+            except BlobNotFound:
+                batch_errors.append((filename, "保存期間切れ（再ダウンロードしてください）"))
+                if not is_large_batch or debug_mode:
+                    st.error(f"❌ {filename}: 保存領域から削除済みです。再ダウンロードしてください")
             except Exception as e:
                 batch_errors.append((filename, str(e)))
                 if not is_large_batch or debug_mode:
@@ -1702,13 +2362,13 @@ def process_files(file_data, source_type):
             progress_bar.progress((global_idx + 1) / total_files)
         
         # バッチ結果をメインリストに追加
-        processed_dfs.extend(batch_processed)
         error_files.extend(batch_errors)
         
         # 大量処理時のメモリクリア
-        if is_large_batch and len(processed_dfs) > 100:
+        if is_large_batch and len(collector) > 100:
             import gc
             gc.collect()
+        memory_container.caption(f"🧠 {collector.governor.summary()}")
         
         # バッチ完了通知
         if is_large_batch:
@@ -1717,133 +2377,26 @@ def process_files(file_data, source_type):
             st.info(f"📦 バッチ {batch_start//batch_size + 1} 完了: 成功{success_count}件, エラー{error_count}件")
     
     # データ統合（軽量化・安全化）
-    if processed_dfs:
-        status_container.info("🔗 データ統合中...")
-        
-        # Step 1: 各DataFrameの前処理（安全化）
-        safe_dfs = []
-        for i, df in enumerate(processed_dfs):
-            try:
-                # インデックスを明示的にリセット
-                df = df.reset_index(drop=True)
-                
-                # 列名の重複チェック・修正
-                columns = df.columns.tolist()
-                seen_columns = {}
-                new_columns = []
-                
-                for col in columns:
-                    col_str = str(col)
-                    if col_str in seen_columns:
-                        seen_columns[col_str] += 1
-                        new_col_name = f"{col_str}_dup{seen_columns[col_str]}"
-                        new_columns.append(new_col_name)
-                        if debug_mode:
-                            st.warning(f"⚠️ DataFrame{i}: 重複列名修正 '{col_str}' → '{new_col_name}'")
-                    else:
-                        seen_columns[col_str] = 0
-                        new_columns.append(col_str)
-                
-                df.columns = new_columns
-                
-                # 列名を文字列に統一
-                df.columns = [str(col) for col in df.columns]
-                
-                safe_dfs.append(df)
-                
-            except Exception as e:
-                if debug_mode:
-                    st.error(f"❌ DataFrame{i}の前処理でエラー: {e}")
-                continue
-        
-        if not safe_dfs:
-            st.error("❌ 有効なDataFrameがありません")
-            return
-        
-        # Step 2: 安全な結合処理
+    if len(collector):
         try:
-            # メモリ効率的な統合
-            if len(safe_dfs) > 100:
-                # 大量データの場合、段階的に統合
-                st.info("📊 大量データを段階的に統合中...")
-                # ファイル数に応じたチャンクサイズ調整
-                if len(safe_dfs) > 700:
-                    chunk_size = 15  # 大量ファイル時は小さいチャンク
-                elif len(safe_dfs) > 300:
-                    chunk_size = 25
-                else:
-                    chunk_size = 50
-                
-                merged_chunks = []
-                
-                for i in range(0, len(safe_dfs), chunk_size):
-                    chunk = safe_dfs[i:i+chunk_size]
-                    
-                    # safe_concat_dataframes関数を使用
-                    merged_chunk = safe_concat_dataframes(chunk, debug_mode)
-                    
-                    merged_chunks.append(merged_chunk)
-                    
-                    if i % (chunk_size * 5) == 0:  # 5チャンクごとに進捗表示
-                        progress_pct = min((i+chunk_size) / len(safe_dfs) * 100, 100)
-                        st.info(f"統合進捗: {min(i+chunk_size, len(safe_dfs))}/{len(safe_dfs)} チャンク ({progress_pct:.1f}%)")
-                        
-                        # メモリクリア（700件以上の場合）
-                        if len(safe_dfs) > 700 and i % (chunk_size * 10) == 0:
-                            import gc
-                            gc.collect()
-                
-                # 最終統合も同様に修正
-                if len(merged_chunks) == 1:
-                    merged_df = merged_chunks[0]
-                else:
-                    aligned_chunks = align_dataframe_columns(merged_chunks, debug_mode)
-                    merged_df = safe_concat_dataframes(aligned_chunks, debug_mode)
-            else:
-                # 通常データの場合
-                if len(safe_dfs) == 1:
-                    merged_df = safe_dfs[0].copy()
-                else:
-                    # 列名を統一してから結合
-                    aligned_dfs = align_dataframe_columns(safe_dfs, debug_mode)
-                    merged_df = safe_concat_dataframes(aligned_dfs, debug_mode)
-            
-            # 最終インデックスリセット
-            merged_df = merged_df.reset_index(drop=True)
-            
-        except Exception as e:
-            st.error(f"❌ データ統合エラー: {e}")
-            st.info("🔄 代替方法で統合を試行中...")
-            
-            # 代替統合方法
-            try:
-                merged_df = concatenate_dataframes_safely(safe_dfs, debug_mode)
-            except Exception as e2:
-                st.error(f"❌ 代替統合も失敗: {e2}")
-                return
-        
-        # 軽量化された重複削除
-        merged_df = remove_duplicates_lightweight(merged_df, is_large_batch)
-        
-        # 既存データとの統合
-        if not st.session_state.merged_data.empty and st.session_state.get('merge_with_existing', True):
-            status_container.info("🔄 既存データと統合中...")
-            combined_df = pd.concat([st.session_state.merged_data, merged_df], ignore_index=True)
-            combined_df = remove_duplicates_lightweight(combined_df, True)
-            st.session_state.merged_data = combined_df
-        else:
-            st.session_state.merged_data = merged_df
-        
-        # 統計情報保存
-        st.session_state.processing_stats = total_stats
-        
-        # 簡潔な結果表示
-        st.success(f"""
-        ✅ **{source_type}ファイル処理完了**
-        - 処理ファイル数: {total_stats['files_processed']}/{total_files}個
-        - 最終データ数: {len(st.session_state.merged_data)}件
-        - エラーファイル数: {len(error_files)}個
-        """)
+            merge_processed_frames(collector, total_stats, error_files, total_files, source_type,
+                                   is_large_batch, debug_mode, status_container, recorder)
+        finally:
+            collector.close()
+    memory_container.caption(f"🧠 {collector.governor.summary()}")
+    
+    # 列構成キャッシュを保存
+    try:
+        schema_cache.save()
+    except Exception as e:
+        st.warning(f"⚠️ 列構成キャッシュの保存に失敗: {e}")
+    st.caption(f"🗂️ {schema_cache.summary(schema_counters)}")
+    st.caption(f"⏱️ {frame_cache.summary(frame_counters)}")
+    logging.info(frame_cache.summary(frame_counters))
+    st.caption(f"💾 {get_blob_store().summary()}")
+    if shared_frames.parses_avoided:
+        st.caption(f"🔁 同じ内容のファイルの読み込みを共有: {shared_frames.parses_avoided}件")
+    finish_run_recorder(recorder)
     
     # エラーファイル表示（簡潔）
     if error_files:
@@ -1854,13 +2407,17 @@ def process_files(file_data, source_type):
     status_container.empty()
     progress_bar.empty()
 
-def process_single_file_lightweight(filename, content, debug_mode=False):
-    """軽量化されたファイル読み込み"""
+def process_single_file_lightweight(filename, content, debug_mode=False, recorder=NULL_RECORDER):
+    """軽量化されたファイル読み込み（content は bytes または mmap）"""
     try:
         if filename.lower().endswith('.csv'):
+            # 文字コード検出は bytes が必要なため、CSVだけ読み込み時に複製する
+            if not isinstance(content, (bytes, bytearray)):
+                content = bytes(content)
             # 日本語CSV用の軽量エンコーディング検出
             encodings_to_try = ['utf-8-sig', 'utf-8', 'shift_jis', 'cp932']
-            detected_encoding = detect(content).get("encoding", "utf-8")
+            with recorder.span("encoding", bytes=len(content)):
+                detected_encoding = detect(content).get("encoding", "utf-8")
             
             if detected_encoding and detected_encoding not in encodings_to_try:
                 encodings_to_try.insert(0, detected_encoding)
@@ -1871,8 +2428,10 @@ def process_single_file_lightweight(filename, content, debug_mode=False):
                     if content_str.startswith('\ufeff'):
                         content_str = content_str[1:]
                     
-                    df = pd.read_csv(io.StringIO(content_str), dtype=str, on_bad_lines="skip")
-                    df = df.reset_index(drop=True)  # 追加：インデックスリセット
+                    with recorder.span("parse", bytes=len(content)) as span:
+                        df = pd.read_csv(io.StringIO(content_str), dtype=str, on_bad_lines="skip")
+                        df = df.reset_index(drop=True)  # 追加：インデックスリセット
+                        span.rows_out = len(df)
                     
                     # 簡単な文字化けチェック
                     first_col = str(df.columns[0]) if len(df.columns) > 0 else ""
@@ -1885,8 +2444,10 @@ def process_single_file_lightweight(filename, content, debug_mode=False):
             
             # 全て失敗した場合、強制デコード
             content_str = content.decode(detected_encoding, errors='ignore')
-            df = pd.read_csv(io.StringIO(content_str), dtype=str, on_bad_lines="skip")
-            df = df.reset_index(drop=True)  # 追加：インデックスリセット
+            with recorder.span("parse", bytes=len(content)) as span:
+                df = pd.read_csv(io.StringIO(content_str), dtype=str, on_bad_lines="skip")
+                df = df.reset_index(drop=True)  # 追加：インデックスリセット
+                span.rows_out = len(df)
             
             # 文字化け自動修正
             if any(any(suspect in str(col) for suspect in ['録音', '墨訂', '震災']) for col in df.columns):
@@ -1901,7 +2462,11 @@ def process_single_file_lightweight(filename, content, debug_mode=False):
             
         else:
             # Excelファイル
-            df = pd.read_excel(io.BytesIO(content), dtype=str, engine='openpyxl')
+            # mmap はファイルオブジェクトとしてそのまま渡す
+            source = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+            with recorder.span("parse", bytes=len(content)) as span:
+                df = read_excel(source, filename)
+                span.rows_out = len(df)
             return df.reset_index(drop=True)  # 追加：インデックスリセット
             
     except Exception as e:
@@ -1909,8 +2474,53 @@ def process_single_file_lightweight(filename, content, debug_mode=False):
             st.error(f"❌ ファイル読み込みエラー: {filename} - {e}")
         return None
 
-def process_dataframe_lightweight(df, filename, debug_mode=False):
-    """軽量化されたデータフレーム処理"""
+def resolve_lightweight_column_plan(columns):
+    """ヘッダーから列名解決プラン（重複列名修正・不要列削除・列名変換）を作成"""
+    # 重複列名修正
+    seen_columns = {}
+    new_columns = []
+    for col in columns:
+        col_str = str(col).strip()
+        if col_str in seen_columns:
+            seen_columns[col_str] += 1
+            new_columns.append(f"{col_str}_dup{seen_columns[col_str]}")
+        else:
+            seen_columns[col_str] = 0
+            new_columns.append(col_str)
+    
+    # 不要な列（ブース番号、小間番号、ロゴURL）
+    columns_to_drop = [col for col in new_columns
+                       if any(keyword in col.lower().strip() for keyword in UNNEEDED_COLUMN_KEYWORDS)]
+    
+    # 列名正規化（簡潔版）
+    rename_dict = {}
+    for col in new_columns:
+        if col in columns_to_drop:
+            continue
+        new_name = COLUMN_RENAME_INDEX.get(normalize_column_key(col)) or match_lightweight_partial(col)
+        if new_name:
+            rename_dict[col] = new_name
+    
+    return {'columns': new_columns, 'drop': columns_to_drop, 'rename': rename_dict}
+
+def add_run_columns(df, filename):
+    """実行ごとに変わる列（ソースファイル・更新日時・処理月）と日付キーを追加
+
+    年のない日付は今日を基準に年を補うため、日付キーもここで作る（処理済みキャッシュには保存しない）
+    """
+    now = datetime.now()
+    df['ソースファイル'] = filename
+    df['更新日時'] = now.strftime('%Y-%m-%d %H:%M:%S')
+    df['処理月'] = now.strftime('%Y-%m')
+    # 日付キー（重複削除の並べ替え用）を取り込み時に1回だけ作成
+    add_date_keys(df)
+    return df
+
+def process_dataframe_lightweight(df, filename, debug_mode=False, recorder=NULL_RECORDER, run_columns=True):
+    """軽量化されたデータフレーム処理
+
+    run_columns=False では実行ごとに変わる列を追加しない（処理済みキャッシュに保存する場合。読み出し後に add_run_columns）
+    """
     try:
         # 大量データ対応：メモリ効率化
         if len(df) > 10000:
@@ -1926,110 +2536,73 @@ def process_dataframe_lightweight(df, filename, debug_mode=False):
         # インデックスを明示的にリセット（重要）
         df = df.reset_index(drop=True)
         
-        # 重複列名修正（簡潔版）
-        original_columns = list(df.columns)
-        seen_columns = {}
-        new_columns = []
-        
-        for col in original_columns:
-            col_str = str(col).strip()
-            if col_str in seen_columns:
-                seen_columns[col_str] += 1
-                new_col_name = f"{col_str}_dup{seen_columns[col_str]}"
-                new_columns.append(new_col_name)
-                if debug_mode:
-                    st.warning(f"⚠️ 重複列名修正: '{col_str}' → '{new_col_name}'")
-            else:
-                seen_columns[col_str] = 0
-                new_columns.append(col_str)
+        with recorder.span("column_resolution", rows_in=len(df)):
+            # 列名解決（同じヘッダーは保存済みのプランを使用）
+            original_columns = list(df.columns)
+            plan = get_schema_cache().resolve(
+                "lightweight", COLUMN_RULES_VERSION, original_columns, resolve_lightweight_column_plan
+            )
         
-        df.columns = new_columns
+            # 重複列名修正（簡潔版）
+            if debug_mode:
+                for col, new_col_name in zip(original_columns, plan['columns']):
+                    if str(col).strip() != new_col_name:
+                        st.warning(f"⚠️ 重複列名修正: '{str(col).strip()}' → '{new_col_name}'")
         
-        # 列名を文字列に統一
-        df.columns = [str(col) for col in df.columns]
+            df.columns = plan['columns']
         
-        # 再度インデックスリセット
-        df = df.reset_index(drop=True)
+            # 再度インデックスリセット
+            df = df.reset_index(drop=True)
         
-        # 不要な列を削除
-        columns_to_drop = []
-        for col in df.columns:
-            col_lower = str(col).lower().strip()
-            # ブース番号、小間番号、ロゴURLを削除
-            if any(keyword in col_lower for keyword in ['ブース番号', '小間番号', 'ロゴurl', 'ロゴ url', 'logo', 'booth', '小間', 'ブース']):
-                columns_to_drop.append(col)
+            # 不要な列を削除
+            if plan['drop']:
                 if debug_mode:
-                    st.info(f"🗑️ 不要列削除: {col}")
-        
-        if columns_to_drop:
-            df = df.drop(columns=columns_to_drop)
+                    for col in plan['drop']:
+                        st.info(f"🗑️ 不要列削除: {col}")
+                df = df.drop(columns=plan['drop'])
         
-        # 列名正規化（簡潔版）
-        rename_dict = {}
-        for col in df.columns:
-            col_clean = str(col).strip()
-            col_lower = col_clean.lower()
-            
-            # 完全一致チェック
-            for old_name, new_name in COLUMN_RENAMES.items():
-                if col_lower == old_name.lower():
-                    rename_dict[col] = new_name
-                    break
-            
-            # 部分マッチング（最小限）
-            if col not in rename_dict:
-                if 'tel' in col_lower and 'url' not in col_lower:
-                    rename_dict[col] = 'Tel'
-                elif 'mail' in col_lower and 'url' not in col_lower:
-                    rename_dict[col] = 'メールアドレス'
-                elif any(kw in col_clean for kw in ['会社', '企業']) and 'url' not in col_lower:
-                    rename_dict[col] = '会社名'
-                elif col_lower in ['url', 'website'] and len(col_clean) < 15:
-                    rename_dict[col] = 'Website'
-                elif any(kw in col_clean for kw in ['展示会初日', '開始日', '初日', '開催日']) and 'url' not in col_lower:
-                    rename_dict[col] = '展示会初日'
-        
-        # 安全な列名変換
-        try:
-            df.rename(columns=rename_dict, inplace=True)
-            # 再度列名を文字列に統一
-            df.columns = [str(col) for col in df.columns]
-        except Exception as e:
-            if debug_mode:
-                st.warning(f"⚠️ 列名変換エラー: {e}")
+            # 安全な列名変換
+            try:
+                df.rename(columns=plan['rename'], inplace=True)
+                # 再度列名を文字列に統一
+                df.columns = [str(col) for col in df.columns]
+            except Exception as e:
+                if debug_mode:
+                    st.warning(f"⚠️ 列名変換エラー: {e}")
         
-        # 必須列追加
-        for col in REQUIRED_COLUMNS:
-            if col not in df.columns:
-                df[col] = ""
+        with recorder.span("normalization", rows_in=len(df)) as span:
+            # 必須列追加
+            for col in REQUIRED_COLUMNS:
+                if col not in df.columns:
+                    df[col] = ""
         
-        # 展示会初日列も追加
-        if '展示会初日' not in df.columns:
-            df['展示会初日'] = ""
+            # 展示会初日列も追加
+            if '展示会初日' not in df.columns:
+                df['展示会初日'] = ""
         
-        # 展示会名設定
-        if '展示会名' in df.columns:
-            empty_mask = df['展示会名'].isna() | (df['展示会名'] == '')
-            df.loc[empty_mask, '展示会名'] = inferred_event_name
+            # 展示会名設定
+            if '展示会名' in df.columns:
+                empty_mask = df['展示会名'].isna() | (df['展示会名'] == '')
+                df.loc[empty_mask, '展示会名'] = inferred_event_name
         
-        # データ正規化（最小限）
-        try:
-            if "Tel" in df.columns:
-                df["Tel"] = df["Tel"].apply(normalize_phone)
-            if "メールアドレス" in df.columns:
-                df["メールアドレス"] = df["メールアドレス"].apply(validate_email)
-        except Exception as e:
-            if debug_mode:
-                st.warning(f"⚠️ データ正規化エラー: {e}")
+            # データ正規化（最小限）
+            try:
+                if "Tel" in df.columns:
+                    df["Tel"] = df["Tel"].apply(normalize_phone)
+                if "メールアドレス" in df.columns:
+                    df["メールアドレス"] = df["メールアドレス"].apply(validate_email)
+            except Exception as e:
+                if debug_mode:
+                    st.warning(f"⚠️ データ正規化エラー: {e}")
         
-        # 担当者補完（修正：「ご担当者」に変更）
-        if "担当者" in df.columns:
-            df["担当者"] = df["担当者"].fillna("ご担当者").replace("", "ご担当者")
+            # 担当者補完（修正：「ご担当者」に変更）
+            if "担当者" in df.columns:
+                df["担当者"] = df["担当者"].fillna("ご担当者").replace("", "ご担当者")
         
-        # メタデータ追加
-        df['ソースファイル'] = filename
-        df['更新日時'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        df['処理月'] = datetime.now().strftime('%Y-%m')
+            # メタデータ・日付キー追加
+            if run_columns:
+                add_run_columns(df, filename)
+            span.rows_out = len(df)
         
         # 最終インデックスリセット
         df = df.reset_index(drop=True)
@@ -2061,7 +2634,8 @@ def align_dataframe_columns(dfs, debug_mode=False):
             # 欠けている列を追加
             for col in all_columns:
                 if col not in df.columns:
-                    df[col] = ""
+                    # 日付キーは数値のまま（ない行は MISSING_DATE_KEY）
+                    df[col] = MISSING_DATE_KEY if col in DATE_KEY_COLUMNS else ""
             
             # 列順序を統一
             df = df[all_columns]
@@ -2128,8 +2702,11 @@ def concatenate_dataframes_safely(dfs, debug_mode=False):
     
     return result_df
 
-def remove_duplicates_lightweight(df, is_large=False):
-    """軽量化された重複削除（日付ベース、メールアドレス考慮）"""
+def remove_duplicates_lightweight(df, is_large=False, fuzzy_companies=False):
+    """軽量化された重複削除（日付ベース、メールアドレス考慮）
+
+    fuzzy_companies=True の場合は会社名の表記ゆれ（株式会社ABC / (株)ＡＢＣ など）を同じ会社として扱う
+    """
     if is_large:
         st.info("🔄 重複削除中...")
     
@@ -2141,59 +2718,18 @@ def remove_duplicates_lightweight(df, is_large=False):
     try:
         # 会社名+展示会名+メールアドレスでの重複削除（日付ベース）
         if '会社名' in df.columns and '展示会名' in df.columns:
-            # 日付列を datetime 型に変換
-            date_cols_parsed = []
+            # 日付キー（取り込み時に作成済み。なければここで作成、読み取れない日付は 0）
+            # 複数の日付列がある場合は、最も新しい日付を使用
+            latest_dates = row_dates(df)
             
-            # 展示会初日の変換を試みる
-            if '展示会初日' in df.columns:
-                try:
-                    df['_parsed_exhibition_date'] = pd.to_datetime(df['展示会初日'], errors='coerce')
-                    date_cols_parsed.append('_parsed_exhibition_date')
-                except:
-                    pass
-            
-            # 最終更新日の変換を試みる（もし存在すれば）
-            if '最終更新日' in df.columns:
-                try:
-                    df['_parsed_update_date'] = pd.to_datetime(df['最終更新日'], errors='coerce')
-                    date_cols_parsed.append('_parsed_update_date')
-                except:
-                    pass
-            
-            # 日付でソート（新しい順）
-            if date_cols_parsed:
-                # 複数の日付列がある場合は、最も新しい日付を使用
-                if len(date_cols_parsed) > 1:
-                    df['_max_date'] = df[date_cols_parsed].max(axis=1)
-                    sort_col = '_max_date'
-                else:
-                    sort_col = date_cols_parsed[0]
-                
-                # 日付でソート（新しい順、NaTは最後に）
-                df = df.sort_values(by=sort_col, ascending=False, na_position='last')
-            
-            # 重複削除の基準を設定
-            # メールアドレス列が存在する場合は、それも重複判定に含める
-            if 'メールアドレス' in df.columns:
-                # メールアドレスを正規化（空文字とNaNを統一）
-                df['_normalized_email'] = df['メールアドレス'].fillna('').str.strip()
-                df.loc[df['_normalized_email'] == '', '_normalized_email'] = pd.NA
-                
-                # 会社名 + 展示会名 + メールアドレスで重複削除
-                duplicate_subset = ['会社名', '展示会名', '_normalized_email']
-            else:
-                duplicate_subset = ['会社名', '展示会名']
-            
-            # 重複削除（最初のもの=最新を残す）
-            df = df.drop_duplicates(subset=duplicate_subset, keep='first')
-            
-            # 一時的な列を削除
-            temp_cols = ['_parsed_exhibition_date', '_parsed_update_date', '_max_date', '_normalized_email']
-            for col in temp_cols:
-                if col in df.columns:
-                    df = df.drop(columns=[col])
+            # 重複削除の基準（会社名+展示会名+メールアドレス）
+            groups, resolution = dedup_groups(df, fuzzy_companies)
+            if resolution:
+                show_company_resolution(resolution)
             
-            df = df.reset_index(drop=True)
+            # キーごとに最新の行を残す（日付の新しい順、日付なしは最後に）
+            positions = latest_positions(groups, latest_dates)
+            df = df.take(positions).reset_index(drop=True)
         
         removed_count = original_count - len(df)
         if is_large and removed_count > 0:
@@ -2204,6 +2740,47 @@ def remove_duplicates_lightweight(df, is_large=False):
     
     return df
 
+def show_company_resolution(resolution):
+    """会社名のゆれを統合した結果の表示"""
+    if resolution['merged_clusters']:
+        st.info(f"🧩 {resolution_summary(resolution)}")
+        with st.expander("統合した会社名の例"):
+            for names in resolution['examples']:
+                st.write(" / ".join(names))
+
+def set_merged_data(df):
+    """統合データを差し替え、データバージョンを進める（エクスポートキャッシュの無効化用）"""
+    st.session_state.merged_data = df
+    st.session_state.merged_data_version = st.session_state.get('merged_data_version', 0) + 1
+
+def get_export_cache(data_version, filter_signature):
+    """(データバージョン, フィルター署名) に対応するエクスポートキャッシュを返す"""
+    cache_key = (data_version, filter_signature)
+    export_cache = st.session_state.get('export_cache')
+    if not export_cache or export_cache['key'] != cache_key:
+        # 条件が変わったら古い成果物は破棄
+        export_cache = {'key': cache_key, 'artifacts': {}}
+        st.session_state.export_cache = export_cache
+    return export_cache['artifacts']
+
+def lazy_export(artifacts, kind, builder, recorder=None):
+    """クリック時に初めて生成し、同じ条件の間は使い回すエクスポート関数を返す
+
+    recorder を指定すると生成にかかった時間を "export" 段階として記録し、計測レポートを書き直す
+    """
+    def produce():
+        if kind not in artifacts:
+            if recorder is None:
+                artifacts[kind] = builder()
+            else:
+                with recorder.span("export") as span:
+                    artifacts[kind] = builder()
+                    if isinstance(artifacts[kind], bytes):
+                        span.bytes = len(artifacts[kind])
+                recorder.write()
+        return artifacts[kind]
+    return produce
+
 def display_processed_files():
     """処理済みファイル一覧表示"""
     if st.session_state.processed_files:
@@ -2226,6 +2803,10 @@ def data_search_and_download():
     if st.session_state.merged_data.empty:
         st.info("⚠️ まずファイルを処理して統合してください")
         return
+    
+    # 再実行ごとのCPU時間計測
+    rerun_cpu_start = time.process_time()
+    eager_export = False
         
     st.subheader("🔍 高度な検索・分析・ダウンロード")
     
@@ -2288,8 +2869,12 @@ def data_search_and_download():
         # 担当者検索
         contact_search = st.text_input("担当者名検索（部分一致）")
     
+    # エクスポートキャッシュ用の検索条件
+    search_params = [selected_exhibitions, selected_industries, company_search,
+                     contact_search, email_filter, tel_filter]
+    
     # データフィルタリング
-    filtered_data = st.session_state.merged_data.copy()
+    filtered_data = drop_date_keys(st.session_state.merged_data).copy()
     
     # 複数選択対応
     if '全て' not in selected_exhibitions:
@@ -2346,6 +2931,10 @@ def data_search_and_download():
         # ダウンロードセクション
         st.markdown("### 📥 ダウンロード")
         
+        # ダウンロード用の絞り込み（列がない場合は絞り込まない）
+        download_industries = None
+        download_exhibitions = None
+        
         # ダウンロードオプション
         with st.expander("⚙️ ダウンロードオプション", expanded=True):
             col1, col2, col3 = st.columns(3)
@@ -2360,7 +2949,7 @@ def data_search_and_download():
                 # 業界カテゴリ選択
                 if '業界' in filtered_data.columns:
                     unique_industries = filtered_data['業界'].dropna().unique().tolist()
-                    selected_industries = st.multiselect(
+                    download_industries = st.multiselect(
                         "業界を選択",
                         options=unique_industries,
                         default=unique_industries,
@@ -2371,12 +2960,26 @@ def data_search_and_download():
                 # 展示会選択
                 if '展示会名' in filtered_data.columns:
                     unique_exhibitions = filtered_data['展示会名'].dropna().unique().tolist()
-                    selected_exhibitions = st.multiselect(
+                    download_exhibitions = st.multiselect(
                         "展示会を選択",
                         options=unique_exhibitions,
                         default=unique_exhibitions,
                         help="ダウンロードする展示会を選択"
                     )
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                xlsx_engine = st.selectbox(
+                    "Excel書き出しエンジン",
+                    available_xlsx_engines(),
+                    help="xlsxwriterは行ストリーミングで高速・省メモリ"
+                )
+            with col2:
+                eager_export = st.checkbox(
+                    "全形式を即時生成（従来動作）",
+                    value=False,
+                    help="未チェック時はボタンを押した形式だけ生成します"
+                )
         
         # フィルタリング後のデータ
         download_data = filtered_data.copy()
@@ -2389,90 +2992,102 @@ def data_search_and_download():
             ]
         
         # 業界フィルタ
-        if '業界' in download_data.columns and 'selected_industries' in locals():
-            download_data = download_data[download_data['業界'].isin(selected_industries)]
+        if '業界' in download_data.columns and download_industries is not None:
+            download_data = download_data[download_data['業界'].isin(download_industries)]
         
         # 展示会フィルタ
-        if '展示会名' in download_data.columns and 'selected_exhibitions' in locals():
-            download_data = download_data[download_data['展示会名'].isin(selected_exhibitions)]
+        if '展示会名' in download_data.columns and download_exhibitions is not None:
+            download_data = download_data[download_data['展示会名'].isin(download_exhibitions)]
         
         st.info(f"🎯 ダウンロード対象: {len(download_data)}件")
         
         # SNS列の統合処理を実行
         download_data = merge_sns_columns(download_data)
         
+        # エクスポート成果物は (データバージョン, フィルター署名, 種類) でキャッシュ
+        filter_signature = hashlib.md5(json.dumps(
+            search_params + [download_email_only, download_industries, download_exhibitions, xlsx_engine],
+            ensure_ascii=False, default=str
+        ).encode('utf-8')).hexdigest()
+        artifacts = get_export_cache(st.session_state.merged_data_version, filter_signature)
+        
+        # メールリスト・テレアポリストの元データ（ダウンロードデータが空の場合はフィルター前のデータを使用）
+        list_source = download_data if not download_data.empty else filtered_data
+        
+        def build_email_list():
+            # メールリストのみ（修正：展示会初日を追加）
+            email_columns = ['会社名', '担当者', 'メールアドレス', '展示会名', '業界']
+            if '展示会初日' in filtered_data.columns:
+                email_columns.append('展示会初日')
+            email_only = list_source[
+                (list_source['メールアドレス'].notna()) & 
+                (list_source['メールアドレス'] != '')
+            ]
+            # 必要な列のみ選択（存在する列のみ）
+            available_email_cols = [col for col in email_columns if col in email_only.columns]
+            email_only = email_only[available_email_cols] if available_email_cols else email_only
+            return email_only.to_csv(index=False, encoding='utf-8-sig')
+        
+        def build_tel_list():
+            # テレアポリスト（修正：展示会初日を追加）
+            tel_columns = ['会社名', '担当者', 'Tel', '展示会名', '業界']
+            if '展示会初日' in filtered_data.columns:
+                tel_columns.append('展示会初日')
+            tel_only = list_source[
+                (list_source['Tel'].notna()) & 
+                (list_source['Tel'] != '')
+            ]
+            # 必要な列のみ選択（存在する列のみ）
+            available_tel_cols = [col for col in tel_columns if col in tel_only.columns]
+            tel_only = tel_only[available_tel_cols] if available_tel_cols else tel_only
+            return tel_only.to_csv(index=False, encoding='utf-8-sig')
+        
+        # 生成時間は直前の取り込みの計測に追記する
+        recorder = st.session_state.get('last_run_recorder')
+        exports = {
+            'csv': lazy_export(artifacts, 'csv',
+                               lambda: download_data.to_csv(index=False, encoding='utf-8-sig'), recorder),
+            'xlsx': lazy_export(artifacts, 'xlsx',
+                                lambda: dataframe_to_xlsx_bytes(download_data, 'ExhibitionData', xlsx_engine), recorder),
+            'email_list': lazy_export(artifacts, 'email_list', build_email_list, recorder),
+            'tel_list': lazy_export(artifacts, 'tel_list', build_tel_list, recorder),
+        }
+        
+        # 従来動作：ボタンを押さなくても全形式を生成
+        if eager_export:
+            exports = {kind: produce() for kind, produce in exports.items()}
+        
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            csv = download_data.to_csv(index=False, encoding='utf-8-sig')
             st.download_button(
                 label="📄 CSVダウンロード",
-                data=csv,
+                data=exports['csv'],
                 file_name=f"exhibition_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
             )
         
         with col2:
             # Excelダウンロード
-            try:
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    download_data.to_excel(writer, index=False, sheet_name='ExhibitionData')
-                excel_data = output.getvalue()
-                
-                st.download_button(
-                    label="📊 Excelダウンロード",
-                    data=excel_data,
-                    file_name=f"exhibition_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            except ImportError:
-                st.error("⚠️ Excelダウンロードにはopenpyxlが必要です。\n`pip install openpyxl`を実行してください。")
+            st.download_button(
+                label="📊 Excelダウンロード",
+                data=exports['xlsx'],
+                file_name=f"exhibition_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
         
         with col3:
-            # メールリストのみ（修正：展示会初日を追加）
-            email_columns = ['会社名', '担当者', 'メールアドレス', '展示会名', '業界']
-            if '展示会初日' in filtered_data.columns:
-                email_columns.append('展示会初日')
-            
-            # ダウンロードデータが空の場合はフィルター前のデータを使用
-            email_source = download_data if not download_data.empty else filtered_data
-            email_only = email_source[
-                (email_source['メールアドレス'].notna()) & 
-                (email_source['メールアドレス'] != '')
-            ]
-            # 必要な列のみ選択（存在する列のみ）
-            available_email_cols = [col for col in email_columns if col in email_only.columns]
-            email_only = email_only[available_email_cols] if available_email_cols else email_only
-            
-            email_csv = email_only.to_csv(index=False, encoding='utf-8-sig')
             st.download_button(
                 label="📧 メールリスト",
-                data=email_csv,
+                data=exports['email_list'],
                 file_name=f"email_list_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
             )
         
         with col4:
-            # テレアポリスト（修正：展示会初日を追加）
-            tel_columns = ['会社名', '担当者', 'Tel', '展示会名', '業界']
-            if '展示会初日' in filtered_data.columns:
-                tel_columns.append('展示会初日')
-            
-            # ダウンロードデータが空の場合はフィルター前のデータを使用
-            tel_source = download_data if not download_data.empty else filtered_data
-            tel_only = tel_source[
-                (tel_source['Tel'].notna()) & 
-                (tel_source['Tel'] != '')
-            ]
-            # 必要な列のみ選択（存在する列のみ）
-            available_tel_cols = [col for col in tel_columns if col in tel_only.columns]
-            tel_only = tel_only[available_tel_cols] if available_tel_cols else tel_only
-            
-            tel_csv = tel_only.to_csv(index=False, encoding='utf-8-sig')
             st.download_button(
                 label="📞 テレアポリスト",
-                data=tel_csv,
+                data=exports['tel_list'],
                 file_name=f"tel_list_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
             )
@@ -2512,6 +3127,10 @@ def data_search_and_download():
                         st.write(f"- {date}: {count}件")
     else:
         st.warning("🔍 検索条件に一致するデータがありません")
+    
+    rerun_cpu = time.process_time() - rerun_cpu_start
+    export_mode = "即時生成" if eager_export else "遅延生成"
+    st.caption(f"⏱️ この画面の再実行CPU時間: {rerun_cpu:.3f}秒（エクスポート: {export_mode}）")
 
 def main():
     st.title("📊 展示会リスト自動化システム（高機能版）")
@@ -2531,6 +3150,12 @@ def main():
         "処理を選択してください:",
         ["🔗 Notion連携", "📁 ファイル処理", "🔍 データ検索・分析"]
     )
+    st.sidebar.checkbox(
+        "🧩 会社名のゆれを統合して重複削除",
+        value=FUZZY_COMPANY_DEDUP,
+        key='fuzzy_company_dedup',
+        help="「株式会社ABC」「(株)ＡＢＣ」「ABC Co., Ltd.」などを同じ会社として重複削除します（あいまい一致）"
+    )
     
     if mode == "🔗 Notion連携":
         notion_download()
@@ -2554,7 +3179,7 @@ def main():
     
     # データリセット
     if st.sidebar.button("🔄 全データをリセット"):
-        st.session_state.merged_data = pd.DataFrame()
+        set_merged_data(pd.DataFrame())
         st.session_state.processed_files = []
         st.session_state.processing_stats = {}
         if 'notion_files' in st.session_state:
@@ -7,7 +7,6 @@ update.py - 展示会リスト月次自動更新スクリプト
 
 import os
 import pandas as pd
-import requests
 import re
 from datetime import datetime, timedelta
 from notion_client import Client
@@ -17,6 +16,19 @@ import json
 import logging
 import hashlib
 from calendar import monthrange
+from schema_cache import get_schema_cache, rename_by_position, rules_fingerprint
+from column_rules import RULES_ENGINE_VERSION, build_rename_index, normalize_column_key
+from notion_access import RateLimitedClient, UnsupportedFilter, query_all_pages
+from notion_mirror import get_notion_mirror
+from pipeline import PIPELINE_DOWNLOAD_WORKERS, FilePipeline
+from frame_cache import frame_cache_key, get_frame_cache
+from sheets_api import SHEETS_EXPORT_BASE
+from async_fetch import create_fetcher
+from company_resolution import FUZZY_COMPANY_DEDUP, resolution_summary, resolve_companies
+from instrumentation import NULL_RECORDER, RunRecorder
+from processed_ledger import STATUS_PENDING, get_processed_ledger, ledger_key
+from excel_reader import read_excel
+from xlsx_writer import write_xlsx
 
 # ログ設定
 logging.basicConfig(
@@ -28,12 +40,19 @@ logging.basicConfig(
 NOTION_API_KEY = os.environ.get("NOTION_API_KEY")
 DATABASE_ID = os.environ.get("DATABASE_ID")
 FORCE_FULL_UPDATE = os.environ.get("FORCE_FULL_UPDATE", "false").lower() == "true"
+# Notionデータベースのローカルミラーを差分同期して検索する（false で毎回Notionに直接問い合わせ）
+USE_NOTION_MIRROR = os.environ.get("USE_NOTION_MIRROR", "true").lower() == "true"
+# Notion API の接続先（負荷試験ではローカルの代替サーバーを指定する）
+NOTION_BASE_URL = os.environ.get("NOTION_BASE_URL")
 
 OUTPUT_DIR = "data"
 MERGED_FILE = os.path.join(OUTPUT_DIR, "merged_exhibition_data.xlsx")
 MONTHLY_FILE = os.path.join(OUTPUT_DIR, "monthly_new_data.xlsx")
+# 以前の処理済みファイルログ（台帳に1回だけ取り込む）
 PROCESSED_FILES_LOG = os.path.join(OUTPUT_DIR, "processed_files.json")
+PROCESSED_LEDGER_FILE = os.path.join(OUTPUT_DIR, "processed_files.sqlite")
 UPDATE_LOG_FILE = os.path.join(OUTPUT_DIR, "monthly_update_log.json")
+NOTION_MIRROR_FILE = os.path.join(OUTPUT_DIR, "notion_mirror.sqlite")
 
 # 拡張版列名マッピング
 COLUMN_RENAMES = {
@@ -108,6 +127,18 @@ COLUMN_RENAMES = {
 REQUIRED_COLUMNS = ["メールアドレス", "展示会名", "担当者", "業界", "Tel", "会社名"]
 KEY_COLS = ["展示会名", "業界", "会社名"]
 
+# 完全一致用の索引（正規化キー → 変換先）
+COLUMN_RENAME_INDEX = build_rename_index(COLUMN_RENAMES)
+
+# 列名ルールのバージョン（ルール変更時に列構成キャッシュを無効化）
+COLUMN_RULES_VERSION = rules_fingerprint(RULES_ENGINE_VERSION, COLUMN_RENAMES)
+SCHEMA_CACHE_FILE = os.path.join(OUTPUT_DIR, "schema_cache.json")
+
+# 読み込み・正規化処理のバージョン（処理内容を変えたら上げる。処理済みキャッシュを無効化）
+PROCESSING_VERSION = 1
+FRAME_PIPELINE_VERSION = rules_fingerprint(PROCESSING_VERSION, COLUMN_RULES_VERSION)
+FRAME_CACHE_DIR = os.path.join(OUTPUT_DIR, "frame_cache")
+
 def create_output_dir():
     """出力ディレクトリを作成"""
     if not os.path.exists(OUTPUT_DIR):
@@ -121,20 +152,11 @@ def get_current_month_range():
     last_day = datetime(now.year, now.month, last_day_of_month, 23, 59, 59)
     return first_day, last_day
 
-def load_processed_files():
-    """処理済みファイルのログを読み込み"""
-    if os.path.exists(PROCESSED_FILES_LOG):
-        try:
-            with open(PROCESSED_FILES_LOG, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_processed_files(processed_files):
-    """処理済みファイルのログを保存"""
-    with open(PROCESSED_FILES_LOG, 'w', encoding='utf-8') as f:
-        json.dump(processed_files, f, ensure_ascii=False, indent=2)
+def open_processed_ledger():
+    """処理済みファイルの台帳を開く（以前の processed_files.json があれば初回に取り込む）"""
+    ledger = get_processed_ledger(PROCESSED_LEDGER_FILE)
+    ledger.import_json(PROCESSED_FILES_LOG)
+    return ledger
 
 def generate_file_hash(content):
     """ファイルコンテンツのハッシュを生成"""
@@ -249,7 +271,7 @@ def google_sheet_to_csv_url(sheet_url):
     
     gid_match = re.search(r"[#&]gid=([0-9]+)", sheet_url)
     gid = gid_match.group(1) if gid_match else "0"
-    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
+    return f"{SHEETS_EXPORT_BASE}/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
 
 def fetch_new_files_from_notion(notion, database_id, processed_files):
     """Notionから今月の新規ファイルのみを取得"""
@@ -280,20 +302,18 @@ def fetch_new_files_from_notion(notion, database_id, processed_files):
         ]
     }
 
-    all_items = []
-    start_cursor = None
-
-    while True:
-        response = notion.databases.query(
-            database_id=database_id,
-            filter=filter_conditions,
-            start_cursor=start_cursor
-        )
-        items = response.get("results", [])
-        all_items.extend(items)
-        if not response.get("has_more"):
-            break
-        start_cursor = response.get("next_cursor")
+    use_mirror = USE_NOTION_MIRROR
+    if use_mirror:
+        # 前回以降に編集されたページだけを同期し、フィルターはローカルで評価
+        mirror = get_notion_mirror(NOTION_MIRROR_FILE)
+        mirror.sync(notion, database_id, full=FORCE_FULL_UPDATE)
+        try:
+            all_items = mirror.query(database_id, filter_conditions)
+        except UnsupportedFilter as e:
+            logging.warning(f"ミラーで評価できないためNotion APIで検索: {e}")
+            use_mirror = False
+    if not use_mirror:
+        all_items, _ = query_all_pages(notion, database_id, filter_conditions)
 
     # 新規ファイルのみフィルタリング
     new_files = []
@@ -312,81 +332,105 @@ def fetch_new_files_from_notion(notion, database_id, processed_files):
                 else:
                     continue
                 
-                # ファイルが既に処理済みかチェック
-                file_key = f"{item['id']}_{file_url}"
+                # ファイルが既に処理済みかチェック（署名付きURLのクエリを除いたキー）
+                file_key = ledger_key(item['id'], file_url)
                 if file_key not in processed_files:
                     new_files.append(item)
                     break
 
+    if use_mirror:
+        # ミラーに保存されたファイルURLは失効しているため、ダウンロード対象のみ取り直す
+        new_files = mirror.refresh_file_urls(notion, database_id, new_files)
+
     logging.info(f"今月の抽出日条件: {first_day.strftime('%Y-%m-%d')} ～ {last_day.strftime('%Y-%m-%d')}")
     logging.info(f"今月の新規アイテム: {len(new_files)}件")
     return new_files
 
-def process_dataframe(df, filename):
-    """データフレームの高度な処理"""
+def resolve_column_plan(columns):
+    """ヘッダーから列名変換プラン（位置ごとの変換後の列名、変換しない列は None）を作成（全角半角・大文字小文字を無視）"""
+    return {"rename": [COLUMN_RENAME_INDEX.get(normalize_column_key(col)) for col in columns]}
+
+def add_run_columns(df, filename):
+    """実行ごとに変わる列（ソースファイル・更新日時・処理月）を追加（処理済みキャッシュには保存しない）"""
+    now = datetime.now()
+    df['ソースファイル'] = filename
+    df['更新日時'] = now.strftime('%Y-%m-%d %H:%M:%S')
+    df['処理月'] = now.strftime('%Y-%m')
+    return df
+
+CONTACT_KEYWORDS = ['問い合わせ先', '連絡先', 'お問い合わせ先', 'Contact', '問合せ先']
+
+def extract_contacts(df, stats):
+    """連絡先系の列からメールアドレスとTELを抽出して空欄を埋める"""
+    contact_cols = [c for c in df.columns if any(keyword in c for keyword in CONTACT_KEYWORDS)]
+    if not contact_cols:
+        return
+    
+    # 必要カラムを事前に確保
+    if 'メールアドレス' not in df.columns:
+        df['メールアドレス'] = ''
+    if 'Tel' not in df.columns:
+        df['Tel'] = ''
+    
+    for col in contact_cols:
+        # メールアドレス抽出
+        temp_emails = df[col].apply(extract_email_from_text)
+        email_mask = (df['メールアドレス'] == '') & (temp_emails != '')
+        df.loc[email_mask, 'メールアドレス'] = temp_emails[email_mask]
+        stats["email_extracted"] += email_mask.sum()
+        
+        # 電話番号抽出
+        temp_phones = df[col].apply(extract_phone_from_text)
+        phone_mask = (df['Tel'] == '') & (temp_phones != '')
+        df.loc[phone_mask, 'Tel'] = temp_phones[phone_mask]
+        stats["tel_extracted"] += phone_mask.sum()
+
+def process_dataframe(df, filename, recorder=NULL_RECORDER, run_columns=True):
+    """データフレームの高度な処理
+
+    run_columns=False では実行ごとに変わる列を追加しない（処理済みキャッシュに保存する場合。読み出し後に add_run_columns）
+    """
     try:
         stats = {"email_extracted": 0, "tel_extracted": 0}
         
         # ファイル名から展示会名を推測
         inferred_event_name = os.path.splitext(filename)[0]
         
-        # 列名正規化（大文字小文字を無視）
-        rename_dict = {}
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            for old_name, new_name in COLUMN_RENAMES.items():
-                if col_lower == old_name.lower():
-                    rename_dict[col] = new_name
-                    break
-        
-        df.rename(columns=rename_dict, inplace=True)
+        # 列名正規化（同じヘッダーは保存済みのプランを使用）
+        with recorder.span("column_resolution", rows_in=len(df)):
+            plan = get_schema_cache(SCHEMA_CACHE_FILE).resolve(
+                "update", COLUMN_RULES_VERSION, df.columns, resolve_column_plan
+            )
+            df.columns = rename_by_position(df.columns, plan["rename"])
         
         # 連絡先系列からメールアドレスとTEL抽出
-        contact_cols = [c for c in df.columns if any(keyword in c for keyword in 
-                       ['問い合わせ先', '連絡先', 'お問い合わせ先', 'Contact', '問合せ先'])]
-        
-        if contact_cols:
-            # 必要カラムを事前に確保
-            if 'メールアドレス' not in df.columns:
-                df['メールアドレス'] = ''
-            if 'Tel' not in df.columns:
-                df['Tel'] = ''
-
-            for col in contact_cols:
-                # メールアドレス抽出
-                temp_emails = df[col].apply(extract_email_from_text)
-                email_mask = (df['メールアドレス'] == '') & (temp_emails != '')
-                df.loc[email_mask, 'メールアドレス'] = temp_emails[email_mask]
-                stats["email_extracted"] += email_mask.sum()
-                
-                # 電話番号抽出
-                temp_phones = df[col].apply(extract_phone_from_text)
-                phone_mask = (df['Tel'] == '') & (temp_phones != '')
-                df.loc[phone_mask, 'Tel'] = temp_phones[phone_mask]
-                stats["tel_extracted"] += phone_mask.sum()
-        
-        # 必須列がなければ追加
-        for col in REQUIRED_COLUMNS:
-            if col not in df.columns:
-                df[col] = ""
-        
-        # 展示会名が空の場合、ファイル名から推測
-        if '展示会名' in df.columns:
-            df.loc[df['展示会名'] == '', '展示会名'] = inferred_event_name
-        
-        # 文字列列の前後空白除去
-        str_cols = df.select_dtypes(include="object").columns
-        df[str_cols] = df[str_cols].apply(lambda s: s.str.strip() if hasattr(s, 'str') else s)
-        
-        # 担当者名の補完
-        if "担当者" in df.columns:
-            df["担当者"] = df["担当者"].fillna("").replace("", "ご担当者様")
-        
-        # データ正規化
-        if "Tel" in df.columns:
-            df["Tel"] = df["Tel"].apply(normalize_phone)
-        if "メールアドレス" in df.columns:
-            df["メールアドレス"] = df["メールアドレス"].apply(validate_email)
+        with recorder.span("contact_extraction", rows_in=len(df)):
+            extract_contacts(df, stats)
+        
+        with recorder.span("normalization", rows_in=len(df)) as span:
+            # 必須列がなければ追加
+            for col in REQUIRED_COLUMNS:
+                if col not in df.columns:
+                    df[col] = ""
+            
+            # 展示会名が空の場合、ファイル名から推測
+            if '展示会名' in df.columns:
+                df.loc[df['展示会名'] == '', '展示会名'] = inferred_event_name
+            
+            # 文字列列の前後空白除去
+            str_cols = df.select_dtypes(include="object").columns
+            df[str_cols] = df[str_cols].apply(lambda s: s.str.strip() if hasattr(s, 'str') else s)
+            
+            # 担当者名の補完
+            if "担当者" in df.columns:
+                df["担当者"] = df["担当者"].fillna("").replace("", "ご担当者様")
+            
+            # データ正規化
+            if "Tel" in df.columns:
+                df["Tel"] = df["Tel"].apply(normalize_phone)
+            if "メールアドレス" in df.columns:
+                df["メールアドレス"] = df["メールアドレス"].apply(validate_email)
+            span.rows_out = len(df)
         
         # 必須3列が丸ごと空ならエラー
         key_cols_check = ["メールアドレス", "Tel", "会社名"]
@@ -394,118 +438,201 @@ def process_dataframe(df, filename):
             raise ValueError("必須項目（メールアドレス・Tel・会社名）の列全体が空欄です。")
         
         # ファイル名と更新日時を追加
-        df['ソースファイル'] = filename
-        df['更新日時'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        df['処理月'] = datetime.now().strftime('%Y-%m')
+        if run_columns:
+            add_run_columns(df, filename)
         
         return df, stats, None
         
     except Exception as e:
         return None, {}, str(e)
 
-def download_and_process_new_files(items, processed_files):
-    """新規ファイルをダウンロードして処理"""
+def page_title_of(properties):
+    """ページタイトルを取得"""
+    page_title = "untitled"
+    if "名前" in properties and properties["名前"]["title"]:
+        page_title = properties["名前"]["title"][0]["plain_text"] if properties["名前"]["title"] else "untitled"
+    elif "Name" in properties and properties["Name"]["title"]:
+        page_title = properties["Name"]["title"][0]["plain_text"] if properties["Name"]["title"] else "untitled"
+    return page_title
+
+def download_and_process_new_files(items, processed_files, fetcher=None, recorder=NULL_RECORDER, ledger=None):
+    """新規ファイルをダウンロードして処理（ダウンロードと読み込みを並行実行）
+
+    processed_files は処理済みの判定に使う（台帳または dict。強制全更新では空の dict）。
+    処理が終わったファイルは1件ずつ ledger にコミットし、前回の実行で処理済み・未統合のファイルは
+    ダウンロードせずに保存済みの処理結果を使う。
+    fetcher を省略すると FETCH_ENGINE の取得エンジンを作成して使う。
+    recorder には段階ごとの所要時間・行数・バイト数を記録する（保存済みの処理結果を使ったファイルは記録されない）
+    戻り値: (DataFrame のリスト, 抽出件数, 今回処理・再開したファイルキーのリスト)
+    """
     logging.info("新規ファイルをダウンロード・処理中...")
     
     processed_dfs = []
     error_count = 0
     success_count = 0
     total_stats = {"email_extracted": 0, "tel_extracted": 0}
-    new_processed_files = processed_files.copy()
+    resumed_count = 0
+    file_keys = []
+    if ledger is None:
+        ledger = open_processed_ledger()
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
-    
-    for item_idx, item in enumerate(items):
-        properties = item["properties"]
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = create_fetcher()
+    
+    def expand(item_idx, item):
+        file_property = item["properties"].get("ファイル")
+        if not file_property or file_property["type"] != "files":
+            return []
+        page_title = page_title_of(item["properties"])
+        return [(item_idx, file_idx, item, page_title, file_info)
+                for file_idx, file_info in enumerate(file_property["files"])]
+    
+    def resume(file_key):
+        """前回の実行で処理済み・未統合のファイルは保存済みの処理結果を返す（なければ None）"""
+        entry = ledger.entry(file_key)
+        if entry is None or entry['status'] != STATUS_PENDING:
+            return None
+        value = frame_cache.get(frame_cache_key("update", FRAME_PIPELINE_VERSION, entry['hash'], entry['filename']))
+        if value is None:
+            return None
+        logging.info(f"再開（前回の実行で処理済み）: {entry['filename']}")
+        add_run_columns(value[0], entry['filename'])
+        return entry['filename'], (None, file_key, entry['hash'], value)
+    
+    def fetch(task):
+        item_idx, file_idx, item, page_title, file_info = task
+        file_content = None
+        final_name = ""
+        file_url = ""
         
-        # ページタイトルを取得
-        page_title = "untitled"
-        if "名前" in properties and properties["名前"]["title"]:
-            page_title = properties["名前"]["title"][0]["plain_text"] if properties["名前"]["title"] else "untitled"
-        elif "Name" in properties and properties["Name"]["title"]:
-            page_title = properties["Name"]["title"][0]["plain_text"] if properties["Name"]["title"] else "untitled"
+        resumed = resume(ledger_key(item['id'], file_info.get(file_info['type'], {}).get('url', '')))
+        if resumed is not None:
+            return resumed
         
-        file_property = properties.get("ファイル")
-        if file_property and file_property["type"] == "files":
-            for file_idx, file_info in enumerate(file_property["files"]):
-                try:
-                    file_content = None
-                    file_name = ""
-                    file_url = ""
-                    
-                    # Notionに直接アップロードされたファイル
-                    if file_info["type"] == "file":
-                        file_name = file_info["name"]
-                        file_url = file_info["file"]["url"]
-                        ext = os.path.splitext(file_name)[1].lower()
-                        
-                        if ext in [".csv", ".xlsx", ".xls"]:
-                            response = requests.get(file_url, headers=headers)
-                            response.raise_for_status()
-                            file_content = response.content
-                            final_name = f"{os.path.splitext(file_name)[0]}_{item_idx+1}_{file_idx+1}{ext}"
-                    
-                    # Googleスプレッドシート等の外部URL
-                    elif file_info["type"] == "external":
-                        file_url = file_info["external"]["url"]
-                        if is_google_sheet_url(file_url):
-                            csv_url = google_sheet_to_csv_url(file_url)
-                            if csv_url:
-                                response = requests.get(csv_url, headers=headers)
-                                response.raise_for_status()
-                                file_content = response.content
-                                sheet_id = extract_sheet_id(file_url)
-                                final_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}.csv"
-                    
-                    if file_content and final_name:
-                        # ファイルハッシュを生成してチェック
-                        file_hash = generate_file_hash(file_content)
-                        file_key = f"{item['id']}_{file_url}"
-                        
-                        if file_key not in processed_files or processed_files[file_key].get('hash') != file_hash:
-                            # ファイルを処理
-                            df = process_file_content(file_content, final_name)
-                            if df is not None:
-                                processed_df, stats, error = process_dataframe(df, final_name)
-                                if processed_df is not None:
-                                    processed_dfs.append(processed_df)
-                                    total_stats["email_extracted"] += stats["email_extracted"]
-                                    total_stats["tel_extracted"] += stats["tel_extracted"]
-                                    success_count += 1
-                                    
-                                    # 処理済みファイルとして記録
-                                    new_processed_files[file_key] = {
-                                        'filename': final_name,
-                                        'hash': file_hash,
-                                        'processed_date': datetime.now().isoformat(),
-                                        'rows': len(processed_df)
-                                    }
-                                    
-                                    logging.info(f"処理成功: {final_name} ({len(processed_df)}行)")
-                                else:
-                                    error_count += 1
-                                    logging.error(f"データ処理エラー: {final_name} - {error}")
-                            else:
-                                error_count += 1
-                                logging.error(f"ファイル処理エラー: {final_name}")
-                        else:
-                            logging.info(f"スキップ（既処理済み）: {final_name}")
-                    
-                except Exception as e:
-                    error_count += 1
-                    logging.error(f"ダウンロードエラー: {str(e)}")
-    
-    logging.info(f"処理完了: 成功 {success_count}件, エラー {error_count}件")
+        # Notionに直接アップロードされたファイル
+        if file_info["type"] == "file":
+            file_name = file_info["name"]
+            file_url = file_info["file"]["url"]
+            ext = os.path.splitext(file_name)[1].lower()
+            
+            if ext in [".csv", ".xlsx", ".xls"]:
+                with recorder.span("download") as span:
+                    response = fetcher.get(file_url, headers=headers)
+                    response.raise_for_status()
+                    file_content = response.content
+                    span.bytes = len(file_content)
+                final_name = f"{os.path.splitext(file_name)[0]}_{item_idx+1}_{file_idx+1}{ext}"
+        
+        # Googleスプレッドシート等の外部URL
+        elif file_info["type"] == "external":
+            file_url = file_info["external"]["url"]
+            if is_google_sheet_url(file_url):
+                csv_url = google_sheet_to_csv_url(file_url)
+                if csv_url:
+                    with recorder.span("download") as span:
+                        response = fetcher.get(csv_url, headers=headers)
+                        response.raise_for_status()
+                        file_content = response.content
+                        span.bytes = len(file_content)
+                    sheet_id = extract_sheet_id(file_url)
+                    final_name = f"{page_title}_{sheet_id}_{item_idx+1}_{file_idx+1}.csv"
+        
+        if not (file_content and final_name):
+            return None
+        
+        # ファイルハッシュを生成してチェック
+        file_hash = generate_file_hash(file_content)
+        file_key = ledger_key(item['id'], file_url)
+        processed = processed_files.get(file_key)
+        if processed and processed.get('hash') == file_hash:
+            logging.info(f"スキップ（既処理済み）: {final_name}")
+            return None
+        return final_name, (file_content, file_key, file_hash, None)
+    
+    def parse(task, final_name, payload):
+        file_content, file_key, file_hash, resumed = payload
+        if resumed is not None:
+            return resumed + (file_key, file_hash, True)
+        
+        def process_file():
+            df = process_file_content(file_content, final_name, recorder)
+            if df is None:
+                return None
+            return process_dataframe(df, final_name, recorder, run_columns=False)
+        
+        # 強制全更新や前月取得済みのファイルは保存済みの処理結果を使う（実行ごとに変わる列は毎回追加）
+        result = frame_cache.cached(
+            frame_cache_key("update", FRAME_PIPELINE_VERSION, file_hash, final_name),
+            process_file, cacheable=lambda value: value[0] is not None
+        )
+        if result is None:
+            return None
+        if result[0] is not None:
+            add_run_columns(result[0], final_name)
+        return result + (file_key, file_hash, False)
+    
+    frame_cache = get_frame_cache(FRAME_CACHE_DIR)
+    frame_counters = frame_cache.counters()
+    # 同時取得数は取得エンジンに合わせる（httpx では待ち合わせるだけのスレッドになる）
+    pipeline = FilePipeline(expand, fetch, parse,
+                            download_workers=max(PIPELINE_DOWNLOAD_WORKERS, fetcher.concurrency))
+    ordered_dfs = []
+    for result in pipeline.run(items):
+        if result.error is not None:
+            error_count += 1
+            logging.error(f"ダウンロードエラー: {result.error}" if result.stage != "parse"
+                          else f"ファイル処理エラー ({result.name}): {result.error}")
+            continue
+        if result.value is None:
+            error_count += 1
+            logging.error(f"ファイル処理エラー: {result.name}")
+            continue
+        
+        processed_df, stats, error, file_key, file_hash, resumed = result.value
+        final_name = result.name
+        if processed_df is not None:
+            ordered_dfs.append((result.seq, processed_df))
+            file_keys.append(file_key)
+            total_stats["email_extracted"] += stats["email_extracted"]
+            total_stats["tel_extracted"] += stats["tel_extracted"]
+            success_count += 1
+            
+            if resumed:
+                resumed_count += 1
+            else:
+                # 処理済みファイルとしてすぐにコミット（途中で止まっても次の実行で再開できる）
+                ledger.record(file_key, final_name, file_hash, len(processed_df))
+            
+            logging.info(f"処理成功: {final_name} ({len(processed_df)}行)")
+        else:
+            error_count += 1
+            logging.error(f"データ処理エラー: {final_name} - {error}")
+    
+    # 完了順ではなくNotionのページ順で統合する
+    processed_dfs = [df for _, df in sorted(ordered_dfs, key=lambda entry: entry[0])]
+    logging.info(f"パイプライン: ダウンロード {pipeline.stats['downloaded']}件 / スキップ {pipeline.stats['skipped']}件 / "
+                 f"キュー内の最大ファイル数 {pipeline.stats['peak_queued_files']}")
+    logging.info(fetcher.summary())
+    if own_fetcher:
+        fetcher.close()
+    
+    logging.info(f"処理完了: 成功 {success_count}件（前回の実行から再開 {resumed_count}件）, エラー {error_count}件")
     logging.info(f"メール抽出: {total_stats['email_extracted']}件, 電話番号抽出: {total_stats['tel_extracted']}件")
+    logging.info(ledger.summary())
     
-    # 処理済みファイルログを更新
-    save_processed_files(new_processed_files)
+    # 列構成キャッシュを保存
+    schema_cache = get_schema_cache(SCHEMA_CACHE_FILE)
+    schema_cache.save()
+    logging.info(schema_cache.summary())
+    logging.info(frame_cache.summary(frame_counters))
     
-    return processed_dfs, total_stats
+    return processed_dfs, total_stats, file_keys
 
-def process_file_content(file_content, filename):
+def process_file_content(file_content, filename, recorder=NULL_RECORDER):
     """ファイル内容を処理してDataFrameを返す"""
     try:
         # 一時ファイルに保存
@@ -516,10 +643,15 @@ def process_file_content(file_content, filename):
             # ファイル読み込み
             if filename.lower().endswith('.csv'):
                 # 文字コード判定
-                encoding = detect(file_content)["encoding"] or "utf-8"
-                df = pd.read_csv(tmp_file.name, dtype=str, encoding=encoding, on_bad_lines="skip")
+                with recorder.span("encoding", bytes=len(file_content)):
+                    encoding = detect(file_content)["encoding"] or "utf-8"
+                with recorder.span("parse", bytes=len(file_content)) as span:
+                    df = pd.read_csv(tmp_file.name, dtype=str, encoding=encoding, on_bad_lines="skip")
+                    span.rows_out = len(df)
             else:
-                df = pd.read_excel(tmp_file.name, dtype=str, engine='openpyxl')
+                with recorder.span("parse", bytes=len(file_content)) as span:
+                    df = read_excel(tmp_file.name, filename)
+                    span.rows_out = len(df)
             
             # 一時ファイル削除
             os.unlink(tmp_file.name)
@@ -539,7 +671,8 @@ def load_existing_data():
     """既存の統合データを読み込み"""
     if os.path.exists(MERGED_FILE):
         try:
-            df = pd.read_excel(MERGED_FILE, dtype=str, engine='openpyxl')
+            # 行数がシートの上限を超えて分割保存された場合に備えて全シートを読む
+            df = read_excel(MERGED_FILE, all_sheets=True)
             logging.info(f"既存データ読み込み完了: {len(df)}行")
             return df
         except Exception as e:
@@ -547,45 +680,55 @@ def load_existing_data():
     
     return pd.DataFrame()
 
-def merge_with_existing_data(new_dfs, existing_df):
+def merge_with_existing_data(new_dfs, existing_df, recorder=NULL_RECORDER):
     """新規データと既存データを統合し、重複削除"""
     if not new_dfs:
         logging.info("新規データがありません")
         return existing_df
     
-    # 新規データを統合
-    new_data = pd.concat(new_dfs, ignore_index=True)
-    logging.info(f"新規データ: {len(new_data)}行")
-    
-    if existing_df.empty:
-        merged_df = new_data
-    else:
-        # 既存データと結合
-        merged_df = pd.concat([existing_df, new_data], ignore_index=True)
+    with recorder.span("concat") as span:
+        # 新規データを統合
+        new_data = pd.concat(new_dfs, ignore_index=True)
+        logging.info(f"新規データ: {len(new_data)}行")
+        
+        if existing_df.empty:
+            merged_df = new_data
+        else:
+            # 既存データと結合
+            merged_df = pd.concat([existing_df, new_data], ignore_index=True)
+        span.rows_out = len(merged_df)
     
     before_count = len(merged_df)
-    
-    # 重複削除（古いデータを削除、新しいデータを保持）
-    # メールアドレスベースの重複削除
-    if 'メールアドレス' in merged_df.columns:
-        email_mask = (merged_df['メールアドレス'].notna()) & (merged_df['メールアドレス'] != '')
-        email_duplicates = merged_df[email_mask].duplicated(subset=['メールアドレス'], keep='last')
-        merged_df = merged_df[~email_duplicates]
-        email_removed = email_duplicates.sum()
-        logging.info(f"メールアドレス重複削除: {email_removed}件")
-    
-    # 会社名+展示会名ベースの重複削除
-    key_duplicates = merged_df.duplicated(subset=['会社名', '展示会名'], keep='last')
-    merged_df = merged_df[~key_duplicates]
-    key_removed = key_duplicates.sum()
-    logging.info(f"会社名+展示会名重複削除: {key_removed}件")
-    
-    # 空行削除
-    key_cols_check = ["メールアドレス", "Tel", "会社名"]
-    empty_mask = merged_df[key_cols_check].replace("", pd.NA).isna().all(axis=1)
-    merged_df = merged_df[~empty_mask]
-    empty_removed = empty_mask.sum()
-    logging.info(f"空行削除: {empty_removed}件")
+    with recorder.span("dedup", rows_in=before_count) as span:
+        # 重複削除（古いデータを削除、新しいデータを保持）
+        # メールアドレスベースの重複削除
+        if 'メールアドレス' in merged_df.columns:
+            email_mask = (merged_df['メールアドレス'].notna()) & (merged_df['メールアドレス'] != '')
+            email_duplicates = merged_df[email_mask].duplicated(subset=['メールアドレス'], keep='last')
+            merged_df = merged_df[~email_duplicates]
+            email_removed = email_duplicates.sum()
+            logging.info(f"メールアドレス重複削除: {email_removed}件")
+        
+        # 会社名+展示会名ベースの重複削除（FUZZY_COMPANY_DEDUP=true なら会社名の表記ゆれを統合）
+        if FUZZY_COMPANY_DEDUP:
+            company_groups, resolution = resolve_companies(
+                merged_df['会社名'], merged_df.get('メールアドレス'), merged_df.get('Tel'))
+            logging.info(resolution_summary(resolution))
+            key_frame = pd.DataFrame({'会社': company_groups, '展示会名': merged_df['展示会名'].to_numpy()})
+            key_duplicates = pd.Series(key_frame.duplicated(keep='last').to_numpy(), index=merged_df.index)
+        else:
+            key_duplicates = merged_df.duplicated(subset=['会社名', '展示会名'], keep='last')
+        merged_df = merged_df[~key_duplicates]
+        key_removed = key_duplicates.sum()
+        logging.info(f"会社名+展示会名重複削除: {key_removed}件")
+        
+        # 空行削除
+        key_cols_check = ["メールアドレス", "Tel", "会社名"]
+        empty_mask = merged_df[key_cols_check].replace("", pd.NA).isna().all(axis=1)
+        merged_df = merged_df[~empty_mask]
+        empty_removed = empty_mask.sum()
+        logging.info(f"空行削除: {empty_removed}件")
+        span.rows_out = len(merged_df)
     
     after_count = len(merged_df)
     logging.info(f"統合結果: {before_count} → {after_count}行 ({before_count - after_count}件削除)")
@@ -620,47 +763,60 @@ def main():
         logging.error("エラー: NOTION_API_KEY または DATABASE_ID が設定されていません")
         return
     
+    # 段階ごとの所要時間・行数（INSTRUMENTATION_DIR に JSON で保存）
+    recorder = RunRecorder("update")
+    
     try:
         # 出力ディレクトリ作成
         create_output_dir()
         
-        # Notion クライアント初期化
-        notion = Client(auth=NOTION_API_KEY)
+        # Notion クライアント初期化（レート制御・429再試行付き）
+        client_options = {"base_url": NOTION_BASE_URL} if NOTION_BASE_URL else {}
+        notion = RateLimitedClient(Client(auth=NOTION_API_KEY, **client_options))
         
-        # 処理済みファイルログを読み込み
-        processed_files = load_processed_files()
+        # 処理済みファイルの台帳を開く
+        ledger = open_processed_ledger()
+        processed_files = ledger
         
         if FORCE_FULL_UPDATE:
             logging.info("強制全更新モード: 全データを再処理します")
-            processed_files = {}  # 処理済みファイルログをクリア
+            processed_files = {}  # 処理済みの判定をしない（台帳の記録は処理し直したファイルで上書き）
         
         # 今月の新規ファイルを取得
         new_items = fetch_new_files_from_notion(notion, DATABASE_ID, processed_files)
+        logging.info(notion.limiter.summary())
         
         if not new_items and not FORCE_FULL_UPDATE:
             logging.info("今月の新規ファイルが見つかりませんでした。処理を終了します。")
             return
         
         # 新規ファイルをダウンロード・処理
-        new_dfs, stats = download_and_process_new_files(new_items, processed_files)
+        new_dfs, stats, file_keys = download_and_process_new_files(new_items, processed_files, recorder=recorder,
+                                                                   ledger=ledger)
         
         # 今月の新規データを保存
         if new_dfs:
             monthly_data = pd.concat(new_dfs, ignore_index=True)
-            monthly_data.to_excel(MONTHLY_FILE, index=False)
+            with recorder.span("export", rows_in=len(monthly_data)):
+                write_xlsx(monthly_data, MONTHLY_FILE)
             logging.info(f"今月の新規データ保存: {MONTHLY_FILE} ({len(monthly_data)}行)")
         
         # 既存データを読み込み
         existing_data = load_existing_data()
         
         # データ統合と重複削除
-        final_data = merge_with_existing_data(new_dfs, existing_data)
+        final_data = merge_with_existing_data(new_dfs, existing_data, recorder)
         
         # 最終データを保存
         if not final_data.empty:
-            final_data.to_excel(MERGED_FILE, index=False)
+            with recorder.span("export", rows_in=len(final_data)):
+                write_xlsx(final_data, MERGED_FILE)
             logging.info(f"統合データ保存完了: {MERGED_FILE} ({len(final_data)}行)")
             
+            # 統合データを保存できたので、今回処理・再開したファイルだけを統合済みにする
+            merged_count = ledger.mark_merged(file_keys)
+            logging.info(f"処理済みファイル台帳を更新: 統合済み {merged_count}件")
+            
             # 更新ログ保存
             save_monthly_update_log(stats, len(new_items), len(final_data))
             
@@ -671,6 +827,11 @@ def main():
     except Exception as e:
         logging.error(f"エラーが発生しました: {e}")
         raise
+    finally:
+        logging.info(recorder.summary())
+        report_path = recorder.write()
+        if report_path:
+            logging.info(f"計測レポート保存: {report_path}")
 
 if __name__ == "__main__":
     main()
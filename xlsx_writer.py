@@ -0,0 +1,112 @@
+"""
+xlsx_writer.py - DataFrame の xlsx 書き出し（行ストリーミング、シートの行数上限で分割）
+xlsxwriter の constant_memory（なければ openpyxl の write_only）で1行ずつ書き出し、セルオブジェクトを保持しない。
+Excel の1シートの上限（1,048,576 行、うち1行は列名）を超える場合は列名つきで次のシートに分けて書く
+（ExhibitionData, ExhibitionData_2, ...）。読み込むときは excel_reader.read_excel(..., all_sheets=True)。
+"""
+
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+# Excel の1シートの最大行数（列名の行を含む）
+EXCEL_MAX_ROWS = 1048576
+# 1シートに書くデータの行数（既定は上限いっぱい）
+XLSX_SHEET_ROWS = int(os.environ.get("XLSX_SHEET_ROWS", str(EXCEL_MAX_ROWS - 1)))
+# シート名の最大文字数
+_SHEET_NAME_LENGTH = 31
+
+def available_xlsx_engines():
+    """利用可能なExcel書き出しエンジン（速い順）"""
+    engines = []
+    try:
+        import xlsxwriter  # noqa: F401
+        engines.append('xlsxwriter')
+    except ImportError:
+        pass
+    engines.append('openpyxl')
+    return engines
+
+def _cell_value(value):
+    """セルに書く値（欠損は空セル、numpy の数値は Python の数値）"""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+        if isinstance(value, float) and value != value:
+            return None
+    return value
+
+def sheet_names(base, count):
+    """分割したシートの名前（2枚目以降は _2, _3 ...、31文字以内）"""
+    names = []
+    for index in range(count):
+        suffix = f"_{index + 1}" if index else ""
+        names.append(f"{base[:_SHEET_NAME_LENGTH - len(suffix)]}{suffix}")
+    return names
+
+def _sheet_ranges(rows, sheet_rows):
+    """シートごとのデータ行の範囲（0行でも1シート）"""
+    sheet_rows = max(1, min(sheet_rows, EXCEL_MAX_ROWS - 1))
+    return [(start, min(start + sheet_rows, rows)) for start in range(0, rows, sheet_rows)] or [(0, 0)]
+
+def write_xlsx(df, target, sheet_name='Sheet1', engine=None, sheet_rows=None, formulas=False):
+    """DataFrame を xlsx に書き出し、書いたシート数を返す（target はパスまたはファイルオブジェクト）
+
+    formulas=True の場合は '=' で始まる文字列を数式として書く（False なら文字列のまま）
+    """
+    engine = engine or available_xlsx_engines()[0]
+    ranges = _sheet_ranges(len(df), XLSX_SHEET_ROWS if sheet_rows is None else sheet_rows)
+    names = sheet_names(sheet_name, len(ranges))
+    header = [str(col) for col in df.columns]
+
+    if engine == 'xlsxwriter':
+        import xlsxwriter
+        # constant_memory: 1行ずつ書き出してセルオブジェクトを保持しない（シートは順に書き切る）
+        workbook = xlsxwriter.Workbook(target, {
+            'constant_memory': True,
+            'strings_to_formulas': formulas,
+            'strings_to_numbers': False,
+            'strings_to_urls': False,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        for name, (start, end) in zip(names, ranges):
+            worksheet = workbook.add_worksheet(name)
+            worksheet.write_row(0, 0, header)
+            rows = df.iloc[start:end].itertuples(index=False, name=None)
+            for row_idx, row in enumerate(rows, start=1):
+                worksheet.write_row(row_idx, 0, [_cell_value(value) for value in row])
+        workbook.close()
+    else:
+        from openpyxl import Workbook
+        # write_only: 追加した行はすぐに書き出され、セルオブジェクトを保持しない
+        workbook = Workbook(write_only=True)
+        for name, (start, end) in zip(names, ranges):
+            worksheet = workbook.create_sheet(name)
+            worksheet.append(header)
+            for row in df.iloc[start:end].itertuples(index=False, name=None):
+                values = [_cell_value(value) for value in row]
+                if not formulas:
+                    values = [_text_cell(worksheet, value) for value in values]
+                worksheet.append(values)
+        workbook.save(target)
+    return len(ranges)
+
+def _text_cell(worksheet, value):
+    """openpyxl は '=' で始まる文字列を数式として書くため、文字列のセルにする"""
+    if isinstance(value, str) and value.startswith('='):
+        from openpyxl.cell import WriteOnlyCell
+        cell = WriteOnlyCell(worksheet, value)
+        cell.data_type = 's'
+        return cell
+    return value
+
+def dataframe_to_xlsx_bytes(df, sheet_name='ExhibitionData', engine=None):
+    """DataFrameをExcelファイルのバイト列に変換"""
+    output = io.BytesIO()
+    write_xlsx(df, output, sheet_name, engine)
+    return output.getvalue()